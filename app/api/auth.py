@@ -11,11 +11,13 @@ try:
 except Exception:
     class _Fallback:
         API_KEY: Optional[str] = None
+        ADMIN_API_KEY: Optional[str] = None
     settings = _Fallback()  # type: ignore
 
 # Desteklenen iki alınış yöntemi
 _api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 _api_key_query = APIKeyQuery(name="api_key", auto_error=False)
+_admin_key_header = APIKeyHeader(name="X-Admin-Key", auto_error=False)
 
 
 async def get_api_key(
@@ -45,3 +47,26 @@ async def require_api_key(api_key: Optional[str] = Depends(get_api_key)) -> None
         )
     # Başarılı doğrulama → None döner (FastAPI dependency sözleşmesi)
     return
+
+
+async def require_admin_key(
+    admin_key: Optional[str] = Depends(_admin_key_header),
+    api_key: Optional[str] = Depends(get_api_key),
+) -> None:
+    """
+    Yıkıcı admin işlemleri (birleştirme, arşivleme vb.) için dependency:
+      - settings.ADMIN_API_KEY varsa X-Admin-Key header'ı ile birebir eşleşme zorunlu.
+      - Yoksa normal API anahtarı kuralı uygulanır (API_KEY de yoksa açık mod).
+    """
+    expected = (getattr(settings, "ADMIN_API_KEY", None) or "").strip()
+    if not expected:
+        await require_api_key(api_key)
+        return
+
+    supplied = (admin_key or "").strip()
+    if not supplied or supplied != expected:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Forbidden: invalid or missing admin key.",
+        )
+    return
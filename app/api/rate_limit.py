@@ -1,9 +1,42 @@
 # app/api/rate_limit.py
 from __future__ import annotations
 
-import os
+"""
+Maliyet ağırlıklı, worker'lar arası paylaşılan token-bucket hız sınırlayıcı.
+
+- Anahtar: RATE_LIMIT_KEY=user → doğrulanmış API anahtarı varsa anahtar + user_id (query
+  veya JSON gövdesi; anahtar sahibinin kullanıcıları ayrı kovalar), yoksa anahtar, yoksa
+  istemci IP'si. RATE_LIMIT_KEY=api_key → doğrulanmış API anahtarı, yoksa IP.
+  İstemcinin gönderdiği değerler (user_id, X-API-Key) yalnızca anahtar settings.API_KEY /
+  ADMIN_API_KEY ile eşleşiyorsa kova seçer; açık modda (API_KEY yok) veya eşleşmeyen
+  anahtarda IP kovası kullanılır (her istekte yeni değerle sınırı aşmak mümkün olurdu).
+- Kova: RATE_LIMIT ("60/minute") dolum hızı, RATE_LIMIT_BURST kapasite (token).
+- Route maliyeti: route şablonu + method (ör. "POST /api/chat=3"); 0 → sınırsız.
+- Durum: RATE_LIMIT_BACKEND=sqlite iken aynı makinedeki tüm worker'lar tek bir
+  SQLite dosyasını paylaşır; dolum + tüketim tek BEGIN IMMEDIATE işleminde atomiktir.
+  memory → süreç içi (tek worker / test).
+- Yanıtlar: RateLimit-Limit / -Remaining / -Reset / -Policy başlıkları; 429'da Retry-After.
+
+Kullanım: router bağımlılığı olarak rate_limit, başlıklar için apply_headers middleware'i.
+Depo hatasında istek geçirilir (fail-open) ve sayaç artırılır.
+"""
+
+import fnmatch
+import hashlib
+import hmac
 import logging
-from typing import Optional
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 log = logging.getLogger("rate_limit")
 
@@ -12,60 +45,366 @@ try:
     from app.core.config import settings  # type: ignore
 except Exception:
     class _Fallback:
-        RATE_LIMIT: str = "60/minute"
+        RATE_LIMIT: str = os.getenv("RATE_LIMIT", "60/minute")
+        RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+        RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "30"))
+        RATE_LIMIT_KEY = os.getenv("RATE_LIMIT_KEY", "user")
+        RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+        RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "")
+        RATE_LIMIT_COSTS = os.getenv("RATE_LIMIT_COSTS", "")
+        API_PREFIX = "/api"
+        DB_PATH = os.getenv("DB_PATH", "./data/memory.db")
+        API_KEY = os.getenv("API_KEY")
+        ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
     settings = _Fallback()  # type: ignore
 
-
-# -----------------------------------------------------------------------------
-# SlowAPI (Flask-Limiter tarzı FastAPI rate limit)
-# -----------------------------------------------------------------------------
 try:
-    from slowapi import Limiter  # type: ignore
-    from slowapi.util import get_remote_address  # type: ignore
-    from slowapi.errors import RateLimitExceeded  # type: ignore
-    from fastapi.responses import JSONResponse
-    from fastapi import Request
-
-    # Ortak limiter nesnesi (IP tabanlı)
-    limiter = Limiter(key_func=get_remote_address)
-
-    async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
-        """Hız limiti aşıldığında dönecek standart yanıt."""
-        return JSONResponse(
-            status_code=429,
-            content={
-                "code": "rate_limit_exceeded",
-                "message": "Too many requests. Please try again later.",
-                "detail": {
-                    "limit": str(exc.detail),
-                    "path": str(request.url.path),
-                },
-            },
-        )
-
-    # Uygulama genelinde kullanılacak varsayılan limit (örn. 60/dakika)
-    DEFAULT_LIMIT = getattr(settings, "RATE_LIMIT", "60/minute")
-
-    # Örnek kullanım (router içinde):
-    # from app.api.rate_limit import limiter
-    # @router.get("/endpoint")
-    # @limiter.limit("5/minute")
-    # async def endpoint(): ...
-    #
-    # veya global: app.state.limiter = limiter
-
-except Exception as e:
-    # slowapi yüklü değilse fallback
-    log.warning("SlowAPI bulunamadı veya başlatılamadı: %s", e)
-
-    class DummyLimiter:
-        def limit(self, *args, **kwargs):
-            def decorator(func):
-                return func
-            return decorator
-
-    async def rate_limit_exceeded_handler(*_, **__):
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+_PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0, "day": 86400.0}
+
+# Varsayılan route maliyetleri (RATE_LIMIT_COSTS ile genişletilir / ezilir).
+# Sohbet turu: yanıt + distillation + extraction → en fazla üç LLM çağrısı;
+# hafıza yazımı / arama bir embedding çağrısı; sağlık / istatistik / admin ücretsiz.
+_P = str(getattr(settings, "API_PREFIX", "/api") or "").rstrip("/")
+DEFAULT_COSTS: Tuple[Tuple[str, float], ...] = (
+    (f"POST {_P}/chat", 3.0),
+    (f"POST {_P}/memory/*", 1.0),
+    (f"GET {_P}/memory/*", 0.5),
+    (f"GET {_P}/health*", 0.0),
+    (f"GET {_P}/stats", 0.0),
+    (f"* {_P}/admin/*", 0.0),
+    ("*", 1.0),
+)
+
+
+def parse_rate(value: str) -> float:
+    """'60/minute' → saniye başına token (1.0). Geçersizse ValueError."""
+    n, _, period = str(value).strip().partition("/")
+    period = period.strip().lower().rstrip("s") or "second"
+    if period not in _PERIODS:
+        raise ValueError(f"unsupported rate period: {value!r}")
+    return float(n) / _PERIODS[period]
+
+
+def parse_costs(value: str) -> List[Tuple[str, float]]:
+    """'POST /api/chat=3, GET /api/memory/*=0.5' → [(desen, maliyet)] (verilen sırayla)."""
+    out: List[Tuple[str, float]] = []
+    for part in str(value or "").split(","):
+        pattern, sep, cost = part.strip().rpartition("=")
+        if sep and pattern.strip():
+            out.append((pattern.strip(), float(cost)))
+    return out
+
+
+RATE_LIMIT_ENABLED: bool = bool(getattr(settings, "RATE_LIMIT_ENABLED", True))
+DEFAULT_LIMIT: str = str(getattr(settings, "RATE_LIMIT", "60/minute"))
+REFILL_PER_S: float = parse_rate(DEFAULT_LIMIT)
+BURST: float = max(1.0, float(getattr(settings, "RATE_LIMIT_BURST", 30.0)))
+KEY_MODE: str = str(getattr(settings, "RATE_LIMIT_KEY", "user") or "user").lower()
+BACKEND: str = str(getattr(settings, "RATE_LIMIT_BACKEND", "sqlite") or "sqlite").lower()
+COSTS: List[Tuple[str, float]] = parse_costs(getattr(settings, "RATE_LIMIT_COSTS", "")) + list(DEFAULT_COSTS)
+
+
+def route_cost(method: str, route: str) -> float:
+    """İlk eşleşen desenin maliyeti; desen 'METHOD /yol' veya yalnızca '/yol' / '*' olabilir."""
+    target = f"{method.upper()} {route}"
+    for pattern, cost in COSTS:
+        if " " not in pattern and pattern != "*":
+            pattern = f"* {pattern}"
+        if fnmatch.fnmatchcase(target, pattern):
+            return cost
+    return 1.0
+
+
+class Decision:
+    """Tek bir kontrolün sonucu (başlıklar bu nesneden üretilir)."""
+
+    __slots__ = ("allowed", "key", "cost", "remaining", "capacity", "rate", "retry_after_s")
+
+    def __init__(self, allowed: bool, key: str, cost: float, remaining: float, capacity: float, rate: float) -> None:
+        self.allowed = allowed
+        self.key = key
+        self.cost = cost
+        self.remaining = max(0.0, remaining)
+        self.capacity = capacity
+        self.rate = rate
+        self.retry_after_s = 0 if allowed else _ceil_s((cost - self.remaining) / rate if rate > 0 else 0)
+
+    def headers(self) -> Dict[str, str]:
+        reset = _ceil_s((self.capacity - self.remaining) / self.rate) if self.rate > 0 else 0
+        out = {
+            "RateLimit-Limit": str(int(self.capacity)),
+            "RateLimit-Remaining": str(int(math.floor(self.remaining))),
+            "RateLimit-Reset": str(reset),
+            "RateLimit-Policy": f"{int(self.capacity)};w={_ceil_s(self.capacity / self.rate) if self.rate > 0 else 0}",
+        }
+        if not self.allowed:
+            out["Retry-After"] = str(self.retry_after_s)
+        return out
+
+
+def _ceil_s(seconds: float) -> int:
+    return max(0, int(math.ceil(seconds)))
+
+
+# ---------------------------
+# Depolar
+# ---------------------------
+class _MemoryBuckets:
+    """Süreç içi kovalar (tek worker / test)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._data: Dict[str, Tuple[float, float]] = {}
+
+    def take(self, key: str, cost: float, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            tokens, ts = self._data.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._data[key] = (tokens, now)
+            return allowed, tokens
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            stale = [k for k, (_, ts) in self._data.items() if ts < older_than]
+            for k in stale:
+                del self._data[k]
+            return len(stale)
+
+
+class _SQLiteBuckets:
+    """
+    Worker'lar arası paylaşılan kovalar. Durum geçicidir (synchronous=OFF); çökmede
+    kaybolması yalnızca kovaların dolu başlaması demektir.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+          bucket_key TEXT PRIMARY KEY,
+          tokens REAL NOT NULL,
+          updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._local = threading.local()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        con = self._connect()
+        try:
+            con.execute(self._SCHEMA)
+        finally:
+            con.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=OFF;")
+        con.execute("PRAGMA busy_timeout=2000;")
+        return con
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = self._connect()
+            self._local.con = con
+        return con
+
+    def take(self, key: str, cost: float, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        con = self._con()
+        # BEGIN IMMEDIATE: oku-dol-tüket-yaz, diğer worker'lar için tek atomik adım
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            row = con.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE bucket_key = ?", (key,)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            con.execute(
+                "INSERT INTO rate_buckets (bucket_key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(bucket_key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+    def prune(self, older_than: float) -> int:
+        cur = self._con().execute("DELETE FROM rate_buckets WHERE updated_at < ?", (older_than,))
+        return cur.rowcount
+
+
+def _default_db_path() -> str:
+    explicit = str(getattr(settings, "RATE_LIMIT_DB_PATH", "") or "")
+    if explicit:
+        return explicit
+    base = Path(str(getattr(settings, "DB_PATH", "./data/memory.db"))).parent
+    return str(base / "ratelimit.db")
+
+
+class TokenBucketLimiter:
+    def __init__(self, *, capacity: float, rate: float, backend: str = "sqlite", path: Optional[str] = None) -> None:
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.backend = backend
+        self._store: Any = _SQLiteBuckets(path or _default_db_path()) if backend == "sqlite" else _MemoryBuckets()
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def check(self, key: str, cost: float) -> Decision:
+        now = time.time()
+        try:
+            ok, remaining = self._store.take(key, cost, self.capacity, self.rate, now)
+        except Exception as e:
+            # Depo erişilemezse isteği engelleme (fail-open)
+            self.errors += 1
+            _incr("rate_limit_store_error")
+            log.warning("Rate limit deposu hatası (%s): %r", self.backend, e)
+            return Decision(True, key, cost, self.capacity, self.capacity, self.rate)
+        if ok:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+            _incr("rate_limit_rejected")
+        # Ara sıra tamamen dolmuş (boşta) kovaları temizle
+        if random.random() < 0.001 and self.rate > 0:
+            try:
+                self._store.prune(now - self.capacity / self.rate)
+            except Exception:
+                pass
+        return Decision(ok, key, cost, remaining, self.capacity, self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": RATE_LIMIT_ENABLED,
+            "backend": self.backend,
+            "key": KEY_MODE,
+            "capacity": self.capacity,
+            "refill_per_s": self.rate,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "store_errors": self.errors,
+        }
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
+
+# ---------------------------
+# FastAPI entegrasyonu
+# ---------------------------
+class RateLimitExceeded(Exception):
+    def __init__(self, decision: Decision) -> None:
+        super().__init__(f"rate limit exceeded for {decision.key}")
+        self.decision = decision
+
+
+def _hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()[:16]
+
+
+async def _user_id(request: Request) -> Optional[str]:
+    uid = request.query_params.get("user_id")
+    if uid:
+        return uid
+    if request.method in ("POST", "PUT", "PATCH") and "json" in request.headers.get("content-type", ""):
+        try:
+            # FastAPI gövdeyi zaten okudu; Request nesnesi önbelleği paylaşılır
+            body = await request.json()
+        except Exception:
+            return None
+        if isinstance(body, dict) and body.get("user_id"):
+            return str(body["user_id"])
+    return None
+
+
+def _verified_key(request: Request) -> Optional[str]:
+    """İstekteki API anahtarı; yalnızca yapılandırılmış anahtarlardan biriyle eşleşiyorsa."""
+    supplied = (request.headers.get("x-api-key") or request.query_params.get("api_key") or "").strip()
+    if not supplied:
         return None
+    for name in ("API_KEY", "ADMIN_API_KEY"):
+        expected = (getattr(settings, name, None) or "").strip()
+        if expected and hmac.compare_digest(supplied.encode("utf-8"), expected.encode("utf-8")):
+            return supplied
+    return None
+
+
+async def client_key(request: Request) -> str:
+    api_key = _verified_key(request)
+    if not api_key:
+        # Kimliği doğrulanmamış istemci: user_id / anahtar değerine güvenilmez, IP kovası
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+    if KEY_MODE == "user":
+        uid = await _user_id(request)
+        if uid:
+            return f"user:{_hash(api_key)}:{uid}"
+    return f"key:{_hash(api_key)}"
+
+
+async def rate_limit(request: Request) -> None:
+    """
+    Router bağımlılığı: route maliyetini istemci kovasından düşer; yetersizse 429.
+    Karar request.state.rate_limit'e yazılır (başlıklar middleware'de eklenir).
+    Kova işlemi (sqlite: BEGIN IMMEDIATE + busy_timeout) thread havuzunda çalışır;
+    kilit beklemesi event loop'u durdurmaz.
+    """
+    if not RATE_LIMIT_ENABLED or limiter is None:
+        return
+    route = getattr(request.scope.get("route"), "path", None) or request.url.path
+    cost = route_cost(request.method, route)
+    if cost <= 0:
+        return
+    decision = await run_in_threadpool(limiter.check, await client_key(request), cost)
+    request.state.rate_limit = decision
+    if not decision.allowed:
+        raise RateLimitExceeded(decision)
+
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+    """Hız limiti aşıldığında dönecek standart yanıt."""
+    d = exc.decision
+    return JSONResponse(
+        status_code=429,
+        content={
+            "code": "rate_limit_exceeded",
+            "message": "Too many requests. Please try again later.",
+            "detail": {
+                "limit": DEFAULT_LIMIT,
+                "cost": d.cost,
+                "retry_after_s": d.retry_after_s,
+                "path": str(request.url.path),
+            },
+        },
+        headers=d.headers(),
+    )
+
+
+def apply_headers(request: Request, response) -> None:
+    """Başarılı yanıtlara RateLimit-* başlıklarını ekler (karar verildiyse)."""
+    decision = getattr(request.state, "rate_limit", None)
+    if decision is not None and decision.allowed:
+        for k, v in decision.headers().items():
+            response.headers[k] = v
+
 
-    limiter = DummyLimiter()
-    DEFAULT_LIMIT = "disabled"
+limiter: Optional[TokenBucketLimiter] = None
+if RATE_LIMIT_ENABLED:
+    try:
+        limiter = TokenBucketLimiter(capacity=BURST, rate=REFILL_PER_S, backend=BACKEND)
+    except Exception as e:
+        log.warning("Rate limiter başlatılamadı; hız sınırı devre dışı: %s", e)
+        limiter = None
@@ -2,10 +2,14 @@
 from __future__ import annotations
 
 import time
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from fastapi import APIRouter
-from starlette.responses import JSONResponse
+from fastapi import APIRouter, Depends, Query
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse
+
+from app.api.auth import require_admin_key
+from app.api.schemas import ConsolidationRequest, RestoreRequest
 
 # Opsiyonel metrik modülü
 try:
@@ -20,6 +24,102 @@ except Exception:
         topk_global = 5
     METRICS = _DummyMetrics()  # type: ignore
 
+# Opsiyonel write-back kapısı istatistikleri
+try:
+    from app.services import writeback_gate  # type: ignore
+except Exception:
+    writeback_gate = None  # type: ignore
+
+# Opsiyonel LLM yanıt önbelleği istatistikleri
+try:
+    from app.services import llm_cache  # type: ignore
+except Exception:
+    llm_cache = None  # type: ignore
+
+# Opsiyonel koşan STM özeti
+try:
+    from app.services import stm_summary  # type: ignore
+except Exception:
+    stm_summary = None  # type: ignore
+
+# Opsiyonel retrieval sonuç önbelleği
+try:
+    from app.services import retrieval_cache  # type: ignore
+except Exception:
+    retrieval_cache = None  # type: ignore
+
+# Opsiyonel LLM istemcisi (devre kesici durumu)
+try:
+    from app.services import llm_client  # type: ignore
+except Exception:
+    llm_client = None  # type: ignore
+
+# Opsiyonel embedding istemcisi (batch kuyruğu / devre kesici)
+try:
+    from app.services import embed_client  # type: ignore
+except Exception:
+    embed_client = None  # type: ignore
+
+# Opsiyonel LTM birleştirme işi
+try:
+    from app.services import consolidator  # type: ignore
+except Exception:
+    consolidator = None  # type: ignore
+
+# Opsiyonel retention / soğuk arşiv
+try:
+    from app.services import retention  # type: ignore
+except Exception:
+    retention = None  # type: ignore
+
+# Opsiyonel segmentli vektör deposu
+try:
+    from app.services import vector_segments  # type: ignore
+except Exception:
+    vector_segments = None  # type: ignore
+
+# Opsiyonel istek izleme (span dışa aktarıcı durumu)
+try:
+    from app.observability import tracing  # type: ignore
+except Exception:
+    tracing = None  # type: ignore
+
+# Opsiyonel örneklemeli profil / yavaş istek yakalama
+try:
+    from app.observability import profiler  # type: ignore
+except Exception:
+    profiler = None  # type: ignore
+
+# Opsiyonel liveness / readiness kontrolleri
+try:
+    from app.observability import health as health_checks  # type: ignore
+except Exception:
+    health_checks = None  # type: ignore
+
+# Opsiyonel açılış süreleri (import / ısınma)
+try:
+    from app.services import warmup  # type: ignore
+except Exception:
+    warmup = None  # type: ignore
+
+# Opsiyonel sağlayıcı eşzamanlılık / kuyruk durumu
+try:
+    from app.services import provider_scheduler  # type: ignore
+except Exception:
+    provider_scheduler = None  # type: ignore
+
+# Opsiyonel hız sınırlayıcı (kapalıysa limiter None)
+try:
+    from app.api.rate_limit import limiter as rate_limiter  # type: ignore
+except Exception:
+    rate_limiter = None  # type: ignore
+
+# Opsiyonel shard / bağlantı havuzu bilgisi
+try:
+    from app.db import repository  # type: ignore
+except Exception:
+    repository = None  # type: ignore
+
 router = APIRouter()
 _STARTED_AT = time.time()
 
@@ -29,6 +129,23 @@ async def health() -> Dict[str, Any]:
     return {"status": "ok", "uptime_s": round(time.time() - _STARTED_AT, 3)}
 
 
+@router.get("/health/live")
+async def health_live() -> Dict[str, Any]:
+    """Liveness: yalnızca sürecin cevap verdiğini gösterir (bağımlılıklara dokunmaz)."""
+    if health_checks is None:
+        return {"status": "ok", "uptime_s": round(time.time() - _STARTED_AT, 3)}
+    return health_checks.liveness()
+
+
+@router.get("/health/ready")
+async def health_ready(force: bool = False) -> JSONResponse:
+    """Readiness: DB turu, ısınma, kuyruk ve devre kesici kontrolleri; hazır değilse 503."""
+    if health_checks is None:
+        return JSONResponse({"detail": "health checks unavailable"}, status_code=503)
+    report = await run_in_threadpool(health_checks.readiness, force)
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
 @router.get("/stats")
 async def stats() -> JSONResponse:
     data = {
@@ -39,4 +156,150 @@ async def stats() -> JSONResponse:
         "topk_local": int(getattr(METRICS, "topk_local", 5)),
         "topk_global": int(getattr(METRICS, "topk_global", 5)),
     }
+    if hasattr(METRICS, "snapshot_counters"):
+        data["counters"] = METRICS.snapshot_counters()
+    if hasattr(METRICS, "snapshot_histograms"):
+        data["histograms"] = METRICS.snapshot_histograms()
+    if writeback_gate is not None:
+        data["writeback_gate"] = writeback_gate.stats()
+    if llm_cache is not None:
+        data["llm_cache"] = llm_cache.stats()
+    if retrieval_cache is not None:
+        data["retrieval_cache"] = retrieval_cache.stats()
+    if stm_summary is not None:
+        data["stm_summary"] = stm_summary.stats()
+    if llm_client is not None and hasattr(llm_client, "breaker_state"):
+        data["llm_breaker"] = llm_client.breaker_state()
+    if vector_segments is not None:
+        data["vector_segments"] = vector_segments.stats()
+    if repository is not None and hasattr(repository, "pool_stats"):
+        data["db"] = {"shard_count": repository.SHARD_COUNT, "pools": repository.pool_stats()}
+    if embed_client is not None and hasattr(embed_client, "queue_depth"):
+        data["embed"] = {
+            "batch_queue_depth": embed_client.queue_depth(),
+            "breaker": embed_client.BREAKER.snapshot(),
+        }
+    if tracing is not None:
+        data["tracing"] = tracing.exporter_stats()
+    if profiler is not None:
+        data["slow_requests"] = profiler.SLOW.stats()
+    if warmup is not None:
+        data["startup"] = warmup.startup_report()
+    if provider_scheduler is not None:
+        data["provider_scheduler"] = provider_scheduler.stats()
+    if rate_limiter is not None:
+        data["rate_limit"] = rate_limiter.stats()
     return JSONResponse(data)
+
+
+@router.post("/admin/consolidate", dependencies=[Depends(require_admin_key)])
+async def consolidate(req: ConsolidationRequest) -> JSONResponse:
+    """Kullanıcı hafızalarını kümeleyip birleştirir; önce/sonra sayılarını döner."""
+    if consolidator is None:
+        return JSONResponse({"detail": "consolidator unavailable"}, status_code=503)
+    report = await run_in_threadpool(
+        consolidator.run,
+        req.user_ids,
+        scopes=tuple(req.scopes),
+        threshold=req.threshold,
+        use_llm=req.use_llm,
+        dry_run=req.dry_run,
+        workers=req.workers,
+    )
+    return JSONResponse(report)
+
+
+@router.post("/admin/retention/sweep", dependencies=[Depends(require_admin_key)])
+async def retention_sweep(dry_run: bool = False) -> JSONResponse:
+    """Retention politikalarını hemen uygular (arka plan süpürücüsünü beklemeden)."""
+    if retention is None:
+        return JSONResponse({"detail": "retention unavailable"}, status_code=503)
+    return JSONResponse(await run_in_threadpool(retention.sweep, dry_run=dry_run))
+
+
+@router.get("/admin/retention/stats", dependencies=[Depends(require_admin_key)])
+async def retention_stats() -> JSONResponse:
+    if retention is None:
+        return JSONResponse({"detail": "retention unavailable"}, status_code=503)
+    return JSONResponse(await run_in_threadpool(retention.stats))
+
+
+@router.post("/admin/retention/restore", dependencies=[Depends(require_admin_key)])
+async def retention_restore(req: RestoreRequest) -> JSONResponse:
+    """Arşivlenmiş kayıtları geri alır: local → session, global → kullanıcı."""
+    if retention is None:
+        return JSONResponse({"detail": "retention unavailable"}, status_code=503)
+    scope = getattr(req.scope, "value", req.scope)
+    if scope == "local":
+        if not req.session_id:
+            return JSONResponse({"detail": "session_id is required for local scope"}, status_code=400)
+        n = await run_in_threadpool(retention.restore_session, req.user_id, req.session_id)
+    elif scope == "global":
+        n = await run_in_threadpool(retention.restore_user, req.user_id, "global")
+    else:
+        return JSONResponse({"detail": f"unsupported scope: {scope}"}, status_code=400)
+    return JSONResponse({"restored": n})
+
+
+# ---------------------------
+# Profil / yavaş istekler
+# ---------------------------
+def _profile_response(result: Dict[str, Any], fmt: str):
+    """collapsed → flamegraph.pl / speedscope girdisi; json → özet + yığın sayımları."""
+    if fmt == "collapsed":
+        return PlainTextResponse(profiler.collapsed_text(result.get("stacks") or {}))
+    out = dict(result)
+    out["top"] = profiler.top_frames(result.get("stacks") or {})
+    return JSONResponse(out)
+
+
+@router.post("/admin/profile", dependencies=[Depends(require_admin_key)])
+async def profile(
+    seconds: float = Query(5.0, gt=0, description="Örnekleme süresi (PROFILER_MAX_SECONDS ile sınırlı)"),
+    interval_ms: Optional[float] = Query(None, gt=0, description="Örnekleme aralığı; boş → PROFILER_INTERVAL_MS"),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    include_idle: bool = Query(False, description="Beklemede duran thread yığınlarını da say"),
+):
+    """Worker'ı süre sınırlı olarak örnekler; aynı anda tek profil çalışır."""
+    if profiler is None or not profiler.PROFILER_ENABLED:
+        return JSONResponse({"detail": "profiler unavailable"}, status_code=503)
+    try:
+        result = await run_in_threadpool(
+            profiler.profile, seconds, interval_ms, include_idle=include_idle
+        )
+    except profiler.ProfilerBusyError as e:
+        return JSONResponse({"detail": str(e)}, status_code=409)
+    return _profile_response(result, format)
+
+
+@router.post("/admin/warmup", dependencies=[Depends(require_admin_key)])
+async def run_warmup(providers: Optional[bool] = None) -> JSONResponse:
+    """Isınmayı elle tetikler (ör. büyük bir geri yüklemeden sonra); adım sürelerini döner."""
+    if warmup is None:
+        return JSONResponse({"detail": "warmup unavailable"}, status_code=503)
+    return JSONResponse(await run_in_threadpool(lambda: warmup.run(providers=providers)))
+
+
+@router.get("/admin/slow-requests", dependencies=[Depends(require_admin_key)])
+async def slow_requests() -> JSONResponse:
+    """Halka tampondaki yavaş istek yakalamaları (en yeni önce, yığınlar hariç)."""
+    if profiler is None:
+        return JSONResponse({"detail": "profiler unavailable"}, status_code=503)
+    return JSONResponse({"stats": profiler.SLOW.stats(), "items": profiler.SLOW.list()})
+
+
+@router.get("/admin/slow-requests/{capture_id}", dependencies=[Depends(require_admin_key)])
+async def slow_request(capture_id: int, format: str = Query("json", pattern="^(collapsed|json)$")):
+    if profiler is None:
+        return JSONResponse({"detail": "profiler unavailable"}, status_code=503)
+    capture = profiler.SLOW.get(capture_id)
+    if capture is None:
+        return JSONResponse({"detail": "capture not found"}, status_code=404)
+    return _profile_response(capture, format)
+
+
+@router.delete("/admin/slow-requests", dependencies=[Depends(require_admin_key)])
+async def clear_slow_requests() -> JSONResponse:
+    if profiler is None:
+        return JSONResponse({"detail": "profiler unavailable"}, status_code=503)
+    return JSONResponse({"cleared": profiler.SLOW.clear()})
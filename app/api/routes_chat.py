@@ -2,12 +2,14 @@
 from __future__ import annotations
 
 import logging
-from typing import List
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 
 from app.api.schemas import ChatRequest, ChatResponse, Scope, SourceItem
 from app.core.config import settings  # Backend defaultları için
+from app.core.errors import ProviderUnavailableError
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,12 @@ except Exception as e:
     logger.exception("STM store modülü yüklenemedi: %s", e)
     stm_store = None  # type: ignore
 
+try:
+    import app.services.stm_summary as stm_summary  # type: ignore
+except Exception as e:
+    logger.exception("STM özet modülü yüklenemedi: %s", e)
+    stm_summary = None  # type: ignore
+
 try:
     import app.services.ltm_local_store as ltm_local_store  # type: ignore
     import app.services.ltm_global_store as ltm_global_store  # type: ignore
@@ -46,15 +54,113 @@ except Exception as e:
     logger.exception("Memory policy modülü yüklenemedi: %s", e)
     memory_policy = None  # type: ignore
 
+try:
+    import app.services.retention as retention  # type: ignore
+except Exception as e:
+    logger.exception("Retention modülü yüklenemedi: %s", e)
+    retention = None  # type: ignore
+
+try:
+    import app.services.structured_reply as structured_reply  # type: ignore
+except Exception as e:
+    logger.exception("Structured reply modülü yüklenemedi: %s", e)
+    structured_reply = None  # type: ignore
+
+try:
+    from app.observability.metrics import METRICS, stage as _stage  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+    _stage = nullcontext  # type: ignore
+
+try:
+    import app.observability.tracing as tracing  # type: ignore
+except Exception:
+    tracing = None  # type: ignore
+
+try:
+    from app.services.provider_scheduler import background as _background, inline as _inline  # type: ignore
+except Exception:
+    _background = nullcontext  # type: ignore
+    _inline = nullcontext  # type: ignore
+
+try:
+    from app.observability.profiler import SLOW as _slow_sampler  # type: ignore
+except Exception:
+    _slow_sampler = None  # type: ignore
+
+
+def _write_back(
+    *,
+    user_id: str,
+    session_id: str,
+    user_message: str,
+    reply: str,
+    sources: List[Dict[str, Any]],
+    candidates: Optional[List[Dict[str, Any]]],
+) -> None:
+    """
+    Yanıttan LTM adaylarını çıkarır ve uygular (Local / Global). /chat yanıtı gönderildikten
+    sonra BackgroundTasks ile çalışır; LLM ve embedding çağrıları background önceliğindedir.
+    """
+    with _background():
+        with _stage("memory_extraction"):
+            try:
+                actions = memory_policy.extract_writebacks(  # type: ignore
+                    user_id=user_id,
+                    session_id=session_id,
+                    user_message=user_message,
+                    assistant_reply=reply,
+                    sources=sources,
+                    candidates=candidates,
+                )
+            except AttributeError:
+                actions = []
+            except Exception as e:
+                logger.exception("Memory policy extract_writebacks sırasında hata: %s", e)
+                actions = []
+
+        with _stage("write_back") if actions else nullcontext():
+            for act in actions or []:
+                scope = act.get("scope")
+                text = act.get("text")
+                meta = act.get("meta") or {}
+                if not text or scope not in ("local", "global"):
+                    continue
+
+                if scope == "local" and ltm_local_store is not None:
+                    try:
+                        ltm_local_store.add(  # type: ignore
+                            session_id=session_id,
+                            user_id=user_id,
+                            text=text,
+                            meta=meta,
+                        )
+                    except Exception as e:
+                        logger.exception("Local LTM write-back hatası: %s", e)
+                elif scope == "global" and ltm_global_store is not None:
+                    try:
+                        ltm_global_store.add(  # type: ignore
+                            user_id=user_id,
+                            text=text,
+                            meta=meta,
+                        )
+                    except Exception as e:
+                        logger.exception("Global LTM write-back hatası: %s", e)
+
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(req: ChatRequest):
+def chat(req: ChatRequest, background_tasks: BackgroundTasks):
     """
     Ana sohbet endpoint'i.
     - STM + Local LTM + Global LTM'den bağlam toplar (retriever)
     - LLM'den yanıt alır (llm_client)
-    - Gerekirse hafızaya write-back yapar (memory_policy + ltm_*_store)
+    - Gerekirse hafızaya write-back yapar (memory_policy + ltm_*_store; yanıt sonrası arka planda)
     """
+    # Senkron uç threadpool'da çalışır (sağlayıcı / kuyruk beklemesi event loop'u bloklamaz);
+    # yavaş istek örnekleyicisi bu thread'i izlesin
+    if _slow_sampler is not None:
+        _slow_sampler.rebind()
+
     # Ön-kontroller
     if retriever is None or llm_client is None:
         raise HTTPException(501, detail="Retriever veya LLM istemcisi yapılandırılmamış.")
@@ -80,6 +186,13 @@ async def chat(req: ChatRequest):
     )
     # --------------------------------------------------------------------------
 
+    # Tek çağrı modu: yanıt + memory adayları tek LLM çağrısından gelir
+    single_call = (
+        bool(getattr(settings, "CHAT_SINGLE_CALL_MODE", False))
+        and structured_reply is not None
+        and hasattr(llm_client, "stream")
+    )
+
     # 0) Kullanıcı turunu STM'e yaz (aynı session içinde hafıza oluşsun)
     if stm_store is not None and hasattr(stm_store, "append_turn"):
         try:
@@ -91,16 +204,27 @@ async def chat(req: ChatRequest):
         except Exception:
             logger.exception("STM user turn eklenemedi")
 
-    # 1) Bağlamı derle (STM + Local LTM + Global LTM)
+    # 0.5) Arşivlenmiş (idle) session'a dönüldüyse local hafızayı sıcak tabloya geri al
+    if retention is not None and getattr(settings, "RETENTION_RESTORE_ON_ACCESS", True):
+        try:
+            if retention.has_archived(req.user_id, req.session_id, reason="idle_session"):  # type: ignore
+                retention.restore_session(req.user_id, req.session_id, reason="idle_session")  # type: ignore
+        except Exception:
+            logger.exception("Arşivlenmiş session geri yüklenemedi")
+
+    # 1) Bağlamı derle (STM + Local LTM + Global LTM); distill LLM'i background sitesi
+    # olsa da yanıtı beklettiğinden kuyruk süresi interaktif sınırdadır
     try:
-        ctx = retriever.retrieve_context(  # type: ignore
-            user_id=req.user_id,
-            session_id=req.session_id,
-            query_text=req.message,
-            topk_local=resolved_topk_local,
-            topk_global=resolved_topk_global,
-            stm_max_turns=resolved_stm_max_turns,
-        )
+        with tracing.span("retrieve_context") if tracing is not None else nullcontext(), _inline():
+            ctx = retriever.retrieve_context(  # type: ignore
+                user_id=req.user_id,
+                session_id=req.session_id,
+                query_text=req.message,
+                topk_local=resolved_topk_local,
+                topk_global=resolved_topk_global,
+                stm_max_turns=resolved_stm_max_turns,
+                distill_with_llm=not single_call,
+            )
     except Exception as e:
         # Gerçek hatayı logla ve tek bir genel hata mesajı dön
         logger.exception("Retriever çağrısı sırasında hata: %s", e)
@@ -115,17 +239,49 @@ async def chat(req: ChatRequest):
         raise HTTPException(500, "Retriever geçerli bir prompt üretemedi.")
 
     # 2) LLM’den yanıt al
-    try:
-        llm_out = llm_client.generate(prompt=prompt)  # type: ignore
-    except AttributeError:
-        raise HTTPException(500, "llm_client.generate(...) fonksiyonu eksik.")
-    except Exception as e:
-        logger.exception("LLM çağrısı sırasında hata: %s", e)
-        raise HTTPException(500, "LLM yanıt üretirken hata oluştu.")
+    inline_candidates = None
+    if single_call:
+        # Yapılandırılmış çıktı akış halinde ayrıştırılır; "reply" metni parça parça çözülür
+        prompt = f"{prompt}\n{structured_reply.build_instructions()}\n"  # type: ignore
+        parser = structured_reply.IncrementalReplyParser()  # type: ignore
+        with _stage("llm_generate"):
+            try:
+                for chunk in llm_client.stream(prompt=prompt, call_site="chat"):  # type: ignore
+                    parser.feed(chunk)
+            except ProviderUnavailableError as e:
+                logger.warning("LLM sağlayıcısı kullanılamıyor: %s", e)
+                raise HTTPException(503, "LLM sağlayıcısı şu anda yanıt veremiyor.", headers={"Retry-After": "5"})
+            except Exception as e:
+                logger.exception("LLM akış çağrısı sırasında hata: %s", e)
+                raise HTTPException(500, "LLM yanıt üretirken hata oluştu.")
 
-    reply: str = (
-        llm_out.get("text") if isinstance(llm_out, dict) else str(llm_out)
-    )
+        parsed = parser.finish()
+        reply: str = parsed["reply"]
+        # Model formatı uygulamadıysa ayrı extraction çağrısına geri düşülür
+        if parsed["structured"]:
+            inline_candidates = parsed["memories"]
+    else:
+        with _stage("llm_generate"):
+            try:
+                llm_out = llm_client.generate(  # type: ignore
+                    prompt=prompt,
+                    call_site="chat",
+                    semantic_query=req.message,
+                    # Benzer soru yalnızca aynı bağlamda (STM / özet / hafızalar) aynı yanıtı alır
+                    semantic_namespace=f"{req.user_id}:{req.session_id}:{ctx.get('context_key', '')}",
+                )
+            except AttributeError:
+                raise HTTPException(500, "llm_client.generate(...) fonksiyonu eksik.")
+            except ProviderUnavailableError as e:
+                logger.warning("LLM sağlayıcısı kullanılamıyor: %s", e)
+                raise HTTPException(503, "LLM sağlayıcısı şu anda yanıt veremiyor.", headers={"Retry-After": "5"})
+            except Exception as e:
+                logger.exception("LLM çağrısı sırasında hata: %s", e)
+                raise HTTPException(500, "LLM yanıt üretirken hata oluştu.")
+
+        reply = (
+            llm_out.get("text") if isinstance(llm_out, dict) else str(llm_out)
+        )
 
     # 2.5) Asistan turunu STM'e yaz (cevap da hafızaya girsin)
     if stm_store is not None and hasattr(stm_store, "append_turn"):
@@ -138,6 +294,13 @@ async def chat(req: ChatRequest):
         except Exception:
             logger.exception("STM assistant turn eklenemedi")
 
+    # 2.6) Pencereden düşen turlar birikti ise koşan özet arka planda güncellenir
+    if stm_summary is not None:
+        try:
+            stm_summary.maybe_schedule(req.session_id)
+        except Exception:
+            logger.exception("STM özeti planlanamadı")
+
     # 3) Write-back (potansiyel uzun süreli hafıza yazımı)
     sources: List[SourceItem] = []
     for s in raw_sources:
@@ -155,54 +318,27 @@ async def chat(req: ChatRequest):
                 )
             )
 
-    if memory_policy is not None:
-        try:
-            actions = memory_policy.extract_writebacks(  # type: ignore
-                user_id=req.user_id,
-                session_id=req.session_id,
-                user_message=req.message,
-                assistant_reply=reply,
-                sources=[s.dict() for s in sources],
-            )
-        except AttributeError:
-            actions = []
-        except Exception as e:
-            logger.exception("Memory policy extract_writebacks sırasında hata: %s", e)
-            actions = []
-    else:
-        actions = []
-
-    # 4) Aksiyonları uygula (Local / Global)
-    for act in actions or []:
-        scope = act.get("scope")
-        text = act.get("text")
-        meta = act.get("meta") or {}
-        if not text or scope not in ("local", "global"):
-            continue
+    if METRICS is not None and sources:
+        METRICS.record_retrieval_hit()
 
-        if scope == "local" and ltm_local_store is not None:
-            try:
-                ltm_local_store.add(  # type: ignore
-                    session_id=req.session_id,
-                    user_id=req.user_id,
-                    text=text,
-                    meta=meta,
-                )
-            except Exception as e:
-                logger.exception("Local LTM write-back hatası: %s", e)
-        elif scope == "global" and ltm_global_store is not None:
-            try:
-                ltm_global_store.add(  # type: ignore
-                    user_id=req.user_id,
-                    text=text,
-                    meta=meta,
-                )
-            except Exception as e:
-                logger.exception("Global LTM write-back hatası: %s", e)
+    # 3.5) Hafıza çıkarımı + LTM yazımı yanıt gönderildikten sonra arka planda yapılır:
+    # background önceliğindeki sağlayıcı kuyruğu (PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S)
+    # interaktif isteğin süresine eklenmez
+    if memory_policy is not None:
+        background_tasks.add_task(
+            _write_back,
+            user_id=req.user_id,
+            session_id=req.session_id,
+            user_message=req.message,
+            reply=reply,
+            sources=[s.dict() for s in sources],
+            candidates=inline_candidates,
+        )
 
     # 5) Yanıt modeli
     return ChatResponse(
         reply=reply,
         used_stm_turns=used_stm_turns,
         sources=sources if req.return_sources else None,
+        debug=tracing.debug_payload() if (req.debug and tracing is not None) else None,
     )
@@ -87,8 +87,10 @@ async def list_global_memories(
 # -----------------------------
 # EKLE / GÜNCELLE (LOCAL/GLOBAL)
 # -----------------------------
+# Embedding çağrısı yapan uçlar senkron: FastAPI threadpool'da çalıştırır, sağlayıcı
+# beklemesi (kuyruk slotu dahil) event loop'u bloklamaz
 @router.post("/memory/local", response_model=MemoryItem)
-async def add_local_memory(req: MemoryWriteRequest):
+def add_local_memory(req: MemoryWriteRequest):
     _require(req.scope == Scope.LOCAL, "Bu uç yalnızca scope=local içindir.")
     _require(req.session_id is not None, "Local LTM için session_id zorunludur.")
     _require(ltm_local_store is not None, "Local LTM servisi yapılandırılmamış.", 501)
@@ -106,7 +108,7 @@ async def add_local_memory(req: MemoryWriteRequest):
 
 
 @router.post("/memory/global", response_model=MemoryItem)
-async def add_global_memory(req: MemoryWriteRequest):
+def add_global_memory(req: MemoryWriteRequest):
     _require(req.scope == Scope.GLOBAL, "Bu uç yalnızca scope=global içindir.")
     _require(ltm_global_store is not None, "Global LTM servisi yapılandırılmamış.", 501)
 
@@ -125,17 +127,21 @@ async def add_global_memory(req: MemoryWriteRequest):
 # SİL (scope + id)
 # -----------------------------
 @router.delete("/memory/{scope}/{memory_id}", response_model=MemoryDeleteResponse)
-async def delete_memory(scope: Scope, memory_id: int):
+async def delete_memory(
+    scope: Scope,
+    memory_id: int,
+    user_id: Optional[str] = Query(None, description="Verilirse silme doğrudan kullanıcının shard'ına yönlenir"),
+):
     if scope == Scope.LOCAL:
         _require(ltm_local_store is not None, "Local LTM servisi yapılandırılmamış.", 501)
         try:
-            deleted = ltm_local_store.delete(memory_id)  # type: ignore
+            deleted = ltm_local_store.delete(memory_id, user_id)  # type: ignore
         except AttributeError:
             raise HTTPException(500, "ltm_local_store.delete(...) fonksiyonu eksik.")
     elif scope == Scope.GLOBAL:
         _require(ltm_global_store is not None, "Global LTM servisi yapılandırılmamış.", 501)
         try:
-            deleted = ltm_global_store.delete(memory_id)  # type: ignore
+            deleted = ltm_global_store.delete(memory_id, user_id)  # type: ignore
         except AttributeError:
             raise HTTPException(500, "ltm_global_store.delete(...) fonksiyonu eksik.")
     else:
@@ -148,7 +154,7 @@ async def delete_memory(scope: Scope, memory_id: int):
 # ARAMA (embedding veya metin)
 # -----------------------------
 @router.post("/memory/search", response_model=ListResponse[MemoryItem])
-async def search_memory(req: MemorySearchRequest):
+def search_memory(req: MemorySearchRequest):
     _require(ltm_local_store is not None or ltm_global_store is not None, "LTM servisleri yapılandırılmamış.", 501)
 
     items: List[MemoryItem] = []
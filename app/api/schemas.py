@@ -31,6 +31,7 @@ class ChatRequest(BaseModel):
     topk_global: int = Field(5, ge=0, le=50, description="Global LTM'den getirilecek maksimum kayıt")
     stm_max_turns: int = Field(8, ge=0, le=50, description="STM içinden eklenecek son konuşma turu sayısı")
     return_sources: bool = Field(True, description="Yanıt ile birlikte kullanılan kaynak/snippet bilgilerini döndür")
+    debug: bool = Field(False, description="Yanıta istek izi (aşama süreleri / span'lar) ekle")
 
     class Config:
         arbitrary_types_allowed = True
@@ -51,6 +52,7 @@ class ChatResponse(BaseModel):
     reply: str = Field(..., description="Modelin üretimi")
     used_stm_turns: int = Field(0, ge=0, description="Prompta dahil edilen STM tur sayısı")
     sources: Optional[List[SourceItem]] = Field(None, description="Kullanılan kaynak/snippet listesi")
+    debug: Optional[Dict[str, Any]] = Field(None, description="İstek izi: request_id, aşama süreleri (ms), span'lar")
 
 
 # -----------------------------
@@ -132,3 +134,20 @@ class StatsResponse(BaseModel):
     retrieval_hits: int
     topk_local: int = 5
     topk_global: int = 5
+
+
+class ConsolidationRequest(BaseModel):
+    """Admin: LTM birleştirme işi parametreleri."""
+    user_ids: Optional[List[str]] = Field(None, description="Boşsa tüm kullanıcılar işlenir")
+    scopes: List[Scope] = Field(default_factory=lambda: ["global", "local"], description="İşlenecek kapsamlar")
+    threshold: Optional[float] = Field(None, ge=0.0, le=1.0, description="Kümeleme kosinüs eşiği")
+    use_llm: Optional[bool] = Field(None, description="Küme metnini LLM ile yeniden yaz")
+    dry_run: bool = Field(False, description="Yalnızca raporla; hiçbir kaydı değiştirme")
+    workers: Optional[int] = Field(None, ge=1, le=32, description="Paralel süreç sayısı")
+
+
+class RestoreRequest(BaseModel):
+    """Admin: arşivlenmiş hafızaları sıcak tabloya geri alma."""
+    scope: Scope = Field(Scope.LOCAL, description="local: session, global: kullanıcı")
+    user_id: str = Field(..., description="Kullanıcı kimliği")
+    session_id: Optional[str] = Field(None, description="Local için gerekli")
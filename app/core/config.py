@@ -26,14 +26,103 @@ class Settings(BaseSettings):
 
     # Basit API anahtarı
     API_KEY: Optional[str] = os.getenv("API_KEY")
+    # Yıkıcı admin uçları (X-Admin-Key); boşsa API_KEY kuralı geçerli
+    ADMIN_API_KEY: Optional[str] = os.getenv("ADMIN_API_KEY")
+
+    # ---- Metrikler (Prometheus /metrics) ----
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # 0 → gauge'lar yalnızca scrape anında tazelenir
+    METRICS_GAUGE_REFRESH_S: float = float(os.getenv("METRICS_GAUGE_REFRESH_S", "15"))
+
+    # ---- İstek izleme (X-Request-ID, Server-Timing, JSONL span dışa aktarımı) ----
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    TRACING_SERVER_TIMING: bool = os.getenv("TRACING_SERVER_TIMING", "true").lower() == "true"
+    # Boş → dışa aktarım kapalı; dolu → OTLP/JSON biçiminde satır başına bir iz
+    TRACING_EXPORT_PATH: str = os.getenv("TRACING_EXPORT_PATH", "")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "llm-memory-assistant")
+
+    # ---- Örneklemeli profil (/api/admin/profile) ve yavaş istek yakalama ----
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "true").lower() == "true"
+    PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    PROFILER_INTERVAL_MS: float = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+    # 0 → yavaş istek yakalama kapalı
+    SLOW_REQUEST_THRESHOLD_MS: float = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+    SLOW_REQUEST_SAMPLE_INTERVAL_MS: float = float(os.getenv("SLOW_REQUEST_SAMPLE_INTERVAL_MS", "20"))
+    SLOW_REQUEST_BUFFER: int = int(os.getenv("SLOW_REQUEST_BUFFER", "50"))
+
+    # ---- Liveness / readiness (/livez, /readyz, /api/health/ready) ----
+    HEALTH_PUBLIC_PROBES: bool = os.getenv("HEALTH_PUBLIC_PROBES", "true").lower() == "true"
+    HEALTH_CACHE_TTL_S: float = float(os.getenv("HEALTH_CACHE_TTL_S", "2"))
+    HEALTH_DB_TIMEOUT_S: float = float(os.getenv("HEALTH_DB_TIMEOUT_S", "0.5"))
+    HEALTH_DB_RTT_MAX_MS: float = float(os.getenv("HEALTH_DB_RTT_MAX_MS", "250"))
+    HEALTH_MAX_EMBED_QUEUE: int = int(os.getenv("HEALTH_MAX_EMBED_QUEUE", "512"))
+    HEALTH_MAX_SEGMENT_QUEUE: int = int(os.getenv("HEALTH_MAX_SEGMENT_QUEUE", "1000"))
+    # true → ısınma bitmeden hazır değil (503); false → yalnızca "degraded"
+    HEALTH_REQUIRE_WARM: bool = os.getenv("HEALTH_REQUIRE_WARM", "false").lower() == "true"
+    HEALTH_FAIL_ON_OPEN_BREAKER: bool = os.getenv("HEALTH_FAIL_ON_OPEN_BREAKER", "false").lower() == "true"
+
+    # ---- Açılış ısınması (bağlantılar, şablonlar, sağlayıcılar, sıcak kullanıcı segmentleri) ----
+    WARMUP_ENABLED: bool = os.getenv("WARMUP_ENABLED", "false").lower() == "true"
+    # true → açılış ısınma bitene kadar bekler; false → arka planda
+    WARMUP_BLOCKING: bool = os.getenv("WARMUP_BLOCKING", "true").lower() == "true"
+    WARMUP_HOT_USERS: int = int(os.getenv("WARMUP_HOT_USERS", "50"))
+    WARMUP_PROVIDERS: bool = os.getenv("WARMUP_PROVIDERS", "true").lower() == "true"
 
     # ---- DB ----
     DB_PATH: str = os.getenv("DB_PATH", "./data/memory.db")
+    # Kullanıcı bazlı shard dosyaları (1 → yalnızca DB_PATH); SHARD_DIR boşsa DB_PATH klasörü/shards
+    SHARD_COUNT: int = int(os.getenv("SHARD_COUNT", "1"))
+    SHARD_DIR: str = os.getenv("SHARD_DIR", "")
+    SHARD_VNODES: int = int(os.getenv("SHARD_VNODES", "64"))
+    # Shard başına bağlantı havuzu boyutu
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
 
     # ---- LLM (Gemini) ----
     GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
     GEMINI_ENDPOINT: Optional[str] = os.getenv("GEMINI_ENDPOINT")
+    # gemini | stub (stub: yerel, gecikme/hata enjekte edilebilen sahte sağlayıcı)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+
+    # ---- LLM dayanıklılık (deadline / retry / hedge / devre kesici) ----
+    LLM_DEADLINE_S: float = float(os.getenv("LLM_DEADLINE_S", "30"))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    LLM_RETRY_BACKOFF_BASE_S: float = float(os.getenv("LLM_RETRY_BACKOFF_BASE_S", "0.25"))
+    LLM_RETRY_BACKOFF_MAX_S: float = float(os.getenv("LLM_RETRY_BACKOFF_MAX_S", "2.0"))
+    LLM_HEDGE_ENABLED: bool = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_PERCENTILE: float = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+    LLM_BREAKER_ERROR_RATE: float = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+    LLM_BREAKER_MIN_CALLS: int = int(os.getenv("LLM_BREAKER_MIN_CALLS", "10"))
+    LLM_BREAKER_WINDOW_S: float = float(os.getenv("LLM_BREAKER_WINDOW_S", "30"))
+    LLM_BREAKER_OPEN_S: float = float(os.getenv("LLM_BREAKER_OPEN_S", "15"))
+
+    # ---- Sağlayıcı eşzamanlılığı / öncelikli kuyruk (LLM + embedding) ----
+    PROVIDER_SCHED_ENABLED: bool = os.getenv("PROVIDER_SCHED_ENABLED", "true").lower() == "true"
+    LLM_MAX_CONCURRENCY: int = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+    # 0 → MAX_CONCURRENCY'nin yarısı; kalan slotlar interaktif isteklere ayrılır
+    LLM_BACKGROUND_MAX_CONCURRENCY: int = int(os.getenv("LLM_BACKGROUND_MAX_CONCURRENCY", "0"))
+    EMB_MAX_CONCURRENCY: int = int(os.getenv("EMB_MAX_CONCURRENCY", "4"))
+    EMB_BACKGROUND_MAX_CONCURRENCY: int = int(os.getenv("EMB_BACKGROUND_MAX_CONCURRENCY", "0"))
+    PROVIDER_QUEUE_TIMEOUT_S: float = float(os.getenv("PROVIDER_QUEUE_TIMEOUT_S", "5"))
+    PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S: float = float(os.getenv("PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S", "60"))
+    PROVIDER_QUEUE_MAX: int = int(os.getenv("PROVIDER_QUEUE_MAX", "256"))
+    # Background önceliğinde kuyruğa giren LLM çağrı noktaları (call_site)
+    PROVIDER_BACKGROUND_SITES: str = os.getenv("PROVIDER_BACKGROUND_SITES", "extraction,summarizer,consolidation")
+
+    # ---- Stub LLM sağlayıcı (LLM_PROVIDER=stub) ----
+    LLM_STUB_LATENCY_MS: float = float(os.getenv("LLM_STUB_LATENCY_MS", "200"))
+    LLM_STUB_LATENCY_SPREAD: float = float(os.getenv("LLM_STUB_LATENCY_SPREAD", "0.5"))
+    # fixed | uniform | exponential | lognormal
+    LLM_STUB_LATENCY_DIST: str = os.getenv("LLM_STUB_LATENCY_DIST", "lognormal")
+    LLM_STUB_ERROR_RATE: float = float(os.getenv("LLM_STUB_ERROR_RATE", "0.0"))
+    LLM_STUB_HANG_RATE: float = float(os.getenv("LLM_STUB_HANG_RATE", "0.0"))
+
+    # ---- Stub embedding sağlayıcı (EMB_BACKEND=stub) ----
+    EMB_STUB_LATENCY_MS: float = float(os.getenv("EMB_STUB_LATENCY_MS", "20"))
+    EMB_STUB_LATENCY_SPREAD: float = float(os.getenv("EMB_STUB_LATENCY_SPREAD", "0.5"))
+    EMB_STUB_LATENCY_DIST: str = os.getenv("EMB_STUB_LATENCY_DIST", "lognormal")
+    EMB_STUB_ERROR_RATE: float = float(os.getenv("EMB_STUB_ERROR_RATE", "0.0"))
 
     # ---- Embeddings ----
     GOOGLE_EMBED_API_KEY: Optional[str] = os.getenv("GOOGLE_EMBED_API_KEY")
@@ -41,6 +130,18 @@ class Settings(BaseSettings):
     EMB_MODEL: str = os.getenv("EMB_MODEL", "text-embedding-004")
     EMB_DIM: int = int(os.getenv("EMB_DIM", "768"))
     GOOGLE_EMBED_ENDPOINT: Optional[str] = os.getenv("GOOGLE_EMBED_ENDPOINT")
+    # google | local | stub (local: ağ gerektirmeyen, deterministik hashlenmiş n-gram embedding'i;
+    # stub: aynı vektörler + EMB_STUB_* gecikme/hata enjeksiyonu)
+    EMB_BACKEND: str = os.getenv("EMB_BACKEND", "google")
+    EMB_LOCAL_NGRAM_MIN: int = int(os.getenv("EMB_LOCAL_NGRAM_MIN", "3"))
+    EMB_LOCAL_NGRAM_MAX: int = int(os.getenv("EMB_LOCAL_NGRAM_MAX", "5"))
+    # Opsiyonel: fit edilmiş IDF dosyası (JSON); değişirse EMB_VERSION da değiştirilmeli
+    EMB_LOCAL_IDF_PATH: str = os.getenv("EMB_LOCAL_IDF_PATH", "")
+    EMB_DEADLINE_S: float = float(os.getenv("EMB_DEADLINE_S", "20"))
+    # Mikro-batch: eşzamanlı encode çağrıları tek sağlayıcı isteğinde toplanır
+    EMB_BATCH_ENABLED: bool = os.getenv("EMB_BATCH_ENABLED", "true").lower() == "true"
+    EMB_BATCH_MAX_SIZE: int = int(os.getenv("EMB_BATCH_MAX_SIZE", "64"))
+    EMB_BATCH_MAX_WAIT_MS: float = float(os.getenv("EMB_BATCH_MAX_WAIT_MS", "5"))
 
     # ---- Vector Store ----
     VECTORSTORE_BACKEND: str = os.getenv("VECTORSTORE_BACKEND", "faiss")
@@ -55,10 +156,29 @@ class Settings(BaseSettings):
 
     # ---- Retrieval varsayılanları ----
     STM_MAX_TURNS_DEFAULT: int = int(os.getenv("STM_MAX_TURNS_DEFAULT", "8"))
+    # Koşan STM özeti: prompt'a özet + son ham turlar (token bütçeli) girer
+    STM_SUMMARY_ENABLED: bool = os.getenv("STM_SUMMARY_ENABLED", "true").lower() == "true"
+    STM_RECENT_TURNS: int = int(os.getenv("STM_RECENT_TURNS", "4"))
+    STM_RECENT_MAX_TOKENS: int = int(os.getenv("STM_RECENT_MAX_TOKENS", "600"))
+    STM_SUMMARY_MAX_TOKENS: int = int(os.getenv("STM_SUMMARY_MAX_TOKENS", "256"))
+    STM_SUMMARY_BATCH_TURNS: int = int(os.getenv("STM_SUMMARY_BATCH_TURNS", "4"))
+    # Opt-in: LLM ile özet (varsayılan kural tabanlı; tur başına ek LLM çağrısı yok)
+    STM_SUMMARY_USE_LLM: bool = os.getenv("STM_SUMMARY_USE_LLM", "false").lower() == "true"
     TOPK_LOCAL_DEFAULT: int = int(os.getenv("TOPK_LOCAL_DEFAULT", "8"))
     TOPK_GLOBAL_DEFAULT: int = int(os.getenv("TOPK_GLOBAL_DEFAULT", "8"))
     RETRIEVAL_BUDGET_TOKENS: int = int(os.getenv("RETRIEVAL_BUDGET_TOKENS", "400"))
 
+    # Segmentli vektör deposu: tüm korpusta arama (mühürlü segmentler + değişken kuyruk)
+    VECTOR_SEGMENTS_ENABLED: bool = (
+        os.getenv("VECTOR_SEGMENTS_ENABLED", "true").lower() == "true"
+    )
+    SEGMENT_SEAL_ROWS: int = int(os.getenv("SEGMENT_SEAL_ROWS", "256"))
+    SEGMENT_TARGET_ROWS: int = int(os.getenv("SEGMENT_TARGET_ROWS", "4096"))
+    SEGMENT_MAX_SMALL: int = int(os.getenv("SEGMENT_MAX_SMALL", "4"))
+    SEGMENT_CACHE_MB: int = int(os.getenv("SEGMENT_CACHE_MB", "256"))
+    # similarity.knn_batch: tek seferde ayrılan skor bloğunun üst sınırı (MB)
+    KNN_MAX_BLOCK_MB: float = float(os.getenv("KNN_MAX_BLOCK_MB", "64"))
+
     # Retrieval için minimum benzerlik eşiği (0–1 arası)
     RETRIEVAL_MIN_SIMILARITY: float = float(
         os.getenv("RETRIEVAL_MIN_SIMILARITY", "0.75")
@@ -69,8 +189,99 @@ class Settings(BaseSettings):
         os.getenv("WRITEBACK_CONFIDENCE_THRESHOLD", "0.6")
     )
 
+    # Write-back ön filtresi (LLM çağrısından önce ucuz yerel karar)
+    WRITEBACK_GATE_ENABLED: bool = (
+        os.getenv("WRITEBACK_GATE_ENABLED", "true").lower() == "true"
+    )
+    WRITEBACK_GATE_THRESHOLD: float = float(
+        os.getenv("WRITEBACK_GATE_THRESHOLD", "0.3")
+    )
+    WRITEBACK_GATE_MIN_CHARS: int = int(os.getenv("WRITEBACK_GATE_MIN_CHARS", "12"))
+    # Atlanan turların bu oranı denetim için yine de LLM'e gönderilir (0 = kapalı)
+    WRITEBACK_GATE_SAMPLE_RATE: float = float(
+        os.getenv("WRITEBACK_GATE_SAMPLE_RATE", "0.05")
+    )
+    # Opsiyonel skorlayıcı kayıtlıysa sezgisel skorla harmanlama ağırlığı
+    WRITEBACK_GATE_SCORER_WEIGHT: float = float(
+        os.getenv("WRITEBACK_GATE_SCORER_WEIGHT", "0.5")
+    )
+
+    # LTM yazımında anlamsal yakın-kopya birleştirme (LSH aday + kesin kosinüs)
+    MEMORY_DEDUP_ENABLED: bool = (
+        os.getenv("MEMORY_DEDUP_ENABLED", "true").lower() == "true"
+    )
+    MEMORY_DEDUP_THRESHOLD: float = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.92"))
+    MEMORY_DEDUP_LSH_BANDS: int = int(os.getenv("MEMORY_DEDUP_LSH_BANDS", "8"))
+    MEMORY_DEDUP_LSH_BAND_BITS: int = int(os.getenv("MEMORY_DEDUP_LSH_BAND_BITS", "8"))
+
+    # ---- Çevrim dışı LTM birleştirme (consolidation) ----
+    CONSOLIDATION_THRESHOLD: float = float(os.getenv("CONSOLIDATION_THRESHOLD", "0.88"))
+    CONSOLIDATION_USE_LLM: bool = (
+        os.getenv("CONSOLIDATION_USE_LLM", "false").lower() == "true"
+    )
+    CONSOLIDATION_WORKERS: int = int(os.getenv("CONSOLIDATION_WORKERS", "4"))
+
+    # ---- Retention / soğuk arşiv (0 = politika kapalı) ----
+    # archive: zlib ile sıkıştırılıp archived_memories'e taşınır | delete: kalıcı silinir
+    RETENTION_MODE: str = os.getenv("RETENTION_MODE", "archive")
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+    RETENTION_MAX_BATCHES: int = int(os.getenv("RETENTION_MAX_BATCHES", "50"))
+    RETENTION_SWEEP_INTERVAL_S: float = float(os.getenv("RETENTION_SWEEP_INTERVAL_S", "0"))
+    # Arşivlenmiş bir session'a yeni mesaj gelince kayıtları otomatik geri yükle
+    RETENTION_RESTORE_ON_ACCESS: bool = (
+        os.getenv("RETENTION_RESTORE_ON_ACCESS", "true").lower() == "true"
+    )
+    LOCAL_RETENTION_MAX_AGE_DAYS: float = float(os.getenv("LOCAL_RETENTION_MAX_AGE_DAYS", "0"))
+    LOCAL_RETENTION_MAX_PER_SESSION: int = int(os.getenv("LOCAL_RETENTION_MAX_PER_SESSION", "0"))
+    LOCAL_RETENTION_MAX_PER_USER: int = int(os.getenv("LOCAL_RETENTION_MAX_PER_USER", "0"))
+    LOCAL_RETENTION_IDLE_SESSION_DAYS: float = float(
+        os.getenv("LOCAL_RETENTION_IDLE_SESSION_DAYS", "0")
+    )
+    GLOBAL_RETENTION_MAX_PER_USER: int = int(os.getenv("GLOBAL_RETENTION_MAX_PER_USER", "0"))
+
+    # ---- Chat üretim modu ----
+    # true → yanıt + memory adayları tek LLM çağrısında (JSON) üretilir,
+    # distillation kural tabanlı yapılır ve ayrı extraction çağrısı atlanır.
+    CHAT_SINGLE_CALL_MODE: bool = (
+        os.getenv("CHAT_SINGLE_CALL_MODE", "false").lower() == "true"
+    )
+
+    # ---- LLM yanıt önbelleği ----
+    LLM_CACHE_ENABLED: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_TTL_S: int = int(os.getenv("LLM_CACHE_TTL_S", "3600"))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2048"))
+    # Birebir (exact) önbelleğin açık olduğu çağrı noktaları (virgülle ayrılmış)
+    LLM_CACHE_SITES: str = os.getenv("LLM_CACHE_SITES", "chat,summarizer,extraction")
+    # Semantik önbellek opt-in: varsayılan olarak hiçbir çağrı noktasında açık değil
+    LLM_SEMANTIC_CACHE_SITES: str = os.getenv("LLM_SEMANTIC_CACHE_SITES", "")
+    LLM_SEMANTIC_CACHE_THRESHOLD: float = float(
+        os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.95")
+    )
+    LLM_SEMANTIC_CACHE_MAX_ENTRIES: int = int(
+        os.getenv("LLM_SEMANTIC_CACHE_MAX_ENTRIES", "512")
+    )
+
+    # ---- Retrieval sonuç önbelleği (LTM sürüm sayaçlarıyla geçersizleşir) ----
+    RETRIEVAL_CACHE_ENABLED: bool = (
+        os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+    )
+    RETRIEVAL_CACHE_TTL_S: float = float(os.getenv("RETRIEVAL_CACHE_TTL_S", "600"))
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+
     # ---- Rate limit / Server ----
     RATE_LIMIT: str = os.getenv("RATE_LIMIT", "60/minute")
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    # Kova kapasitesi (token); RATE_LIMIT dolum hızıdır
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "30"))
+    # user (doğrulanmış API anahtarı + user_id → anahtar → IP; doğrulanmamış istekte IP)
+    # | api_key (API anahtarı → IP)
+    RATE_LIMIT_KEY: str = os.getenv("RATE_LIMIT_KEY", "user")
+    # sqlite (worker'lar arası paylaşılan) | memory (süreç içi)
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+    # Boşsa DB_PATH klasöründe ratelimit.db
+    RATE_LIMIT_DB_PATH: str = os.getenv("RATE_LIMIT_DB_PATH", "")
+    # Ek / ezen route maliyetleri: "POST /api/chat=3,GET /api/memory/*=0.5" (ilk eşleşen geçerli)
+    RATE_LIMIT_COSTS: str = os.getenv("RATE_LIMIT_COSTS", "")
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
 
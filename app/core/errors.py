@@ -47,3 +47,26 @@ class AuthError(ApplicationError):
 class ValidationAppError(ApplicationError):
     def __init__(self, message: str = "İş kuralı doğrulama hatası", **kwargs: Any) -> None:
         super().__init__(message, code="business_validation_error", **kwargs)
+
+
+class ProviderUnavailableError(ApplicationError):
+    """Dış sağlayıcı (LLM / embedding) zamanında veya hiç yanıt veremedi."""
+
+    def __init__(self, message: str = "Sağlayıcı şu anda yanıt veremiyor", **kwargs: Any) -> None:
+        kwargs.setdefault("code", "provider_unavailable")
+        super().__init__(message, **kwargs)
+
+
+class DeadlineExceededError(ProviderUnavailableError):
+    def __init__(self, message: str = "Sağlayıcı çağrısı süre sınırını aştı", **kwargs: Any) -> None:
+        super().__init__(message, code="deadline_exceeded", **kwargs)
+
+
+class CircuitOpenError(ProviderUnavailableError):
+    def __init__(self, message: str = "Sağlayıcı devre kesici açık; çağrı yapılmadı", **kwargs: Any) -> None:
+        super().__init__(message, code="circuit_open", **kwargs)
+
+
+class QueueTimeoutError(ProviderUnavailableError):
+    def __init__(self, message: str = "Sağlayıcı kuyruğunda slot alınamadı", **kwargs: Any) -> None:
+        super().__init__(message, code="queue_timeout", **kwargs)
@@ -1,9 +1,13 @@
 # app/db/repository.py
 from __future__ import annotations
 
+import bisect
 import os
+import queue
 import sqlite3
+import threading
 from contextlib import contextmanager
+from hashlib import blake2b
 from pathlib import Path
 from typing import Any, Dict, Generator, Iterable, List, Optional, Tuple
 
@@ -13,6 +17,10 @@ try:
 except Exception:
     class _Fallback:
         DB_PATH = os.getenv("DB_PATH", "./data/memory.db")
+        SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+        SHARD_DIR = os.getenv("SHARD_DIR", "")
+        SHARD_VNODES = int(os.getenv("SHARD_VNODES", "64"))
+        DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
     settings = _Fallback()  # type: ignore
 
 
@@ -62,6 +70,211 @@ def get_conn(db_path: Optional[str] = None) -> Generator[sqlite3.Connection, Non
         con.close()
 
 
+# -----------------------------------------------------------------------------
+# Sharding: user_id → shard DB dosyası (consistent hashing)
+# -----------------------------------------------------------------------------
+# Shard i'de yeni oluşturulan id'ler (i + 1) * ID_SHARD_STRIDE'dan başlar; böylece
+# id'ler shard'lar arasında benzersizdir ve id'den shard bulunabilir. Bu aralığın
+# altındaki id'ler tek dosyalı (legacy) DB'den taşınmış kayıtlardır.
+ID_SHARD_STRIDE = 1 << 40
+# AUTOINCREMENT dizisi shard ofsetinden başlatılan tablolar
+_SEQUENCED_TABLES = ("local_memories", "global_memories", "stm_turns", "archived_memories", "vector_segments")
+SHARD_FILE_FMT = "memory-{:03d}.db"
+
+
+def _hash64(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ShardRing:
+    """
+    Sanal düğümlü consistent hash ring. Shard sayısı değiştiğinde kullanıcıların
+    yalnızca ~1/N'i yer değiştirir.
+    """
+
+    def __init__(self, shard_count: int, vnodes: int = 64) -> None:
+        self.shard_count = max(1, int(shard_count))
+        points: List[Tuple[int, int]] = []
+        for shard in range(self.shard_count):
+            for v in range(max(1, int(vnodes))):
+                points.append((_hash64(f"shard-{shard}#{v}"), shard))
+        points.sort()
+        self._keys = [p[0] for p in points]
+        self._shards = [p[1] for p in points]
+
+    def shard_for(self, user_id: str) -> int:
+        if self.shard_count == 1:
+            return 0
+        i = bisect.bisect(self._keys, _hash64(str(user_id))) % len(self._keys)
+        return self._shards[i]
+
+
+SHARD_COUNT: int = max(1, int(getattr(settings, "SHARD_COUNT", 1)))
+_RING = ShardRing(SHARD_COUNT, int(getattr(settings, "SHARD_VNODES", 64)))
+
+
+def shard_dir() -> Path:
+    d = str(getattr(settings, "SHARD_DIR", "") or "")
+    if d:
+        return Path(d)
+    return Path(getattr(settings, "DB_PATH", "./data/memory.db")).parent / "shards"
+
+
+def shard_path(index: int) -> str:
+    """Shard dosya yolu. SHARD_COUNT=1 ise tek dosyalı DB_PATH kullanılır (geriye uyumlu)."""
+    if SHARD_COUNT == 1:
+        return getattr(settings, "DB_PATH", "./data/memory.db")
+    return str(shard_dir() / SHARD_FILE_FMT.format(int(index)))
+
+
+def all_paths() -> List[str]:
+    return [shard_path(i) for i in range(SHARD_COUNT)]
+
+
+def shard_for_user(user_id: str) -> int:
+    return _RING.shard_for(user_id)
+
+
+def path_for_user(user_id: str) -> str:
+    return shard_path(_RING.shard_for(user_id))
+
+
+def path_for_id(memory_id: int) -> Optional[str]:
+    """
+    Shard ofsetli id → shard yolu. Legacy (ofsetsiz) id'ler için None döner;
+    çağıran tüm shard'lara yaymalıdır (fan-out).
+    """
+    if SHARD_COUNT == 1:
+        return shard_path(0)
+    idx = int(memory_id) // ID_SHARD_STRIDE - 1
+    if 0 <= idx < SHARD_COUNT:
+        return shard_path(idx)
+    return None
+
+
+def paths_for_memory(memory_id: int, user_id: Optional[str] = None) -> List[str]:
+    """Bir kaydın bulunabileceği shard yolları: kullanıcı → id ofseti → tüm shard'lar."""
+    if user_id:
+        return [path_for_user(user_id)]
+    p = path_for_id(memory_id)
+    return [p] if p is not None else all_paths()
+
+
+def seed_sequences(con: sqlite3.Connection, index: int) -> None:
+    """Shard'ın AUTOINCREMENT dizilerini (index + 1) * ID_SHARD_STRIDE'a taşır (idempotent)."""
+    base = (int(index) + 1) * ID_SHARD_STRIDE
+    for table in _SEQUENCED_TABLES:
+        cur = con.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        if cur is None:
+            con.execute("INSERT INTO sqlite_sequence(name, seq) VALUES (?, ?)", (table, base))
+        elif int(cur[0]) < base:
+            con.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (base, table))
+
+
+# -----------------------------------------------------------------------------
+# Shard başına bağlantı havuzu
+# -----------------------------------------------------------------------------
+class _Pool:
+    """
+    Tek bir DB dosyası için sınırlı bağlantı havuzu.
+    Mağaza (ltm_*_store) yazımları FK uygulamadan yapılır (users/sessions satırı
+    zorunlu değildir); havuz bağlantıları da bu davranışı korur.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = max(1, int(size))
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _new(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+        con.row_factory = sqlite3.Row
+        _apply_pragmas(con)
+        con.execute("PRAGMA foreign_keys=OFF;")
+        return con
+
+    def acquire(self, timeout: float = 10.0) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._new()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        return self._idle.get(timeout=timeout)
+
+    def release(self, con: sqlite3.Connection) -> None:
+        self._idle.put(con)
+
+    def discard(self, con: sqlite3.Connection) -> None:
+        try:
+            con.close()
+        finally:
+            with self._lock:
+                self._created -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "size": self.size, "open": self._created, "idle": self._idle.qsize()}
+
+
+_POOLS: Dict[str, _Pool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _pool(path: str) -> _Pool:
+    p = _POOLS.get(path)
+    if p is None:
+        with _POOLS_LOCK:
+            p = _POOLS.get(path)
+            if p is None:
+                p = _Pool(path, int(getattr(settings, "DB_POOL_SIZE", 8)))
+                _POOLS[path] = p
+    return p
+
+
+@contextmanager
+def pooled_conn(path: Optional[str] = None) -> Generator[sqlite3.Connection, None, None]:
+    """Havuzdan bağlantı; çıkışta commit (hata → rollback) ve havuza iade."""
+    pool = _pool(path or shard_path(0))
+    con = pool.acquire()
+    try:
+        yield con
+        con.commit()
+    except BaseException:
+        try:
+            con.rollback()
+        except Exception:
+            pool.discard(con)
+            raise
+        pool.release(con)
+        raise
+    else:
+        pool.release(con)
+
+
+def user_conn(user_id: str):
+    """Kullanıcının shard'ına havuzlu bağlantı (context manager)."""
+    return pooled_conn(path_for_user(user_id))
+
+
+def pool_stats() -> List[Dict[str, Any]]:
+    with _POOLS_LOCK:
+        return [p.stats() for p in _POOLS.values()]
+
+
 # -----------------------------------------------------------------------------
 # Schema Management
 # -----------------------------------------------------------------------------
@@ -76,6 +289,7 @@ def ensure_schema(path: Optional[str] = None, schema_path: Optional[str] = None)
     """
     Veritabanı şemasını (app/db/schema.sql) uygular / garanti eder.
     İdempotent olacak şekilde tasarlanmıştır (CREATE IF NOT EXISTS / CREATE INDEX IF NOT EXISTS).
+    path verilmezse tüm shard dosyalarına uygulanır ve id dizileri shard ofsetine taşınır.
     """
     sf = _schema_file(schema_path)
     if not sf.exists():
@@ -83,8 +297,16 @@ def ensure_schema(path: Optional[str] = None, schema_path: Optional[str] = None)
 
     sql = sf.read_text(encoding="utf-8")
 
-    with get_conn(path) as con:
-        con.executescript(sql)
+    if path is not None:
+        with get_conn(path) as con:
+            con.executescript(sql)
+        return
+
+    for i, p in enumerate(all_paths()):
+        with get_conn(p) as con:
+            con.executescript(sql)
+            if SHARD_COUNT > 1:
+                seed_sequences(con, i)
 
 
 # -----------------------------------------------------------------------------
@@ -159,9 +381,9 @@ def fetchall(
 # -----------------------------------------------------------------------------
 def ensure_user(user_id: str, *, db_path: Optional[str] = None) -> None:
     """
-    users tablosunda user_id yoksa ekler.
+    users tablosunda user_id yoksa ekler (varsayılan: kullanıcının shard'ı).
     """
-    with get_conn(db_path) as con:
+    with get_conn(db_path or path_for_user(user_id)) as con:
         cur = con.cursor()
         cur.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,))
         if cur.fetchone() is None:
@@ -174,9 +396,9 @@ def ensure_user(user_id: str, *, db_path: Optional[str] = None) -> None:
 
 def ensure_session(session_id: str, user_id: str, title: str = "", *, db_path: Optional[str] = None) -> None:
     """
-    sessions tablosunda session_id yoksa ekler.
+    sessions tablosunda session_id yoksa ekler (varsayılan: kullanıcının shard'ı).
     """
-    with get_conn(db_path) as con:
+    with get_conn(db_path or path_for_user(user_id)) as con:
         cur = con.cursor()
         cur.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,))
         if cur.fetchone() is None:
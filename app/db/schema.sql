@@ -57,11 +57,61 @@ CREATE TABLE IF NOT EXISTS stm_turns (
   FOREIGN KEY (session_id) REFERENCES sessions(session_id) ON DELETE CASCADE
 );
 
+-- LTM yakın-kopya tespiti için LSH bant kovaları (scope: global/local)
+CREATE TABLE IF NOT EXISTS memory_signatures (
+  scope TEXT NOT NULL,
+  memory_id INTEGER NOT NULL,
+  user_id TEXT NOT NULL,
+  session_id TEXT NOT NULL DEFAULT '',
+  band INTEGER NOT NULL,
+  bucket INTEGER NOT NULL
+);
+
+-- Soğuk arşiv: retention ile sıcak tablodan çıkarılan kayıtlar (payload: zlib(JSON))
+CREATE TABLE IF NOT EXISTS archived_memories (
+  archive_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  scope TEXT NOT NULL,
+  memory_id INTEGER NOT NULL,
+  user_id TEXT NOT NULL,
+  session_id TEXT NOT NULL DEFAULT '',
+  payload BLOB NOT NULL,
+  reason TEXT,
+  archived_at INTEGER NOT NULL
+);
+
+-- Mühürlü vektör segmentleri (sahip: scope + user + [session]); vektörler L2 normalize
+CREATE TABLE IF NOT EXISTS vector_segments (
+  segment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  scope TEXT NOT NULL,
+  user_id TEXT NOT NULL,
+  session_id TEXT NOT NULL DEFAULT '',
+  min_id INTEGER NOT NULL,
+  max_id INTEGER NOT NULL,
+  count INTEGER NOT NULL,
+  dim INTEGER NOT NULL,
+  ids BLOB NOT NULL,
+  vectors BLOB NOT NULL,
+  created_at INTEGER NOT NULL
+);
+
+-- LTM sürüm sayaçları: (user_id, '') global, (user_id, session_id) local; her yazmada artar
+CREATE TABLE IF NOT EXISTS memory_versions (
+  user_id TEXT NOT NULL,
+  session_id TEXT NOT NULL DEFAULT '',
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at INTEGER,
+  PRIMARY KEY (user_id, session_id)
+);
+
 -- İndeksler
 CREATE INDEX IF NOT EXISTS idx_local_session ON local_memories(session_id);
 CREATE INDEX IF NOT EXISTS idx_local_user ON local_memories(user_id);
 CREATE INDEX IF NOT EXISTS idx_global_user ON global_memories(user_id);
 CREATE UNIQUE INDEX IF NOT EXISTS uq_global_user_text ON global_memories(user_id, text);
+CREATE INDEX IF NOT EXISTS idx_sig_lookup ON memory_signatures(scope, user_id, session_id, band, bucket);
+CREATE INDEX IF NOT EXISTS idx_archived_owner ON archived_memories(scope, user_id, session_id);
+CREATE INDEX IF NOT EXISTS idx_segments_owner ON vector_segments(scope, user_id, session_id, max_id);
+CREATE INDEX IF NOT EXISTS idx_sig_memory ON memory_signatures(scope, memory_id);
 
 -- Yardımcı seed (isteğe bağlı örnek kayıtlar)
 -- INSERT OR IGNORE INTO users(user_id, created_at) VALUES ('demo', strftime('%s','now'));
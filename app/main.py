@@ -1,15 +1,19 @@
 # app/main.py
 from __future__ import annotations
 
+import time
+
+_IMPORT_T0 = time.perf_counter()
+
 import os
 import logging
 from pathlib import Path
 from typing import Iterable, List
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse, Response
 
 # --- Config & Logging ---------------------------------------------------------
 try:
@@ -32,15 +36,13 @@ logging.basicConfig(
 )
 log = logging.getLogger("app.main")
 
-# --- Rate limit (SlowAPI entegrasyonu) ---------------------------------------
-limiter = None
-rate_limit_handler = None
+# --- Rate limit (token bucket, worker'lar arası paylaşılan) --------------------
+rate_limit = None
 try:
-    # Beklenen: app/api/rate_limit.py -> limiter, rate_limit_exceeded_handler
-    from app.api.rate_limit import limiter as _limiter, rate_limit_exceeded_handler as _rl_handler  # type: ignore
+    # Beklenen: app/api/rate_limit.py -> rate_limit (dependency), RateLimitExceeded, handler
+    from app.api import rate_limit as _rate_limit  # type: ignore
 
-    limiter = _limiter
-    rate_limit_handler = _rl_handler
+    rate_limit = _rate_limit
 except Exception:
     log.warning("Rate limit modülü yüklenemedi; hız sınırı devre dışı.")
 
@@ -63,6 +65,33 @@ try:
 except Exception:
     log.warning("DB repository.ensure_schema bulunamadı; uygulama DB şemasını garanti etmeyecek.")
 
+# --- Metrikler (Prometheus) --------------------------------------------------
+metrics = None
+try:
+    from app.observability import metrics as _metrics  # type: ignore
+
+    metrics = _metrics
+except Exception:
+    log.warning("Metrik modülü yüklenemedi; /metrics devre dışı.")
+
+# --- Yavaş istek örnekleyicisi (profiler) -------------------------------------
+profiler = None
+try:
+    from app.observability import profiler as _profiler  # type: ignore
+
+    profiler = _profiler
+except Exception:
+    log.warning("Profiler modülü yüklenemedi; yavaş istek yakalama devre dışı.")
+
+# --- İstek izleme (request id / Server-Timing) --------------------------------
+tracing = None
+try:
+    from app.observability import tracing as _tracing  # type: ignore
+
+    tracing = _tracing
+except Exception:
+    log.warning("Tracing modülü yüklenemedi; Server-Timing başlıkları devre dışı.")
+
 # --- Routers ------------------------------------------------------------------
 from app.api.routes_chat import router as chat_router  # type: ignore
 from app.api.routes_admin import router as admin_router  # type: ignore
@@ -97,20 +126,72 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    # --- Rate limit middleware/handler (varsa) ---
-    if limiter is not None:
-        # SlowAPI 0.1.x tarzı
-        try:
-            from slowapi import _rate_limit_exceeded_handler  # noqa: F401
-            from slowapi.middleware import SlowAPIMiddleware  # type: ignore
-            from slowapi.errors import RateLimitExceeded  # type: ignore
-
-            app.state.limiter = limiter
-            app.add_exception_handler(RateLimitExceeded, rate_limit_handler)  # type: ignore
-            app.add_middleware(SlowAPIMiddleware)
-            log.info("Rate limiting etkin.")
-        except Exception as e:
-            log.warning("Rate limiting middleware bağlanamadı: %s", e)
+    # --- Rate limit: 429 eşleyici + başarılı yanıtlarda RateLimit-* başlıkları ---
+    if rate_limit is not None and rate_limit.limiter is not None:
+        app.add_exception_handler(rate_limit.RateLimitExceeded, rate_limit.rate_limit_exceeded_handler)  # type: ignore
+
+        @app.middleware("http")
+        async def _rate_limit_headers(request: Request, call_next):
+            response = await call_next(request)
+            rate_limit.apply_headers(request, response)
+            return response
+
+        log.info("Rate limiting etkin (%s, %s).", rate_limit.BACKEND, rate_limit.DEFAULT_LIMIT)
+
+    # --- İstek metrikleri (route şablonu / method / status) ---
+    if metrics is not None:
+
+        @app.middleware("http")
+        async def _metrics_middleware(request: Request, call_next):
+            with metrics.measure_request() as rec:
+                rec["method"] = request.method
+                try:
+                    response = await call_next(request)
+                    rec["status"] = response.status_code
+                    return response
+                finally:
+                    # Ham path yerine şablon (/api/memory/{memory_id}) → sınırlı etiket kümesi
+                    route = request.scope.get("route")
+                    rec["route"] = getattr(route, "path", None) or "unmatched"
+
+    # --- Yavaş istekler: eşiği aşan isteklerin yığın örnekleri halka tampona yazılır ---
+    if profiler is not None and profiler.SLOW.enabled:
+
+        @app.middleware("http")
+        async def _slow_request_middleware(request: Request, call_next):
+            rid = tracing.current_request_id() if tracing is not None else None
+            handle = profiler.SLOW.begin(f"{request.method} {request.url.path}", rid)
+            status = 500
+            try:
+                response = await call_next(request)
+                status = response.status_code
+                return response
+            finally:
+                route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+                profiler.SLOW.end(handle, method=request.method, route=route, status=status)
+
+    # --- İstek izi: X-Request-ID contextvars ile taşınır, aşamalar Server-Timing'e yazılır ---
+    if tracing is not None and tracing.TRACING_ENABLED:
+
+        @app.middleware("http")
+        async def _tracing_middleware(request: Request, call_next):
+            token = tracing.start_trace(request.headers.get("x-request-id"), name=request.method)
+            trace = tracing.current_trace()
+            status = 500
+            try:
+                response = await call_next(request)
+                status = response.status_code
+                response.headers["X-Request-ID"] = trace.request_id
+                if tracing.TRACING_SERVER_TIMING:
+                    response.headers["Server-Timing"] = tracing.server_timing(trace)
+                return response
+            finally:
+                route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+                tracing.end_trace(
+                    token,
+                    name=f"{request.method} {route}",
+                    **{"http.method": request.method, "http.route": route, "http.status_code": status},
+                )
 
     # --- Global hata eşleyiciler ---
     # Uygulamaya özel Exception -> JSONResponse
@@ -138,16 +219,42 @@ def create_app() -> FastAPI:
         data_dir.mkdir(parents=True, exist_ok=True)
         if ensure_schema:
             try:
-                ensure_schema(path=getattr(settings, "DB_PATH", "./data/memory.db"))  # type: ignore
+                ensure_schema()  # type: ignore  # tüm shard dosyaları (SHARD_COUNT=1 → DB_PATH)
                 log.info("DB şeması garanti edildi.")
             except Exception as e:
                 log.exception("DB şema garantisi başarısız: %s", e)
+        # Retention süpürücüsü (RETENTION_SWEEP_INTERVAL_S > 0 ise)
+        try:
+            from app.services import retention  # type: ignore
+
+            if retention.start_sweeper():
+                log.info("Retention süpürücüsü başlatıldı.")
+        except Exception as e:
+            log.exception("Retention süpürücüsü başlatılamadı: %s", e)
+        if metrics is not None and getattr(settings, "METRICS_ENABLED", True):
+            metrics.start_gauge_refresher()
+        # Isınma (WARMUP_ENABLED): bloklayıcı modda worker bitene kadar istek kabul etmez
+        try:
+            from app.services import warmup  # type: ignore
+
+            if warmup.WARMUP_ENABLED:
+                if warmup.WARMUP_BLOCKING:
+                    from starlette.concurrency import run_in_threadpool
+
+                    await run_in_threadpool(warmup.run)
+                else:
+                    warmup.start_background()
+        except Exception as e:
+            log.exception("Isınma başarısız: %s", e)
 
     # --- Router montajı ---
     api_prefix = getattr(settings, "API_PREFIX", "/api")
 
-    # Auth zorunluysa, chat/memory/admin router'larına dependency olarak uygula
+    # Auth zorunluysa, chat/memory/admin router'larına dependency olarak uygula;
+    # hız sınırı auth'tan sonra (geçersiz anahtarlar kova tüketmesin)
     deps = [Depends(require_api_key)] if require_api_key else []
+    if rate_limit is not None and rate_limit.limiter is not None:
+        deps.append(Depends(rate_limit.rate_limit))
 
     app.include_router(chat_router, prefix=api_prefix, tags=["chat"], dependencies=deps)
     if memory_router is not None:
@@ -164,11 +271,50 @@ def create_app() -> FastAPI:
             "status": "ok",
         }
 
+    # Yük dengeleyici / orkestratör probları (API anahtarı istemez; ayrıntı /api/health/ready'de)
+    if getattr(settings, "HEALTH_PUBLIC_PROBES", True):
+        try:
+            from app.observability import health as health_checks  # type: ignore
+        except Exception:
+            health_checks = None
+
+        if health_checks is not None:
+            from starlette.concurrency import run_in_threadpool
+
+            @app.get("/livez", include_in_schema=False)
+            async def livez():
+                return health_checks.liveness()
+
+            @app.get("/readyz", include_in_schema=False)
+            async def readyz():
+                report = await run_in_threadpool(health_checks.readiness)
+                body = {k: report[k] for k in ("status", "ready", "failing", "cached")}
+                return JSONResponse(body, status_code=200 if report["ready"] else 503)
+
+    # Prometheus scrape ucu (API anahtarı istemez; iç ağdan erişilmesi beklenir)
+    if metrics is not None and getattr(settings, "METRICS_ENABLED", True):
+
+        @app.get("/metrics", include_in_schema=False)
+        async def prometheus_metrics():
+            if not metrics.PROM.enabled:
+                return PlainTextResponse("prometheus_client yüklü değil\n", status_code=503)
+            body, content_type = metrics.PROM.render()
+            return Response(content=body, media_type=content_type)
+
     return app
 
 
 app = create_app()
 
+# Import + uygulama kurulumu süresi (sağlayıcı istemcileri tembel; /api/stats → startup)
+try:
+    from app.services import warmup as _warmup  # type: ignore
+
+    _warmup.record_import((time.perf_counter() - _IMPORT_T0) * 1000.0)
+    log.info("app.main import süresi: %.1f ms", (time.perf_counter() - _IMPORT_T0) * 1000.0)
+except Exception:
+    pass
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,275 @@
+# app/observability/health.py
+from __future__ import annotations
+
+"""
+Liveness / readiness kontrolleri.
+
+- liveness(): süreç ayakta mı (bağımlılıklara dokunmaz, her zaman ucuz).
+- readiness(): trafiği zamanında karşılayabilir mi?
+    db       : her shard dosyasında SELECT + kısa süreli BEGIN IMMEDIATE (kilit) turu, RTT ölçülür
+    warm     : vektör segment önbelleği / ısınma durumu (mark_warm ile işaretlenir)
+    queues   : embed batch ve segment bakım kuyruğu derinlikleri limitlere karşı
+    breakers : embedding / LLM devre kesicisi durumu ve gecikme yüzdelikleri
+  Sonuç HEALTH_CACHE_TTL_S boyunca önbelleğe alınır; eşzamanlı problar tek hesaplamayı paylaşır.
+
+Her kontrol "ok" | "degraded" | "fail" döner; herhangi biri "fail" ise hazır değil (503).
+Açık devre kesicisi fallback açıkken hizmet sürdüğü için varsayılan olarak "degraded" sayılır.
+"""
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        HEALTH_CACHE_TTL_S = float(os.getenv("HEALTH_CACHE_TTL_S", "2"))
+        HEALTH_DB_TIMEOUT_S = float(os.getenv("HEALTH_DB_TIMEOUT_S", "0.5"))
+        HEALTH_DB_RTT_MAX_MS = float(os.getenv("HEALTH_DB_RTT_MAX_MS", "250"))
+        HEALTH_MAX_EMBED_QUEUE = int(os.getenv("HEALTH_MAX_EMBED_QUEUE", "512"))
+        HEALTH_MAX_SEGMENT_QUEUE = int(os.getenv("HEALTH_MAX_SEGMENT_QUEUE", "1000"))
+        HEALTH_REQUIRE_WARM = os.getenv("HEALTH_REQUIRE_WARM", "false").lower() == "true"
+        HEALTH_FAIL_ON_OPEN_BREAKER = os.getenv("HEALTH_FAIL_ON_OPEN_BREAKER", "false").lower() == "true"
+
+    settings = _Fallback()  # type: ignore
+
+HEALTH_CACHE_TTL_S: float = float(getattr(settings, "HEALTH_CACHE_TTL_S", 2.0))
+HEALTH_DB_TIMEOUT_S: float = float(getattr(settings, "HEALTH_DB_TIMEOUT_S", 0.5))
+HEALTH_DB_RTT_MAX_MS: float = float(getattr(settings, "HEALTH_DB_RTT_MAX_MS", 250.0))
+HEALTH_MAX_EMBED_QUEUE: int = int(getattr(settings, "HEALTH_MAX_EMBED_QUEUE", 512))
+HEALTH_MAX_SEGMENT_QUEUE: int = int(getattr(settings, "HEALTH_MAX_SEGMENT_QUEUE", 1000))
+HEALTH_REQUIRE_WARM: bool = bool(getattr(settings, "HEALTH_REQUIRE_WARM", False))
+HEALTH_FAIL_ON_OPEN_BREAKER: bool = bool(getattr(settings, "HEALTH_FAIL_ON_OPEN_BREAKER", False))
+
+OK, DEGRADED, FAIL = "ok", "degraded", "fail"
+_RANK = {OK: 0, DEGRADED: 1, FAIL: 2}
+
+_STARTED_AT = time.time()
+
+
+# ---------------------------
+# Isınma durumu
+# ---------------------------
+class _WarmState:
+    """Isınma (warm-up) işinin durumu; warm-up yoksa başlangıçta 'warm' kabul edilir."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.warm = True
+        self.details: Dict[str, Any] = {}
+        self.updated_at: Optional[float] = None
+
+    def mark(self, warm: bool, **details: Any) -> None:
+        with self._lock:
+            self.warm = bool(warm)
+            self.details = dict(details)
+            self.updated_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"warm": self.warm, "updated_at": self.updated_at, **self.details}
+
+
+_WARM = _WarmState()
+
+
+def mark_warming(**details: Any) -> None:
+    _WARM.mark(False, **details)
+
+
+def mark_warm(**details: Any) -> None:
+    _WARM.mark(True, **details)
+
+
+# ---------------------------
+# Tekil kontroller
+# ---------------------------
+def _service(name: str):
+    # Yalnızca yüklenmiş modüllere bak: prob ağır sağlayıcıları import ettirmesin
+    return sys.modules.get(name)
+
+
+def _db_paths() -> List[str]:
+    repo = _service("app.db.repository")
+    if repo is not None and hasattr(repo, "all_paths"):
+        return list(repo.all_paths())
+    return [str(getattr(settings, "DB_PATH", "./data/memory.db"))]
+
+
+def _probe_db(path: str) -> Dict[str, Any]:
+    """
+    Kısa zaman aşımlı ayrı bağlantı: okuma turu + BEGIN IMMEDIATE/ROLLBACK ile yazma
+    kilidinin HEALTH_DB_TIMEOUT_S içinde alınabildiğini doğrular (havuzdaki 5 sn'lik
+    busy_timeout probu bekletmesin diye havuz kullanılmaz).
+    """
+    t0 = time.perf_counter()
+    con = None
+    try:
+        con = sqlite3.connect(path, timeout=HEALTH_DB_TIMEOUT_S, isolation_level=None)
+        con.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        con.execute("BEGIN IMMEDIATE")
+        con.execute("ROLLBACK")
+        rtt_ms = (time.perf_counter() - t0) * 1000.0
+        status = OK if rtt_ms <= HEALTH_DB_RTT_MAX_MS else DEGRADED
+        return {"path": path, "status": status, "rtt_ms": round(rtt_ms, 3)}
+    except sqlite3.OperationalError as e:
+        rtt_ms = (time.perf_counter() - t0) * 1000.0
+        return {"path": path, "status": FAIL, "rtt_ms": round(rtt_ms, 3), "error": str(e)}
+    except Exception as e:
+        return {"path": path, "status": FAIL, "error": repr(e)}
+    finally:
+        if con is not None:
+            try:
+                con.close()
+            except Exception:
+                pass
+
+
+def check_db() -> Dict[str, Any]:
+    shards = [_probe_db(p) for p in _db_paths()]
+    status = max((s["status"] for s in shards), key=_RANK.get, default=FAIL)
+    rtts = [s["rtt_ms"] for s in shards if "rtt_ms" in s]
+    return {
+        "status": status,
+        "max_rtt_ms": max(rtts) if rtts else None,
+        "limit_ms": HEALTH_DB_RTT_MAX_MS,
+        "shards": shards,
+    }
+
+
+def check_warm() -> Dict[str, Any]:
+    out: Dict[str, Any] = {"state": _WARM.snapshot()}
+    seg = _service("app.services.vector_segments")
+    if seg is not None:
+        try:
+            st = seg.stats()
+            out["segment_cache"] = st.get("cache")
+        except Exception:
+            pass
+    emb = _service("app.services.embed_client")
+    out["embed_client_loaded"] = emb is not None
+    warm = bool(out["state"].get("warm"))
+    out["status"] = OK if warm else (FAIL if HEALTH_REQUIRE_WARM else DEGRADED)
+    return out
+
+
+def check_queues() -> Dict[str, Any]:
+    queues: Dict[str, Dict[str, Any]] = {}
+    emb = _service("app.services.embed_client")
+    if emb is not None and hasattr(emb, "queue_depth"):
+        queues["embed_batch"] = {"depth": int(emb.queue_depth()), "limit": HEALTH_MAX_EMBED_QUEUE}
+    seg = _service("app.services.vector_segments")
+    if seg is not None:
+        try:
+            depth = int(seg.stats().get("pending_maintenance", 0))
+            queues["segment_maintenance"] = {"depth": depth, "limit": HEALTH_MAX_SEGMENT_QUEUE}
+        except Exception:
+            pass
+    status = OK
+    for q in queues.values():
+        if q["limit"] > 0 and q["depth"] >= q["limit"]:
+            q["status"] = FAIL
+            status = FAIL
+        elif q["limit"] > 0 and q["depth"] >= q["limit"] // 2:
+            q["status"] = DEGRADED
+            status = max(status, DEGRADED, key=_RANK.get)
+        else:
+            q["status"] = OK
+    return {"status": status, "queues": queues}
+
+
+def _breaker_status(state: Optional[str]) -> str:
+    if state == "open":
+        return FAIL if HEALTH_FAIL_ON_OPEN_BREAKER else DEGRADED
+    if state == "half_open":
+        return DEGRADED
+    return OK
+
+
+def check_breakers() -> Dict[str, Any]:
+    breakers: Dict[str, Dict[str, Any]] = {}
+    llm = _service("app.services.llm_client")
+    if llm is not None and hasattr(llm, "breaker_state"):
+        try:
+            breakers["llm"] = llm.breaker_state()
+        except Exception as e:
+            breakers["llm"] = {"state": None, "error": repr(e)}
+    emb = _service("app.services.embed_client")
+    if emb is not None and hasattr(emb, "BREAKER"):
+        try:
+            breakers["embed"] = emb.BREAKER.snapshot()
+        except Exception as e:
+            breakers["embed"] = {"state": None, "error": repr(e)}
+    status = OK
+    for b in breakers.values():
+        b["status"] = _breaker_status(b.get("state"))
+        status = max(status, b["status"], key=_RANK.get)
+    return {"status": status, "breakers": breakers}
+
+
+CHECKS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "db": check_db,
+    "warm": check_warm,
+    "queues": check_queues,
+    "breakers": check_breakers,
+}
+
+
+# ---------------------------
+# Birleşik sonuç (önbellekli)
+# ---------------------------
+def _run_checks() -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    checks: Dict[str, Dict[str, Any]] = {}
+    for name, fn in CHECKS.items():
+        try:
+            checks[name] = fn()
+        except Exception as e:
+            checks[name] = {"status": FAIL, "error": repr(e)}
+    status = max((c.get("status", FAIL) for c in checks.values()), key=_RANK.get, default=OK)
+    return {
+        "status": status,
+        "ready": status != FAIL,
+        "failing": [k for k, c in checks.items() if c.get("status") == FAIL],
+        "checked_at": time.time(),
+        "check_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+        "checks": checks,
+    }
+
+
+class _ReadinessCache:
+    def __init__(self, ttl_s: float) -> None:
+        self.ttl_s = max(0.0, float(ttl_s))
+        self._lock = threading.Lock()
+        self._value: Optional[Dict[str, Any]] = None
+        self._at = 0.0
+
+    def get(self, force: bool = False) -> Dict[str, Any]:
+        now = time.monotonic()
+        value = self._value
+        if not force and value is not None and now - self._at < self.ttl_s:
+            return dict(value, cached=True)
+        # Tek hesaplama: kilidi bekleyenler taze sonucu paylaşır
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._value is not None and now - self._at < self.ttl_s:
+                return dict(self._value, cached=True)
+            self._value = _run_checks()
+            self._at = time.monotonic()
+            return dict(self._value, cached=False)
+
+
+_CACHE = _ReadinessCache(HEALTH_CACHE_TTL_S)
+
+
+def liveness() -> Dict[str, Any]:
+    return {"status": OK, "uptime_s": round(time.time() - _STARTED_AT, 3), "pid": os.getpid()}
+
+
+def readiness(force: bool = False) -> Dict[str, Any]:
+    """Önbellekli hazır olma raporu; force=True önbelleği atlar."""
+    return _CACHE.get(force=force)
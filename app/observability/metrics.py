@@ -1,9 +1,84 @@
 # app/observability/metrics.py
 from __future__ import annotations
 
+"""
+Süreç içi metrik toplayıcı (METRICS) + opsiyonel Prometheus dışa aktarımı.
+
+- METRICS.incr / observe değerleri /api/stats JSON'unda görünür; prometheus_client
+  kuruluysa aynı değerler memory_events_total / memory_<ad> olarak da yayınlanır.
+- stage("local_search") bağlam yöneticisi hat aşamalarının süresini
+  memory_stage_duration_seconds{stage} histogramına yazar.
+- Gauge'lar (STM session sayısı, kuyruk derinlikleri, devre kesici durumu) scrape
+  anında ve METRICS_GAUGE_REFRESH_S aralığıyla arka planda tazelenir.
+
+Çoklu worker (gunicorn): PROMETHEUS_MULTIPROC_DIR süreçler başlamadan önce boş bir
+klasöre ayarlanır; /metrics tüm worker'ların dosyalarını birleştirir. Ölen worker'ların
+canlı gauge'larını temizlemek için gunicorn yapılandırmasına:
+
+    def child_exit(server, worker):
+        from app.observability.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
+"""
+
+import os
+import re
+import sys
 import threading
 import time
 from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+try:
+    from app.observability import tracing as _tracing  # type: ignore
+except Exception:  # pragma: no cover
+    _tracing = None  # type: ignore
+
+try:
+    import prometheus_client as _prom  # type: ignore
+    from prometheus_client import multiprocess as _prom_mp  # type: ignore
+except Exception:  # pragma: no cover - opsiyonel bağımlılık
+    _prom = None  # type: ignore
+    _prom_mp = None  # type: ignore
+
+# Varsayılan histogram kovaları (ms veya adet gibi birimsiz değerler için)
+DEFAULT_BUCKETS: Sequence[float] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+# Aşama / HTTP süreleri (saniye)
+STAGE_BUCKETS_S: Sequence[float] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+_STAGE_BUCKETS_MS: Sequence[float] = tuple(b * 1000.0 for b in STAGE_BUCKETS_S)
+
+_NAMESPACE = "memory"
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+
+
+class _Histogram:
+    """Sabit kovalı basit histogram (kümülatif olmayan sayımlar)."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # son kova: +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        v = float(value)
+        self.count += 1
+        self.sum += v
+        for i, b in enumerate(self.buckets):
+            if v <= b:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": (self.sum / self.count) if self.count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
 
 
 class _Metrics:
@@ -13,6 +88,8 @@ class _Metrics:
     - ortalama gecikme (ms)
     - retrieval hit sayısı
     - topk varsayılanları (gözlem amaçlı)
+    - adlandırılmış sayaçlar (cache hit/miss, fallback vb.)
+    - adlandırılmış histogramlar (batch boyutu, bekleme süresi vb.)
     """
     def __init__(self) -> None:
         self._lock = threading.RLock()
@@ -23,6 +100,8 @@ class _Metrics:
         self.retrieval_hits = 0
         self.topk_local = 5
         self.topk_global = 5
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, _Histogram] = {}
 
     def record_request(self, latency_ms: float | None = None) -> None:
         with self._lock:
@@ -34,6 +113,38 @@ class _Metrics:
     def record_retrieval_hit(self, n: int = 1) -> None:
         with self._lock:
             self.retrieval_hits += int(max(0, n))
+        PROM.retrieval_hit(int(max(0, n)))
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+        PROM.incr(name, n)
+
+    def snapshot_counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Optional[Sequence[float]] = None,
+        *,
+        export: bool = True,
+    ) -> None:
+        """export=False: yalnızca süreç içi histogram (Prometheus tarafı ayrı yayınlanıyorsa)."""
+        with self._lock:
+            h = self.histograms.get(name)
+            if h is None:
+                h = _Histogram(buckets or DEFAULT_BUCKETS)
+                self.histograms[name] = h
+            h.observe(value)
+        if export:
+            PROM.observe(name, value, buckets or DEFAULT_BUCKETS)
+
+    def snapshot_histograms(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {k: h.snapshot() for k, h in self.histograms.items()}
 
     def set_topk(self, local: int, global_: int) -> None:
         with self._lock:
@@ -41,18 +152,235 @@ class _Metrics:
             self.topk_global = int(global_)
 
 
+# ---------------------------
+# Prometheus dışa aktarımı
+# ---------------------------
+def _settings_value(name: str, default: Any) -> Any:
+    try:
+        from app.core.config import settings  # type: ignore
+
+        return getattr(settings, name, default)
+    except Exception:
+        return default
+
+
+def _metric_name(name: str) -> str:
+    return f"{_NAMESPACE}_{_NAME_RE.sub('_', str(name)).strip('_').lower()}"
+
+
+class _Prometheus:
+    """
+    prometheus_client sarmalayıcısı; kütüphane yoksa tüm çağrılar no-op'tur.
+    Metrikler varsayılan REGISTRY'ye kaydedilir (multiprocess modda değerler
+    PROMETHEUS_MULTIPROC_DIR altındaki dosyalara yazılır).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.enabled = _prom is not None
+        self._histograms: Dict[str, Any] = {}
+        self._refresher: Optional[threading.Thread] = None
+        if not self.enabled:
+            return
+        self.events = _prom.Counter(
+            f"{_NAMESPACE}_events_total", "Adlandırılmış olay sayaçları (cache hit/miss, fallback…)", ["event"]
+        )
+        self.stage_seconds = _prom.Histogram(
+            f"{_NAMESPACE}_stage_duration_seconds", "Hat aşaması süreleri", ["stage"], buckets=STAGE_BUCKETS_S
+        )
+        self.http_requests = _prom.Counter(
+            f"{_NAMESPACE}_http_requests_total", "HTTP istekleri", ["method", "route", "status"]
+        )
+        self.http_seconds = _prom.Histogram(
+            f"{_NAMESPACE}_http_request_duration_seconds",
+            "HTTP istek süreleri",
+            ["method", "route"],
+            buckets=STAGE_BUCKETS_S,
+        )
+        self.retrieval_hits = _prom.Counter(
+            f"{_NAMESPACE}_retrieval_hits_total", "Kaynak döndüren retrieval sayısı"
+        )
+        self.stm_sessions = _prom.Gauge(
+            f"{_NAMESPACE}_stm_sessions", "Bellekteki STM session sayısı", multiprocess_mode="livesum"
+        )
+        self.queue_depth = _prom.Gauge(
+            f"{_NAMESPACE}_queue_depth", "Arka plan kuyruk derinlikleri", ["queue"], multiprocess_mode="livesum"
+        )
+        self.breaker_state = _prom.Gauge(
+            f"{_NAMESPACE}_breaker_state",
+            "Devre kesici durumu (0=closed, 1=half_open, 2=open)",
+            ["provider"],
+            multiprocess_mode="livemax",
+        )
+
+    # --- sayaç / histogram ---
+    def incr(self, name: str, n: int = 1) -> None:
+        if self.enabled and n > 0:
+            self.events.labels(event=name).inc(n)
+
+    def observe(self, name: str, value: float, buckets: Sequence[float]) -> None:
+        if not self.enabled:
+            return
+        h = self._histograms.get(name)
+        if h is None:
+            with self._lock:
+                h = self._histograms.get(name)
+                if h is None:
+                    try:
+                        h = _prom.Histogram(_metric_name(name), f"{name} dağılımı", buckets=tuple(buckets))
+                    except ValueError:
+                        # aynı adla başka bir metrik kayıtlı → yalnızca süreç içi tutulur
+                        h = False
+                    self._histograms[name] = h
+        if h:
+            h.observe(float(value))
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        if self.enabled:
+            self.stage_seconds.labels(stage=stage).observe(seconds)
+
+    def observe_http(self, method: str, route: str, status: int, seconds: float) -> None:
+        if not self.enabled:
+            return
+        self.http_requests.labels(method=method, route=route, status=str(status)).inc()
+        self.http_seconds.labels(method=method, route=route).observe(seconds)
+
+    def retrieval_hit(self, n: int) -> None:
+        if self.enabled and n > 0:
+            self.retrieval_hits.inc(n)
+
+    # --- gauge'lar ---
+    def refresh_gauges(self) -> None:
+        """
+        Yalnızca yüklenmiş servis modüllerine bakar (scrape, ağır sağlayıcıları
+        import ettirmesin); her hata sessizce yutulur.
+        """
+        if not self.enabled:
+            return
+        mods = sys.modules
+        stm = mods.get("app.services.stm_store")
+        if stm is not None and hasattr(stm, "session_count"):
+            try:
+                self.stm_sessions.set(stm.session_count())
+            except Exception:
+                pass
+        emb = mods.get("app.services.embed_client")
+        if emb is not None:
+            try:
+                self.queue_depth.labels(queue="embed_batch").set(emb.queue_depth())
+                self.breaker_state.labels(provider="embed").set(_BREAKER_LEVELS.get(emb.BREAKER.state, 0))
+            except Exception:
+                pass
+        seg = mods.get("app.services.vector_segments")
+        if seg is not None:
+            try:
+                self.queue_depth.labels(queue="segment_maintenance").set(
+                    seg.stats().get("pending_maintenance", 0)
+                )
+            except Exception:
+                pass
+        sched = mods.get("app.services.provider_scheduler")
+        if sched is not None:
+            try:
+                self.queue_depth.labels(queue="llm_provider").set(sched.LLM.queue_depth())
+                self.queue_depth.labels(queue="embed_provider").set(sched.EMBED.queue_depth())
+            except Exception:
+                pass
+        llm = mods.get("app.services.llm_client")
+        if llm is not None:
+            try:
+                self.breaker_state.labels(provider="llm").set(_BREAKER_LEVELS.get(llm.BREAKER.state, 0))
+            except Exception:
+                pass
+
+    def start_refresher(self, interval_s: float) -> bool:
+        """Gauge'ları arka planda tazeler (multiprocess modda her worker kendi değerini yazar)."""
+        if not self.enabled or interval_s <= 0:
+            return False
+        with self._lock:
+            if self._refresher is not None and self._refresher.is_alive():
+                return False
+
+            def _loop() -> None:
+                tick = threading.Event()  # Event.wait: profil örneklerinde boşta görünür
+                while True:
+                    self.refresh_gauges()
+                    tick.wait(interval_s)
+
+            self._refresher = threading.Thread(target=_loop, name="metrics-gauges", daemon=True)
+            self._refresher.start()
+        return True
+
+    # --- dışa aktarım ---
+    def render(self) -> Tuple[bytes, str]:
+        """(gövde, content-type). Multiprocess modda tüm worker dosyaları birleştirilir."""
+        if not self.enabled:
+            raise RuntimeError("prometheus_client yüklü değil")
+        self.refresh_gauges()
+        if multiprocess_dir():
+            registry = _prom.CollectorRegistry()
+            _prom_mp.MultiProcessCollector(registry)
+        else:
+            registry = _prom.REGISTRY
+        return _prom.generate_latest(registry), _prom.CONTENT_TYPE_LATEST
+
+
+_BREAKER_LEVELS = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def multiprocess_dir() -> str:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir") or ""
+
+
+def mark_process_dead(pid: int) -> None:
+    """gunicorn child_exit kancası: ölen worker'ın canlı gauge dosyalarını siler."""
+    if _prom_mp is not None and multiprocess_dir():
+        _prom_mp.mark_process_dead(pid)
+
+
+@contextmanager
+def measure_request() -> Iterator[Dict[str, Any]]:
+    """
+    with measure_request() as rec: blok sonunda METRICS.record_request(latency_ms) çağrılır.
+    rec sözlüğüne method / route / status yazılırsa HTTP metrikleri de yayınlanır.
+    """
+    rec: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        dt_s = time.perf_counter() - t0
+        METRICS.record_request(dt_s * 1000.0)
+        if rec.get("route"):
+            PROM.observe_http(
+                str(rec.get("method") or "GET"), str(rec["route"]), int(rec.get("status") or 500), dt_s
+            )
+
+
 @contextmanager
-def measure_request():
+def stage(name: str) -> Iterator[None]:
     """
-    with measure_request(): blok sonunda METRICS.record_request(latency_ms) çağrılır.
+    with stage("local_search"): blok süresi memory_stage_duration_seconds{stage}
+    histogramına ve /api/stats altındaki stage_<ad>_ms histogramına yazılır; aktif
+    bir istek izi varsa aynı adla span açılır. Hata fırlatan bloklar da ölçülür.
     """
-    t0 = time.time()
+    t0 = time.perf_counter()
     try:
-        yield
+        if _tracing is not None:
+            with _tracing.span(name):
+                yield
+        else:
+            yield
     finally:
-        dt_ms = (time.time() - t0) * 1000.0
-        METRICS.record_request(dt_ms)
+        dt_s = time.perf_counter() - t0
+        METRICS.observe(f"stage_{name}_ms", dt_s * 1000.0, _STAGE_BUCKETS_MS, export=False)
+        PROM.observe_stage(name, dt_s)
+
+
+def start_gauge_refresher() -> bool:
+    return PROM.start_refresher(float(_settings_value("METRICS_GAUGE_REFRESH_S", 15.0)))
 
 
-# Tekil metrik nesnesi
+# Tekil metrik nesneleri
+PROM = _Prometheus()
 METRICS = _Metrics()
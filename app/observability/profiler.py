@@ -0,0 +1,308 @@
+# app/observability/profiler.py
+from __future__ import annotations
+
+"""
+Yeniden başlatma gerektirmeyen örneklemeli profil aracı.
+
+- profile(seconds, interval_ms): süre sınırlı, tüm thread'lerin yığınlarını
+  sys._current_frames() ile örnekler; çıktı "collapsed stack" biçimindedir
+  (flamegraph.pl, speedscope, inferno doğrudan okur).
+- SLOW: yavaş istek örnekleyicisi. Middleware her isteği begin()/end() ile kaydeder;
+  izleyici thread yalnızca SLOW_REQUEST_THRESHOLD_MS'i aşmış isteklerin thread'ini
+  örnekler (hızlı istekler için maliyet: bir sözlük yazımı). Eşiği aşan istekler sınırlı
+  bir halka tampona (ring buffer) yazılır.
+
+Not: async handler'lar event loop thread'inde çalışır; aynı anda başka istekler de
+loop'u kullanıyorsa örnekler onların yığınlarını da içerebilir. Threadpool'da çalışan
+senkron handler'lar SLOW.rebind() ile örneklenecek thread'i kendi thread'lerine taşır.
+"""
+
+import contextvars
+import itertools
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Dict, List, Optional
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "true").lower() == "true"
+        PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+        PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+        SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+        SLOW_REQUEST_SAMPLE_INTERVAL_MS = float(os.getenv("SLOW_REQUEST_SAMPLE_INTERVAL_MS", "20"))
+        SLOW_REQUEST_BUFFER = int(os.getenv("SLOW_REQUEST_BUFFER", "50"))
+
+    settings = _Fallback()  # type: ignore
+
+PROFILER_ENABLED: bool = bool(getattr(settings, "PROFILER_ENABLED", True))
+PROFILER_MAX_SECONDS: float = float(getattr(settings, "PROFILER_MAX_SECONDS", 60.0))
+PROFILER_INTERVAL_MS: float = float(getattr(settings, "PROFILER_INTERVAL_MS", 10.0))
+SLOW_REQUEST_THRESHOLD_MS: float = float(getattr(settings, "SLOW_REQUEST_THRESHOLD_MS", 2000.0))
+SLOW_REQUEST_SAMPLE_INTERVAL_MS: float = float(getattr(settings, "SLOW_REQUEST_SAMPLE_INTERVAL_MS", 20.0))
+SLOW_REQUEST_BUFFER: int = max(1, int(getattr(settings, "SLOW_REQUEST_BUFFER", 50)))
+
+# Yığın derinliği sınırı (çok derin özyinelemede örnek maliyeti sabit kalsın)
+_MAX_DEPTH = 128
+# Örnekleme aralığının alt sınırı (ms)
+_MIN_INTERVAL_MS = 1.0
+
+
+# Middleware'de açılan yakalamanın kimliği (threadpool'a kopyalanan bağlamla taşınır)
+_HANDLE: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("slow_request_handle", default=None)
+
+
+class ProfilerBusyError(RuntimeError):
+    """Aynı anda yalnızca bir isteğe bağlı profil çalışabilir."""
+
+
+# ---------------------------
+# Yığın biçimleme
+# ---------------------------
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    # collapsed biçimde ';' ayraç, ' ' sayı ayracıdır
+    return f"{module}:{code.co_name}".replace(";", ",").replace(" ", "_")
+
+
+def _collapse(frame, root: Optional[str] = None) -> str:
+    parts: List[str] = []
+    depth = 0
+    while frame is not None and depth < _MAX_DEPTH:
+        parts.append(_frame_label(frame))
+        frame = frame.f_back
+        depth += 1
+    if root:
+        parts.append(root.replace(";", ",").replace(" ", "_"))
+    parts.reverse()
+    return ";".join(parts)
+
+
+def collapsed_text(stacks: Dict[str, int]) -> str:
+    """{"a;b;c": n} → 'a;b;c n' satırları (çoktan aza)."""
+    return "".join(f"{k} {v}\n" for k, v in sorted(stacks.items(), key=lambda kv: (-kv[1], kv[0])))
+
+
+def top_frames(stacks: Dict[str, int], limit: int = 20) -> List[Dict[str, Any]]:
+    """En sık görülen yaprak (self) çerçeveler; hızlı okuma için."""
+    leaf: Counter = Counter()
+    for stack, n in stacks.items():
+        leaf[stack.rsplit(";", 1)[-1]] += n
+    total = sum(leaf.values()) or 1
+    return [
+        {"frame": f, "samples": n, "ratio": round(n / total, 4)} for f, n in leaf.most_common(limit)
+    ]
+
+
+# ---------------------------
+# İsteğe bağlı profil
+# ---------------------------
+_PROFILE_LOCK = threading.Lock()
+
+
+def profile(
+    seconds: float,
+    interval_ms: Optional[float] = None,
+    *,
+    include_idle: bool = False,
+) -> Dict[str, Any]:
+    """
+    seconds boyunca (PROFILER_MAX_SECONDS ile sınırlı) çağıran thread dışındaki tüm
+    thread'leri örnekler. Kök çerçeve thread adıdır. include_idle=False ise yalnızca
+    bekleme çağrısında (sleep / wait / select) duran yığınlar atlanır.
+    Başka bir profil çalışıyorsa ProfilerBusyError.
+    """
+    if not PROFILER_ENABLED:
+        raise RuntimeError("profiler disabled")
+    seconds = min(max(0.05, float(seconds)), PROFILER_MAX_SECONDS)
+    interval_s = max(_MIN_INTERVAL_MS, float(interval_ms or PROFILER_INTERVAL_MS)) / 1000.0
+    if not _PROFILE_LOCK.acquire(blocking=False):
+        raise ProfilerBusyError("a profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while True:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                if not include_idle and _is_idle(frame):
+                    continue
+                stacks[_collapse(frame, names.get(tid, f"thread-{tid}"))] += 1
+            samples += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval_s, deadline - now))
+        elapsed = time.perf_counter() - started
+    finally:
+        _PROFILE_LOCK.release()
+    return {
+        "seconds": round(elapsed, 3),
+        "interval_ms": interval_s * 1000.0,
+        "samples": samples,
+        "stacks": dict(stacks),
+    }
+
+
+_IDLE_LEAVES = frozenset(
+    {"wait", "sleep", "select", "poll", "epoll", "_worker", "get", "accept", "_wait_for_tstate_lock"}
+)
+
+
+def _is_idle(frame) -> bool:
+    # Yaprak çerçeve (Python seviyesinde) bilinen bir bekleme fonksiyonuysa thread boşta sayılır
+    # (time.sleep yerine Event.wait kullanan arka plan döngüleri de bu sayede elenir)
+    return frame.f_code.co_name in _IDLE_LEAVES
+
+
+# ---------------------------
+# Yavaş istek örnekleyicisi
+# ---------------------------
+class _Inflight:
+    __slots__ = ("capture_id", "thread_id", "label", "request_id", "started", "stacks", "samples")
+
+    def __init__(self, capture_id: int, thread_id: int, label: str, request_id: Optional[str]) -> None:
+        self.capture_id = capture_id
+        self.thread_id = thread_id
+        self.label = label
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+
+class _SlowRequestSampler:
+    """
+    Süren isteklerin kaydı + eşik aşıldığında thread yığını örnekleyen izleyici thread.
+    Eşik 0 veya altı → kapalı (begin() None döner).
+    """
+
+    def __init__(self, threshold_ms: float, interval_ms: float, capacity: int) -> None:
+        self.threshold_s = float(threshold_ms) / 1000.0
+        self.interval_s = max(_MIN_INTERVAL_MS, float(interval_ms)) / 1000.0
+        self._lock = threading.Lock()
+        self._inflight: Dict[int, _Inflight] = {}
+        self._captures: "deque[Dict[str, Any]]" = deque(maxlen=max(1, int(capacity)))
+        self._ids = itertools.count(1)
+        self._worker: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self.captured = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_s > 0
+
+    def begin(self, label: str, request_id: Optional[str] = None) -> Optional[int]:
+        """Çağıran thread'de başlayan isteği kaydeder; end() için kimlik döner."""
+        if not self.enabled:
+            return None
+        entry = _Inflight(next(self._ids), threading.get_ident(), label, request_id)
+        with self._lock:
+            self._inflight[entry.capture_id] = entry
+        _HANDLE.set(entry.capture_id)
+        self._ensure_worker()
+        return entry.capture_id
+
+    def rebind(self) -> None:
+        """Süren isteğin örneklenecek thread'ini çağıran thread yapar (threadpool handler'ları)."""
+        handle = _HANDLE.get()
+        if handle is None:
+            return
+        with self._lock:
+            entry = self._inflight.get(handle)
+            if entry is not None:
+                entry.thread_id = threading.get_ident()
+
+    def end(self, handle: Optional[int], **info: Any) -> Optional[Dict[str, Any]]:
+        """İsteği kapatır; eşik aşıldıysa yakalamayı halka tampona yazar ve döner."""
+        if handle is None:
+            return None
+        with self._lock:
+            entry = self._inflight.pop(handle, None)
+        if entry is None:
+            return None
+        elapsed = time.perf_counter() - entry.started
+        if elapsed < self.threshold_s:
+            return None
+        capture = {
+            "id": entry.capture_id,
+            "ts": int(time.time()),
+            "label": entry.label,
+            "request_id": entry.request_id,
+            "duration_ms": round(elapsed * 1000.0, 3),
+            "samples": entry.samples,
+            "interval_ms": self.interval_s * 1000.0,
+            "stacks": dict(entry.stacks),
+            **info,
+        }
+        with self._lock:
+            self._captures.append(capture)
+            self.captured += 1
+        return capture
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="slow-request-sampler", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval_s)
+            now = time.perf_counter()
+            with self._lock:
+                due = [e for e in self._inflight.values() if now - e.started >= self.threshold_s]
+            if not due:
+                continue
+            frames = sys._current_frames()
+            for e in due:
+                frame = frames.get(e.thread_id)
+                if frame is not None:
+                    e.stacks[_collapse(frame)] += 1
+                    e.samples += 1
+
+    # --- okuma ---
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._captures)
+        return [{k: v for k, v in c.items() if k != "stacks"} for c in reversed(items)]
+
+    def get(self, capture_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for c in self._captures:
+                if c["id"] == capture_id:
+                    return dict(c)
+        return None
+
+    def clear(self) -> int:
+        with self._lock:
+            n = len(self._captures)
+            self._captures.clear()
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold_ms": self.threshold_s * 1000.0,
+                "interval_ms": self.interval_s * 1000.0,
+                "inflight": len(self._inflight),
+                "buffered": len(self._captures),
+                "capacity": self._captures.maxlen,
+                "captured": self.captured,
+            }
+
+
+# Tekil örnekleyici
+SLOW = _SlowRequestSampler(SLOW_REQUEST_THRESHOLD_MS, SLOW_REQUEST_SAMPLE_INTERVAL_MS, SLOW_REQUEST_BUFFER)
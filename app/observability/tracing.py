@@ -0,0 +1,356 @@
+# app/observability/tracing.py
+from __future__ import annotations
+
+"""
+Hafif istek bazlı span izleme.
+
+- Her HTTP isteği için start_trace() bir iz (trace) açar; request id contextvars ile
+  taşınır (current_request_id()), böylece aynı istekteki tüm aşamalar ilişkilendirilir.
+- span("local_search") iç içe geçebilen zaman aralıkları üretir; aktif iz yoksa no-op.
+  metrics.stage(...) her aşama için otomatik span açar.
+- Sonuçlar: Server-Timing başlığı (server_timing()), ChatResponse.debug alanı
+  (debug_payload()) ve TRACING_EXPORT_PATH ayarlıysa OpenTelemetry (OTLP/JSON span)
+  biçimine uygun JSONL dosyası (arka plan yazıcısı ile, istek yolunu bloklamaz).
+
+Not: contextvars thread havuzuna kendiliğinden geçmez; span'lar çağıran thread'de
+açılıp kapandığı sürece (deadline/singleflight sarmalayıcıları dahil) doğru ebeveyne bağlanır.
+"""
+
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+        TRACING_SERVER_TIMING = os.getenv("TRACING_SERVER_TIMING", "true").lower() == "true"
+        TRACING_EXPORT_PATH = os.getenv("TRACING_EXPORT_PATH", "")
+        TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "llm-memory-assistant")
+
+    settings = _Fallback()  # type: ignore
+
+TRACING_ENABLED: bool = bool(getattr(settings, "TRACING_ENABLED", True))
+TRACING_SERVER_TIMING: bool = bool(getattr(settings, "TRACING_SERVER_TIMING", True))
+TRACING_EXPORT_PATH: str = str(getattr(settings, "TRACING_EXPORT_PATH", "") or "")
+TRACING_SERVICE_NAME: str = str(getattr(settings, "TRACING_SERVICE_NAME", "llm-memory-assistant"))
+
+# Bir istekte tutulacak en fazla span (kaçak döngülere karşı)
+_MAX_SPANS = 512
+# Request id başlığından kabul edilen en fazla uzunluk
+_MAX_REQUEST_ID = 128
+
+
+class _Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "_t0", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    def finish(self) -> None:
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._t0)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else self.start_ns + (time.perf_counter_ns() - self._t0)
+        return (end - self.start_ns) / 1e6
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+
+class _Trace:
+    """Tek isteğin span'ları (kök span: HTTP isteği)."""
+
+    def __init__(self, request_id: str, name: str) -> None:
+        self.request_id = request_id
+        self.trace_id = secrets.token_hex(16)
+        self._lock = threading.Lock()
+        self.spans: List[_Span] = []
+        self.dropped = 0
+        self.root = _Span(name, None, {"request.id": request_id})
+
+    def add(self, span: _Span) -> bool:
+        with self._lock:
+            if len(self.spans) >= _MAX_SPANS:
+                self.dropped += 1
+                return False
+            self.spans.append(span)
+            return True
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Aynı adlı span'ların toplam süresi (ms), ilk görülme sırasıyla."""
+        out: Dict[str, float] = {}
+        with self._lock:
+            spans = list(self.spans)
+        for s in spans:
+            if s.end_ns is None:
+                continue
+            out[s.name] = out.get(s.name, 0.0) + s.duration_ms
+        return out
+
+
+_TRACE: ContextVar[Optional[_Trace]] = ContextVar("memory_trace", default=None)
+_CURRENT: ContextVar[Optional[_Span]] = ContextVar("memory_span", default=None)
+
+
+# ---------------------------
+# İz yaşam döngüsü
+# ---------------------------
+def new_request_id() -> str:
+    return secrets.token_hex(8)
+
+
+def _clean_request_id(value: Optional[str]) -> str:
+    rid = "".join(ch for ch in str(value or "") if ch.isalnum() or ch in "-_.:")[:_MAX_REQUEST_ID]
+    return rid or new_request_id()
+
+
+def start_trace(request_id: Optional[str] = None, name: str = "request") -> Token:
+    """Yeni iz açar ve contextvar'a bağlar; dönen token end_trace'e verilir."""
+    trace = _Trace(_clean_request_id(request_id), name)
+    return _TRACE.set(trace)
+
+
+def end_trace(token: Token, name: Optional[str] = None, **attributes: Any) -> Optional[_Trace]:
+    """Kök span'ı kapatır (isteğe bağlı yeni adla), dışa aktarır ve contextvar'ı eski haline döndürür."""
+    trace = _TRACE.get()
+    _TRACE.reset(token)
+    if trace is None:
+        return None
+    if name:
+        trace.root.name = name
+    trace.root.attributes.update(attributes)
+    trace.root.finish()
+    if _EXPORTER is not None:
+        _EXPORTER.submit(trace)
+    return trace
+
+
+def current_trace() -> Optional[_Trace]:
+    return _TRACE.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _TRACE.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[_Span]]:
+    """
+    with span("distill", sources=12) as sp: ...
+    Aktif iz yoksa None verir ve hiçbir şey kaydetmez.
+    """
+    trace = _TRACE.get()
+    if trace is None:
+        yield None
+        return
+    parent = _CURRENT.get()
+    sp = _Span(name, parent.span_id if parent is not None else trace.root.span_id, dict(attributes))
+    if not trace.add(sp):
+        yield None
+        return
+    token = _CURRENT.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.error = type(e).__name__
+        raise
+    finally:
+        sp.finish()
+        _CURRENT.reset(token)
+
+
+def annotate(key: str, value: Any) -> None:
+    """Geçerli span'a (yoksa kök span'a) öznitelik ekler."""
+    trace = _TRACE.get()
+    if trace is None:
+        return
+    sp = _CURRENT.get() or trace.root
+    sp.set(key, value)
+
+
+# ---------------------------
+# Çıktılar
+# ---------------------------
+def _token(name: str) -> str:
+    # Server-Timing metrik adı bir HTTP token'ı olmalı
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name) or "span"
+
+
+def server_timing(trace: Optional[_Trace] = None) -> str:
+    """'embed;dur=1.2, local_search;dur=3.4, total;dur=25.0' biçiminde başlık değeri."""
+    trace = trace or _TRACE.get()
+    if trace is None:
+        return ""
+    parts = [f"{_token(name)};dur={ms:.1f}" for name, ms in trace.timings_ms().items()]
+    parts.append(f"total;dur={trace.root.duration_ms:.1f}")
+    return ", ".join(parts)
+
+
+def debug_payload(trace: Optional[_Trace] = None) -> Optional[Dict[str, Any]]:
+    """ChatResponse.debug için istek kimliği, aşama toplamları ve span ağacı."""
+    trace = trace or _TRACE.get()
+    if trace is None:
+        return None
+    with trace._lock:
+        spans = list(trace.spans)
+    return {
+        "request_id": trace.request_id,
+        "trace_id": trace.trace_id,
+        "elapsed_ms": round(trace.root.duration_ms, 3),
+        "timings_ms": {k: round(v, 3) for k, v in trace.timings_ms().items()},
+        "spans": [
+            {
+                "name": s.name,
+                "span_id": s.span_id,
+                "parent_id": s.parent_id,
+                "offset_ms": round((s.start_ns - trace.root.start_ns) / 1e6, 3),
+                "duration_ms": round(s.duration_ms, 3),
+                "attributes": dict(s.attributes),
+                **({"error": s.error} if s.error else {}),
+            }
+            for s in spans
+        ],
+        "dropped_spans": trace.dropped,
+    }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(trace: _Trace, s: _Span) -> Dict[str, Any]:
+    """OTLP/JSON Span nesnesi (resource bilgisi satır başına eklenir)."""
+    out: Dict[str, Any] = {
+        "traceId": trace.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 2 if s is trace.root else 1,  # SERVER / INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        out["parentSpanId"] = s.parent_id
+    return out
+
+
+class _JsonlExporter:
+    """
+    Bitmiş izleri arka plan thread'inde JSONL dosyasına ekler. Her satır bir OTLP
+    "resourceSpans" kaydıdır (otel-collector'ın file receiver'ı ile okunabilir).
+    Kuyruk doluysa iz düşürülür; istek yolu hiçbir zaman disk beklemez.
+    """
+
+    def __init__(self, path: str, max_queue: int = 1024) -> None:
+        self.path = Path(path)
+        self._queue: "queue.Queue[_Trace]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self.exported = 0
+        self.dropped = 0
+
+    def submit(self, trace: _Trace) -> None:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._worker.start()
+
+    def _line(self, trace: _Trace) -> str:
+        with trace._lock:
+            spans = [trace.root] + list(trace.spans)
+        record = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [{"key": "service.name", "value": {"stringValue": TRACING_SERVICE_NAME}}]
+                    },
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.observability.tracing"},
+                            "spans": [_otlp_span(trace, s) for s in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with self.path.open("a", encoding="utf-8") as fh:
+                    for trace in batch:
+                        fh.write(self._line(trace) + "\n")
+                self.exported += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Testler / kapanış için: yazılmamış iz kalmayana kadar bekler (en fazla timeout)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_EXPORTER: Optional[_JsonlExporter] = (
+    _JsonlExporter(TRACING_EXPORT_PATH) if TRACING_ENABLED and TRACING_EXPORT_PATH else None
+)
+
+
+def exporter_stats() -> Dict[str, Any]:
+    if _EXPORTER is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "path": str(_EXPORTER.path),
+        "exported": _EXPORTER.exported,
+        "dropped": _EXPORTER.dropped,
+        "pending": _EXPORTER._queue.qsize(),
+    }
+
+
+def flush(timeout: float = 2.0) -> None:
+    if _EXPORTER is not None:
+        _EXPORTER.flush(timeout)
@@ -0,0 +1,45 @@
+# app/scripts/consolidate.py
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+try:
+    from app.db.repository import ensure_schema  # type: ignore
+    from app.services import consolidator  # type: ignore
+except Exception as e:
+    print(f"[consolidate] Import error: {e}", file=sys.stderr)
+    raise
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cluster and merge redundant long-term memories per user.")
+    parser.add_argument("--db", dest="db_path", default=None, help="Path to SQLite DB (default from settings.DB_PATH)")
+    parser.add_argument("--user", dest="user_ids", action="append", default=None, help="user_id to process (repeatable; default: all users)")
+    parser.add_argument("--scope", choices=["global", "local", "all"], default="all", help="Which memory table to consolidate")
+    parser.add_argument("--threshold", type=float, default=None, help="Cosine similarity threshold for clustering")
+    parser.add_argument("--llm", dest="use_llm", action="store_true", default=None, help="Rewrite each merged cluster with the LLM")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be merged")
+    args = parser.parse_args(argv)
+
+    ensure_schema(path=args.db_path)
+
+    scopes = ("global", "local") if args.scope == "all" else (args.scope,)
+    report = consolidator.run(
+        args.user_ids,
+        scopes=scopes,
+        threshold=args.threshold,
+        use_llm=args.use_llm,
+        dry_run=args.dry_run,
+        workers=args.workers,
+        db_path=args.db_path,
+    )
+    print(json.dumps({k: v for k, v in report.items() if k != "per_user"}, ensure_ascii=False, indent=2))
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,299 @@
+# app/scripts/migrate_shards.py
+from __future__ import annotations
+
+"""
+Tek dosyalı DB'yi (DB_PATH) kullanıcı bazlı shard dosyalarına çevrimiçi böler.
+
+Akış (uygulama kaynak DB üzerinde çalışmaya devam ederken):
+  1) python -m app.scripts.migrate_shards --shards 4
+     Satırlar rowid sırasıyla batch'ler halinde kullanıcının shard'ına kopyalanır.
+     İlerleme kaynak DB'deki shard_migration tablosunda tutulur; komut tekrar
+     çalıştırılabilir ve yalnızca yeni satırları kopyalar.
+  2) SHARD_COUNT=4 ile uygulama yeniden başlatılır (yazımlar artık shard'lara gider).
+  3) python -m app.scripts.migrate_shards --shards 4 --final
+     Kalan yeni satırlar kopyalanır; kopyadan sonra kaynakta güncellenen kayıtlar
+     (updated_at) yeniden eşitlenir, kaynakta silinmiş legacy kayıtlar shard'dan düşülür.
+  4) python -m app.scripts.migrate_shards --shards 4 --verify
+
+Türetilmiş tablolar kopyalanmaz: memory_signatures kopyalanan her kayıt için
+yeniden üretilir, vector_segments ilk aramalarda kuyruktan yeniden mühürlenir.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from app.db.repository import (  # type: ignore
+        ID_SHARD_STRIDE,
+        SHARD_FILE_FMT,
+        ShardRing,
+        ensure_schema,
+        get_conn,
+        seed_sequences,
+        settings,
+        shard_dir,
+    )
+    from app.services import memory_dedupe  # type: ignore
+except Exception as e:
+    print(f"[migrate_shards] Import error: {e}", file=sys.stderr)
+    raise
+
+# Kopyalama sırası: önce sahipler, sonra bağlı kayıtlar
+_TABLES: Tuple[str, ...] = (
+    "users",
+    "sessions",
+    "global_memories",
+    "local_memories",
+    "stm_turns",
+    "archived_memories",
+)
+_MEMORY_SCOPES = {"global_memories": "global", "local_memories": "local"}
+
+_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS shard_migration (
+  tbl TEXT PRIMARY KEY,
+  last_rowid INTEGER NOT NULL,
+  started_at INTEGER NOT NULL
+)
+"""
+
+
+class _Targets:
+    """Shard indeksi → hedef dosya; kullanıcı → shard yönlendirmesi."""
+
+    def __init__(self, count: int, directory: Path, vnodes: int) -> None:
+        self.ring = ShardRing(count, vnodes)
+        self.paths = [str(directory / SHARD_FILE_FMT.format(i)) for i in range(count)]
+
+    def for_user(self, user_id: str) -> int:
+        return self.ring.shard_for(user_id)
+
+
+def _columns(con: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in con.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _state(con: sqlite3.Connection) -> Dict[str, Tuple[int, int]]:
+    con.execute(_STATE_SQL)
+    return {r[0]: (int(r[1]), int(r[2])) for r in con.execute("SELECT tbl, last_rowid, started_at FROM shard_migration")}
+
+
+def _session_owner(src: sqlite3.Connection, cache: Dict[str, Optional[str]], session_id: str) -> Optional[str]:
+    if session_id not in cache:
+        row = src.execute("SELECT user_id FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            # Oturum satırı olmadan yazılmış kayıtlar: sahibi local hafızadan bulunur
+            row = src.execute("SELECT user_id FROM local_memories WHERE session_id = ? LIMIT 1", (session_id,)).fetchone()
+        cache[session_id] = row[0] if row else None
+    return cache[session_id]
+
+
+def _index(con: sqlite3.Connection, table: str, row: Dict[str, Any]) -> None:
+    scope = _MEMORY_SCOPES.get(table)
+    if scope is None:
+        return
+    memory_dedupe.index(
+        con, scope, int(row["id"]), row["user_id"], row.get("session_id"),
+        np.frombuffer(row["embedding"], dtype=np.float32),
+    )
+
+
+def _write(targets: _Targets, table: str, cols: List[str], grouped: Dict[int, List[Dict[str, Any]]], *, upsert: bool) -> int:
+    written = 0
+    placeholders = ", ".join("?" * len(cols))
+    if upsert:
+        # Shard'daki kayıt daha yeniyse (geçişten sonra güncellendi) dokunulmaz
+        sets = ", ".join(f"{c} = excluded.{c}" for c in cols if c != "id")
+        sql = (
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(id) DO UPDATE SET {sets} "
+            f"WHERE COALESCE(excluded.updated_at, 0) > COALESCE({table}.updated_at, 0)"
+        )
+    else:
+        sql = f"INSERT OR IGNORE INTO {table} ({', '.join(cols)}) VALUES ({placeholders})"
+    for shard, rows in grouped.items():
+        with get_conn(targets.paths[shard]) as con:
+            # Mağazalar FK uygulamadan yazar; oturum satırı olmayan kayıtlar da taşınmalı
+            con.execute("PRAGMA foreign_keys=OFF;")
+            for row in rows:
+                try:
+                    cur = con.execute(sql, [row[c] for c in cols])
+                except sqlite3.IntegrityError:
+                    # Aynı metin geçişten sonra shard'a yeniden eklenmiş olabilir (uq_global_user_text)
+                    continue
+                if cur.rowcount:
+                    written += 1
+                    _index(con, table, row)
+    return written
+
+
+def _route(
+    src: sqlite3.Connection,
+    targets: _Targets,
+    table: str,
+    rows: Sequence[sqlite3.Row],
+    owners: Dict[str, Optional[str]],
+) -> Tuple[Dict[int, List[Dict[str, Any]]], int]:
+    grouped: Dict[int, List[Dict[str, Any]]] = defaultdict(list)
+    orphans = 0
+    for r in rows:
+        d = dict(r)
+        d.pop("_rid", None)
+        user_id = d.get("user_id") if table != "stm_turns" else _session_owner(src, owners, d["session_id"])
+        if not user_id:
+            orphans += 1
+            continue
+        grouped[targets.for_user(user_id)].append(d)
+    return grouped, orphans
+
+
+def copy(source: str, targets: _Targets, *, batch_size: int) -> Dict[str, Any]:
+    """Her tablonun high-water mark'ından sonraki satırlarını kopyalar (tekrar çalıştırılabilir)."""
+    report: Dict[str, Any] = {}
+    owners: Dict[str, Optional[str]] = {}
+    now = int(time.time())
+    for table in _TABLES:
+        with get_conn(source) as src:
+            last = _state(src).get(table, (0, now))[0]
+            cols = _columns(src, table)
+        copied = orphans = 0
+        while True:
+            with get_conn(source) as src:
+                rows = src.execute(
+                    f"SELECT rowid AS _rid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                grouped, n_orphans = _route(src, targets, table, rows, owners)
+            copied += _write(targets, table, cols, grouped, upsert=False)
+            orphans += n_orphans
+            last = int(rows[-1]["_rid"])
+            # İlerleme, hedefler commit edildikten sonra kaydedilir (çökme → batch tekrar, IGNORE ile zararsız)
+            with get_conn(source) as src:
+                src.execute(
+                    """
+                    INSERT INTO shard_migration (tbl, last_rowid, started_at) VALUES (?, ?, ?)
+                    ON CONFLICT(tbl) DO UPDATE SET last_rowid = excluded.last_rowid
+                    """,
+                    (table, last, now),
+                )
+            if len(rows) < batch_size:
+                break
+        report[table] = {"copied": copied, "orphans": orphans, "last_rowid": last}
+    return report
+
+
+def finalize(source: str, targets: _Targets, *, batch_size: int) -> Dict[str, Any]:
+    """
+    Geçiş sonrası son eşitleme: yeni satırlar + kopyadan sonra güncellenen kayıtlar +
+    kaynakta silinmiş legacy kayıtların shard'lardan düşülmesi.
+    """
+    report: Dict[str, Any] = {"copy": copy(source, targets, batch_size=batch_size)}
+    with get_conn(source) as src:
+        state = _state(src)
+
+    for table, scope in _MEMORY_SCOPES.items():
+        started = state.get(table, (0, int(time.time())))[1]
+        with get_conn(source) as src:
+            cols = _columns(src, table)
+            rows = src.execute(f"SELECT * FROM {table} WHERE updated_at >= ?", (started,)).fetchall()
+            grouped, _ = _route(src, targets, table, rows, {})
+            alive = {int(r[0]) for r in src.execute(f"SELECT id FROM {table}").fetchall()}
+        resynced = _write(targets, table, cols, grouped, upsert=True)
+
+        dropped = 0
+        for path in targets.paths:
+            with get_conn(path) as con:
+                legacy = [int(r[0]) for r in con.execute(f"SELECT id FROM {table} WHERE id < ?", (ID_SHARD_STRIDE,))]
+                gone = [i for i in legacy if i not in alive]
+                if gone:
+                    con.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in gone])
+                    memory_dedupe.remove(con, scope, gone)
+                    dropped += len(gone)
+        report[table] = {"resynced": resynced, "dropped": dropped}
+    return report
+
+
+def verify(source: str, targets: _Targets) -> Dict[str, Any]:
+    """
+    Kullanıcı başına legacy kayıt sayılarını kaynak ile shard'lar arasında karşılaştırır.
+    Geçişten sonra shard'da silinen legacy kayıtlar fark olarak görünür (kaynak artık donmuştur).
+    """
+    report: Dict[str, Any] = {}
+    for table in _MEMORY_SCOPES:
+        with get_conn(source) as src:
+            expected = {r[0]: int(r[1]) for r in src.execute(f"SELECT user_id, COUNT(1) FROM {table} GROUP BY user_id")}
+        actual: Dict[str, int] = defaultdict(int)
+        misplaced = 0
+        for i, path in enumerate(targets.paths):
+            with get_conn(path) as con:
+                for user_id, n in con.execute(
+                    f"SELECT user_id, COUNT(1) FROM {table} WHERE id < ? GROUP BY user_id", (ID_SHARD_STRIDE,)
+                ):
+                    actual[user_id] += int(n)
+                    if targets.for_user(user_id) != i:
+                        misplaced += int(n)
+        mismatched = sorted(u for u in set(expected) | set(actual) if expected.get(u, 0) != actual.get(u, 0))
+        report[table] = {
+            "source_rows": sum(expected.values()),
+            "shard_rows": sum(actual.values()),
+            "mismatched_users": mismatched[:50],
+            "misplaced_rows": misplaced,
+        }
+    report["ok"] = all(not v["mismatched_users"] and not v["misplaced_rows"] for v in report.values())
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Split a single-file memory DB into per-user shard files (online, resumable).")
+    parser.add_argument("--source", default=None, help="Source SQLite DB (default from settings.DB_PATH)")
+    parser.add_argument("--shards", type=int, default=None, help="Number of shard files (default from settings.SHARD_COUNT)")
+    parser.add_argument("--shard-dir", default=None, help="Directory for shard files (default from settings.SHARD_DIR)")
+    parser.add_argument("--batch", type=int, default=1000, help="Rows copied per transaction")
+    parser.add_argument("--final", action="store_true", help="Final sync after the app has been switched to shards")
+    parser.add_argument("--verify", action="store_true", help="Only compare per-user counts between source and shards")
+    args = parser.parse_args(argv)
+
+    source = args.source or getattr(settings, "DB_PATH", "./data/memory.db")
+    count = int(args.shards or getattr(settings, "SHARD_COUNT", 1))
+    if count < 2:
+        print("[migrate_shards] --shards must be >= 2", file=sys.stderr)
+        return 2
+    if not Path(source).exists():
+        print(f"[migrate_shards] source not found: {source}", file=sys.stderr)
+        return 2
+    directory = Path(args.shard_dir) if args.shard_dir else shard_dir()
+    targets = _Targets(count, directory, int(getattr(settings, "SHARD_VNODES", 64)))
+
+    if args.verify:
+        report = verify(source, targets)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0 if report["ok"] else 1
+
+    ensure_schema(path=source)
+    for i, path in enumerate(targets.paths):
+        ensure_schema(path=path)
+        with get_conn(path) as con:
+            seed_sequences(con, i)
+
+    t0 = time.perf_counter()
+    if args.final:
+        report = finalize(source, targets, batch_size=args.batch)
+    else:
+        report = copy(source, targets, batch_size=args.batch)
+    report["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
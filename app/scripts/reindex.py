@@ -0,0 +1,112 @@
+# app/scripts/reindex.py
+from __future__ import annotations
+
+import argparse
+import sys
+from typing import Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+try:
+    from app.db.repository import all_paths, ensure_schema, get_conn  # type: ignore
+    from app.services import memory_dedupe, memory_versions, vector_segments  # type: ignore
+    from app.services import embed_client  # type: ignore
+except Exception as e:
+    print(f"[reindex] Import error: {e}", file=sys.stderr)
+    raise
+
+_TABLES = {"global": "global_memories", "local": "local_memories"}
+
+
+def reembed(
+    con, scope: str, *, user_id: Optional[str] = None, db_path: Optional[str] = None, batch: int = 64
+) -> Tuple[int, int]:
+    """
+    Vektör uzayı (emb_version, model) PROVIDER_SPACE'ten farklı kayıtları yeniden gömer
+    (ör. sağlayıcı erişilemezken yerel yedek motorla yazılanlar). Sağlayıcı yine yedeğe
+    düşerse kayıt olduğu gibi bırakılır. İmzalar yenilenir, sürümler artırılır ve
+    etkilenen sahiplerin segmentleri geçersizlenir. Dönüş: (güncellenen, kalan).
+    """
+    table = _TABLES[scope]
+    target = tuple(embed_client.PROVIDER_SPACE)
+    session_col = "session_id" if scope == "local" else "NULL"
+    sql = (
+        f"SELECT id, user_id, {session_col} AS session_id, text FROM {table} "
+        f"WHERE NOT (emb_version = ? AND model = ?)"
+    )
+    params: List[Any] = [*target]
+    if user_id:
+        sql += " AND user_id = ?"
+        params.append(user_id)
+    rows = con.execute(sql + " ORDER BY id", params).fetchall()
+
+    updated = skipped = 0
+    owners: Set[Tuple[str, Optional[str]]] = set()
+    for i in range(0, len(rows), batch):
+        chunk = rows[i:i + batch]
+        # Sağlayıcı çağrısı yazma kilidi dışında yapılır
+        vecs, spaces = embed_client.encode_versioned([r["text"] for r in chunk])
+        touched: Set[Tuple[str, Optional[str]]] = set()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            for r, vec, space in zip(chunk, vecs, spaces):
+                if tuple(space) != target:
+                    skipped += 1
+                    continue
+                emb = np.asarray(vec, dtype=np.float32)
+                cur = con.execute(
+                    f"UPDATE {table} SET embedding = ?, emb_version = ?, model = ?, dim = ? "
+                    f"WHERE id = ? AND text = ?",
+                    (emb.tobytes(), space[0], space[1], int(emb.shape[0]), int(r["id"]), r["text"]),
+                )
+                if cur.rowcount == 0:  # bu arada silinmiş / değişmiş
+                    continue
+                memory_dedupe.index(con, scope, int(r["id"]), r["user_id"], r["session_id"], emb)
+                touched.add((r["user_id"], r["session_id"]))
+                updated += 1
+            for uid, sid in touched:
+                memory_versions.bump(con, scope, uid, sid)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            raise
+        owners |= touched
+
+    # Segmentler yalnızca PROVIDER_SPACE satırlarını içerir → yeni gömülenler için yeniden kurulur
+    for uid, sid in owners:
+        vector_segments.invalidate(scope, uid, sid if scope == "local" else None, db_path=db_path)
+    return updated, skipped
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild LSH signatures used for LTM near-duplicate detection.")
+    parser.add_argument("--db", dest="db_path", default=None, help="Path to SQLite DB (default: every shard file)")
+    parser.add_argument("--scope", choices=["global", "local", "all"], default="all", help="Which memory table to index")
+    parser.add_argument("--user", dest="user_id", default=None, help="Only reindex this user_id")
+    parser.add_argument(
+        "--reembed",
+        action="store_true",
+        help="Re-embed memories whose embedding space differs from the configured provider "
+        "(e.g. rows written by the local fallback) before rebuilding signatures",
+    )
+    args = parser.parse_args(argv)
+
+    # memory_signatures tablosunun var olduğundan emin ol
+    ensure_schema(path=args.db_path)
+
+    scopes = ["global", "local"] if args.scope == "all" else [args.scope]
+    for path in ([args.db_path] if args.db_path else all_paths()):
+        with get_conn(path) as con:
+            for scope in scopes:
+                if args.reembed:
+                    done, left = reembed(con, scope, user_id=args.user_id, db_path=path)
+                    print(f"[reindex] {path} {scope}: {done} memories re-embedded, {left} still on fallback")
+                n = memory_dedupe.backfill(con, scope, user_id=args.user_id)
+                print(f"[reindex] {path} {scope}: {n} memories indexed")
+
+    print("[reindex] OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+# app/scripts/retention.py
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from typing import Optional
+
+try:
+    from app.db.repository import ensure_schema  # type: ignore
+    from app.services import retention  # type: ignore
+except Exception as e:
+    print(f"[retention] Import error: {e}", file=sys.stderr)
+    raise
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Apply memory retention policies or restore archived memories.")
+    parser.add_argument("--db", dest="db_path", default=None, help="Path to SQLite DB (default from settings.DB_PATH)")
+    parser.add_argument("--dry-run", action="store_true", help="Only count rows that would be archived/deleted")
+    parser.add_argument("--restore-user", dest="user_id", default=None, help="Restore archived memories of this user_id")
+    parser.add_argument("--restore-session", dest="session_id", default=None, help="Restore one archived session (requires --restore-user)")
+    args = parser.parse_args(argv)
+
+    ensure_schema(path=args.db_path)
+
+    if args.user_id:
+        if args.session_id:
+            n = retention.restore_session(args.user_id, args.session_id, db_path=args.db_path)
+        else:
+            n = retention.restore_user(args.user_id, "global", db_path=args.db_path)
+        print(f"[retention] restored {n} memories")
+        return 0
+
+    report = retention.sweep(dry_run=args.dry_run, db_path=args.db_path)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
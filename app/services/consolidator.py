@@ -0,0 +1,475 @@
+# app/services/consolidator.py
+from __future__ import annotations
+
+"""
+Çevrim dışı (offline) LTM birleştirme işi.
+
+Her kullanıcının global (ve session bazında local) hafızaları için:
+1) Embedding'ler normalize edilip blok blok M @ M.T ile benzerlik hesaplanır;
+   eşik (CONSOLIDATION_THRESHOLD) üstü çiftler union-find ile aday kümelere bağlanır
+   (tek bağlantılı / single-linkage agglomerative kümeleme). Yalnızca aynı vektör
+   uzayındaki (emb_version, model) kayıtlar karşılaştırılır.
+2) Her aday küme medoid etrafında bölünür (bkz. _tight_groups): küme içi benzerlik
+   toplamı en yüksek kayıt (medoid) korunur, yalnızca medoide eşik üstü benzer
+   kayıtlar silinir. A~B~C zincirinde A ile C birbirine benzemese de aynı aday
+   kümeye düşer; medoide uzak kalanlar silinmez, kendi aralarında yeniden kümelenir.
+3) Opsiyonel olarak LLM küme metinlerini tek cümlede yeniden yazar; LLM yoksa
+   veya fallback dönerse medoid metni aynen kalır.
+4) Köken bilgisi meta'da tutulur: merged_from, merged_texts, consolidated_at.
+
+Kullanıcılar ProcessPoolExecutor ile paralel işlenir (bkz. run()). Alt süreçler "spawn"
+ile başlatılır: fork, uvicorn worker'ının thread havuzlarını (resilience._EXECUTOR,
+embed batcher) thread'leri olmadan kopyalar ve LLM / encode çağrıları deadline'a kadar asılır.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.db.repository import all_paths, get_conn, path_for_user
+from app.services import provider_scheduler
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        CONSOLIDATION_THRESHOLD = float(os.getenv("CONSOLIDATION_THRESHOLD", "0.88"))
+        CONSOLIDATION_USE_LLM = os.getenv("CONSOLIDATION_USE_LLM", "false").lower() == "true"
+        CONSOLIDATION_WORKERS = int(os.getenv("CONSOLIDATION_WORKERS", "4"))
+
+    settings = _Fallback()  # type: ignore
+
+# Segmentli vektör deposu (opsiyonel)
+try:
+    from app.services import vector_segments  # type: ignore
+except Exception:
+    vector_segments = None  # type: ignore
+
+# Yakın-kopya imzaları (opsiyonel)
+try:
+    from app.services import memory_dedupe  # type: ignore
+except Exception:
+    memory_dedupe = None  # type: ignore
+
+# LTM sürüm sayaçları (retrieval önbelleği geçersizleştirme; opsiyonel)
+try:
+    from app.services import memory_versions  # type: ignore
+except Exception:
+    memory_versions = None  # type: ignore
+
+log = logging.getLogger("consolidator")
+
+CONSOLIDATION_THRESHOLD: float = float(getattr(settings, "CONSOLIDATION_THRESHOLD", 0.88))
+CONSOLIDATION_USE_LLM: bool = bool(getattr(settings, "CONSOLIDATION_USE_LLM", False))
+CONSOLIDATION_WORKERS: int = max(1, int(getattr(settings, "CONSOLIDATION_WORKERS", 4)))
+
+# Meta'da saklanacak birleştirilmiş metin sayısı (meta şişmesin)
+_MAX_PROVENANCE_TEXTS = 20
+_BLOCK = 1024
+
+_TABLES = {"global": "global_memories", "local": "local_memories"}
+
+_REWRITE_PROMPT = """You are merging redundant long-term memory entries about the same user.
+The statements below all describe the same fact. Write ONE concise statement that
+keeps every concrete detail and resolves wording differences. Keep the language of
+the statements. Output only the statement, nothing else.
+
+[STATEMENTS]
+{items}
+"""
+
+
+# ---------------------------
+# Kümeleme
+# ---------------------------
+def _find(parent: np.ndarray, i: int) -> int:
+    root = i
+    while parent[root] != root:
+        root = parent[root]
+    while parent[i] != root:
+        parent[i], i = root, parent[i]
+    return root
+
+
+def cluster(embeddings: np.ndarray, threshold: float) -> List[List[int]]:
+    """
+    Kosinüs benzerliği >= threshold olan çiftleri birleştiren single-linkage kümeleme
+    (aday kümeler; silinecek kayıtlar _tight_groups ile medoide göre seçilir).
+    Benzerlik matrisi _BLOCK satırlık bloklar halinde hesaplanır (bellek O(_BLOCK * N)).
+    Dönüş: 2+ elemanlı kümelerin indeks listeleri.
+    """
+    n = embeddings.shape[0]
+    if n < 2:
+        return []
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms > 0, norms, 1.0)
+    parent = np.arange(n)
+
+    for start in range(0, n, _BLOCK):
+        block = unit[start:start + _BLOCK] @ unit.T
+        rows, cols = np.nonzero(block >= threshold)
+        rows = rows + start
+        mask = cols > rows
+        for i, j in zip(rows[mask].tolist(), cols[mask].tolist()):
+            ri, rj = _find(parent, i), _find(parent, j)
+            if ri != rj:
+                parent[rj] = ri
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(_find(parent, i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def _medoid(unit: np.ndarray, members: Sequence[int]) -> int:
+    sub = unit[list(members)]
+    return int(members[int(np.argmax((sub @ sub.T).sum(axis=1)))])
+
+
+def _tight_groups(unit: np.ndarray, members: Sequence[int], threshold: float) -> List[Tuple[int, List[int]]]:
+    """
+    Single-linkage aday kümesini, her üyesi korunan medoide >= threshold benzer gruplara böler.
+    Medoide uzak kalan üyeler kendi aralarında yeniden kümelenir (zincirleme silme olmaz).
+    Dönüş: [(medoid, üyeler)] — üyeler medoidi de içerir, her grup 2+ elemanlı.
+    """
+    out: List[Tuple[int, List[int]]] = []
+    stack: List[List[int]] = [list(members)]
+    while stack:
+        group = stack.pop()
+        if len(group) < 2:
+            continue
+        m = _medoid(unit, group)
+        sims = unit[group] @ unit[m]
+        close = [i for i, sim in zip(group, sims.tolist()) if i == m or sim >= threshold]
+        kept = set(close)
+        rest = [i for i in group if i not in kept]
+        if len(close) > 1:
+            out.append((m, close))
+        if len(rest) > 1:
+            stack.extend([rest[j] for j in sub] for sub in cluster(unit[rest], threshold))
+    return out
+
+
+# ---------------------------
+# LLM ile yeniden yazım
+# ---------------------------
+def _rewrite(texts: Sequence[str]) -> Optional[str]:
+    try:
+        from app.services import llm_client  # gecikmeli import: LLM yalnızca gerekiyorsa yüklenir
+    except Exception:
+        return None
+    items = "\n".join(f"- {t}" for t in texts)
+    try:
+        res = llm_client.generate(
+            _REWRITE_PROMPT.format(items=items),
+            temperature=0.0,
+            max_output_tokens=128,
+            call_site="consolidation",
+        )
+    except Exception as e:
+        log.info("Birleştirme yeniden yazımı başarısız: %s", e)
+        return None
+    if res.get("fallback"):
+        return None
+    text = " ".join(str(res.get("text") or "").split()).strip().strip('"')
+    return text or None
+
+
+# ---------------------------
+# Kapsam bazında birleştirme
+# ---------------------------
+def _merge_meta(rows: Sequence[sqlite3.Row], keep_id: int, ts: int) -> Dict[str, Any]:
+    metas: Dict[int, Dict[str, Any]] = {}
+    for r in rows:
+        try:
+            metas[int(r["id"])] = json.loads(r["meta"]) if r["meta"] else {}
+        except Exception:
+            metas[int(r["id"])] = {}
+
+    merged = dict(metas[keep_id])
+    for mid, m in metas.items():
+        if mid == keep_id:
+            continue
+        for k, v in m.items():
+            merged.setdefault(k, v)
+
+    confs = [float(m["confidence"]) for m in metas.values() if isinstance(m.get("confidence"), (int, float))]
+    if confs:
+        merged["confidence"] = max(confs)
+    merged["dup_count"] = sum(int(m.get("dup_count", 0)) for m in metas.values()) + len(rows) - 1
+
+    merged_from = [int(x) for x in merged.get("merged_from", [])]
+    merged_from.extend(int(r["id"]) for r in rows if int(r["id"]) != keep_id)
+    merged["merged_from"] = merged_from
+    texts = list(merged.get("merged_texts", []))
+    texts.extend(r["text"] for r in rows if int(r["id"]) != keep_id)
+    merged["merged_texts"] = texts[-_MAX_PROVENANCE_TEXTS:]
+    merged["consolidated_at"] = ts
+    return merged
+
+
+def _plan_group(
+    scope: str,
+    rows: List[sqlite3.Row],
+    *,
+    threshold: float,
+    use_llm: bool,
+    dry_run: bool,
+) -> List[Dict[str, Any]]:
+    """
+    Tek bir (kullanıcı [+ session]) grubunun küme planları; veritabanı kilidi tutulmaz.
+    LLM yeniden yazımı ve yeniden gömme burada, yazma işleminden ÖNCE yapılır.
+    """
+    if len(rows) < 2:
+        return []
+    emb = np.stack([np.frombuffer(r["embedding"], dtype=np.float32) for r in rows])
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    unit = emb / np.where(norms > 0, norms, 1.0)
+
+    groups = [g for members in cluster(emb, threshold) for g in _tight_groups(unit, members, threshold)]
+    ts = int(time.time())
+    plans: List[Dict[str, Any]] = []
+    for medoid, members in groups:
+        keep = rows[medoid]
+        keep_id = int(keep["id"])
+        group_rows = [rows[i] for i in members]
+        plan: Dict[str, Any] = {
+            "keep": keep,
+            "members": {int(r["id"]): r["text"] for r in group_rows},
+            "drop_ids": [int(r["id"]) for r in group_rows if int(r["id"]) != keep_id],
+            "meta": _merge_meta(group_rows, keep_id, ts),
+            "ts": ts,
+            "rewrite": None,
+        }
+        new_text = _rewrite([r["text"] for r in group_rows]) if use_llm and not dry_run else None
+        if new_text and new_text != keep["text"]:
+            try:
+                from app.services.embed_client import encode_versioned  # gecikmeli import
+                vecs, spaces = encode_versioned([new_text])
+                plan["rewrite"] = (new_text, np.asarray(vecs[0], dtype=np.float32), spaces[0])
+            except Exception as e:
+                log.info("Yeniden yazılan metin gömülemedi; medoid metni korunuyor (id=%s): %s", keep_id, e)
+        plans.append(plan)
+    return plans
+
+
+def _apply_cluster(con: sqlite3.Connection, scope: str, plan: Dict[str, Any]) -> int:
+    """
+    Bir küme planını kısa bir BEGIN IMMEDIATE işleminde uygular. Dönüş: silinen kayıt.
+    Plan okunduktan sonra üyelerden biri silinmiş / değişmişse küme atlanır (sonraki
+    çalıştırmada yeniden değerlendirilir).
+    """
+    table = _TABLES[scope]
+    keep = plan["keep"]
+    keep_id = int(keep["id"])
+    members: Dict[int, str] = plan["members"]
+    drop_ids: List[int] = plan["drop_ids"]
+    meta, ts = plan["meta"], plan["ts"]
+
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        marks = ",".join("?" * len(members))
+        current = {
+            int(r["id"]): r["text"]
+            for r in con.execute(f"SELECT id, text FROM {table} WHERE id IN ({marks})", list(members))
+        }
+        if current != members:
+            con.rollback()
+            log.info("Küme birleştirme sırasında değişti; atlanıyor (id=%s)", keep_id)
+            return 0
+
+        # Önce kopyaları sil: global'de yeniden yazılan metin uq_global_user_text ile çakışmasın
+        con.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in drop_ids])
+        if memory_dedupe is not None:
+            memory_dedupe.remove(con, scope, drop_ids)
+
+        rewritten = False
+        if plan["rewrite"] is not None:
+            new_text, vec, (emb_version, emb_model) = plan["rewrite"]
+            try:
+                con.execute(
+                    f"UPDATE {table} SET text = ?, embedding = ?, meta = ?, emb_version = ?, model = ?, "
+                    f"updated_at = ? WHERE id = ?",
+                    (
+                        new_text,
+                        vec.tobytes(),
+                        json.dumps({**meta, "rewritten": True}, ensure_ascii=False),
+                        emb_version,
+                        emb_model,
+                        ts,
+                        keep_id,
+                    ),
+                )
+                if memory_dedupe is not None:
+                    memory_dedupe.index(con, scope, keep_id, keep["user_id"], _session_of(keep), vec)
+                rewritten = True
+            except sqlite3.IntegrityError:
+                log.info("Yeniden yazılan metin mevcut bir kayıtla çakıştı; medoid metni korunuyor (id=%s)", keep_id)
+
+        if not rewritten:
+            con.execute(
+                f"UPDATE {table} SET meta = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(meta, ensure_ascii=False), ts, keep_id),
+            )
+        if memory_versions is not None:
+            memory_versions.bump(con, scope, keep["user_id"], _session_of(keep))
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    return len(drop_ids)
+
+
+def _session_of(row: sqlite3.Row) -> Optional[str]:
+    return row["session_id"] if "session_id" in row.keys() else None
+
+
+def consolidate_user(
+    user_id: str,
+    *,
+    scopes: Sequence[str] = ("global", "local"),
+    threshold: Optional[float] = None,
+    use_llm: Optional[bool] = None,
+    dry_run: bool = False,
+    db_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Bir kullanıcının hafızalarını birleştirir.
+    Dönüş: {"user_id", "<scope>": {"before", "after", "clusters", "removed"}, "elapsed_ms"}
+    """
+    thr = CONSOLIDATION_THRESHOLD if threshold is None else float(threshold)
+    llm = CONSOLIDATION_USE_LLM if use_llm is None else bool(use_llm)
+    t0 = time.perf_counter()
+    report: Dict[str, Any] = {"user_id": user_id}
+    db_path = db_path or path_for_user(user_id)
+
+    # Yeniden yazım / yeniden gömme çağrıları interaktif trafiğin arkasında kuyruğa girer.
+    # Yazma kilidi yalnızca küme başına kısa işlemlerde tutulur; LLM / encode sırasında
+    # açık işlem yoktur (okumalar WAL anlık görüntüsünden, kilitsiz).
+    with provider_scheduler.background(), get_conn(db_path) as con:
+        for scope in scopes:
+            table = _TABLES[scope]
+            rows = con.execute(
+                f"SELECT * FROM {table} WHERE user_id = ? ORDER BY id", (user_id,)
+            ).fetchall()
+
+            # local hafıza session bağlamlıdır: kümeler session sınırını aşmaz; farklı
+            # vektör uzaylarındaki (emb_version, model) kayıtlar da birbiriyle kıyaslanmaz
+            groups: Dict[Tuple[Optional[str], str, str], List[sqlite3.Row]] = {}
+            for r in rows:
+                groups.setdefault((_session_of(r), r["emb_version"], r["model"]), []).append(r)
+
+            n_clusters = removed = 0
+            for group_rows in groups.values():
+                plans = _plan_group(scope, group_rows, threshold=thr, use_llm=llm, dry_run=dry_run)
+                n_clusters += len(plans)
+                for plan in plans:
+                    removed += len(plan["drop_ids"]) if dry_run else _apply_cluster(con, scope, plan)
+            report[scope] = {
+                "before": len(rows),
+                "after": len(rows) - removed,
+                "clusters": n_clusters,
+                "removed": removed,
+            }
+
+    # Birleştirmede embedding'ler değişmiş / satırlar silinmiş olabilir → segmentler yeniden kurulur
+    if vector_segments is not None and not dry_run:
+        for scope in scopes:
+            if report[scope]["removed"]:
+                vector_segments.invalidate(scope, user_id, db_path=db_path)
+
+    report["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return report
+
+
+def _list_users(db_path: Optional[str]) -> List[str]:
+    users = set()
+    for path in ([db_path] if db_path else all_paths()):
+        with get_conn(path) as con:
+            rows = con.execute(
+                "SELECT user_id FROM global_memories UNION SELECT user_id FROM local_memories"
+            ).fetchall()
+        users.update(r[0] for r in rows)
+    return sorted(users)
+
+
+def _consolidate_user_job(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    # Süreç havuzu için modül düzeyinde (pickle edilebilir) giriş noktası
+    user_id = kwargs.pop("user_id")
+    return consolidate_user(user_id, **kwargs)
+
+
+def run(
+    user_ids: Optional[Sequence[str]] = None,
+    *,
+    scopes: Sequence[str] = ("global", "local"),
+    threshold: Optional[float] = None,
+    use_llm: Optional[bool] = None,
+    dry_run: bool = False,
+    workers: Optional[int] = None,
+    db_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Verilen (veya tüm) kullanıcıları paralel birleştirir; toplam önce/sonra sayılarını raporlar.
+    workers <= 1 ise aynı süreçte sıralı çalışır.
+    """
+    t0 = time.perf_counter()
+    users = list(user_ids) if user_ids else _list_users(db_path)
+    n_workers = CONSOLIDATION_WORKERS if workers is None else max(1, int(workers))
+    jobs = [
+        {
+            "user_id": u,
+            "scopes": tuple(scopes),
+            "threshold": threshold,
+            "use_llm": use_llm,
+            "dry_run": dry_run,
+            "db_path": db_path,
+        }
+        for u in users
+    ]
+
+    reports: List[Dict[str, Any]] = []
+    errors: Dict[str, str] = {}
+    if n_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                reports.append(_consolidate_user_job(dict(job)))
+            except Exception as e:
+                errors[job["user_id"]] = repr(e)
+    else:
+        with ProcessPoolExecutor(
+            max_workers=min(n_workers, len(jobs)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+            futures = {pool.submit(_consolidate_user_job, dict(job)): job["user_id"] for job in jobs}
+            for f in as_completed(futures):
+                try:
+                    reports.append(f.result())
+                except Exception as e:
+                    errors[futures[f]] = repr(e)
+
+    totals: Dict[str, Dict[str, int]] = {}
+    for rep in reports:
+        for scope in scopes:
+            s = rep.get(scope) or {}
+            t = totals.setdefault(scope, {"before": 0, "after": 0, "clusters": 0, "removed": 0})
+            for k in t:
+                t[k] += int(s.get(k, 0))
+
+    reports.sort(key=lambda r: r["user_id"])
+    return {
+        "users": len(users),
+        "dry_run": dry_run,
+        "totals": totals,
+        "per_user": reports,
+        "errors": errors,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000.0, 1),
+    }
@@ -1,11 +1,22 @@
 # app/services/embed_client.py
 from __future__ import annotations
 
+import hashlib
 import os
-from typing import Iterable, List
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-# LangChain Google Embeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+# LangChain Google Embeddings: import ilk sağlayıcı kullanımına ertelenir (get_embeddings)
+if TYPE_CHECKING:  # pragma: no cover
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+from app.services import local_embedder, provider_scheduler
+from app.services.resilience import CircuitBreaker, call_with_deadline
+from app.services.singleflight import SingleFlight
 
 # Config
 try:
@@ -16,6 +27,11 @@ except Exception:
         EMB_MODEL = os.getenv("EMB_MODEL", "text-embedding-004")
         EMB_DIM = int(os.getenv("EMB_DIM", "768"))
         GOOGLE_EMBED_API_KEY = os.getenv("GOOGLE_EMBED_API_KEY", "")
+        EMB_BACKEND = os.getenv("EMB_BACKEND", "google")
+        EMB_DEADLINE_S = float(os.getenv("EMB_DEADLINE_S", "20"))
+        EMB_BATCH_ENABLED = os.getenv("EMB_BATCH_ENABLED", "true").lower() == "true"
+        EMB_BATCH_MAX_SIZE = int(os.getenv("EMB_BATCH_MAX_SIZE", "64"))
+        EMB_BATCH_MAX_WAIT_MS = float(os.getenv("EMB_BATCH_MAX_WAIT_MS", "5"))
 
     settings = _Fallback()  # type: ignore
 
@@ -24,65 +40,345 @@ EMB_VERSION: str = getattr(settings, "EMB_VERSION", "text-embedding-004")
 EMB_MODEL: str = getattr(settings, "EMB_MODEL", "text-embedding-004")
 EMB_DIM: int = int(getattr(settings, "EMB_DIM", 768))
 GOOGLE_EMBED_API_KEY: str = getattr(settings, "GOOGLE_EMBED_API_KEY", "")
+# google | local | stub (local: ağ gerektirmeyen hashlenmiş n-gram embedding'i;
+# stub: aynı vektörler + ayarlanabilir gecikme/hata, batch/devre kesici yolundan geçer)
+EMB_BACKEND: str = str(getattr(settings, "EMB_BACKEND", "google") or "google").lower()
+
+# Vektörün üretildiği uzay (emb_version, model): yerel motor ve stub (aynı vektörler)
+# sağlayıcı modelinden ayrı etiketlenir; arama / kopya tespiti / birleştirme yalnızca
+# aynı uzaydaki kayıtları karşılaştırır, reindex --reembed farklı uzaydakileri yeniden gömer.
+# PROVIDER_SPACE yapılandırılmış backend'in uzayıdır (local/stub'da yerel uzay).
+LOCAL_SPACE: Tuple[str, str] = (local_embedder.EMB_VERSION, local_embedder.EMB_VERSION)
+PROVIDER_SPACE: Tuple[str, str] = (
+    LOCAL_SPACE if EMB_BACKEND in ("stub", "local") else (EMB_VERSION, EMB_MODEL)
+)
+
+# --- Sağlayıcı çağrısı / mikro-batch ayarları ---
+EMB_DEADLINE_S: float = float(getattr(settings, "EMB_DEADLINE_S", 20.0))
+EMB_BATCH_ENABLED: bool = bool(getattr(settings, "EMB_BATCH_ENABLED", True))
+EMB_BATCH_MAX_SIZE: int = max(1, int(getattr(settings, "EMB_BATCH_MAX_SIZE", 64)))
+EMB_BATCH_MAX_WAIT_MS: float = max(0.0, float(getattr(settings, "EMB_BATCH_MAX_WAIT_MS", 5.0)))
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS, stage as _stage  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+    _stage = nullcontext  # type: ignore
 
 # Fallback her durumda aktif olsun (test ve dev için deterministik davranış)
 EMB_FALLBACK_ENABLED = os.getenv("EMB_FALLBACK_ENABLED", "true").lower() == "true"
 
 
-def _fallback_vector(text: str) -> List[float]:
+def _fallback_vectors(texts: List[str]) -> List[List[float]]:
     """
-    Deterministik fallback embedding vektörü.
-    İlk elemana hash bazlı bir değer, kalanlara 0 yazar.
+    Deterministik yerel embedding (local_embedder); süreçler ve yeniden
+    başlatmalar arasında aynı metin için aynı vektörü üretir.
     """
-    h = abs(hash(text)) % 1009 / 1009.0
-    vec = [0.0] * EMB_DIM
-    vec[0] = float(h)
-    return vec
+    return local_embedder.embed(texts).tolist()
 
 
-def _load_embeddings() -> GoogleGenerativeAIEmbeddings | None:
+def _fallback_vector(text: str) -> List[float]:
+    return _fallback_vectors([text])[0]
+
+
+def _load_embeddings() -> Optional["GoogleGenerativeAIEmbeddings"]:
     """
     Tekil GoogleGenerativeAIEmbeddings örneğini yükler.
-    API anahtarı yoksa None döner ve encode() fallback kullanır.
+    API anahtarı yoksa veya EMB_BACKEND=local ise None döner; encode() yerel
+    embedding'i kullanır. EMB_BACKEND=stub ise yerel stub sağlayıcı döner.
     """
-    if not GOOGLE_EMBED_API_KEY:
+    if EMB_BACKEND == "stub":
+        from app.services.stub_providers import StubEmbeddings
+
+        return StubEmbeddings.from_settings(settings)  # type: ignore
+
+    if EMB_BACKEND == "local" or not GOOGLE_EMBED_API_KEY:
         return None
 
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
     return GoogleGenerativeAIEmbeddings(
         model=EMB_MODEL,
         google_api_key=GOOGLE_EMBED_API_KEY,
     )
 
 
-_EMB = _load_embeddings()
+_EMB: Any = None
+_EMB_LOADED = False
+_EMB_LOCK = threading.Lock()
+
+
+def get_embeddings() -> Any:
+    """Sağlayıcı istemcisini ilk kullanımda oluşturur; yerel backend / anahtar yoksa None."""
+    global _EMB, _EMB_LOADED
+    if not _EMB_LOADED:
+        with _EMB_LOCK:
+            if not _EMB_LOADED:
+                _EMB = _load_embeddings()
+                _EMB_LOADED = True
+    return _EMB
+
+# Embedding sağlayıcısı için ayrı devre kesici (LLM'den bağımsız açılır/kapanır)
+BREAKER = CircuitBreaker(
+    "embed",
+    error_rate=float(getattr(settings, "LLM_BREAKER_ERROR_RATE", 0.5)),
+    min_calls=int(getattr(settings, "LLM_BREAKER_MIN_CALLS", 10)),
+    window_s=float(getattr(settings, "LLM_BREAKER_WINDOW_S", 30.0)),
+    open_s=float(getattr(settings, "LLM_BREAKER_OPEN_S", 15.0)),
+)
+
+# Aynı metin kümesi için eşzamanlı embed çağrıları tek sağlayıcı çağrısında birleşir
+_INFLIGHT = SingleFlight("embed")
+
+# Histogram kovaları
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+
+def _observe(name: str, value: float, buckets) -> None:
+    if METRICS is not None and hasattr(METRICS, "observe"):
+        METRICS.observe(name, value, buckets)
+
+
+def _provider_embed(texts: List[str], priority: str) -> List[List[float]]:
+    """
+    Tek bir sağlayıcı batch çağrısı (eşzamanlılık slotu + deadline + devre kesici ile).
+    Kuyrukta geçen süre EMB_DEADLINE_S bütçesinden düşülür.
+    """
+    timeout = min(provider_scheduler.queue_timeout(priority), EMB_DEADLINE_S)
+    with provider_scheduler.EMBED.slot(priority, timeout=timeout) as waited:
+        return call_with_deadline(
+            lambda: get_embeddings().embed_documents(texts),
+            deadline_s=max(0.001, EMB_DEADLINE_S - waited),
+            retries=int(getattr(settings, "LLM_MAX_RETRIES", 2)),
+            backoff_base_s=float(getattr(settings, "LLM_RETRY_BACKOFF_BASE_S", 0.25)),
+            backoff_max_s=float(getattr(settings, "LLM_RETRY_BACKOFF_MAX_S", 2.0)),
+            breaker=BREAKER,
+        )
+
+
+# ---------------------------
+# Mikro-batch dağıtıcı
+# ---------------------------
+class _Pending:
+    __slots__ = ("texts", "future", "enqueued_at", "priority")
+
+    def __init__(self, texts: List[str], priority: str) -> None:
+        self.texts = texts
+        self.future: Future = Future()
+        self.enqueued_at = time.monotonic()
+        # Worker thread çağıranın bağlamını görmez; öncelik gönderimde yakalanır
+        self.priority = priority
+
+
+class _EmbedBatcher:
+    """
+    Eşzamanlı encode() çağrılarını kısa bir zaman penceresinde (max_wait_ms) veya
+    en fazla max_size metne ulaşana kadar toplayıp tek embed_documents çağrısı yapar.
+    - Batch içindeki yinelenen metinler sağlayıcıya bir kez gönderilir.
+    - Vektörler her çağırana kendi Future'ı üzerinden sırasıyla geri dağıtılır.
+    - Sağlayıcı hatası batch'teki tüm bekleyenlere iletilir (encode fallback'e düşer).
+    - Batch'ler önceliğe göre ayrılır: interaktif ve background istekler aynı batch'e
+      girmez; bekleyen interaktif istek varsa sıradaki batch onunla başlar.
+    Tek bir toplayıcı thread ilk istekte başlatılır; toplanan batch'ler önceliğine ait
+    havuza verilir ve toplayıcı bir sonraki batch'i toplamaya devam eder. Sağlayıcı slotu
+    (provider_scheduler.EMBED.slot) her batch için kendi dağıtım thread'inde istenir:
+    slot bekleyen bir background batch interaktif batch'leri bekletmez.
+    Havuz boyutları sağlayıcı sınırlarıdır (interaktif: limit, background: background_limit).
+    """
+
+    def __init__(self, max_size: int, max_wait_ms: float, max_inflight: int, max_background: int) -> None:
+        self.max_size = max(1, int(max_size))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_inflight = max(1, int(max_inflight))
+        self.max_background = max(1, min(int(max_background), self.max_inflight))
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._pools: Dict[str, ThreadPoolExecutor] = {}
+        # Kuyruktan alınıp henüz bir batch'e girmemiş istekler (sığmadı / öncelik farklı);
+        # yalnızca toplayıcı thread değiştirir
+        self._backlog: List[_Pending] = []
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if not self._pools:
+                self._pools = {
+                    provider_scheduler.INTERACTIVE: ThreadPoolExecutor(
+                        max_workers=self.max_inflight, thread_name_prefix="embed-dispatch"
+                    ),
+                    provider_scheduler.BACKGROUND: ThreadPoolExecutor(
+                        max_workers=self.max_background, thread_name_prefix="embed-dispatch-bg"
+                    ),
+                }
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        item = _Pending(texts, provider_scheduler.current_priority())
+        self._queue.put(item)
+        self._ensure_worker()
+        return item.future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + len(self._backlog)
+
+    # --- worker ---
+    def _first(self) -> _Pending:
+        """Sıradaki batch'in ilk isteği: bekleyen interaktif istek öncelikli."""
+        for i, p in enumerate(self._backlog):
+            if p.priority == provider_scheduler.INTERACTIVE:
+                return self._backlog.pop(i)
+        if self._backlog:
+            return self._backlog.pop(0)
+        return self._queue.get()
+
+    def _next(self, priority: str, deadline: float) -> Optional[_Pending]:
+        """Pencere içinde aynı öncelikli sıradaki istek; farklı öncelikliler backlog'a."""
+        for i, p in enumerate(self._backlog):
+            if p.priority == priority:
+                return self._backlog.pop(i)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return None
+            if item.priority == priority:
+                return item
+            self._backlog.append(item)
+
+    def _collect(self) -> List[_Pending]:
+        first = self._first()
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.monotonic() + self.max_wait_s
+        while size < self.max_size:
+            item = self._next(first.priority, deadline)
+            if item is None:
+                break
+            if size + len(item.texts) > self.max_size:
+                self._backlog.insert(0, item)
+                break
+            batch.append(item)
+            size += len(item.texts)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            self._pools[batch[0].priority].submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        now = time.monotonic()
+        index: Dict[str, int] = {}
+        unique: List[str] = []
+        for p in batch:
+            _observe("embed_batch_wait_ms", (now - p.enqueued_at) * 1000.0, _WAIT_MS_BUCKETS)
+            for t in p.texts:
+                if t not in index:
+                    index[t] = len(unique)
+                    unique.append(t)
+        _observe("embed_batch_size", len(unique), _BATCH_SIZE_BUCKETS)
+
+        try:
+            vectors = _provider_embed(unique, batch[0].priority)
+            if len(vectors) != len(unique):
+                raise ValueError(f"embed_documents returned {len(vectors)} vectors for {len(unique)} texts")
+        except BaseException as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        for p in batch:
+            if not p.future.done():
+                p.future.set_result([vectors[index[t]] for t in p.texts])
+
+
+# Aynı anda uçuşta olabilecek batch sayısı: sağlayıcı eşzamanlılık sınırları (sınırsızsa 4)
+_BATCHER = _EmbedBatcher(
+    EMB_BATCH_MAX_SIZE,
+    EMB_BATCH_MAX_WAIT_MS,
+    provider_scheduler.EMBED.limit if provider_scheduler.EMBED.limit > 0 else 4,
+    provider_scheduler.EMBED.background_limit if provider_scheduler.EMBED.limit > 0 else 4,
+)
+
+
+def queue_depth() -> int:
+    """Batch dağıtıcısında bekleyen encode isteği sayısı."""
+    return _BATCHER.queue_depth()
+
+
+def _embed_documents(texts: List[str], timeout: float) -> List[List[float]]:
+    """
+    Batch açıksa ve istek tek batch'e sığıyorsa dağıtıcı üzerinden, aksi halde
+    doğrudan sağlayıcıya gider.
+    """
+    if EMB_BATCH_ENABLED and len(texts) <= EMB_BATCH_MAX_SIZE:
+        return _BATCHER.submit(texts).result(timeout=timeout)
+    return _provider_embed(texts, provider_scheduler.current_priority())
+
+
+def _request_key(texts: List[str]) -> str:
+    h = hashlib.sha256(EMB_MODEL.encode("utf-8"))
+    for t in texts:
+        h.update(b"\x00")
+        h.update(t.encode("utf-8"))
+    return h.hexdigest()
 
 
 def encode(texts: Iterable[str], timeout: float = 20.0) -> List[List[float]]:
     """
     Metin listesini embed eder.
-    - LangChain GoogleGenerativeAIEmbeddings kullanır.
-    - Her durumda deterministik bir sonuç döner (fallback).
+    - EMB_BACKEND=google: LangChain GoogleGenerativeAIEmbeddings kullanır.
+    - EMB_BACKEND=local veya API anahtarı yok: yerel hashlenmiş n-gram embedding'i.
+    - Sağlayıcı hata verirse yerel embedding'e düşer (degraded mode).
+    Süre "embed" aşaması olarak ölçülür.
+    """
+    with _stage("embed"):
+        return _encode(texts, timeout)[0]
+
+
+def encode_versioned(
+    texts: Iterable[str], timeout: float = 20.0
+) -> Tuple[List[List[float]], List[Tuple[str, str]]]:
     """
+    encode() + her vektörün gerçekten üretildiği uzay (emb_version, model).
+    Kalıcı yazmalar (LTM) bunu kullanır: yerel fallback'e düşen vektör sağlayıcı
+    modeliyle etiketlenmez.
+    """
+    with _stage("embed"):
+        return _encode(texts, timeout)
+
+
+def _encode(texts: Iterable[str], timeout: float) -> Tuple[List[List[float]], List[Tuple[str, str]]]:
     # Iterable güvenliği
     if isinstance(texts, str):
         texts = [texts]
 
     outputs: List[List[float]] = []
+    spaces: List[Tuple[str, str]] = []
     texts_list = [str(t) for t in texts]
 
-    # API anahtarı veya model yoksa direkt fallback
-    if _EMB is None:
-        for t in texts_list:
-            outputs.append(_fallback_vector(t))
-        return outputs
+    # Yerel backend (veya API anahtarı yok) → tek seferde batch yerel embedding
+    if get_embeddings() is None:
+        return _fallback_vectors(texts_list), [LOCAL_SPACE] * len(texts_list)
 
     # LangChain ile embed etmeyi dene
     try:
         # embed_documents: List[str] -> List[List[float]]
-        embs = _EMB.embed_documents(texts_list)
+        embs, _shared = _INFLIGHT.do(
+            _request_key(texts_list),
+            lambda: _embed_documents(texts_list, timeout),
+            timeout=timeout,
+        )
         for vec, t in zip(embs, texts_list):
             if not isinstance(vec, list) or not vec:
                 outputs.append(_fallback_vector(t))
+                spaces.append(LOCAL_SPACE)
                 continue
 
             # Boyut kontrolü
@@ -93,10 +389,9 @@ def encode(texts: Iterable[str], timeout: float = 20.0) -> List[List[float]]:
                     vec = vec + [0.0] * (EMB_DIM - len(vec))
 
             outputs.append([float(x) for x in vec])
-        return outputs
+            spaces.append(PROVIDER_SPACE)
+        return outputs, spaces
 
     except Exception:
-        # Ağ hatası / kota / beklenmedik durum → fallback
-        for t in texts_list:
-            outputs.append(_fallback_vector(t))
-        return outputs
+        # Ağ hatası / kota / beklenmedik durum → yerel embedding
+        return _fallback_vectors(texts_list), [LOCAL_SPACE] * len(texts_list)
@@ -0,0 +1,242 @@
+# app/services/llm_cache.py
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        LLM_CACHE_ENABLED = True
+        LLM_CACHE_TTL_S = 3600
+        LLM_CACHE_MAX_ENTRIES = 2048
+        LLM_CACHE_SITES = "chat,summarizer,extraction"
+        LLM_SEMANTIC_CACHE_SITES = ""
+        LLM_SEMANTIC_CACHE_THRESHOLD = 0.95
+        LLM_SEMANTIC_CACHE_MAX_ENTRIES = 512
+
+    settings = _Fallback()  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+CACHE_ENABLED: bool = bool(getattr(settings, "LLM_CACHE_ENABLED", True))
+CACHE_TTL_S: float = float(getattr(settings, "LLM_CACHE_TTL_S", 3600))
+CACHE_MAX_ENTRIES: int = int(getattr(settings, "LLM_CACHE_MAX_ENTRIES", 2048))
+EXACT_SITES = {
+    p.strip() for p in str(getattr(settings, "LLM_CACHE_SITES", "") or "").split(",") if p.strip()
+}
+SEMANTIC_SITES = {
+    p.strip() for p in str(getattr(settings, "LLM_SEMANTIC_CACHE_SITES", "") or "").split(",") if p.strip()
+}
+SEMANTIC_THRESHOLD: float = float(getattr(settings, "LLM_SEMANTIC_CACHE_THRESHOLD", 0.95))
+SEMANTIC_MAX_ENTRIES: int = int(getattr(settings, "LLM_SEMANTIC_CACHE_MAX_ENTRIES", 512))
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
+
+class _TTLLRU:
+    """TTL + boyut sınırlı LRU sözlüğü (thread-safe)."""
+
+    def __init__(self, max_entries: int, ttl_s: float) -> None:
+        self._lock = threading.RLock()
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                self._data.pop(key, None)
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class _SemanticTier:
+    """
+    Sorgu embedding'ine göre yakın eşleşme yapan önbellek.
+    - Girdiler namespace'e (ör. call_site + user/session + model) göre ayrılır;
+      farklı kullanıcıların yanıtları asla birbirine karışmaz.
+    - Namespace içinde doğrusal (vektörize) kosinüs taraması yapılır; toplam giriş
+      sayısı sınırlı olduğu için maliyet küçüktür.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float, threshold: float) -> None:
+        self._lock = threading.RLock()
+        # key -> (expires_at, namespace, unit_vec, value)
+        self._data: "OrderedDict[int, Tuple[float, str, np.ndarray, Any]]" = OrderedDict()
+        self._seq = 0
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.threshold = float(threshold)
+
+    @staticmethod
+    def _unit(vec: Any) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32).ravel()
+        n = float(np.linalg.norm(v))
+        return v / n if n > 0 else v
+
+    def get(self, namespace: str, vec: Any) -> Tuple[Any, float]:
+        q = self._unit(vec)
+        now = time.time()
+        with self._lock:
+            keys: List[int] = []
+            mats: List[np.ndarray] = []
+            for k, (expires_at, ns, v, _) in list(self._data.items()):
+                if expires_at < now:
+                    self._data.pop(k, None)
+                    continue
+                if ns == namespace and v.shape == q.shape:
+                    keys.append(k)
+                    mats.append(v)
+            if not keys:
+                return None, 0.0
+            sims = np.stack(mats) @ q
+            best = int(np.argmax(sims))
+            score = float(sims[best])
+            if score < self.threshold:
+                return None, score
+            key = keys[best]
+            self._data.move_to_end(key)
+            return self._data[key][3], score
+
+    def put(self, namespace: str, vec: Any, value: Any) -> None:
+        with self._lock:
+            self._seq += 1
+            self._data[self._seq] = (time.time() + self.ttl_s, namespace, self._unit(vec), value)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class _LLMCache:
+    """
+    llm_client.generate için iki katmanlı yanıt önbelleği.
+    - exact    : (model, temperature, system, prompt) özetiyle birebir eşleşme
+                 (anahtar llm_client._request_key ile üretilir)
+    - semantic : (opt-in) sorgu embedding'i + benzerlik eşiği
+    Her katman çağrı noktası (call_site) bazında ayrı ayrı açılır/kapanır.
+    """
+
+    def __init__(self) -> None:
+        self._exact = _TTLLRU(CACHE_MAX_ENTRIES, CACHE_TTL_S)
+        self._semantic = _SemanticTier(SEMANTIC_MAX_ENTRIES, CACHE_TTL_S, SEMANTIC_THRESHOLD)
+        self._lock = threading.RLock()
+        self._hits: Dict[str, int] = {}
+
+    # --- istatistik ---
+    def _count(self, tier: str, site: str, outcome: str) -> None:
+        name = f"llm_cache_{tier}_{outcome}"
+        with self._lock:
+            key = f"{name}:{site}"
+            self._hits[key] = self._hits.get(key, 0) + 1
+        _incr(name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            by_site = dict(self._hits)
+        return {
+            "enabled": CACHE_ENABLED,
+            "exact_sites": sorted(EXACT_SITES),
+            "semantic_sites": sorted(SEMANTIC_SITES),
+            "exact_entries": len(self._exact),
+            "semantic_entries": len(self._semantic),
+            "counts": by_site,
+        }
+
+    # --- exact ---
+    def exact_enabled(self, site: str) -> bool:
+        return CACHE_ENABLED and site in EXACT_SITES
+
+    def get_exact(self, site: str, key: str) -> Optional[str]:
+        if not self.exact_enabled(site):
+            return None
+        value = self._exact.get(key)
+        self._count("exact", site, "hit" if value is not None else "miss")
+        return value
+
+    def put_exact(self, site: str, key: str, text: str) -> None:
+        if self.exact_enabled(site) and text:
+            self._exact.put(key, text)
+
+    # --- semantic ---
+    def semantic_enabled(self, site: str) -> bool:
+        return CACHE_ENABLED and site in SEMANTIC_SITES
+
+    @staticmethod
+    def _embed(query: str) -> Optional[List[float]]:
+        try:
+            from app.services.embed_client import encode  # gecikmeli import (döngüsel bağımlılık yok)
+            return encode([query])[0]
+        except Exception:
+            return None
+
+    def get_semantic(self, site: str, namespace: str, query: str) -> Tuple[Optional[str], Optional[List[float]]]:
+        """Dönüş: (yanıt | None, sorgu vektörü) – vektör put_semantic'te tekrar kullanılır."""
+        if not self.semantic_enabled(site) or not query:
+            return None, None
+        vec = self._embed(query)
+        if vec is None:
+            return None, None
+        value, _score = self._semantic.get(f"{site}|{namespace}", vec)
+        self._count("semantic", site, "hit" if value is not None else "miss")
+        return value, vec
+
+    def put_semantic(self, site: str, namespace: str, vec: Optional[List[float]], text: str) -> None:
+        if self.semantic_enabled(site) and vec is not None and text:
+            self._semantic.put(f"{site}|{namespace}", vec, text)
+
+    def clear(self) -> None:
+        self._exact.clear()
+        self._semantic.clear()
+
+
+# Tekil (singleton) örnek
+_cache = _LLMCache()
+
+# Modül düzeyi kısayollar
+get_exact = _cache.get_exact
+put_exact = _cache.put_exact
+get_semantic = _cache.get_semantic
+put_semantic = _cache.put_semantic
+stats = _cache.stats
+clear = _cache.clear
@@ -1,29 +1,95 @@
 # app/services/llm_client.py
 from __future__ import annotations
 
+import hashlib
+import logging
 import os
-from typing import Any, Dict, Optional
+import threading
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
 from app.core.config import settings
+from app.core.errors import ProviderUnavailableError, QueueTimeoutError
+from app.services.resilience import (
+    CircuitBreaker,
+    LatencyTracker,
+    call_with_deadline,
+    iter_with_deadline,
+)
+from app.services import provider_scheduler
+from app.services.singleflight import SingleFlight
 
-# LangChain & Gemini
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage
+# LangChain & Gemini: ağır import'lar ilk kullanıma ertelenir (get_model / _build_messages)
+if TYPE_CHECKING:  # pragma: no cover
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+# Yanıt önbelleği (opsiyonel)
+try:
+    from app.services import llm_cache  # type: ignore
+except Exception:
+    llm_cache = None  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+# İstek izleme (opsiyonel)
+try:
+    from app.observability.tracing import span as _span  # type: ignore
+except Exception:
+    _span = None  # type: ignore
+
+log = logging.getLogger("llm_client")
 
 # -------------------------
 # Fallback kontrolü
 # -------------------------
 LLM_FALLBACK_ENABLED = os.getenv("LLM_FALLBACK_ENABLED", "true").lower() == "true"
 
+# -------------------------
+# Dayanıklılık ayarları
+# -------------------------
+LLM_DEADLINE_S: float = float(getattr(settings, "LLM_DEADLINE_S", 30.0))
+LLM_MAX_RETRIES: int = int(getattr(settings, "LLM_MAX_RETRIES", 2))
+LLM_RETRY_BACKOFF_BASE_S: float = float(getattr(settings, "LLM_RETRY_BACKOFF_BASE_S", 0.25))
+LLM_RETRY_BACKOFF_MAX_S: float = float(getattr(settings, "LLM_RETRY_BACKOFF_MAX_S", 2.0))
+LLM_HEDGE_ENABLED: bool = bool(getattr(settings, "LLM_HEDGE_ENABLED", False))
+LLM_HEDGE_PERCENTILE: float = float(getattr(settings, "LLM_HEDGE_PERCENTILE", 95.0))
+LLM_HEDGE_MIN_SAMPLES: int = int(getattr(settings, "LLM_HEDGE_MIN_SAMPLES", 20))
+
+BREAKER = CircuitBreaker(
+    "llm",
+    error_rate=float(getattr(settings, "LLM_BREAKER_ERROR_RATE", 0.5)),
+    min_calls=int(getattr(settings, "LLM_BREAKER_MIN_CALLS", 10)),
+    window_s=float(getattr(settings, "LLM_BREAKER_WINDOW_S", 30.0)),
+    open_s=float(getattr(settings, "LLM_BREAKER_OPEN_S", 15.0)),
+)
+LATENCY = LatencyTracker()
+# Aynı isteğin eşzamanlı kopyaları tek sağlayıcı çağrısında birleşir
+_INFLIGHT = SingleFlight("llm")
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
 
 # -------------------------
-# Model başlangıcı
+# Model başlangıcı (tembel)
 # -------------------------
-def _load_model() -> ChatGoogleGenerativeAI:
+def _load_model() -> Optional["ChatGoogleGenerativeAI"]:
     """
     Tekil LangChain ChatGoogleGenerativeAI örneğini yükler.
     Eğer API anahtarı yoksa fallback'e düşer.
+    LLM_PROVIDER=stub ise yerel stub model döner.
     """
+    if str(getattr(settings, "LLM_PROVIDER", "gemini")).lower() == "stub":
+        from app.services.stub_providers import StubChatModel
+
+        return StubChatModel.from_settings(settings)  # type: ignore
+
     api_key = settings.GEMINI_API_KEY
     model_name = settings.GEMINI_MODEL
 
@@ -31,15 +97,47 @@ def _load_model() -> ChatGoogleGenerativeAI:
         # Fallback: API anahtarı yok → fonksiyon generate(...) içinde eko üretir.
         return None  # type: ignore
 
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # Yeniden deneme ve süre sınırı bu modülde yönetilir; SDK'nın kendi retry'ı kapalı.
     return ChatGoogleGenerativeAI(
         model=model_name,
         temperature=0.4,
         max_output_tokens=512,
         google_api_key=api_key,
+        timeout=LLM_DEADLINE_S,
+        max_retries=0,
     )
 
 
-_MODEL = _load_model()
+_MODEL: Any = None
+_MODEL_LOADED = False
+_MODEL_LOCK = threading.Lock()
+
+
+def get_model() -> Any:
+    """
+    Sağlayıcı istemcisini ilk kullanımda oluşturur (import anında değil); worker
+    açılışı ve servisleri import eden CLI'lar langchain_google_genai yükünü ödemez.
+    API anahtarı yoksa None (fallback).
+    """
+    global _MODEL, _MODEL_LOADED
+    if not _MODEL_LOADED:
+        with _MODEL_LOCK:
+            if not _MODEL_LOADED:
+                _MODEL = _load_model()
+                _MODEL_LOADED = True
+    return _MODEL
+
+
+def _build_messages(prompt: str, system: Optional[str]) -> List[Any]:
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    msgs: List[Any] = []
+    if system:
+        msgs.append(SystemMessage(content=system))
+    msgs.append(HumanMessage(content=prompt))
+    return msgs
 
 
 # -------------------------
@@ -54,6 +152,62 @@ def _fallback_response(prompt: str) -> str:
     return f"(fallback) {prompt[:400]}"
 
 
+def _on_failure(prompt: str, exc: BaseException, call_site: str) -> str:
+    """
+    Sağlayıcı hatası: loglanır ve sayılır. Fallback açıksa eko metni döner,
+    kapalıysa ProviderUnavailableError fırlatılır (sessiz boş yanıt yok).
+    Kuyruk zaman aşımı (sağlayıcı hiç denenmedi) her zaman fırlatılır: yük atılır,
+    çağıran 503 / atlama ile hızlıca döner.
+    """
+    log.warning("LLM çağrısı başarısız (%s): %r", call_site, exc)
+    if isinstance(exc, QueueTimeoutError):
+        raise exc
+    _incr("llm_fallback")
+    if LLM_FALLBACK_ENABLED:
+        return _fallback_response(prompt)
+    if isinstance(exc, ProviderUnavailableError):
+        raise exc
+    raise ProviderUnavailableError(details={"call_site": call_site, "error": repr(exc)})
+
+
+def breaker_state() -> Dict[str, Any]:
+    """Devre kesici durumu + son gecikme yüzdelikleri (health / stats için)."""
+    snap = BREAKER.snapshot()
+    snap["latency_p50_s"] = LATENCY.percentile(50)
+    snap["latency_p95_s"] = LATENCY.percentile(95)
+    return snap
+
+
+def _request_key(
+    prompt: str,
+    system: Optional[str],
+    temperature: float,
+    max_output_tokens: int,
+) -> str:
+    """(model, temperature, max tokens, system, prompt) özeti: önbellek + single-flight anahtarı."""
+    h = hashlib.sha256()
+    for part in (
+        settings.GEMINI_MODEL,
+        f"{float(temperature):.4f}",
+        str(max_output_tokens),
+        system or "",
+        prompt or "",
+    ):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _semantic_namespace(
+    namespace: str,
+    system: Optional[str],
+    temperature: float,
+) -> str:
+    # Semantik eşleşme yalnızca aynı model/sistem/sıcaklık ve aynı namespace içinde geçerli
+    sys_hash = hashlib.sha256((system or "").encode("utf-8")).hexdigest()[:16]
+    return f"{settings.GEMINI_MODEL}|{float(temperature):.4f}|{sys_hash}|{namespace}"
+
+
 # -------------------------
 # Ana API
 # -------------------------
@@ -63,31 +217,146 @@ def generate(
     system: Optional[str] = None,
     temperature: float = 0.4,
     max_output_tokens: int = 512,
+    call_site: str = "default",
+    semantic_query: Optional[str] = None,
+    semantic_namespace: str = "",
+    deadline_s: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     routes_chat.py tarafından kullanılan ana giriş noktası.
     Dönüş biçimi: {"text": "..."}  (zorunlu)
+
+    call_site          : önbellek ayarlarının uygulanacağı çağrı noktası (chat, summarizer, extraction…)
+    semantic_query     : semantik önbellek için gömülecek sorgu metni (ör. kullanıcı mesajı)
+    semantic_namespace : semantik eşleşmenin sınırı (ör. user_id:session_id) – kullanıcılar arası sızıntıyı engeller
+    deadline_s         : toplam süre sınırı (retry + backoff + hedge dahil); None → LLM_DEADLINE_S
+    Fallback yanıtları önbelleğe yazılmaz.
     """
     # Fallback gerekli mi?
-    if _MODEL is None:
+    model = get_model()
+    if model is None:
         if LLM_FALLBACK_ENABLED:
-            return {"text": _fallback_response(prompt)}
+            return {"text": _fallback_response(prompt), "fallback": True}
         else:
-            return {"text": ""}
+            return {"text": "", "fallback": True}
+
+    # 1) Önbellek: exact → semantic
+    key = _request_key(prompt, system, temperature, max_output_tokens)
+    sem_ns = ""
+    sem_vec = None
+    if llm_cache is not None:
+        cached = llm_cache.get_exact(call_site, key)
+        if cached is not None:
+            return {"text": cached, "cached": "exact"}
+        if semantic_query:
+            sem_ns = _semantic_namespace(semantic_namespace, system, temperature)
+            cached, sem_vec = llm_cache.get_semantic(call_site, sem_ns, semantic_query)
+            if cached is not None:
+                return {"text": cached, "cached": "semantic"}
 
     # Model mesajlarını hazırla
-    msgs = []
-    if system:
-        msgs.append(SystemMessage(content=system))
-    msgs.append(HumanMessage(content=prompt))
+    msgs = _build_messages(prompt, system)
+
+    budget_s = LLM_DEADLINE_S if deadline_s is None else deadline_s
+    priority = provider_scheduler.current_priority(call_site)
+
+    def _invoke() -> Any:
+        # Çağıranın aşama span'ının (ör. llm_generate) altında yalnızca sağlayıcı çağrısı;
+        # önbellek isabetleri ve single-flight takipçileri span açmaz
+        provider_span = (
+            _span("llm.provider_call", call_site=call_site, prompt_chars=len(prompt or ""))
+            if _span is not None
+            else nullcontext()
+        )
+        # Sağlayıcı slotu: kuyrukta geçen süre toplam bütçeden düşülür
+        timeout = min(provider_scheduler.queue_timeout(priority), budget_s)
+        with provider_span as sp, provider_scheduler.LLM.slot(priority, timeout=timeout) as waited:
+            if sp is not None:
+                sp.set("queue_wait_ms", round(waited * 1000.0, 1))
+            return call_with_deadline(
+                lambda: model.invoke(msgs),
+                deadline_s=max(0.001, budget_s - waited),
+                retries=LLM_MAX_RETRIES,
+                backoff_base_s=LLM_RETRY_BACKOFF_BASE_S,
+                backoff_max_s=LLM_RETRY_BACKOFF_MAX_S,
+                breaker=BREAKER,
+                tracker=LATENCY,
+                hedge=LLM_HEDGE_ENABLED,
+                hedge_min_samples=LLM_HEDGE_MIN_SAMPLES,
+                hedge_percentile=LLM_HEDGE_PERCENTILE,
+                on_hedge=lambda: _incr("llm_hedged_requests"),
+            )
 
     try:
-        response = _MODEL.invoke(msgs)
+        # Eşzamanlı aynı istekler (çift gönderim, paralel sekmeler) tek çağrıyı paylaşır
+        response, _shared = _INFLIGHT.do(key, _invoke, timeout=budget_s)
         text = response.content or ""
-    except Exception:
+    except Exception as e:
+        return {"text": _on_failure(prompt, e, call_site), "fallback": True}
+
+    # 2) Başarılı yanıtı önbelleğe yaz
+    if llm_cache is not None and text:
+        llm_cache.put_exact(call_site, key, text)
+        if sem_vec is not None:
+            llm_cache.put_semantic(call_site, sem_ns, sem_vec, text)
+
+    return {"text": text}
+
+
+def stream(
+    prompt: str,
+    *,
+    system: Optional[str] = None,
+    temperature: float = 0.4,
+    max_output_tokens: int = 512,
+    call_site: str = "default",
+    deadline_s: Optional[float] = None,
+) -> Iterator[str]:
+    """
+    generate(...) ile aynı sözleşmenin akış (stream) versiyonu: metin parçaları üretir.
+    Model yoksa veya akış hiç başlamadan hata olursa fallback metni tek parça döner.
+    Exact önbellekte varsa yanıt tek parça olarak döner; eksiksiz akışlar önbelleğe yazılır.
+    """
+    model = get_model()
+    if model is None:
         if LLM_FALLBACK_ENABLED:
-            text = _fallback_response(prompt)
+            yield _fallback_response(prompt)
+        return
+
+    key = _request_key(prompt, system, temperature, max_output_tokens)
+    if llm_cache is not None:
+        cached = llm_cache.get_exact(call_site, key)
+        if cached is not None:
+            yield cached
+            return
+
+    msgs = _build_messages(prompt, system)
+
+    emitted = False
+    parts = []
+    budget_s = LLM_DEADLINE_S if deadline_s is None else deadline_s
+    priority = provider_scheduler.current_priority(call_site)
+    try:
+        # Slot akış bitene (veya istemci kopana) kadar tutulur
+        timeout = min(provider_scheduler.queue_timeout(priority), budget_s)
+        with provider_scheduler.LLM.slot(priority, timeout=timeout) as waited:
+            for chunk in iter_with_deadline(
+                lambda: model.stream(msgs),
+                deadline_s=max(0.001, budget_s - waited),
+                breaker=BREAKER,
+            ):
+                text = chunk.content or ""
+                if text:
+                    emitted = True
+                    parts.append(text)
+                    yield text
+    except Exception as e:
+        # Akış ortasında kopma: verilen kısım kalsın; hiç veri yoksa fallback
+        if not emitted:
+            yield _on_failure(prompt, e, call_site)
         else:
-            text = ""
+            log.warning("LLM akışı yarıda kesildi (%s): %r", call_site, e)
+        return
 
-    return {"text": text}
+    if llm_cache is not None and parts:
+        llm_cache.put_exact(call_site, key, "".join(parts))
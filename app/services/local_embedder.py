@@ -0,0 +1,211 @@
+# app/services/local_embedder.py
+from __future__ import annotations
+
+"""
+Ağ gerektirmeyen, deterministik yerel embedding motoru.
+
+Özellik hashleme (feature hashing / "hashing trick"):
+- Kelime unigram'ları + kelime sınırlarıyla doldurulmuş karakter n-gram'ları
+  (varsayılan 3–5) çıkarılır.
+- Her özellik kararlı bir hash (blake2b) ile EMB_DIM boyutlu uzaya düşürülür;
+  hash'in bir biti işareti belirler, böylece çakışmalar birbirini ortalamada götürür.
+- Ağırlık: alt doğrusal tf (1 + log tf) × opsiyonel IDF (kova bazında).
+- Çıktı L2 normalize edilir; kosinüs benzerliği doğrudan anlamlıdır.
+
+Python'un süreç başına rastgelelenen hash() fonksiyonu kullanılmaz: aynı metin
+her süreçte / yeniden başlatmada aynı vektörü üretir.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Vektör uzayı kimliği: LTM satırlarına emb_version/model olarak yazılır. Normalizasyon,
+# özellik çıkarımı veya hash değişirse artırılmalı (eski satırlar yeniden embed edilir).
+EMB_VERSION = "local-hash-v1"
+
+
+@lru_cache(maxsize=200_000)
+def _feature_hash(feature: str) -> int:
+    """Özellik dizgesi için süreçten bağımsız 64-bit hash."""
+    return int.from_bytes(blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _normalize(text: str) -> str:
+    # "İ" casefold'da "i" + birleşik nokta olur; önceden "i"ye çevrilir. Noktalı/noktasız
+    # i ayrımı sonra tek harfe katlanır: "I" hem İngilizce "i" hem Türkçe "ı" olabilir,
+    # ASCII klavyeyle yazılan Türkçe de "ı" yerine "i" kullanır.
+    t = (text or "").replace("İ", "i")
+    t = unicodedata.normalize("NFKC", t).casefold()
+    return t.replace("ı", "i")
+
+
+def extract_features(
+    text: str,
+    *,
+    ngram_range: Tuple[int, int] = (3, 5),
+    use_words: bool = True,
+) -> Counter:
+    """Metinden (özellik → sayım) çıkarır. Kelime özellikleri 'w:' ile öneklenir."""
+    feats: Counter = Counter()
+    lo, hi = ngram_range
+    for word in _WORD_RE.findall(_normalize(text)):
+        if use_words:
+            feats["w:" + word] += 1
+        padded = f" {word} "
+        n_max = min(hi, len(padded))
+        for n in range(lo, n_max + 1):
+            for i in range(len(padded) - n + 1):
+                feats[padded[i:i + n]] += 1
+    return feats
+
+
+class LocalEmbedder:
+    """
+    Hashlenmiş karakter n-gram + kelime unigram embedding'i.
+    - embed(texts) → (N, dim) float32 matris (L2 normalize)
+    - fit_idf(corpus) ile kova bazında IDF öğrenilebilir; save_idf/load_idf ile
+      dondurulur. IDF değişirse kayıtlı vektörler de değişir (EMB_VERSION artırılmalı).
+    """
+
+    def __init__(
+        self,
+        dim: int = 768,
+        *,
+        ngram_range: Tuple[int, int] = (3, 5),
+        word_weight: float = 2.0,
+        idf: Optional[np.ndarray] = None,
+    ) -> None:
+        self.dim = int(dim)
+        self.ngram_range = (int(ngram_range[0]), int(ngram_range[1]))
+        self.word_weight = float(word_weight)
+        self._idf: Optional[np.ndarray] = None
+        if idf is not None:
+            self.set_idf(idf)
+
+    # --- IDF ---
+    @property
+    def idf(self) -> Optional[np.ndarray]:
+        return self._idf
+
+    def set_idf(self, idf: Sequence[float]) -> None:
+        arr = np.asarray(idf, dtype=np.float32).ravel()
+        if arr.shape[0] != self.dim:
+            raise ValueError(f"idf length {arr.shape[0]} != dim {self.dim}")
+        self._idf = arr
+
+    def fit_idf(self, corpus: Iterable[str]) -> np.ndarray:
+        """Kova bazında yumuşatılmış IDF: log((1 + N) / (1 + df)) + 1."""
+        df = np.zeros(self.dim, dtype=np.float64)
+        n_docs = 0
+        for text in corpus:
+            n_docs += 1
+            buckets = {b for b, _s, _w in self._hashed(text)}
+            if buckets:
+                df[list(buckets)] += 1.0
+        idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        self.set_idf(idf)
+        return self._idf  # type: ignore[return-value]
+
+    def save_idf(self, path: str) -> None:
+        if self._idf is None:
+            raise ValueError("idf not fitted")
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "idf": [round(float(x), 6) for x in self._idf]}, f)
+
+    def load_idf(self, path: str) -> None:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.set_idf(data["idf"])
+
+    # --- embedding ---
+    def _hashed(self, text: str) -> List[Tuple[int, float, float]]:
+        """(kova, işaret, ağırlık) üçlüleri; ağırlık = (1 + log tf) × tür ağırlığı."""
+        out: List[Tuple[int, float, float]] = []
+        for feat, tf in extract_features(text, ngram_range=self.ngram_range).items():
+            h = _feature_hash(feat)
+            bucket = h % self.dim
+            sign = 1.0 if (h >> 63) & 1 else -1.0
+            w = 1.0 + math.log(tf)
+            if feat.startswith("w:"):
+                w *= self.word_weight
+            out.append((bucket, sign, w))
+        return out
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Metin listesini tek seferde (N, dim) matrisine dönüştürür."""
+        n = len(texts)
+        mat = np.zeros((n, self.dim), dtype=np.float32)
+        if n == 0:
+            return mat
+
+        rows: List[int] = []
+        cols: List[int] = []
+        vals: List[float] = []
+        for r, text in enumerate(texts):
+            for bucket, sign, w in self._hashed(str(text)):
+                rows.append(r)
+                cols.append(bucket)
+                vals.append(sign * w)
+        if not rows:
+            return mat
+
+        col_idx = np.asarray(cols, dtype=np.int64)
+        v = np.asarray(vals, dtype=np.float32)
+        if self._idf is not None:
+            v = v * self._idf[col_idx]
+        np.add.at(mat, (np.asarray(rows, dtype=np.int64), col_idx), v)
+
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        np.divide(mat, norms, out=mat, where=norms > 0)
+        return mat
+
+    def embed_one(self, text: str) -> List[float]:
+        return self.embed([text])[0].tolist()
+
+
+# ---------------------------
+# Tekil örnek
+# ---------------------------
+_lock = threading.Lock()
+_instance: Optional[LocalEmbedder] = None
+
+
+def get_embedder() -> LocalEmbedder:
+    """Ayarlardan (EMB_DIM, EMB_LOCAL_*) tekil LocalEmbedder oluşturur."""
+    global _instance
+    if _instance is not None:
+        return _instance
+    with _lock:
+        if _instance is None:
+            try:
+                from app.core.config import settings  # type: ignore
+            except Exception:
+                settings = None  # type: ignore
+            dim = int(getattr(settings, "EMB_DIM", 768))
+            ng_min = int(getattr(settings, "EMB_LOCAL_NGRAM_MIN", 3))
+            ng_max = int(getattr(settings, "EMB_LOCAL_NGRAM_MAX", 5))
+            idf_path = str(getattr(settings, "EMB_LOCAL_IDF_PATH", "") or "")
+            emb = LocalEmbedder(dim, ngram_range=(ng_min, ng_max))
+            if idf_path and os.path.exists(idf_path):
+                emb.load_idf(idf_path)
+            _instance = emb
+    return _instance
+
+
+def embed(texts: Sequence[str]) -> np.ndarray:
+    return get_embedder().embed(texts)
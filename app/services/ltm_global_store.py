@@ -5,7 +5,6 @@ import json
 import os
 import sqlite3
 import time
-from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import numpy as np
@@ -29,6 +28,7 @@ except Exception:
 try:
     from app.services.embed_client import (  # type: ignore
         encode as embed_encode,
+        encode_versioned as embed_encode_versioned,
         EMB_VERSION,
         EMB_MODEL,
         EMB_DIM,
@@ -50,15 +50,41 @@ except Exception:
             out.append(v.tolist())
         return out
 
+    def embed_encode_versioned(texts: Iterable[str]):  # type: ignore
+        out = embed_encode(texts)
+        return out, [(EMB_VERSION, EMB_MODEL)] * len(out)
+
+
+from app.db.repository import path_for_user, paths_for_memory, pooled_conn
+from app.services import similarity
+
+# Segmentli vektör deposu (opsiyonel)
+try:
+    from app.services import vector_segments  # type: ignore
+except Exception:
+    vector_segments = None  # type: ignore
+
+# Yakın-kopya tespiti (opsiyonel)
+try:
+    from app.services import memory_dedupe  # type: ignore
+except Exception:
+    memory_dedupe = None  # type: ignore
+
+# LTM sürüm sayaçları (retrieval önbelleği geçersizleştirme; opsiyonel)
+try:
+    from app.services import memory_versions  # type: ignore
+except Exception:
+    memory_versions = None  # type: ignore
+
 
 # ---------------------------
 # Helpers
 # ---------------------------
-def _conn() -> sqlite3.Connection:
-    Path(settings.DB_PATH).parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(settings.DB_PATH)
-    con.row_factory = sqlite3.Row
-    return con
+def _conn(user_id: Optional[str] = None, *, path: Optional[str] = None):
+    """Kullanıcının shard'ına havuzlu bağlantı; çıkışta commit edilir ve havuza döner."""
+    if path is None and user_id is not None:
+        path = path_for_user(user_id)
+    return pooled_conn(path)
 
 
 def _now() -> int:
@@ -78,12 +104,6 @@ def _norm_text(s: str) -> str:
     return " ".join(s.strip().split())
 
 
-def _cosine(a: np.ndarray, b: np.ndarray, eps: float = 1e-12) -> float:
-    na = np.linalg.norm(a) + eps
-    nb = np.linalg.norm(b) + eps
-    return float(np.dot(a, b) / (na * nb))
-
-
 def _row_to_item(row: sqlite3.Row) -> Dict[str, Any]:
     meta = json.loads(row["meta"]) if row["meta"] else {}
 
@@ -112,11 +132,38 @@ def add(
 ) -> Dict[str, Any]:
     text = _norm_text(text)
     meta = meta or {}
-    emb = embed_encode([text])[0]
+    embs, spaces = embed_encode_versioned([text])
+    emb = embs[0]
+    emb_version, emb_model = spaces[0]
     ts = _now()
 
-    with _conn() as con:
+    with _conn(user_id) as con:
+        # Yazma kilidi baştan alınır: kopya kontrolü, ekleme ve imza indeksi tek atomik
+        # adımdır; eşzamanlı iki yakın-kopya ekleme ikisi birden INSERT'e düşmez.
+        con.execute("BEGIN IMMEDIATE")
         cur = con.cursor()
+
+        # Anlamsal yakın-kopya → yeni satır yerine mevcut kayda birleştir
+        if memory_dedupe is not None:
+            dup = memory_dedupe.find_duplicate(
+                con, "global", user_id, None, emb, space=(emb_version, emb_model)
+            )
+            # Çelişen yakın kayıt (olumsuzluk / sayı farkı) → eski silinir, yeni metin eklenir
+            superseded = (
+                memory_dedupe.supersede(con, "global", dup[0], text, meta, similarity=dup[1])
+                if dup is not None
+                else None
+            )
+            if superseded is not None:
+                meta = superseded
+            elif dup is not None:
+                memory_dedupe.merge(con, "global", dup[0], meta, similarity=dup[1])
+                if memory_versions is not None:
+                    memory_versions.bump(con, "global", user_id)
+                con.commit()
+                cur.execute("SELECT * FROM global_memories WHERE id = ?", (dup[0],))
+                return _row_to_item(cur.fetchone())
+
         try:
             # Yeni kayıt ekle
             cur.execute(
@@ -132,14 +179,18 @@ def add(
                     text,
                     _to_blob(emb),
                     json.dumps(meta, ensure_ascii=False),
-                    EMB_VERSION,
-                    EMB_MODEL,
+                    emb_version,
+                    emb_model,
                     EMB_DIM,
                     ts,
                     None,
                 ),
             )
             mem_id = cur.lastrowid
+            if memory_dedupe is not None:
+                memory_dedupe.index(con, "global", mem_id, user_id, None, emb)
+            if memory_versions is not None:
+                memory_versions.bump(con, "global", user_id)
             con.commit()
 
             cur.execute("SELECT * FROM global_memories WHERE id = ?", (mem_id,))
@@ -180,7 +231,7 @@ def list(
         where += " AND text LIKE ?"
         params.append(f"%{q}%")
 
-    with _conn() as con:
+    with _conn(user_id) as con:
         cur = con.cursor()
         cur.execute(f"SELECT COUNT(1) AS c FROM global_memories {where}", params)
         total = int(cur.fetchone()["c"])
@@ -201,19 +252,34 @@ def list(
         return items, total
 
 
-def delete(memory_id: int) -> int:
-    with _conn() as con:
-        cur = con.cursor()
-        cur.execute("DELETE FROM global_memories WHERE id = ?", (memory_id,))
-        con.commit()
-        return cur.rowcount
+def delete(memory_id: int, user_id: Optional[str] = None) -> int:
+    """user_id verilirse yalnızca kullanıcının shard'ına gidilir; yoksa id ofsetinden bulunur."""
+    for path in paths_for_memory(memory_id, user_id):
+        with _conn(path=path) as con:
+            cur = con.cursor()
+            owner = cur.execute("SELECT user_id FROM global_memories WHERE id = ?", (memory_id,)).fetchone()
+            cur.execute("DELETE FROM global_memories WHERE id = ?", (memory_id,))
+            if memory_dedupe is not None and cur.rowcount:
+                memory_dedupe.remove(con, "global", [memory_id])
+            if memory_versions is not None and owner is not None:
+                memory_versions.bump(con, "global", owner["user_id"])
+            con.commit()
+            if cur.rowcount:
+                return cur.rowcount
+    return 0
 
 
 def clear(user_id: str) -> int:
-    with _conn() as con:
+    with _conn(user_id) as con:
         cur = con.cursor()
         cur.execute("DELETE FROM global_memories WHERE user_id = ?", (user_id,))
+        if memory_dedupe is not None:
+            memory_dedupe.remove_where(con, "global", user_id)
+        if memory_versions is not None:
+            memory_versions.bump(con, "global", user_id)
         con.commit()
+        if vector_segments is not None:
+            vector_segments.invalidate("global", user_id)
         return cur.rowcount
 
 
@@ -228,7 +294,7 @@ def search_text(
 
     q = _norm_text(q)
 
-    with _conn() as con:
+    with _conn(user_id) as con:
         cur = con.cursor()
         cur.execute(
             """
@@ -246,6 +312,24 @@ def search_text(
         return items, len(items)
 
 
+def _hydrate(ids: List[int], user_id: Optional[str] = None) -> Dict[int, sqlite3.Row]:
+    """Segment araması adayları → satırlar (silinmiş id'ler dönmez)."""
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    with _conn(user_id) as con:
+        rows = con.execute(
+            f"""
+            SELECT id, user_id, text, meta,
+                   emb_version, model, dim, created_at, updated_at
+            FROM global_memories
+            WHERE id IN ({placeholders})
+            """,
+            ids,
+        ).fetchall()
+    return {int(r["id"]): r for r in rows}
+
+
 def search_embed(
     user_id: str,
     query_text: str,
@@ -253,33 +337,58 @@ def search_embed(
     candidate_limit: int = 500,
 ) -> Tuple[List[Dict[str, Any]], int]:
 
+    """
+    Embedding tabanlı benzerlik araması (cosine).
+    Segmentli depo açıksa kullanıcının tüm hafızası taranır (candidate_limit yok sayılır);
+    kapalıysa en yeni candidate_limit kayıt taranır.
+    """
     query_text = _norm_text(query_text)
-    q_emb = np.asarray(embed_encode([query_text])[0], dtype=np.float32)
+    q_embs, q_spaces = embed_encode_versioned([query_text])
+    q_emb = np.asarray(q_embs[0], dtype=np.float32)
+    # Yalnızca sorguyla aynı vektör uzayındaki kayıtlar skorlanır; segmentler yalnızca
+    # sağlayıcı uzayını indeksler, yedek (yerel) sorgu doğrudan taramaya düşer
+    q_space = tuple(q_spaces[0])
+
+    if (
+        vector_segments is not None
+        and vector_segments.SEGMENTS_ENABLED
+        and q_space == vector_segments.SEGMENT_SPACE
+    ):
+        hits = vector_segments.search(
+            "global", user_id, None, q_emb, topk, lambda ids: _hydrate(ids, user_id)
+        )
+        items = []
+        for row, score in hits:
+            item = _row_to_item(row)
+            item["meta"]["similarity"] = float(score)
+            items.append(item)
+        return items, len(items)
 
-    with _conn() as con:
+    with _conn(user_id) as con:
         cur = con.cursor()
         cur.execute(
             """
             SELECT id, user_id, text, meta, embedding,
                    emb_version, model, dim, created_at, updated_at
             FROM global_memories
-            WHERE user_id = ?
+            WHERE user_id = ? AND emb_version = ? AND model = ?
             ORDER BY id DESC
             LIMIT ?
             """,
-            (user_id, candidate_limit),
+            (user_id, *q_space, candidate_limit),
         )
         rows = cur.fetchall()
 
-    scored: List[Tuple[float, sqlite3.Row]] = []
-    for r in rows:
-        emb = _from_blob(r["embedding"])
-        score = _cosine(q_emb, emb)
-        scored.append((score, r))
-
-    scored.sort(key=lambda x: x[0], reverse=True)
+    # Tek matris çarpımı + argpartition top-k (satır satır kosinüs yerine);
+    # boyutu sorguyla uyuşmayan eski kayıtlar atlanır
+    dim = q_emb.shape[0]
+    embs = [_from_blob(r["embedding"]) for r in rows]
+    keep = [i for i, e in enumerate(embs) if e.shape[0] == dim]
+    top: List[Tuple[float, sqlite3.Row]] = []
+    if keep:
+        mat = np.stack([embs[i] for i in keep])
+        top = [(s, rows[keep[j]]) for j, s in similarity.knn(q_emb, mat, topk)]
 
-    top = scored[:topk]
     items = [_row_to_item(r) for (s, r) in top]
 
     # skorları meta içine yaz
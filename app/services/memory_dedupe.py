@@ -0,0 +1,326 @@
+# app/services/memory_dedupe.py
+from __future__ import annotations
+
+"""
+LTM yazımı sırasında anlamsal yakın-kopya (near-duplicate) tespiti.
+
+- Aday bulma: rastgele hiperdüzlem LSH (SimHash). Embedding'in LSH_BITS adet
+  hiperdüzleme göre işaret bitleri alınır, LSH_BANDS banda bölünür; her bant
+  (scope, user, [session]) başına memory_signatures tablosunda bir kovaya yazılır.
+  En az bir bandı çakışan kayıtlar adaydır.
+- Doğrulama: adayların embedding'leriyle kesin kosinüs; eşik (MEMORY_DEDUP_THRESHOLD)
+  üstündeki en yakın kayıt yakın-kopyadır.
+- Birleştirme: yeni satır eklenmez; mevcut kaydın updated_at'i ve meta'sı
+  (dup_count, last_seen, eksik anahtarlar) güncellenir.
+- Çelişki: embedding'ler yakın olsa da olumsuzluk ("not", "değil", "-miyor"…) veya sayı
+  belirteçleri farklıysa (ör. "allergic" ↔ "not allergic", "30 yaşında" ↔ "31 yaşında")
+  birleştirilmez; en son söylenen geçerlidir (supersede): eski kayıt silinir, yeni metin
+  eski metni meta'da (superseded_texts) taşıyarak yeni satır olarak eklenir.
+
+Tüm fonksiyonlar çağıranın bağlantısını (con) kullanır; böylece arama + ekleme
+aynı işlemde (transaction) yapılır.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        MEMORY_DEDUP_ENABLED = os.getenv("MEMORY_DEDUP_ENABLED", "true").lower() == "true"
+        MEMORY_DEDUP_THRESHOLD = float(os.getenv("MEMORY_DEDUP_THRESHOLD", "0.92"))
+        MEMORY_DEDUP_LSH_BANDS = int(os.getenv("MEMORY_DEDUP_LSH_BANDS", "8"))
+        MEMORY_DEDUP_LSH_BAND_BITS = int(os.getenv("MEMORY_DEDUP_LSH_BAND_BITS", "8"))
+
+    settings = _Fallback()  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+DEDUP_ENABLED: bool = bool(getattr(settings, "MEMORY_DEDUP_ENABLED", True))
+DEDUP_THRESHOLD: float = float(getattr(settings, "MEMORY_DEDUP_THRESHOLD", 0.92))
+LSH_BANDS: int = max(1, int(getattr(settings, "MEMORY_DEDUP_LSH_BANDS", 8)))
+LSH_BAND_BITS: int = min(62, max(1, int(getattr(settings, "MEMORY_DEDUP_LSH_BAND_BITS", 8))))
+LSH_BITS: int = LSH_BANDS * LSH_BAND_BITS
+
+# Hiperdüzlemler sabit tohumla üretilir: imzalar süreçler arasında kararlıdır
+_SEED = 20240611
+
+_TABLES = {"global": "global_memories", "local": "local_memories"}
+
+# Çelişki belirteçleri: olumsuzluk sözcükleri / ekleri ve sayılar
+_NEGATION_WORDS = frozenset({
+    "not", "no", "never", "none", "nobody", "nothing", "neither", "nor", "without",
+    "değil", "yok", "hiç", "hiçbir", "asla", "hayır",
+})
+_NEGATION_SUFFIX_RE = re.compile(r"\w+(?:m[ıiuü]yor|m[ae]d[ıiuü])\w*$")
+_TOKEN_RE = re.compile(r"[^\W\d_]+(?:'t)?|\d+(?:[.,]\d+)?", re.UNICODE)
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?$")
+_MAX_SUPERSEDED = 5
+
+_planes_lock = threading.Lock()
+_planes: Dict[int, np.ndarray] = {}
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
+
+def _hyperplanes(dim: int) -> np.ndarray:
+    with _planes_lock:
+        planes = _planes.get(dim)
+        if planes is None:
+            rng = np.random.default_rng(_SEED)
+            planes = rng.standard_normal((LSH_BITS, dim)).astype(np.float32)
+            _planes[dim] = planes
+        return planes
+
+
+# ---------------------------
+# İmza
+# ---------------------------
+def band_buckets(vec: Sequence[float]) -> List[Tuple[int, int]]:
+    """Embedding → [(band, bucket), ...] (LSH_BANDS adet)."""
+    v = np.asarray(vec, dtype=np.float32).ravel()
+    bits = (_hyperplanes(v.shape[0]) @ v) > 0
+    weights = 1 << np.arange(LSH_BAND_BITS, dtype=np.int64)
+    buckets = bits.reshape(LSH_BANDS, LSH_BAND_BITS).astype(np.int64) @ weights
+    return [(band, int(b)) for band, b in enumerate(buckets)]
+
+
+def index(
+    con: sqlite3.Connection,
+    scope: str,
+    memory_id: int,
+    user_id: str,
+    session_id: Optional[str],
+    vec: Sequence[float],
+) -> None:
+    """Kaydın bant kovalarını memory_signatures'a yazar (varsa yenisiyle değiştirir)."""
+    con.execute("DELETE FROM memory_signatures WHERE scope = ? AND memory_id = ?", (scope, memory_id))
+    con.executemany(
+        """
+        INSERT INTO memory_signatures (scope, memory_id, user_id, session_id, band, bucket)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [(scope, memory_id, user_id, session_id or "", band, bucket) for band, bucket in band_buckets(vec)],
+    )
+
+
+def remove(con: sqlite3.Connection, scope: str, memory_ids: Iterable[int]) -> None:
+    ids = [(scope, int(i)) for i in memory_ids]
+    if ids:
+        con.executemany("DELETE FROM memory_signatures WHERE scope = ? AND memory_id = ?", ids)
+
+
+def remove_where(con: sqlite3.Connection, scope: str, user_id: str, session_id: Optional[str] = None) -> None:
+    if session_id is None:
+        con.execute("DELETE FROM memory_signatures WHERE scope = ? AND user_id = ?", (scope, user_id))
+    else:
+        con.execute(
+            "DELETE FROM memory_signatures WHERE scope = ? AND user_id = ? AND session_id = ?",
+            (scope, user_id, session_id),
+        )
+
+
+# ---------------------------
+# Arama / birleştirme
+# ---------------------------
+def find_duplicate(
+    con: sqlite3.Connection,
+    scope: str,
+    user_id: str,
+    session_id: Optional[str],
+    vec: Sequence[float],
+    threshold: Optional[float] = None,
+    *,
+    space: Optional[Tuple[str, str]] = None,
+) -> Optional[Tuple[int, float]]:
+    """
+    Aynı kullanıcı (local'de aynı session) içinde eşik üstü en yakın kaydı bulur.
+    space=(emb_version, model) verilirse yalnızca aynı vektör uzayındaki adaylar
+    karşılaştırılır (yerel yedek ve sağlayıcı vektörleri aynı boyutta olsa da kıyaslanamaz).
+    Dönüş: (memory_id, cosine) | None
+    """
+    if not DEDUP_ENABLED:
+        return None
+    thr = DEDUP_THRESHOLD if threshold is None else float(threshold)
+    q = np.asarray(vec, dtype=np.float32).ravel()
+    qn = float(np.linalg.norm(q))
+    if qn == 0.0:
+        return None
+
+    buckets = band_buckets(q)
+    cond = " OR ".join(["(band = ? AND bucket = ?)"] * len(buckets))
+    params: List[Any] = [scope, user_id, session_id or ""]
+    for band, bucket in buckets:
+        params.extend((band, bucket))
+    rows = con.execute(
+        f"""
+        SELECT DISTINCT memory_id FROM memory_signatures
+        WHERE scope = ? AND user_id = ? AND session_id = ? AND ({cond})
+        """,
+        params,
+    ).fetchall()
+    cand_ids = [int(r[0]) for r in rows]
+    if not cand_ids:
+        return None
+
+    table = _TABLES[scope]
+    placeholders = ",".join("?" * len(cand_ids))
+    sql = f"SELECT id, embedding FROM {table} WHERE id IN ({placeholders})"
+    sql_params: List[Any] = list(cand_ids)
+    if space is not None:
+        sql += " AND emb_version = ? AND model = ?"
+        sql_params.extend(space)
+    emb_rows = con.execute(sql, sql_params).fetchall()
+
+    ids: List[int] = []
+    mats: List[np.ndarray] = []
+    for r in emb_rows:
+        e = np.frombuffer(r[1], dtype=np.float32)
+        if e.shape == q.shape:
+            ids.append(int(r[0]))
+            mats.append(e)
+    if not ids:
+        return None
+
+    m = np.stack(mats)
+    norms = np.linalg.norm(m, axis=1) * qn
+    sims = (m @ q) / np.where(norms > 0, norms, 1.0)
+    best = int(np.argmax(sims))
+    score = float(sims[best])
+    if score < thr:
+        _incr("memory_dedup_candidate_rejected")
+        return None
+    return ids[best], score
+
+
+def merge(
+    con: sqlite3.Connection,
+    scope: str,
+    memory_id: int,
+    meta: Optional[Dict[str, Any]] = None,
+    *,
+    similarity: Optional[float] = None,
+) -> None:
+    """Yakın-kopyayı mevcut kayda katar: updated_at + meta (dup_count, last_seen)."""
+    table = _TABLES[scope]
+    row = con.execute(f"SELECT meta FROM {table} WHERE id = ?", (memory_id,)).fetchone()
+    if row is None:
+        return
+    try:
+        current = json.loads(row[0]) if row[0] else {}
+    except Exception:
+        current = {}
+
+    ts = int(time.time())
+    for k, v in (meta or {}).items():
+        if k == "confidence":
+            try:
+                current[k] = max(float(current.get(k, 0.0)), float(v))
+            except (TypeError, ValueError):
+                current.setdefault(k, v)
+        else:
+            current.setdefault(k, v)
+    current["dup_count"] = int(current.get("dup_count", 0)) + 1
+    current["last_seen"] = ts
+    if similarity is not None:
+        current["last_dup_similarity"] = round(float(similarity), 4)
+
+    con.execute(
+        f"UPDATE {table} SET meta = ?, updated_at = ? WHERE id = ?",
+        (json.dumps(current, ensure_ascii=False), ts, memory_id),
+    )
+    _incr(f"memory_dedup_merged_{scope}")
+
+
+def _polarity(text: str) -> Tuple[int, Tuple[str, ...]]:
+    """(olumsuzluk belirteci sayısı, sıralı sayılar)."""
+    neg = 0
+    nums: List[str] = []
+    for tok in _TOKEN_RE.findall((text or "").replace("’", "'").lower()):
+        if _NUMBER_RE.match(tok):
+            nums.append(tok.replace(",", "."))
+        elif tok in _NEGATION_WORDS or tok.endswith("n't") or _NEGATION_SUFFIX_RE.match(tok):
+            neg += 1
+    return neg, tuple(sorted(nums))
+
+
+def conflicts(old_text: str, new_text: str) -> bool:
+    """
+    Yakın iki metin birbirini çürütüyor mu: olumsuzluk sayısının paritesi (olumlu ↔
+    olumsuz) veya içerdikleri sayılar farklıysa True.
+    """
+    old_neg, old_nums = _polarity(old_text)
+    new_neg, new_nums = _polarity(new_text)
+    return (old_neg % 2) != (new_neg % 2) or old_nums != new_nums
+
+
+def supersede(
+    con: sqlite3.Connection,
+    scope: str,
+    memory_id: int,
+    text: str,
+    meta: Optional[Dict[str, Any]] = None,
+    *,
+    similarity: Optional[float] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Yeni metin mevcut yakın kaydı çürütüyorsa eski kaydı (ve imzalarını) siler ve yeni
+    satır için meta döner (superseded_texts, dup_count taşınır). Çelişki yoksa None:
+    çağıran merge() ile birleştirir.
+    """
+    table = _TABLES[scope]
+    row = con.execute(f"SELECT text, meta FROM {table} WHERE id = ?", (memory_id,)).fetchone()
+    if row is None or not conflicts(row[0], text):
+        return None
+    try:
+        old_meta = json.loads(row[1]) if row[1] else {}
+    except Exception:
+        old_meta = {}
+
+    out = dict(meta or {})
+    history = [str(t) for t in old_meta.get("superseded_texts", [])] + [row[0]]
+    out["superseded_texts"] = history[-_MAX_SUPERSEDED:]
+    out["supersedes"] = int(memory_id)
+    out["dup_count"] = int(old_meta.get("dup_count", 0))
+    if similarity is not None:
+        out["last_dup_similarity"] = round(float(similarity), 4)
+
+    con.execute(f"DELETE FROM {table} WHERE id = ?", (memory_id,))
+    remove(con, scope, [memory_id])
+    _incr(f"memory_dedup_superseded_{scope}")
+    return out
+
+
+# ---------------------------
+# Backfill
+# ---------------------------
+def backfill(con: sqlite3.Connection, scope: str, user_id: Optional[str] = None) -> int:
+    """Mevcut kayıtların imzalarını (yeniden) üretir. Dönüş: işlenen kayıt sayısı."""
+    table = _TABLES[scope]
+    session_col = "session_id" if scope == "local" else "NULL"
+    sql = f"SELECT id, user_id, {session_col} AS session_id, embedding FROM {table}"
+    params: List[Any] = []
+    if user_id:
+        sql += " WHERE user_id = ?"
+        params.append(user_id)
+    n = 0
+    for r in con.execute(sql, params).fetchall():
+        index(con, scope, int(r[0]), r[1], r[2], np.frombuffer(r[3], dtype=np.float32))
+        n += 1
+    return n
@@ -3,14 +3,14 @@ from __future__ import annotations
 
 import json
 import time
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 # Opsiyonel PII filtresi
 try:
-    from app.services.pii_guard import scrub_text  # type: ignore
+    from app.services.pii_guard import scrub_texts  # type: ignore
 except Exception:
-    def scrub_text(x: str) -> str:  # fallback
-        return x
+    def scrub_texts(xs: List[str]) -> List[str]:  # fallback
+        return list(xs)
 
 # LLM client (Gemini / benzetimi) – opsiyonel import
 try:
@@ -18,11 +18,24 @@ try:
 except Exception:
     llm_client = None  # type: ignore
 
+# LLM öncesi ucuz write-back kapısı – opsiyonel import
+try:
+    from app.services import writeback_gate  # type: ignore
+except Exception:
+    writeback_gate = None  # type: ignore
+
+# Tek çağrı modunda ana üretimle gelen aday sayısı üst sınırı (prompt: 0-5 madde)
+MAX_INLINE_CANDIDATES = 5
+
+
+def _squash(s: str) -> str:
+    """Basit whitespace temizliği."""
+    return " ".join((s or "").split())
+
 
-def _clean(s: str) -> str:
-    """Basit whitespace temizliği + opsiyonel PII maskesi."""
-    s = (s or "").strip()
-    return scrub_text(" ".join(s.split()))
+def _clean_many(texts: List[str]) -> List[str]:
+    """Whitespace temizliği + opsiyonel PII maskesi (tüm metinler tek taramada)."""
+    return scrub_texts([_squash(t) for t in texts])
 
 
 def _build_prompt(user_message: str, assistant_reply: str) -> str:
@@ -57,6 +70,37 @@ Rules:
 """.strip()
 
 
+def _normalize_candidates(data: Any) -> List[Dict[str, Any]]:
+    """LLM çıktısındaki ham memory listesini doğrular: scope/text kontrolü + temizlik."""
+    if not isinstance(data, list):
+        return []
+
+    candidates: List[Dict[str, Any]] = []
+    items = [
+        item for item in data
+        if isinstance(item, dict) and str(item.get("scope", "")).lower().strip() in ("local", "global")
+    ]
+    # text + reason alanları birlikte maskelenir: [t0, r0, t1, r1, ...]
+    cleaned = _clean_many(
+        [str(item.get(k, "")) for item in items for k in ("text", "reason")]
+    )
+
+    for i, item in enumerate(items):
+        scope = str(item.get("scope", "")).lower().strip()
+        text, reason = cleaned[2 * i], cleaned[2 * i + 1]
+
+        if not text:
+            continue
+
+        candidates.append({
+            "scope": scope,
+            "text": text,
+            "reason": reason or None,
+        })
+
+    return candidates
+
+
 def _llm_propose_memories(
     user_message: str,
     assistant_reply: str,
@@ -68,7 +112,7 @@ def _llm_propose_memories(
     prompt = _build_prompt(user_message, assistant_reply)
 
     try:
-        llm_out = llm_client.generate(prompt=prompt)  # type: ignore
+        llm_out = llm_client.generate(prompt=prompt, call_site="extraction")  # type: ignore
     except Exception:
         return []
 
@@ -87,31 +131,42 @@ def _llm_propose_memories(
     except Exception:
         return []
 
-    if not isinstance(data, list):
-        return []
+    return _normalize_candidates(data)
 
-    candidates: List[Dict[str, Any]] = []
 
-    for item in data:
-        if not isinstance(item, dict):
-            continue
+def _finalize(candidates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Adayları dedupe eder ve write-back aksiyonlarına (meta ile) dönüştürür."""
+    results: List[Dict[str, Any]] = []
+    if not candidates:
+        return results
 
-        scope = str(item.get("scope", "")).lower().strip()
-        text = _clean(str(item.get("text", "")))
-        reason = _clean(str(item.get("reason", "")))
+    # Dedup + meta ekle
+    seen = set()
+    now_ts = int(time.time())
+
+    for c in candidates:
+        scope = c.get("scope")
+        # Adaylar _normalize_candidates'ta maskelendi; burada yalnızca whitespace
+        txt = _squash(c.get("text", ""))
 
-        if scope not in ("local", "global"):
+        if not txt or scope not in ("local", "global"):
             continue
-        if not text:
+
+        key = f"{scope}:{txt.lower()}"
+        if key in seen:
             continue
+        seen.add(key)
 
-        candidates.append({
+        results.append({
             "scope": scope,
-            "text": text,
-            "reason": reason or None,
+            "text": txt,
+            "meta": {
+                "reason": c.get("reason"),
+                "ts": now_ts,
+            },
         })
 
-    return candidates
+    return results
 
 
 def extract_writebacks(
@@ -121,44 +176,36 @@ def extract_writebacks(
     user_message: str,
     assistant_reply: str,
     sources: List[Dict[str, Any]],
+    candidates: Optional[List[Dict[str, Any]]] = None,
 ) -> List[Dict[str, Any]]:
     """
     Kullanıcı mesajı + asistan yanıtından Local/Global memory çıkarımı.
+
+    candidates verilirse (tek çağrı modunda ana üretimle birlikte gelen adaylar)
+    LLM'e tekrar gidilmez; yalnızca doğrulama + dedupe yapılır.
     """
     results: List[Dict[str, Any]] = []
 
+    if candidates is not None:
+        return _finalize(_normalize_candidates(candidates)[:MAX_INLINE_CANDIDATES])
+
+    # 0) Ucuz yerel kapı: "tamam", "teşekkürler", saf takip soruları vb. için LLM'e gitme
+    decision = None
+    if writeback_gate is not None:
+        try:
+            decision = writeback_gate.decide(user_message, assistant_reply)
+        except Exception:
+            decision = None
+    if decision is not None and not decision.get("extract", True):
+        return results
+
     # 1) LLM adayları
     candidates = _llm_propose_memories(
         user_message=user_message,
         assistant_reply=assistant_reply,
     )
 
-    if not candidates:
-        return results
-
-    # 2) Dedup + meta ekle
-    seen = set()
-    now_ts = int(time.time())
-
-    for c in candidates:
-        scope = c.get("scope")
-        txt = _clean(c.get("text", ""))
-
-        if not txt or scope not in ("local", "global"):
-            continue
-
-        key = f"{scope}:{txt.lower()}"
-        if key in seen:
-            continue
-        seen.add(key)
+    if decision is not None and decision.get("sampled"):
+        writeback_gate.record_sample_result(decision, len(candidates))  # type: ignore
 
-        results.append({
-            "scope": scope,
-            "text": txt,
-            "meta": {
-                "reason": c.get("reason"),
-                "ts": now_ts,
-            },
-        })
-
-    return results
+    return _finalize(candidates)
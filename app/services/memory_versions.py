@@ -0,0 +1,54 @@
+# app/services/memory_versions.py
+from __future__ import annotations
+
+"""
+LTM sürüm sayaçları: sahip başına (kullanıcı [+ session]) artan tamsayı.
+
+- Global LTM sahibi (user_id, ''), local LTM sahibi (user_id, session_id) satırıdır.
+- LTM'yi değiştiren her yazma (add / delete / clear, birleştirme, retention) sayacı
+  AYNI işlem içinde bump() ile artırır; commit edilmeyen yazma sayacı da artırmaz.
+- Sayaçlar kullanıcının shard'ındaki memory_versions tablosunda tutulur: tüm worker
+  süreçleri aynı değeri görür. Önbellekler (retrieval_cache) girdiyi oluştururken okunan
+  sürümü saklar; sürüm değiştiyse girdi bayattır.
+"""
+
+import time
+from typing import Optional, Tuple
+
+from app.db.repository import path_for_user, pooled_conn
+
+_UPSERT = """
+    INSERT INTO memory_versions (user_id, session_id, version, updated_at)
+    VALUES (?, ?, 1, ?)
+    ON CONFLICT(user_id, session_id)
+    DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+"""
+
+
+def _owner_session(scope: str, session_id: Optional[str]) -> str:
+    return (session_id or "") if scope == "local" else ""
+
+
+def bump(con, scope: str, user_id: str, session_id: Optional[str] = None) -> None:
+    """Sahibin sürümünü artırır; commit çağıranın işlemiyle birlikte yapılır."""
+    con.execute(_UPSERT, (str(user_id), _owner_session(scope, session_id), int(time.time())))
+
+
+def current(user_id: str, session_id: Optional[str] = None) -> Tuple[int, int]:
+    """
+    (global sürüm, local sürüm) – hiç yazılmamış sahip için 0.
+    Tek indeksli okuma (birincil anahtar); session_id yoksa local sürüm 0'dır.
+    """
+    sid = session_id or ""
+    g = loc = 0
+    with pooled_conn(path_for_user(user_id)) as con:
+        rows = con.execute(
+            "SELECT session_id, version FROM memory_versions WHERE user_id = ? AND session_id IN ('', ?)",
+            (str(user_id), sid),
+        ).fetchall()
+    for r in rows:
+        if r["session_id"] == "":
+            g = int(r["version"])
+        if sid and r["session_id"] == sid:
+            loc = int(r["version"])
+    return g, loc
@@ -1,53 +1,184 @@
 # app/services/pii_guard.py
 from __future__ import annotations
 
+"""
+Basit PII maskeleme: e-posta, IBAN, kredi kartı, T.C. kimlik benzeri ID, telefon.
+İleri seviye (NLP tabanlı) PII tespiti istenirse bu modül genişletilir.
+
+Tek geçişli tarayıcı: tüm türler tek bir birleşik desenle, metin üzerinde bir kez
+soldan sağa bulunur (scan), ardından span'lar türüne göre maskelenir (scrub_text).
+Desen doğrusal zamanlı kalacak şekilde yazılmıştır:
+- Alternatiflerde iç içe / örtüşen niceleyici yok (ör. eski `(?:\\d[ -]*?){13,19}`);
+  rakam dizisi tek bir karakter sınıfı koşusudur, ardından koşul gelmez → geri izleme yok.
+- E-posta yerel kısmı yalnızca koşu başında denenir (lookbehind); böylece '@' içermeyen
+  uzun bir kelime her konumda yeniden taranmaz.
+- Telefon / kart / kimlik ayrımı eşleşme sonrası, rakam sayısıyla Python'da yapılır.
+Öncelik: e-posta > IBAN > rakam dizisi (kart → kimlik → telefon).
+
+Maskeler: e-posta yerel kısmın ilk 2 karakterini ve alan adını, IBAN yalnızca ülke
+kodunu korur; kart, kimlik ve telefon tamamen "***" olur (hiçbir rakam sızmaz).
+"""
+
 import re
-from typing import Callable
+from typing import Iterable, List, Optional, Tuple
+
+# Tek geçiş deseni (alternatif sırası önceliktir: aynı konumda ilk eşleşen kazanır)
+_SCAN_RE = re.compile(
+    r"""
+    (?P<email>
+        (?<![A-Za-z0-9._%+\-])[A-Za-z0-9._%+\-]+     # yerel kısım: yalnızca koşu başında
+        @[A-Za-z0-9.\-]+\.[A-Za-z]{2,}
+    )
+  | (?P<iban>
+        \b(?:
+            [A-Za-z]{2}\d{2}[A-Za-z0-9]{10,30}                      # bitişik (TR33000610...)
+          | [A-Z]{2}\d{2}(?:\x20[A-Z0-9]{4}){2,7}(?:\x20[A-Z0-9]{1,3})?  # 4'lü gruplar
+        )\b
+    )
+  | (?P<num>\+?\(?\d[\d\x20\t()\-]*)                # rakam koşusu; ayrım sonradan
+    """,
+    re.VERBOSE,
+)
+
+# Rakam koşusunun sonundaki ayırıcılar span'a dahil edilmez
+_NUM_TRAILING = " \t-("
+
+# Eşikler
+PHONE_MIN_DIGITS = 7
+NATIONAL_ID_DIGITS = 11
+CARD_MIN_DIGITS = 13
+CARD_MAX_DIGITS = 19
+
+# scrub_texts birleştirme ayracı: hiçbir desen sınıfında yok, span'lar bunu aşamaz
+_BATCH_SEP = "\x00"
 
-# Basit PII maskeleme kuralları.
-# İleri seviye (NLP tabanlı) PII tespiti istenirse bu modül genişletilir.
+Span = Tuple[int, int, str]
 
-# E-posta
-EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-]+)@([A-Za-z0-9.-]+\.[A-Za-z]{2,})", re.UNICODE)
-# Telefon (uluslararası gevşek desen, 7+ rakam)
-PHONE_RE = re.compile(r"(?:(?:\+?\d{1,3}\s?)?(?:\(?\d{2,4}\)?\s?)?[\d\s\-]{7,})")
-# T.C. Kimlik / ulusal ID benzeri (11 rakam), çok gevşek tutuyoruz – gerçek doğrulama yapılmıyor
-NATIONAL_ID_RE = re.compile(r"\b\d{11}\b")
-# IBAN (TR/GENEL gevşek)
-IBAN_RE = re.compile(r"\b[A-Z]{2}\d{2}[A-Z0-9]{10,30}\b", re.IGNORECASE)
-# Kredi kartı (13–19 rakam, boşluk/çizgi ayırıcılarla)
-CREDIT_CARD_RE = re.compile(r"\b(?:\d[ -]*?){13,19}\b")
 
-MASK_EMAIL = lambda m: f"{m.group(1)[:2]}***@{m.group(2)}"
-MASK_GENERIC = lambda s: "***"
+# ---------------------------
+# Sınıflandırma
+# ---------------------------
+def _digit_count(s: str) -> int:
+    return sum(1 for c in s if c.isdecimal())
 
-def _mask_email(text: str) -> str:
-    return EMAIL_RE.sub(MASK_EMAIL, text)
 
-def _mask_phone(text: str) -> str:
-    # Sadece rakam yoğun dizileri masker; tarihi/ID’leri yanlış pozitiflememek için uzunluk eşiği var.
-    return PHONE_RE.sub(lambda m: "***" if len(re.sub(r"\D", "", m.group(0))) >= 7 else m.group(0), text)
+def _luhn_ok(digits: str) -> bool:
+    total = 0
+    for i, c in enumerate(reversed(digits)):
+        d = int(c)
+        if i % 2 == 1:
+            d = d * 2 - 9 if d > 4 else d * 2
+        total += d
+    return total % 10 == 0
+
+
+def _classify_number(s: str) -> Optional[str]:
+    """Rakam koşusunu card | national_id | phone olarak sınıflar; PII değilse None."""
+    n = _digit_count(s)
+    if n < PHONE_MIN_DIGITS:
+        return None
+    if CARD_MIN_DIGITS <= n <= CARD_MAX_DIGITS and not any(c in s for c in "+()"):
+        if _luhn_ok("".join(c for c in s if c.isdecimal())):
+            return "card"
+    if n == NATIONAL_ID_DIGITS and s.isdecimal():
+        return "national_id"
+    return "phone"
+
+
+# ---------------------------
+# Tarama
+# ---------------------------
+def scan(text: str) -> List[Span]:
+    """
+    Metindeki PII span'larını tek geçişte bulur: [(başlangıç, bitiş, tür)], soldan sağa,
+    örtüşmesiz. Tür: email | iban | card | national_id | phone.
+    """
+    spans: List[Span] = []
+    if not text:
+        return spans
+    for m in _SCAN_RE.finditer(text):
+        kind = m.lastgroup
+        start, end = m.span()
+        if kind == "num":
+            s = m.group().rstrip(_NUM_TRAILING)
+            # Kapanmamış parantezle biten koşu: ')' metne aittir ("(555 123 4567)")
+            if s.endswith(")") and s.count(")") > s.count("("):
+                s = s[:-1].rstrip(_NUM_TRAILING)
+            kind = _classify_number(s)
+            if kind is None:
+                continue
+            end = start + len(s)
+        spans.append((start, end, kind))
+    return spans
 
-def _mask_national_id(text: str) -> str:
-    return NATIONAL_ID_RE.sub(MASK_GENERIC, text)
 
-def _mask_iban(text: str) -> str:
-    return IBAN_RE.sub(lambda m: f"{m.group(0)[:6]}***{m.group(0)[-4:]}", text)
+# ---------------------------
+# Maskeleme
+# ---------------------------
+def _mask_email(s: str) -> str:
+    local, _, domain = s.partition("@")
+    return f"{local[:2]}***@{domain}"
+
+
+def _mask_iban(s: str) -> str:
+    # Yalnızca ülke kodu: kontrol rakamları / banka kodu / hesap numarası gizlenir
+    return f"{s[:2]}***"
+
+
+def _mask_generic(s: str) -> str:
+    return "***"
+
+
+MASKERS = {
+    "email": _mask_email,
+    "iban": _mask_iban,
+    "card": _mask_generic,
+    "national_id": _mask_generic,
+    "phone": _mask_generic,
+}
+
+
+def _apply(text: str, spans: List[Span]) -> str:
+    if not spans:
+        return text
+    parts: List[str] = []
+    pos = 0
+    for start, end, kind in spans:
+        parts.append(text[pos:start])
+        parts.append(MASKERS[kind](text[start:end]))
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
 
-def _mask_credit_card(text: str) -> str:
-    return CREDIT_CARD_RE.sub(lambda m: f"{m.group(0)[:4]} **** **** {m.group(0)[-4:]}", text)
 
 def scrub_text(text: str) -> str:
     """
-    Metindeki temel PII ögelerini maskeleyip döndürür.
-    Sıra önemlidir: önce e-posta, ardından daha geniş desenler.
+    Metindeki temel PII ögelerini maskeleyip döndürür (tek tarama + maskeleme).
+    Süre metin uzunluğuyla doğrusal büyür; kötü niyetli girdiler de dahil.
     """
     if not text:
         return text
     out = str(text)
-    out = _mask_email(out)
-    out = _mask_phone(out)
-    out = _mask_national_id(out)
-    out = _mask_iban(out)
-    out = _mask_credit_card(out)
+    return _apply(out, scan(out))
+
+
+def scrub_texts(texts: Iterable[str]) -> List[str]:
+    """
+    Çok sayıda metni maskeler. Metinler ayraçla birleştirilip tek taramada işlenir
+    (çağrı başına sabit maliyet bir kez ödenir); ayracı içeren girdi varsa tek tek işlenir.
+    Boş / None ögeler olduğu gibi döner.
+    """
+    items = list(texts)
+    idx = [i for i, t in enumerate(items) if t]
+    if not idx:
+        return items
+    parts = [str(items[i]) for i in idx]
+    if any(_BATCH_SEP in p for p in parts):
+        scrubbed = [scrub_text(p) for p in parts]
+    else:
+        joined = _BATCH_SEP.join(parts)
+        scrubbed = _apply(joined, scan(joined)).split(_BATCH_SEP)
+    out = list(items)
+    for i, s in zip(idx, scrubbed):
+        out[i] = s
     return out
@@ -0,0 +1,288 @@
+# app/services/provider_scheduler.py
+from __future__ import annotations
+
+"""
+Dış sağlayıcı (LLM / embedding) çağrıları için eşzamanlılık sınırı + öncelikli kuyruk.
+
+- Her sağlayıcının bir ProviderScheduler'ı vardır: aynı anda en fazla `limit` çağrı.
+- Slot bekleyenler öncelik sırasıyla (interactive → background), aynı öncelikte
+  geliş sırasıyla (FIFO) slot alır; boşalan slot doğrudan sıradakine devredilir.
+- Background çağrılar en fazla `background_limit` slot tutabilir; kalan slotlar her
+  zaman interaktif istekler için boş kalır (arka plan işi kotayı tüketemez).
+- Kuyrukta QUEUE_TIMEOUT_S'ten uzun bekleyen veya kuyruk dolu iken gelen çağrı
+  QueueTimeoutError ile hemen düşer (sağlayıcıyı zorlamak yerine hızlı hata);
+  çağıran taraf bunu diğer sağlayıcı hataları gibi fallback'e çevirir.
+- Kuyruk bekleme süreleri "<ad>_queue_wait_ms_<öncelik>" histogramına yazılır.
+
+Öncelik çağrı noktasından (call_site) veya `with background():` bağlamından gelir;
+bağlam contextvar olduğundan run_in_threadpool ile açılan thread'lere de taşınır.
+`with inline():` bağlamındaki çağrılar bir isteğin yanıtını bekletir (ör. /chat içindeki
+distill): background önceliğinde kuyruğa girseler de en fazla PROVIDER_QUEUE_TIMEOUT_S beklerler.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.errors import QueueTimeoutError
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        PROVIDER_SCHED_ENABLED = os.getenv("PROVIDER_SCHED_ENABLED", "true").lower() == "true"
+        LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        LLM_BACKGROUND_MAX_CONCURRENCY = int(os.getenv("LLM_BACKGROUND_MAX_CONCURRENCY", "0"))
+        EMB_MAX_CONCURRENCY = int(os.getenv("EMB_MAX_CONCURRENCY", "4"))
+        EMB_BACKGROUND_MAX_CONCURRENCY = int(os.getenv("EMB_BACKGROUND_MAX_CONCURRENCY", "0"))
+        PROVIDER_QUEUE_TIMEOUT_S = float(os.getenv("PROVIDER_QUEUE_TIMEOUT_S", "5"))
+        PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S = float(os.getenv("PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S", "60"))
+        PROVIDER_QUEUE_MAX = int(os.getenv("PROVIDER_QUEUE_MAX", "256"))
+        PROVIDER_BACKGROUND_SITES = os.getenv("PROVIDER_BACKGROUND_SITES", "extraction,summarizer,consolidation")
+
+    settings = _Fallback()  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+PROVIDER_SCHED_ENABLED: bool = bool(getattr(settings, "PROVIDER_SCHED_ENABLED", True))
+PROVIDER_QUEUE_TIMEOUT_S: float = float(getattr(settings, "PROVIDER_QUEUE_TIMEOUT_S", 5.0))
+PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S: float = float(getattr(settings, "PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S", 60.0))
+PROVIDER_QUEUE_MAX: int = int(getattr(settings, "PROVIDER_QUEUE_MAX", 256))
+PROVIDER_BACKGROUND_SITES = frozenset(
+    s.strip()
+    for s in str(getattr(settings, "PROVIDER_BACKGROUND_SITES", "extraction,summarizer,consolidation")).split(",")
+    if s.strip()
+)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_RANK = {INTERACTIVE: 0, BACKGROUND: 1}
+
+_WAIT_MS_BUCKETS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Açık öncelik bağlamı (None → call_site'tan türetilir, o da yoksa interactive)
+_PRIORITY: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("provider_priority", default=None)
+# İstek yolu içinde mi (kuyruk beklemesi interaktif süreyle sınırlanır)
+_INLINE: contextvars.ContextVar[bool] = contextvars.ContextVar("provider_inline", default=False)
+
+
+# ---------------------------
+# Öncelik
+# ---------------------------
+@contextmanager
+def background() -> Iterator[None]:
+    """Bu bağlamdaki sağlayıcı çağrıları background önceliğinde kuyruğa girer."""
+    token = _PRIORITY.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+@contextmanager
+def inline() -> Iterator[None]:
+    """Bu bağlamdaki çağrılar bir istek yanıtını bekletir; kuyruk süresi interaktif sınırdadır."""
+    token = _INLINE.set(True)
+    try:
+        yield
+    finally:
+        _INLINE.reset(token)
+
+
+def queue_timeout(priority: str) -> float:
+    if priority == BACKGROUND and not _INLINE.get():
+        return PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S
+    return PROVIDER_QUEUE_TIMEOUT_S
+
+
+def current_priority(call_site: Optional[str] = None) -> str:
+    explicit = _PRIORITY.get()
+    if explicit is not None:
+        return explicit
+    if call_site and call_site in PROVIDER_BACKGROUND_SITES:
+        return BACKGROUND
+    return INTERACTIVE
+
+
+# ---------------------------
+# Zamanlayıcı
+# ---------------------------
+class _Waiter:
+    __slots__ = ("priority", "event", "granted", "cancelled")
+
+    def __init__(self, priority: str) -> None:
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class ProviderScheduler:
+    """
+    Sağlayıcı başına slot sayacı + (öncelik, sıra) yığını.
+    limit <= 0 → sınırsız (slot() yalnızca sayım yapar, beklemez).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        *,
+        background_limit: int = 0,
+        queue_max: int = PROVIDER_QUEUE_MAX,
+    ) -> None:
+        self.name = name
+        self.limit = int(limit)
+        # 0 → limitin yarısı (en az 1); limit 1 ise interaktif için yer kalmaz, bilinçli tercih
+        bg = int(background_limit) if background_limit > 0 else max(1, self.limit // 2)
+        self.background_limit = min(bg, self.limit) if self.limit > 0 else bg
+        self.queue_max = int(queue_max)
+        self._lock = threading.Lock()
+        self._heap: List[tuple] = []
+        self._seq = itertools.count()
+        self._active = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._queued = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.granted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    # --- iç ---
+    def _can_run(self, priority: str) -> bool:
+        if self.limit <= 0:
+            return True
+        if self._active[INTERACTIVE] + self._active[BACKGROUND] >= self.limit:
+            return False
+        return priority != BACKGROUND or self._active[BACKGROUND] < self.background_limit
+
+    def _dispatch_locked(self) -> None:
+        """Boşalan slotları kuyruğun başına devreder (kilit tutulurken çağrılır)."""
+        while self._heap:
+            w: _Waiter = self._heap[0][2]
+            if w.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            # Baştaki interaktifse slot yok; background ise sınıra takıldı ve arkasındakiler
+            # de background (yığın sırası) → ikisinde de bekle
+            if not self._can_run(w.priority):
+                break
+            heapq.heappop(self._heap)
+            self._queued[w.priority] -= 1
+            self._active[w.priority] += 1
+            w.granted = True
+            w.event.set()
+
+    def _observe_wait(self, priority: str, wait_s: float) -> None:
+        if METRICS is not None and hasattr(METRICS, "observe"):
+            METRICS.observe(f"{self.name}_queue_wait_ms_{priority}", wait_s * 1000.0, _WAIT_MS_BUCKETS)
+
+    def _incr(self, name: str) -> None:
+        if METRICS is not None and hasattr(METRICS, "incr"):
+            METRICS.incr(f"{self.name}_queue_{name}")
+
+    # --- API ---
+    def acquire(self, priority: str = INTERACTIVE, timeout: Optional[float] = None) -> float:
+        """
+        Slot alır; beklenen süreyi (s) döner. Kuyruk doluysa veya timeout içinde slot
+        gelmezse QueueTimeoutError.
+        """
+        priority = priority if priority in _RANK else INTERACTIVE
+        if timeout is None:
+            timeout = queue_timeout(priority)
+        t0 = time.monotonic()
+        with self._lock:
+            # Sırada bekleyen varken yeni gelen öne geçmez (aynı/üst öncelik FIFO'su korunur)
+            ahead = any(
+                not e[2].cancelled and _RANK[e[2].priority] <= _RANK[priority] for e in self._heap
+            ) if self._heap else False
+            if not ahead and self._can_run(priority):
+                self._active[priority] += 1
+                self.granted += 1
+                self._observe_wait(priority, 0.0)
+                return 0.0
+            if self.queue_max > 0 and len(self._heap) >= self.queue_max:
+                self.rejected += 1
+                self._incr("rejected")
+                raise QueueTimeoutError(
+                    "Sağlayıcı kuyruğu dolu",
+                    details={"provider": self.name, "priority": priority, "queued": len(self._heap)},
+                )
+            w = _Waiter(priority)
+            heapq.heappush(self._heap, (_RANK[priority], next(self._seq), w))
+            self._queued[priority] += 1
+
+        w.event.wait(max(0.0, float(timeout)))
+        with self._lock:
+            if not w.granted:
+                w.cancelled = True
+                self._queued[priority] -= 1
+                self.timed_out += 1
+                # İptal edilen kayıt kuyruğun başını tıkıyorsa sıradakine fırsat ver
+                self._dispatch_locked()
+            else:
+                self.granted += 1
+        wait_s = time.monotonic() - t0
+        self._observe_wait(priority, wait_s)
+        if not w.granted:
+            self._incr("timeouts")
+            raise QueueTimeoutError(
+                "Sağlayıcı kuyruğunda bekleme süresi aşıldı",
+                details={"provider": self.name, "priority": priority, "waited_s": round(wait_s, 3)},
+            )
+        return wait_s
+
+    def release(self, priority: str = INTERACTIVE) -> None:
+        priority = priority if priority in _RANK else INTERACTIVE
+        with self._lock:
+            self._active[priority] = max(0, self._active[priority] - 1)
+            self._dispatch_locked()
+
+    @contextmanager
+    def slot(self, priority: str = INTERACTIVE, timeout: Optional[float] = None) -> Iterator[float]:
+        """with SCHED.slot(prio): ... — çıkışta slot serbest bırakılır; değer bekleme süresidir (s)."""
+        waited = self.acquire(priority, timeout)
+        try:
+            yield waited
+        finally:
+            self.release(priority)
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return self._queued[INTERACTIVE] + self._queued[BACKGROUND]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "background_limit": self.background_limit,
+                "active": dict(self._active),
+                "queued": dict(self._queued),
+                "granted": self.granted,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+
+# Sağlayıcı başına tekil zamanlayıcılar (kapalıyken limit 0 → sınırsız)
+LLM = ProviderScheduler(
+    "llm",
+    int(getattr(settings, "LLM_MAX_CONCURRENCY", 8)) if PROVIDER_SCHED_ENABLED else 0,
+    background_limit=int(getattr(settings, "LLM_BACKGROUND_MAX_CONCURRENCY", 0)),
+)
+EMBED = ProviderScheduler(
+    "embed",
+    int(getattr(settings, "EMB_MAX_CONCURRENCY", 4)) if PROVIDER_SCHED_ENABLED else 0,
+    background_limit=int(getattr(settings, "EMB_BACKGROUND_MAX_CONCURRENCY", 0)),
+)
+
+
+def stats() -> Dict[str, Any]:
+    return {"enabled": PROVIDER_SCHED_ENABLED, "llm": LLM.stats(), "embed": EMBED.stats()}
@@ -0,0 +1,337 @@
+# app/services/resilience.py
+from __future__ import annotations
+
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from app.core.errors import CircuitOpenError, DeadlineExceededError
+
+log = logging.getLogger("resilience")
+
+T = TypeVar("T")
+
+# Sağlayıcı çağrıları bu havuzda koşar; böylece çağıran thread süre sınırında
+# beklemeyi bırakabilir. Asılı kalan bir çağrı thread'i meşgul etmeye devam eder,
+# bu yüzden havuz eşzamanlı istek sayısından geniş tutulur.
+_EXECUTOR = ThreadPoolExecutor(max_workers=64, thread_name_prefix="provider-call")
+
+
+# ---------------------------
+# Gecikme takibi
+# ---------------------------
+class LatencyTracker:
+    """Son N başarılı çağrının süresini tutar; yüzdelik (p50/p95/...) hesaplar."""
+
+    def __init__(self, maxlen: int = 512) -> None:
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(float(seconds))
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            data = sorted(self._samples)
+        idx = min(len(data) - 1, max(0, int(round(p / 100.0 * (len(data) - 1)))))
+        return data[idx]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+# ---------------------------
+# Devre kesici
+# ---------------------------
+class CircuitBreaker:
+    """
+    Kayan zaman penceresinde hata oranı eşiği aşılınca devreyi açar.
+    - closed    : çağrılar serbest
+    - open      : open_s boyunca çağrılar hemen reddedilir (fail fast)
+    - half_open : tek bir deneme çağrısına izin verilir; başarılıysa kapanır
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        error_rate: float = 0.5,
+        min_calls: int = 10,
+        window_s: float = 30.0,
+        open_s: float = 15.0,
+    ) -> None:
+        self.name = name
+        self.error_rate = float(error_rate)
+        self.min_calls = int(min_calls)
+        self.window_s = float(window_s)
+        self.open_s = float(open_s)
+        self._lock = threading.Lock()
+        self._events: Deque[Tuple[float, bool]] = deque()
+        self._state = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _trim(self, now: float) -> None:
+        while self._events and self._events[0][0] < now - self.window_s:
+            self._events.popleft()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == "open":
+                if now - self._opened_at < self.open_s:
+                    return False
+                self._state = "half_open"
+                self._probe_in_flight = False
+            if self._state == "half_open":
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if self._state == "half_open":
+                self._probe_in_flight = False
+                if ok:
+                    self._state = "closed"
+                    self._events.clear()
+                else:
+                    self._state = "open"
+                    self._opened_at = now
+                return
+
+            self._events.append((now, bool(ok)))
+            self._trim(now)
+            total = len(self._events)
+            if total >= self.min_calls:
+                errors = sum(1 for _, good in self._events if not good)
+                if errors / total >= self.error_rate:
+                    self._state = "open"
+                    self._opened_at = now
+                    log.warning("Devre kesici açıldı: %s (hata oranı %.2f)", self.name, errors / total)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.open_s:
+                return "half_open"
+            return self._state
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            total = len(self._events)
+            errors = sum(1 for _, good in self._events if not good)
+        return {
+            "name": self.name,
+            "state": self.state,
+            "window_calls": total,
+            "window_error_rate": (errors / total) if total else 0.0,
+        }
+
+
+# ---------------------------
+# Süre sınırlı çağrı
+# ---------------------------
+def _backoff(attempt: int, base_s: float, max_s: float) -> float:
+    """Üstel geri çekilme + tam jitter (0..cap)."""
+    cap = min(max_s, base_s * (2 ** max(0, attempt - 1)))
+    return random.uniform(0.0, cap)
+
+
+class _AttemptTimeout(Exception):
+    """
+    Denemeye ayrılan süre doldu (havuz beklemesi). fn'in kendi fırlattığı TimeoutError'dan
+    (ör. soket okuma zaman aşımı → yeniden denenir) ayırt etmek için ayrı tiptir.
+    """
+
+
+def _run_attempt(
+    fn: Callable[[], T],
+    *,
+    timeout_s: float,
+    hedge_delay_s: Optional[float],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    fn'i havuzda çalıştırır; timeout_s içinde sonuç yoksa _AttemptTimeout fırlatır.
+    hedge_delay_s verilirse ve ilk çağrı bu sürede bitmezse ikinci (hedge) bir çağrı
+    başlatılır; hangisi önce başarılı biterse onun sonucu döner.
+    """
+    end = time.monotonic() + timeout_s
+    futures: List[Future] = [_EXECUTOR.submit(fn)]
+    hedged = False
+    last_exc: Optional[BaseException] = None
+
+    while futures:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+
+        wait_for = remaining
+        if hedge_delay_s is not None and not hedged:
+            wait_for = min(remaining, hedge_delay_s)
+
+        done, pending = wait(futures, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for f in done:
+            futures.remove(f)
+            exc = f.exception()
+            if exc is None:
+                for p in futures:
+                    p.cancel()
+                return f.result()
+            last_exc = exc
+
+        if not done and hedge_delay_s is not None and not hedged and end - time.monotonic() > 0:
+            hedged = True
+            futures.append(_EXECUTOR.submit(fn))
+            if on_hedge is not None:
+                on_hedge()
+            continue
+
+        if not futures and last_exc is not None:
+            raise last_exc
+
+    for p in futures:
+        p.cancel()
+    if last_exc is not None and not futures:
+        raise last_exc
+    raise _AttemptTimeout(f"attempt exceeded {timeout_s:.3f}s")
+
+
+def call_with_deadline(
+    fn: Callable[[], T],
+    *,
+    deadline_s: float,
+    retries: int = 2,
+    backoff_base_s: float = 0.25,
+    backoff_max_s: float = 2.0,
+    breaker: Optional[CircuitBreaker] = None,
+    tracker: Optional[LatencyTracker] = None,
+    hedge: bool = False,
+    hedge_min_samples: int = 20,
+    hedge_percentile: float = 95.0,
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    fn'i toplam deadline_s süresi içinde, jitter'lı geri çekilmeyle en fazla
+    retries kez yeniden deneyerek çalıştırır.
+    - breaker açıksa CircuitOpenError (çağrı yapılmaz)
+    - süre dolarsa DeadlineExceededError
+    - tüm denemeler hata verirse son hata yeniden fırlatılır
+    hedge=True ve tracker'da yeterli örnek varsa, p95 süresini aşan denemeler için
+    ikinci bir istek paralel başlatılır (tail latency kırpma).
+    """
+    start = time.monotonic()
+    end = start + max(0.0, float(deadline_s))
+    attempt = 0
+    last_exc: Optional[BaseException] = None
+
+    while True:
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError(details={"breaker": breaker.name})
+
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(details={"deadline_s": deadline_s, "attempts": attempt})
+
+        hedge_delay = None
+        if hedge and tracker is not None and len(tracker) >= hedge_min_samples:
+            hedge_delay = tracker.percentile(hedge_percentile)
+
+        t0 = time.monotonic()
+        try:
+            result = _run_attempt(fn, timeout_s=remaining, hedge_delay_s=hedge_delay, on_hedge=on_hedge)
+        except _AttemptTimeout:
+            if breaker is not None:
+                breaker.record(False)
+            raise DeadlineExceededError(details={"deadline_s": deadline_s, "attempts": attempt + 1})
+        except Exception as e:
+            if breaker is not None:
+                breaker.record(False)
+            last_exc = e
+            attempt += 1
+            if attempt > retries:
+                raise
+            sleep_s = _backoff(attempt, backoff_base_s, backoff_max_s)
+            if time.monotonic() + sleep_s >= end:
+                raise DeadlineExceededError(
+                    details={"deadline_s": deadline_s, "attempts": attempt, "last_error": repr(last_exc)}
+                )
+            log.info("Sağlayıcı çağrısı başarısız (%s); %.3fs sonra tekrar denenecek", e, sleep_s)
+            time.sleep(sleep_s)
+            continue
+
+        if breaker is not None:
+            breaker.record(True)
+        if tracker is not None:
+            tracker.record(time.monotonic() - t0)
+        return result
+
+
+_SENTINEL_DONE = object()
+
+
+def iter_with_deadline(
+    gen_fn: Callable[[], Iterator[T]],
+    *,
+    deadline_s: float,
+    breaker: Optional[CircuitBreaker] = None,
+) -> Iterator[T]:
+    """
+    Akış (stream) üreten bir çağrıyı arka planda tüketir; her parça toplam süre
+    sınırı içinde beklenir. Süre dolarsa DeadlineExceededError fırlatılır ve
+    üretici thread bir sonraki parçada durur.
+    """
+    if breaker is not None and not breaker.allow():
+        raise CircuitOpenError(details={"breaker": breaker.name})
+
+    q: "queue.Queue[Any]" = queue.Queue()
+    stop = threading.Event()
+
+    def _produce() -> None:
+        try:
+            for item in gen_fn():
+                if stop.is_set():
+                    return
+                q.put(item)
+            q.put(_SENTINEL_DONE)
+        except BaseException as e:  # hata tüketiciye taşınır
+            q.put(e)
+
+    _EXECUTOR.submit(_produce)
+    end = time.monotonic() + max(0.0, float(deadline_s))
+    try:
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise queue.Empty
+            item = q.get(timeout=remaining)
+            if item is _SENTINEL_DONE:
+                if breaker is not None:
+                    breaker.record(True)
+                return
+            if isinstance(item, BaseException):
+                if breaker is not None:
+                    breaker.record(False)
+                raise item
+            yield item
+    except queue.Empty:
+        if breaker is not None:
+            breaker.record(False)
+        raise DeadlineExceededError(details={"deadline_s": deadline_s})
+    finally:
+        stop.set()
@@ -0,0 +1,409 @@
+# app/services/retention.py
+from __future__ import annotations
+
+"""
+LTM saklama (retention) politikaları ve soğuk arşiv.
+
+Politikalar (0 = kapalı):
+- local  : azami yaş (gün), session başına / kullanıcı başına azami kayıt,
+           boşta (idle) session süresi
+- global : kullanıcı başına azami kayıt
+Yaş ve sıralama COALESCE(updated_at, created_at) üzerinden hesaplanır; en eski
+kayıtlar önce gider.
+
+Politikayı aşan kayıtlar küçük batch'ler halinde (her batch ayrı işlem) ya
+silinir ya da zlib ile sıkıştırılmış JSON olarak archived_memories tablosuna
+taşınır (RETENTION_MODE=archive|delete). Arşivlenen session'lar restore_session()
+ile sıcak tabloya geri alınır.
+
+Arka plan süpürücüsü (start_sweeper) RETENTION_SWEEP_INTERVAL_S aralıkla çalışır.
+"""
+
+import base64
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.db.repository import all_paths, get_conn, path_for_user
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        RETENTION_MODE = os.getenv("RETENTION_MODE", "archive")
+        RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+        RETENTION_MAX_BATCHES = int(os.getenv("RETENTION_MAX_BATCHES", "50"))
+        RETENTION_SWEEP_INTERVAL_S = float(os.getenv("RETENTION_SWEEP_INTERVAL_S", "0"))
+        RETENTION_RESTORE_ON_ACCESS = os.getenv("RETENTION_RESTORE_ON_ACCESS", "true").lower() == "true"
+        LOCAL_RETENTION_MAX_AGE_DAYS = float(os.getenv("LOCAL_RETENTION_MAX_AGE_DAYS", "0"))
+        LOCAL_RETENTION_MAX_PER_SESSION = int(os.getenv("LOCAL_RETENTION_MAX_PER_SESSION", "0"))
+        LOCAL_RETENTION_MAX_PER_USER = int(os.getenv("LOCAL_RETENTION_MAX_PER_USER", "0"))
+        LOCAL_RETENTION_IDLE_SESSION_DAYS = float(os.getenv("LOCAL_RETENTION_IDLE_SESSION_DAYS", "0"))
+        GLOBAL_RETENTION_MAX_PER_USER = int(os.getenv("GLOBAL_RETENTION_MAX_PER_USER", "0"))
+
+    settings = _Fallback()  # type: ignore
+
+# Yakın-kopya imzaları (opsiyonel)
+try:
+    from app.services import memory_dedupe  # type: ignore
+except Exception:
+    memory_dedupe = None  # type: ignore
+
+# Segmentli vektör deposu (opsiyonel)
+try:
+    from app.services import vector_segments  # type: ignore
+except Exception:
+    vector_segments = None  # type: ignore
+
+# LTM sürüm sayaçları (retrieval önbelleği geçersizleştirme; opsiyonel)
+try:
+    from app.services import memory_versions  # type: ignore
+except Exception:
+    memory_versions = None  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+log = logging.getLogger("retention")
+
+_TABLES = {"global": "global_memories", "local": "local_memories"}
+_DAY_S = 86400.0
+_TS = "COALESCE(updated_at, created_at)"
+
+
+def _incr(name: str, n: int = 1) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr") and n:
+        METRICS.incr(name, n)
+
+
+def policy() -> Dict[str, Any]:
+    """Etkin politika (ayarlardan; çağrı anında okunur)."""
+    return {
+        "mode": str(getattr(settings, "RETENTION_MODE", "archive") or "archive").lower(),
+        "batch_size": max(1, int(getattr(settings, "RETENTION_BATCH_SIZE", 200))),
+        "max_batches": max(1, int(getattr(settings, "RETENTION_MAX_BATCHES", 50))),
+        "local": {
+            "max_age_days": float(getattr(settings, "LOCAL_RETENTION_MAX_AGE_DAYS", 0)),
+            "max_per_session": int(getattr(settings, "LOCAL_RETENTION_MAX_PER_SESSION", 0)),
+            "max_per_user": int(getattr(settings, "LOCAL_RETENTION_MAX_PER_USER", 0)),
+            "idle_session_days": float(getattr(settings, "LOCAL_RETENTION_IDLE_SESSION_DAYS", 0)),
+        },
+        "global": {
+            "max_per_user": int(getattr(settings, "GLOBAL_RETENTION_MAX_PER_USER", 0)),
+        },
+    }
+
+
+# ---------------------------
+# Aday seçimi (politika → SQL)
+# ---------------------------
+def _over_limit_sql(table: str, partition: str) -> str:
+    return f"""
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY {partition} ORDER BY {_TS} DESC, id DESC
+            ) AS rn
+            FROM {table}
+        )
+        WHERE rn > ?
+        ORDER BY id
+        LIMIT ?
+    """
+
+
+def _rules(scope: str, pol: Dict[str, Any], now: float) -> List[Tuple[str, str, Tuple[Any, ...]]]:
+    """(reason, sql, params) listesi; sql son parametre olarak LIMIT alır."""
+    table = _TABLES[scope]
+    p = pol[scope]
+    rules: List[Tuple[str, str, Tuple[Any, ...]]] = []
+
+    if scope == "local":
+        if p["idle_session_days"] > 0:
+            rules.append((
+                "idle_session",
+                f"""
+                SELECT id FROM {table}
+                WHERE session_id IN (
+                    SELECT session_id FROM {table}
+                    GROUP BY session_id
+                    HAVING MAX({_TS}) < ?
+                )
+                ORDER BY id
+                LIMIT ?
+                """,
+                (int(now - p["idle_session_days"] * _DAY_S),),
+            ))
+        if p["max_age_days"] > 0:
+            rules.append((
+                "max_age",
+                f"SELECT id FROM {table} WHERE {_TS} < ? ORDER BY id LIMIT ?",
+                (int(now - p["max_age_days"] * _DAY_S),),
+            ))
+        if p["max_per_session"] > 0:
+            rules.append(("max_per_session", _over_limit_sql(table, "session_id"), (p["max_per_session"],)))
+
+    if p.get("max_per_user", 0) > 0:
+        rules.append(("max_per_user", _over_limit_sql(table, "user_id"), (p["max_per_user"],)))
+    return rules
+
+
+# ---------------------------
+# Arşiv / silme
+# ---------------------------
+def _pack(row: sqlite3.Row) -> bytes:
+    data = {k: row[k] for k in row.keys() if k != "embedding"}
+    data["embedding"] = base64.b64encode(row["embedding"]).decode("ascii")
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _unpack(blob: bytes) -> Dict[str, Any]:
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    data["embedding"] = base64.b64decode(data["embedding"])
+    return data
+
+
+def _evict(con: sqlite3.Connection, scope: str, ids: List[int], *, reason: str, mode: str) -> int:
+    table = _TABLES[scope]
+    if memory_versions is not None:
+        session_col = "session_id" if scope == "local" else "''"
+        placeholders = ",".join("?" * len(ids))
+        for owner in con.execute(
+            f"SELECT DISTINCT user_id, {session_col} FROM {table} WHERE id IN ({placeholders})", ids
+        ).fetchall():
+            memory_versions.bump(con, scope, owner[0], owner[1])
+    if mode == "archive":
+        placeholders = ",".join("?" * len(ids))
+        rows = con.execute(f"SELECT * FROM {table} WHERE id IN ({placeholders})", ids).fetchall()
+        ts = int(time.time())
+        con.executemany(
+            """
+            INSERT INTO archived_memories (scope, memory_id, user_id, session_id, payload, reason, archived_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (
+                    scope,
+                    int(r["id"]),
+                    r["user_id"],
+                    r["session_id"] if scope == "local" else "",
+                    _pack(r),
+                    reason,
+                    ts,
+                )
+                for r in rows
+            ],
+        )
+    con.executemany(f"DELETE FROM {table} WHERE id = ?", [(i,) for i in ids])
+    if memory_dedupe is not None:
+        memory_dedupe.remove(con, scope, ids)
+    return len(ids)
+
+
+def sweep(*, dry_run: bool = False, db_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Tüm politikaları uygular. Her batch ayrı işlemde commit edilir; böylece
+    yazma kilidi kısa tutulur ve WAL büyümez. db_path verilmezse tüm shard'lar süpürülür.
+    Dönüş: {"mode", "dry_run", "<scope>": {reason: adet}, "elapsed_ms"}
+    """
+    pol = policy()
+    mode = "delete" if pol["mode"] == "delete" else "archive"
+    now = time.time()
+    t0 = time.perf_counter()
+    report: Dict[str, Any] = {"mode": mode, "dry_run": dry_run, "local": {}, "global": {}}
+
+    for path in ([db_path] if db_path else all_paths()):
+        total = 0
+        for scope in ("local", "global"):
+            counts: Dict[str, int] = report[scope]
+            for reason, sql, params in _rules(scope, pol, now):
+                n = 0
+                for _ in range(pol["max_batches"]):
+                    with get_conn(path) as con:
+                        ids = [int(r[0]) for r in con.execute(sql, (*params, pol["batch_size"])).fetchall()]
+                        if not ids:
+                            break
+                        if dry_run:
+                            # Kuru çalıştırmada yalnızca ilk batch'in boyutu değil tüm adaylar sayılır
+                            n = len(con.execute(sql, (*params, -1)).fetchall())
+                            break
+                        n += _evict(con, scope, ids, reason=reason, mode=mode)
+                    if len(ids) < pol["batch_size"]:
+                        break
+                if n:
+                    counts[reason] = counts.get(reason, 0) + n
+                    total += n
+                    if not dry_run:
+                        _incr(f"retention_{mode}d_{scope}", n)
+
+        if total and not dry_run:
+            try:
+                with get_conn(path) as con:
+                    con.execute("PRAGMA wal_checkpoint(PASSIVE);")
+            except Exception:
+                pass
+
+    report["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+    return report
+
+
+# ---------------------------
+# Geri yükleme
+# ---------------------------
+def has_archived(
+    user_id: str,
+    session_id: str,
+    *,
+    reason: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> bool:
+    sql = "SELECT 1 FROM archived_memories WHERE scope = 'local' AND user_id = ? AND session_id = ?"
+    params: List[Any] = [user_id, session_id]
+    if reason:
+        sql += " AND reason = ?"
+        params.append(reason)
+    with get_conn(db_path or path_for_user(user_id)) as con:
+        row = con.execute(sql + " LIMIT 1", params).fetchone()
+    return row is not None
+
+
+def restore_session(
+    user_id: str,
+    session_id: str,
+    *,
+    reason: Optional[str] = None,
+    db_path: Optional[str] = None,
+) -> int:
+    """
+    Session'ın arşivlenmiş local kayıtlarını sıcak tabloya geri alır (orijinal id'lerle).
+    reason verilirse yalnızca o nedenle arşivlenenler alınır (ör. idle_session);
+    böylece sayı sınırı nedeniyle arşivlenenler her erişimde geri gelip tekrar gitmez.
+    Geri alınan kayıtların updated_at'i yenilenir: hemen tekrar idle sayılmazlar.
+    Dönüş: geri yüklenen kayıt sayısı.
+    """
+    where = "scope = 'local' AND user_id = ? AND session_id = ?"
+    params: Tuple[Any, ...] = (user_id, session_id)
+    if reason:
+        where += " AND reason = ?"
+        params = (*params, reason)
+    return _restore(where, params, db_path=db_path or path_for_user(user_id))
+
+
+def restore_user(user_id: str, scope: str = "global", *, db_path: Optional[str] = None) -> int:
+    """Kullanıcının bir kapsamdaki tüm arşivlenmiş kayıtlarını geri alır."""
+    if scope not in _TABLES:
+        raise ValueError(f"unknown scope: {scope}")
+    return _restore("scope = ? AND user_id = ?", (scope, user_id), db_path=db_path or path_for_user(user_id))
+
+
+def _restore(where: str, params: Tuple[Any, ...], *, db_path: Optional[str]) -> int:
+    ts = int(time.time())
+    restored = 0
+    owners = set()
+    with get_conn(db_path) as con:
+        # Mağazalar FK uygulamadan yazar; geri yükleme de aynı davranmalı (session satırı olmayabilir)
+        con.execute("PRAGMA foreign_keys=OFF;")
+        rows = con.execute(
+            f"SELECT archive_id, scope, payload FROM archived_memories WHERE {where} ORDER BY archive_id", params
+        ).fetchall()
+        for r in rows:
+            scope = r["scope"]
+            d = _unpack(r["payload"])
+            try:
+                meta = json.loads(d.get("meta") or "{}")
+            except Exception:
+                meta = {}
+            meta["restored_at"] = ts
+            d["meta"] = json.dumps(meta, ensure_ascii=False)
+            d["updated_at"] = ts
+            cols = [c for c in d.keys()]
+            try:
+                con.execute(
+                    f"INSERT INTO {_TABLES[scope]} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                    [d[c] for c in cols],
+                )
+            except sqlite3.IntegrityError:
+                # Aynı metin global'de yeniden eklenmiş olabilir → arşiv kaydı düşer
+                log.info("Arşiv kaydı çakıştı, atlandı (scope=%s id=%s)", scope, d.get("id"))
+            else:
+                restored += 1
+                owners.add((scope, d["user_id"], d.get("session_id") if scope == "local" else None))
+                if memory_dedupe is not None:
+                    memory_dedupe.index(
+                        con, scope, int(d["id"]), d["user_id"], d.get("session_id"),
+                        np.frombuffer(d["embedding"], dtype=np.float32),
+                    )
+            con.execute("DELETE FROM archived_memories WHERE archive_id = ?", (r["archive_id"],))
+        if memory_versions is not None:
+            for scope, user_id, session_id in owners:
+                memory_versions.bump(con, scope, user_id, session_id)
+    if restored:
+        _incr("retention_restored", restored)
+        # Geri gelen id'ler mühürlü segment aralıklarının içinde kalır → segmentler yeniden kurulur
+        if vector_segments is not None:
+            for scope, user_id, session_id in owners:
+                vector_segments.invalidate(scope, user_id, session_id, db_path=db_path)
+    return restored
+
+
+def stats(*, db_path: Optional[str] = None) -> Dict[str, Any]:
+    archived: Dict[str, Dict[str, int]] = {}
+    for path in ([db_path] if db_path else all_paths()):
+        with get_conn(path) as con:
+            rows = con.execute(
+                "SELECT scope, COUNT(1) AS c, COALESCE(SUM(LENGTH(payload)), 0) AS b FROM archived_memories GROUP BY scope"
+            ).fetchall()
+        for r in rows:
+            agg = archived.setdefault(r["scope"], {"rows": 0, "bytes": 0})
+            agg["rows"] += int(r["c"])
+            agg["bytes"] += int(r["b"])
+    return {
+        "policy": policy(),
+        "archived": archived,
+        "sweeper_running": _sweeper is not None and _sweeper.is_alive(),
+    }
+
+
+# ---------------------------
+# Arka plan süpürücü
+# ---------------------------
+_sweeper: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+def _loop(interval_s: float) -> None:
+    while not _stop.wait(interval_s):
+        try:
+            rep = sweep()
+            if rep.get("local") or rep.get("global"):
+                log.info("Retention sweep: %s", rep)
+        except Exception:
+            log.exception("Retention sweep başarısız")
+
+
+def start_sweeper(interval_s: Optional[float] = None) -> bool:
+    """RETENTION_SWEEP_INTERVAL_S > 0 ise arka plan süpürücüsünü başlatır."""
+    global _sweeper
+    iv = float(getattr(settings, "RETENTION_SWEEP_INTERVAL_S", 0) if interval_s is None else interval_s)
+    if iv <= 0:
+        return False
+    if _sweeper is not None and _sweeper.is_alive():
+        return True
+    _stop.clear()
+    _sweeper = threading.Thread(target=_loop, args=(iv,), name="retention-sweeper", daemon=True)
+    _sweeper.start()
+    return True
+
+
+def stop_sweeper() -> None:
+    _stop.set()
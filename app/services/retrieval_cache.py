@@ -0,0 +1,174 @@
+# app/services/retrieval_cache.py
+from __future__ import annotations
+
+"""
+retrieve_context için LTM sonuç önbelleği (süreç içi LRU + TTL).
+
+Anahtar: (user_id, session_id, normalize edilmiş sorgu, topk_local, topk_global, distill modu).
+Değer  : local/global isabetler, rerank edilmiş kaynaklar ve distillation bölümleri.
+STM ve prompt metni önbelleğe girmez; her çağrıda taze derlenir.
+
+Geçersizleştirme sürüm sayaçlarıyladır (memory_versions): girdi, hesaplama BAŞLAMADAN
+okunan (global, local) sürümle saklanır; okumada sürüm farklıysa girdi bayattır ("stale")
+ve atılır. Hesaplama sırasında gelen bir yazma da sürümü artırdığından bir sonraki
+okumada girdi kullanılmaz. TTL yalnızca emniyet sınırıdır (embedding modeli değişimi vb.).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.similarity import normalize_text
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        RETRIEVAL_CACHE_ENABLED = os.getenv("RETRIEVAL_CACHE_ENABLED", "true").lower() == "true"
+        RETRIEVAL_CACHE_TTL_S = float(os.getenv("RETRIEVAL_CACHE_TTL_S", "600"))
+        RETRIEVAL_CACHE_MAX_ENTRIES = int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "4096"))
+
+    settings = _Fallback()  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+# Sürüm sayaçları (opsiyonel: yoksa önbellek devre dışı, bayat sonuç riski alınmaz)
+try:
+    from app.services import memory_versions  # type: ignore
+except Exception:
+    memory_versions = None  # type: ignore
+
+CACHE_ENABLED: bool = bool(getattr(settings, "RETRIEVAL_CACHE_ENABLED", True)) and memory_versions is not None
+CACHE_TTL_S: float = float(getattr(settings, "RETRIEVAL_CACHE_TTL_S", 600))
+CACHE_MAX_ENTRIES: int = max(1, int(getattr(settings, "RETRIEVAL_CACHE_MAX_ENTRIES", 4096)))
+
+Key = Tuple[str, str, str, int, int, bool]
+Versions = Tuple[int, int]
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
+
+def copy_sources(sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Kaynak sözlüklerinin (ve meta'larının) sığ kopyası: çağıran değiştirse de önbellek bozulmaz."""
+    out = []
+    for s in sources:
+        c = dict(s)
+        if isinstance(c.get("meta"), dict):
+            c["meta"] = dict(c["meta"])
+        out.append(c)
+    return out
+
+
+class _RetrievalCache:
+    def __init__(self, max_entries: int, ttl_s: float) -> None:
+        self._lock = threading.Lock()
+        # key -> (expires_at, versions, value)
+        self._data: "OrderedDict[Key, Tuple[float, Versions, Dict[str, Any]]]" = OrderedDict()
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    @staticmethod
+    def key(
+        user_id: str,
+        session_id: str,
+        query_text: str,
+        topk_local: int,
+        topk_global: int,
+        distill_with_llm: bool,
+    ) -> Key:
+        return (
+            str(user_id),
+            str(session_id or ""),
+            normalize_text(query_text or ""),
+            int(topk_local),
+            int(topk_global),
+            bool(distill_with_llm),
+        )
+
+    def versions(self, user_id: str, session_id: str) -> Optional[Versions]:
+        """Güncel (global, local) sürüm; okunamazsa None (önbellek bu çağrıda atlanır)."""
+        if not CACHE_ENABLED:
+            return None
+        try:
+            return memory_versions.current(user_id, session_id)
+        except Exception:
+            return None
+
+    def get(self, key: Key, versions: Optional[Versions]) -> Optional[Dict[str, Any]]:
+        if versions is None:
+            return None
+        outcome = "miss"
+        value = None
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, ver, cached = item
+                if ver != versions or expires_at < time.time():
+                    self._data.pop(key, None)
+                    outcome = "stale"
+                else:
+                    self._data.move_to_end(key)
+                    value = cached
+                    outcome = "hit"
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "stale":
+                self.stale += 1
+            else:
+                self.misses += 1
+        _incr(f"retrieval_cache_{outcome}")
+        if value is None:
+            return None
+        return {**value, "sources": copy_sources(value["sources"])}
+
+    def put(self, key: Key, versions: Optional[Versions], value: Dict[str, Any]) -> None:
+        if versions is None:
+            return
+        stored = {**value, "sources": copy_sources(value["sources"])}
+        with self._lock:
+            self._data[key] = (time.time() + self.ttl_s, versions, stored)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "enabled": CACHE_ENABLED,
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# Tekil (singleton) örnek
+_cache = _RetrievalCache(CACHE_MAX_ENTRIES, CACHE_TTL_S)
+
+# Modül düzeyi kısayollar
+key = _cache.key
+versions = _cache.versions
+get = _cache.get
+put = _cache.put
+clear = _cache.clear
+stats = _cache.stats
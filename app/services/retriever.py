@@ -1,7 +1,10 @@
 # app/services/retriever.py
 from __future__ import annotations
 
+import hashlib
 import json
+from contextlib import nullcontext
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Iterable, List
 
@@ -41,6 +44,12 @@ try:
 except Exception:
     stm_store = None  # type: ignore
 
+# Koşan STM özeti (opsiyonel)
+try:
+    from app.services import stm_summary
+except Exception:
+    stm_summary = None  # type: ignore
+
 try:
     from app.services import ltm_local_store, ltm_global_store
 except Exception:
@@ -58,6 +67,18 @@ try:
 except Exception:
     mmr_rerank = None  # type: ignore
 
+# LTM sonuç önbelleği (opsiyonel)
+try:
+    from app.services import retrieval_cache  # type: ignore
+except Exception:
+    retrieval_cache = None  # type: ignore
+
+# Aşama süreleri (opsiyonel)
+try:
+    from app.observability.metrics import stage as _stage  # type: ignore
+except Exception:
+    _stage = nullcontext  # type: ignore
+
 
 # --------------------------- Yardımcılar --------------------------------------
 def _read_text_file(path: Path) -> str:
@@ -67,15 +88,34 @@ def _read_text_file(path: Path) -> str:
         return ""
 
 
+@lru_cache(maxsize=32)
 def _load_prompt_file(filename: str) -> str:
+    # Şablonlar süreç ömrü boyunca sabit; her istekte diskten okunmaz
     base = Path(__file__).resolve().parent.parent / "prompts"
     return _read_text_file(base / filename)
 
 
+PROMPT_TEMPLATES = ("system.txt", "retrieval_instructions.txt")
+
+
+def load_templates() -> Dict[str, int]:
+    """Prompt şablonlarını önbelleğe alır (ısınma); {dosya: karakter sayısı}."""
+    return {name: len(_load_prompt_file(name)) for name in PROMPT_TEMPLATES}
+
+
 def _fmt_turn(role: str, text: str) -> str:
     return f"{role.upper()}: {text.strip()}"
 
 
+def _context_key(*parts: str) -> str:
+    """Prompt'un kullanıcı mesajı dışındaki bağlamının kısa özeti (semantik LLM önbelleği için)."""
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()[:16]
+
+
 def _dedupe_by_text(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     seen = set()
     out: List[Dict[str, Any]] = []
@@ -137,56 +177,43 @@ def _filter_by_similarity(
     return filtered
 
 
-# --------------------------- Ana Giriş Noktası --------------------------------
-def retrieve_context(
+def _retrieve_ltm(
     user_id: str,
     session_id: str,
     query_text: str,
-    topk_local: int = TOPK_LOCAL_DEFAULT,
-    topk_global: int = TOPK_GLOBAL_DEFAULT,
-    stm_max_turns: int = STM_MAX_TURNS_DEFAULT,
+    topk_local: int,
+    topk_global: int,
+    distill_with_llm: bool,
 ) -> Dict[str, Any]:
     """
-    Kullanıcının sorgusu için STM + Local LTM + Global LTM'den bağlam derler,
-    prompt metnini üretir, kaynakları (sources) ve kullanılan STM tur sayısını döndürür.
-
-    Tasarım:
-    - STM         : Sadece bu session içindeki son turlar.
-    - Local LTM   : Bu session'a ait kalıcı kayıtlar (session_id filtreli).
-    - Global LTM  : Kullanıcı genelinde önemli kayıtlar (user_id bazlı, tüm session'lar).
+    Local + Global LTM arama, ağırlıklandırma, rerank ve distillation (adım 2–6).
+    Dönüş yalnızca LTM'ye ve sorguya bağlıdır (STM içermez): retrieval_cache bunu saklar.
+    Bir aşama hata verip atlandıysa complete=False: geçici hata önbelleğe girmez.
     """
-
-    # 1) STM (son N tur)
-    stm_turns: List[Dict[str, Any]] = []
-    if stm_store is not None and hasattr(stm_store, "get_context"):
-        try:
-            stm_turns = stm_store.get_context(  # type: ignore
-                session_id, max_turns=stm_max_turns
-            )
-        except Exception:
-            stm_turns = []
-    used_stm_turns = len(stm_turns or [])
+    complete = True
 
     # 2) Local LTM arama (session bazlı)
     local_hits: List[Dict[str, Any]] = []
     if ltm_local_store is not None:
-        try:
-            if hasattr(ltm_local_store, "search_embed"):
-                local_hits, _ = ltm_local_store.search_embed(  # type: ignore
-                    user_id=user_id,
-                    session_id=session_id,
-                    query_text=query_text,
-                    topk=topk_local,
-                )
-            else:
-                local_hits, _ = ltm_local_store.search_text(  # type: ignore
-                    user_id=user_id,
-                    session_id=session_id,
-                    q=query_text,
-                    topk=topk_local,
-                )
-        except Exception:
-            local_hits = []
+        with _stage("local_search"):
+            try:
+                if hasattr(ltm_local_store, "search_embed"):
+                    local_hits, _ = ltm_local_store.search_embed(  # type: ignore
+                        user_id=user_id,
+                        session_id=session_id,
+                        query_text=query_text,
+                        topk=topk_local,
+                    )
+                else:
+                    local_hits, _ = ltm_local_store.search_text(  # type: ignore
+                        user_id=user_id,
+                        session_id=session_id,
+                        q=query_text,
+                        topk=topk_local,
+                    )
+            except Exception:
+                complete = False
+                local_hits = []
 
     # Local LTM için similarity filtresi uyguluyoruz
     if local_hits:
@@ -207,21 +234,23 @@ def retrieve_context(
     # 3) Global LTM arama (user profili / oturumdan bağımsız)
     global_hits: List[Dict[str, Any]] = []
     if ltm_global_store is not None:
-        try:
-            if hasattr(ltm_global_store, "search_embed"):
-                global_hits, _ = ltm_global_store.search_embed(  # type: ignore
-                    user_id=user_id,
-                    query_text=query_text,
-                    topk=topk_global,
-                )
-            else:
-                global_hits, _ = ltm_global_store.search_text(  # type: ignore
-                    user_id=user_id,
-                    q=query_text,
-                    topk=topk_global,
-                )
-        except Exception:
-            global_hits = []
+        with _stage("global_search"):
+            try:
+                if hasattr(ltm_global_store, "search_embed"):
+                    global_hits, _ = ltm_global_store.search_embed(  # type: ignore
+                        user_id=user_id,
+                        query_text=query_text,
+                        topk=topk_global,
+                    )
+                else:
+                    global_hits, _ = ltm_global_store.search_text(  # type: ignore
+                        user_id=user_id,
+                        q=query_text,
+                        topk=topk_global,
+                    )
+            except Exception:
+                complete = False
+                global_hits = []
 
     # Global LTM tarafında similarity filtresini uygulamıyoruz.
     global_sources = [
@@ -265,27 +294,31 @@ def retrieve_context(
     combined = _dedupe_by_text(combined)
 
     if mmr_rerank is not None and combined:
-        try:
-            combined = mmr_rerank(  # type: ignore
-                combined, query=query_text, topk=len(combined)
-            )
-        except Exception:
-            pass
+        with _stage("rerank"):
+            try:
+                combined = mmr_rerank(  # type: ignore
+                    combined, query=query_text, topk=len(combined)
+                )
+            except Exception:
+                complete = False
 
     # 6) Distillation (özet)
     distilled_sections: List[str] = []
     if summarizer is not None and combined:
-        try:
-            distilled = summarizer.distill(  # type: ignore
-                combined,
-                budget_tokens=RETRIEVAL_BUDGET_TOKENS,
-            )
-            if isinstance(distilled, str):
-                distilled_sections = [distilled]
-            elif isinstance(distilled, list):
-                distilled_sections = [str(x) for x in distilled]
-        except Exception:
-            distilled_sections = []
+        with _stage("distill"):
+            try:
+                distilled = summarizer.distill(  # type: ignore
+                    combined,
+                    budget_tokens=RETRIEVAL_BUDGET_TOKENS,
+                    prefer_llm=distill_with_llm,
+                )
+                if isinstance(distilled, str):
+                    distilled_sections = [distilled]
+                elif isinstance(distilled, list):
+                    distilled_sections = [str(x) for x in distilled]
+            except Exception:
+                complete = False
+                distilled_sections = []
 
     # summarizer yoksa / hata varsa: en iyi snippet’leri doğrudan kullan
     if not distilled_sections:
@@ -294,6 +327,75 @@ def retrieve_context(
             for src in _truncate(combined, topk_local + topk_global)
         ]
 
+    return {
+        "local_texts": [h.get("text") for h in (local_hits or [])],
+        "global_texts": [h.get("text") for h in (global_hits or [])],
+        "sources": combined,
+        "distilled": distilled_sections,
+        "complete": complete,
+    }
+
+
+# --------------------------- Ana Giriş Noktası --------------------------------
+def retrieve_context(
+    user_id: str,
+    session_id: str,
+    query_text: str,
+    topk_local: int = TOPK_LOCAL_DEFAULT,
+    topk_global: int = TOPK_GLOBAL_DEFAULT,
+    stm_max_turns: int = STM_MAX_TURNS_DEFAULT,
+    distill_with_llm: bool = True,
+) -> Dict[str, Any]:
+    """
+    Kullanıcının sorgusu için STM + Local LTM + Global LTM'den bağlam derler,
+    prompt metnini üretir, kaynakları (sources), kullanılan STM tur sayısını ve sorgu
+    dışı bağlamın anahtarını (context_key; semantik LLM önbelleği sınırı) döndürür.
+
+    Tasarım:
+    - STM         : Bu session'ın koşan özeti + son turlar (stm_summary; token bütçeli).
+    - Local LTM   : Bu session'a ait kalıcı kayıtlar (session_id filtreli).
+    - Global LTM  : Kullanıcı genelinde önemli kayıtlar (user_id bazlı, tüm session'lar).
+
+    distill_with_llm=False ise distillation kural tabanlı yapılır (tek çağrı modu:
+    tur başına tek LLM çağrısı hedeflenir).
+    """
+
+    # 1) STM: koşan özet + token bütçesine sığan en yeni ham turlar
+    stm_turns: List[Dict[str, Any]] = []
+    stm_summary_text = ""
+    if stm_summary is not None:
+        try:
+            stm_summary_text, stm_turns = stm_summary.context(session_id, stm_max_turns)
+        except Exception:
+            stm_summary_text, stm_turns = "", []
+    elif stm_store is not None and hasattr(stm_store, "get_context"):
+        try:
+            stm_turns = stm_store.get_context(  # type: ignore
+                session_id, max_turns=stm_max_turns
+            )
+        except Exception:
+            stm_turns = []
+    used_stm_turns = len(stm_turns or [])
+
+    # 2–6) LTM: sürümler değişmediyse aynı sorgunun sonucu önbellekten gelir
+    ltm: Dict[str, Any] = {}
+    cache_key = versions = None
+    if retrieval_cache is not None:
+        cache_key = retrieval_cache.key(
+            user_id, session_id, query_text, topk_local, topk_global, distill_with_llm
+        )
+        # Sürüm hesaplamadan ÖNCE okunur: arada gelen yazma girdiyi bayat bırakır
+        versions = retrieval_cache.versions(user_id, session_id)
+        ltm = retrieval_cache.get(cache_key, versions) or {}
+    if not ltm:
+        ltm = _retrieve_ltm(
+            user_id, session_id, query_text, topk_local, topk_global, distill_with_llm
+        )
+        if retrieval_cache is not None and ltm["complete"]:
+            retrieval_cache.put(cache_key, versions, ltm)
+    combined = ltm["sources"]
+    distilled_sections = ltm["distilled"]
+
     # 7) Prompt derleme
     system_prompt = (
         _load_prompt_file("system.txt")
@@ -309,9 +411,13 @@ def retrieve_context(
         _fmt_turn(t.get("role", "user"), t.get("text", ""))
         for t in (stm_turns or [])
     )
-    local_text = "\n".join(f"- {h.get('text')}" for h in (local_hits or []))
-    global_text = "\n".join(f"- {h.get('text')}" for h in (global_hits or []))
+    local_text = "\n".join(f"- {t}" for t in ltm["local_texts"])
+    global_text = "\n".join(f"- {t}" for t in ltm["global_texts"])
     distilled_text = "\n".join(distilled_sections)
+    # Özet yalnızca varsa eklenir: kısa session'larda prompt biçimi değişmez
+    stm_summary_block = (
+        f"[CONTEXT: STM summary (earlier turns)]\n{stm_summary_text}\n\n" if stm_summary_text else ""
+    )
 
     prompt = f"""[SYSTEM]
 {system_prompt}
@@ -319,7 +425,7 @@ def retrieve_context(
 [INSTRUCTIONS]
 {retrieval_instructions}
 
-[CONTEXT: STM (last {used_stm_turns} turns)]
+{stm_summary_block}[CONTEXT: STM (last {used_stm_turns} turns)]
 {stm_text if stm_text else "(empty)"}
 
 [CONTEXT: Local LTM]
@@ -335,8 +441,24 @@ def retrieve_context(
 {query_text}
 """
 
+    # Semantik yanıt önbelleği yalnızca aynı bağlamda geçerlidir: STM (bu turun kullanıcı
+    # mesajı hariç), özet ve getirilen hafızalar değişince anahtar da değişir
+    context_turns = list(stm_turns or [])
+    if context_turns and context_turns[-1].get("role") == "user" and (
+        (context_turns[-1].get("text") or "").strip() == query_text.strip()
+    ):
+        context_turns = context_turns[:-1]
+    context_key = _context_key(
+        stm_summary_text,
+        "\n".join(_fmt_turn(t.get("role", "user"), t.get("text", "")) for t in context_turns),
+        local_text,
+        global_text,
+        distilled_text,
+    )
+
     return {
         "prompt": prompt,
         "used_stm_turns": used_stm_turns,
         "sources": combined,
+        "context_key": context_key,
     }
@@ -2,11 +2,23 @@
 from __future__ import annotations
 
 import math
+import os
 import unicodedata
-from typing import Iterable, List, Sequence, Tuple
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        KNN_MAX_BLOCK_MB = float(os.getenv("KNN_MAX_BLOCK_MB", "64"))
+
+    settings = _Fallback()  # type: ignore
+
+# knn_batch'in tek seferde ayırdığı skor bloğunun (Q_blok x N_blok float32) üst sınırı
+KNN_MAX_BLOCK_BYTES: int = max(4096, int(float(getattr(settings, "KNN_MAX_BLOCK_MB", 64.0)) * 1024 * 1024))
+
 
 # ---------------------------
 # Metin normalizasyonu
@@ -61,27 +73,108 @@ def cosine_matrix(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
 # ---------------------------
 # Top-K yardımcıları
 # ---------------------------
-def topk_indices(scores: Sequence[float], k: int) -> List[int]:
+def topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Küçük/orta N için basit top-K. Büyük N’de numpy.argpartition daha hızlıdır.
+    NumPy-yerel top-K: (indeksler, skorlar), skor azalan sırada.
+    scores (N,) → (k,) dizileri; (Q,N) → her satır için (Q,k).
+    argpartition O(N) ile k adayı seçer, yalnızca bu k aday sıralanır (O(k log k)).
+    Eşit skorlarda küçük indeks önce gelir (k sınırındaki eşitlikler hariç).
     """
-    if k <= 0:
-        return []
-    k = min(k, len(scores))
-    return sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)[:k]
+    s = np.asarray(scores)
+    n = s.shape[-1]
+    k = max(0, min(int(k), n))
+    if k == 0:
+        shape = s.shape[:-1] + (0,)
+        return np.empty(shape, dtype=np.intp), np.empty(shape, dtype=s.dtype)
+    if k < n:
+        part = np.argpartition(-s, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), s.shape).copy()
+    part_scores = np.take_along_axis(s, part, axis=-1)
+    # (-skor, indeks) sırası: lexsort son anahtarı birincil kabul eder
+    order = np.lexsort((part, -part_scores), axis=-1)
+    idx = np.take_along_axis(part, order, axis=-1)
+    return idx, np.take_along_axis(part_scores, order, axis=-1)
+
+
+def topk_indices(scores: Sequence[float], k: int) -> List[int]:
+    """Liste döndüren top-K (skor azalan); bkz. topk()."""
+    idx, _ = topk(np.asarray(scores, dtype=np.float64).ravel(), k)
+    return idx.tolist()
 
 
 def topk_pairs(scores: Sequence[float], k: int) -> List[Tuple[int, float]]:
-    idxs = topk_indices(scores, k)
-    return [(i, float(scores[i])) for i in idxs]
+    idx, vals = topk(np.asarray(scores, dtype=np.float64).ravel(), k)
+    return list(zip(idx.tolist(), vals.tolist()))
 
 
 def knn(query_vec: np.ndarray, matrix: np.ndarray, k: int) -> List[Tuple[int, float]]:
     """
-    Embedding matrisinde kosinüs KNN.
+    Embedding matrisinde kosinüs KNN (tek sorgu). Dönüş: [(indeks, skor)] azalan.
+    Çok sayıda sorgu için knn_batch kullanın.
+    """
+    sims = cosine_matrix(query_vec, matrix).ravel()
+    idx, vals = topk(sims, k)
+    return list(zip(idx.tolist(), vals.tolist()))
+
+
+def knn_batch(
+    queries: np.ndarray,
+    matrix: np.ndarray,
+    k: int,
+    *,
+    max_block_bytes: Optional[int] = None,
+    normalized: bool = False,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Çok sorgulu kosinüs KNN: queries (Q,D) x matrix (N,D) → (indeksler, skorlar), ikisi de
+    (Q, min(k,N)), satır başına skor azalan.
+
+    Skor matrisi hiçbir zaman tamamen oluşturulmaz: sorgular ve gerekirse matris satırları
+    bloklanır; her blokta tek bir (q_blok x n_blok) float32 skor dizisi max_block_bytes'ı
+    (varsayılan KNN_MAX_BLOCK_MB) aşmaz. Matris blokları arasında satır başına top-k
+    adayları birleştirilir. normalized=True ise girdiler birim vektör kabul edilir
+    (normalize kopyası alınmaz).
     """
-    sims = cosine_matrix(query_vec, matrix).ravel().tolist()
-    return topk_pairs(sims, k)
+    q = np.asarray(queries, dtype=np.float32)
+    if q.ndim == 1:
+        q = q[None, :]
+    M = np.asarray(matrix, dtype=np.float32)
+    n_q, n = q.shape[0], M.shape[0]
+    k = max(0, min(int(k), n))
+    if n_q == 0 or k == 0:
+        return np.empty((n_q, k), dtype=np.intp), np.empty((n_q, k), dtype=np.float32)
+    if not normalized:
+        q = l2_normalize(q, axis=1)
+        M = l2_normalize(M, axis=1)
+
+    cap = KNN_MAX_BLOCK_BYTES if max_block_bytes is None else max(4, int(max_block_bytes))
+    item = np.dtype(np.float32).itemsize
+    # Matris bloğu: tek sorgu satırı bile sınırı aşıyorsa N de bölünür (en az k satır)
+    n_block = min(n, max(k, cap // item))
+    q_block = max(1, cap // (n_block * item))
+
+    out_idx = np.empty((n_q, k), dtype=np.intp)
+    out_scores = np.empty((n_q, k), dtype=np.float32)
+    for qs in range(0, n_q, q_block):
+        qb = q[qs:qs + q_block]
+        best_idx: Optional[np.ndarray] = None
+        best_scores: Optional[np.ndarray] = None
+        for ns in range(0, n, n_block):
+            block = qb @ M[ns:ns + n_block].T  # (q_blok, n_blok)
+            idx, vals = topk(block, k)
+            idx = idx + ns
+            if best_idx is None:
+                best_idx, best_scores = idx, vals
+                continue
+            # Önceki en iyi k ile bu bloğun k'sını birleştir
+            cand_idx = np.concatenate([best_idx, idx], axis=1)
+            cand_scores = np.concatenate([best_scores, vals], axis=1)
+            sel, best_scores = topk(cand_scores, k)
+            best_idx = np.take_along_axis(cand_idx, sel, axis=1)
+        out_idx[qs:qs + qb.shape[0]] = best_idx
+        out_scores[qs:qs + qb.shape[0]] = best_scores
+    return out_idx, out_scores
 
 
 # ---------------------------
@@ -0,0 +1,91 @@
+# app/services/singleflight.py
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+
+from app.core.errors import DeadlineExceededError
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("done", "result", "exc", "followers")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exc: Optional[BaseException] = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Aynı anahtarla eşzamanlı gelen çağrıları tek bir sağlayıcı çağrısında birleştirir.
+    - İlk gelen (leader) fn'i kendi thread'inde çalıştırır.
+    - Sonradan gelenler (follower) kendi çağrılarını yapmaz; leader'ın sonucunu bekler.
+    - Leader hata alırsa (iptal / KeyboardInterrupt dahil) aynı hata follower'lara da iletilir.
+    - Follower kendi bekleme süresini (timeout) aşarsa yalnızca o vazgeçer; leader etkilenmez.
+    Sonuç paylaşılır, önbelleğe alınmaz: çağrı bitince anahtar serbest kalır.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def _incr(self, outcome: str) -> None:
+        if METRICS is not None and hasattr(METRICS, "incr"):
+            METRICS.incr(f"singleflight_{self.name}_{outcome}")
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[[], T],
+        *,
+        timeout: Optional[float] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Dönüş: (sonuç, shared) – shared=True ise sonuç başka bir çağrıdan paylaşıldı.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+            else:
+                call.followers += 1
+                leader = False
+
+        if not leader:
+            self._incr("shared")
+            if not call.done.wait(timeout):
+                self._incr("follower_timeout")
+                raise DeadlineExceededError(details={"singleflight": self.name, "timeout_s": timeout})
+            if call.exc is not None:
+                raise call.exc
+            return call.result, True
+
+        self._incr("leader")
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.exc = e
+            raise
+        finally:
+            # Önce anahtarı bırak, sonra bekleyenleri uyandır: sonraki istekler taze çağrı yapar
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -1,9 +1,10 @@
 # app/services/stm_store.py
 from __future__ import annotations
 
+import itertools
 import threading
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 
 class _STMStore:
@@ -11,11 +12,17 @@ class _STMStore:
     Process içi (in-memory) kısa süreli bellek.
     - Her session_id için sıralı "turn" listesi tutar.
     - Uygulama yeniden başlatılınca sıfırlanır (kalıcı değildir).
+    - Koşan özet (stm_summary): session başına (özet metni, özetlenen tur sayısı).
+      Her session'ın bir dönemi (epoch) vardır; clear sonrası yeni dönem başlar ve
+      eski döneme ait geç kalmış özet yazımları yok sayılır.
     """
 
     def __init__(self) -> None:
         self._lock = threading.RLock()
         self._by_session: Dict[str, List[dict]] = {}
+        self._summary: Dict[str, Tuple[str, int]] = {}
+        self._epoch: Dict[str, int] = {}
+        self._epochs = itertools.count(1)
 
     def append_turn(self, session_id: str, role: str, text: str) -> None:
         """STM'e bir konuşma turu ekle (role: user/assistant/system)."""
@@ -27,6 +34,8 @@ class _STMStore:
             "ts": int(time.time()),
         }
         with self._lock:
+            if session_id not in self._by_session:
+                self._epoch[session_id] = next(self._epochs)
             self._by_session.setdefault(session_id, []).append(item)
 
     def get_context(self, session_id: str, max_turns: int = 8) -> List[dict]:
@@ -40,17 +49,54 @@ class _STMStore:
             # kopya döndür ki dışarıda mutasyona uğramasın
             return [dict(t) for t in turns]
 
+    def turn_count(self, session_id: str) -> int:
+        with self._lock:
+            return len(self._by_session.get(session_id, []))
+
+    def get_range(self, session_id: str, start: int, end: Optional[int] = None) -> List[dict]:
+        """turns[start:end] kopyası (özetleme penceresi için)."""
+        with self._lock:
+            return [dict(t) for t in self._by_session.get(session_id, [])[start:end]]
+
+    def get_summary(self, session_id: str) -> Tuple[str, int, int]:
+        """(özet metni, özetlenen tur sayısı, dönem); özet yoksa ("", 0, dönem)."""
+        with self._lock:
+            text, covered = self._summary.get(session_id, ("", 0))
+            return text, covered, self._epoch.get(session_id, 0)
+
+    def set_summary(self, session_id: str, text: str, covered: int, epoch: int) -> bool:
+        """
+        Özeti günceller; dönem değiştiyse (session temizlendi) veya daha yeni bir özet
+        zaten yazıldıysa yok sayar. Dönüş: yazıldı mı.
+        """
+        with self._lock:
+            if epoch != self._epoch.get(session_id) or session_id not in self._by_session:
+                return False
+            if covered <= self._summary.get(session_id, ("", 0))[1]:
+                return False
+            self._summary[session_id] = (str(text or ""), int(covered))
+            return True
+
     def clear(self, session_id: str) -> None:
-        """Belirli bir oturumun STM'ini temizle."""
+        """Belirli bir oturumun STM'ini (ve koşan özetini) temizle."""
         if not session_id:
             return
         with self._lock:
             self._by_session.pop(session_id, None)
+            self._summary.pop(session_id, None)
+            self._epoch.pop(session_id, None)
+
+    def session_count(self) -> int:
+        """Bellekte turu bulunan session sayısı (metrik gauge'u için)."""
+        with self._lock:
+            return len(self._by_session)
 
     def clear_all(self) -> None:
         """Tüm STM içeriklerini temizle (uygulama içi reset)."""
         with self._lock:
             self._by_session.clear()
+            self._summary.clear()
+            self._epoch.clear()
 
 
 # Tekil (singleton) örnek
@@ -61,3 +107,8 @@ append_turn = _store.append_turn
 get_context = _store.get_context
 clear = _store.clear
 clear_all = _store.clear_all
+session_count = _store.session_count
+turn_count = _store.turn_count
+get_range = _store.get_range
+get_summary = _store.get_summary
+set_summary = _store.set_summary
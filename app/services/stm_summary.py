@@ -0,0 +1,212 @@
+# app/services/stm_summary.py
+from __future__ import annotations
+
+"""
+Uzun session'lar için koşan (rolling) STM özeti.
+
+- Prompt'a ham turların tamamı yerine: koşan özet + özetlenmemiş ham turlar girer.
+- Ham pencere: en yeniden geriye doğru en fazla STM_RECENT_TURNS tur, toplamı
+  STM_RECENT_MAX_TOKENS bütçesine sığanlar (_window_start). En yeni tur bütçeyi tek başına
+  aşsa bile pencerededir ve prompt'ta kırpılarak yer alır.
+- Pencerenin gerisinde kalan özetlenmemiş tur sayısı STM_SUMMARY_BATCH_TURNS'e ulaşınca
+  session arka plan kuyruğuna alınır; worker AYNI pencere hesabıyla pencere öncesini
+  önceki özetle birleştirir (summarizer.summarize_turns, artımlı; her tur bir kez işlenir).
+  Özet STM_SUMMARY_MAX_TOKENS ile sınırlıdır → prompt boyu session uzunluğundan bağımsız kalır.
+- Özetlenmemiş turlar özete katılana kadar prompt'ta ham kalır: hiçbir tur ne özette ne
+  prompt'ta olmadan düşmez (özet gecikirse ham kısım en fazla bir batch kadar büyür).
+- Özetleme varsayılan olarak kural tabanlıdır; STM_SUMMARY_USE_LLM=true ile (opt-in) LLM
+  çağrısı "stm_summary" çağrı noktasıyla ve background önceliğinde yapılır; interaktif
+  sohbet trafiğinin önüne geçmez.
+- İstekteki max_turns ham tur üst sınırı olarak uygulanır (özet açıkken de).
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services import stm_store, summarizer
+
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        STM_SUMMARY_ENABLED = os.getenv("STM_SUMMARY_ENABLED", "true").lower() == "true"
+        STM_RECENT_TURNS = int(os.getenv("STM_RECENT_TURNS", "4"))
+        STM_RECENT_MAX_TOKENS = int(os.getenv("STM_RECENT_MAX_TOKENS", "600"))
+        STM_SUMMARY_MAX_TOKENS = int(os.getenv("STM_SUMMARY_MAX_TOKENS", "256"))
+        STM_SUMMARY_BATCH_TURNS = int(os.getenv("STM_SUMMARY_BATCH_TURNS", "4"))
+        STM_SUMMARY_USE_LLM = os.getenv("STM_SUMMARY_USE_LLM", "false").lower() == "true"
+
+    settings = _Fallback()  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+# Arka plan önceliği (opsiyonel)
+try:
+    from app.services.provider_scheduler import background as _background  # type: ignore
+except Exception:
+    _background = nullcontext  # type: ignore
+
+log = logging.getLogger("stm_summary")
+
+STM_SUMMARY_ENABLED: bool = bool(getattr(settings, "STM_SUMMARY_ENABLED", True))
+RECENT_TURNS: int = max(1, int(getattr(settings, "STM_RECENT_TURNS", 4)))
+RECENT_MAX_TOKENS: int = max(0, int(getattr(settings, "STM_RECENT_MAX_TOKENS", 600)))
+SUMMARY_MAX_TOKENS: int = max(16, int(getattr(settings, "STM_SUMMARY_MAX_TOKENS", 256)))
+BATCH_TURNS: int = max(1, int(getattr(settings, "STM_SUMMARY_BATCH_TURNS", 4)))
+USE_LLM: bool = bool(getattr(settings, "STM_SUMMARY_USE_LLM", False))
+
+_FOLD_MS_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+# ---------------------------
+# Prompt bağlamı
+# ---------------------------
+def _fit_recent(turns: List[dict], max_tokens: int) -> List[dict]:
+    """En yeniden geriye doğru bütçeye sığan turlar (kronolojik sırada)."""
+    if max_tokens <= 0 or not turns:
+        return turns
+    out: List[dict] = []
+    used = 0
+    for t in reversed(turns):
+        cost = summarizer.estimate_tokens(t.get("text", ""))
+        if used + cost > max_tokens:
+            if not out:
+                # En yeni tur tek başına bütçeyi aşıyor: kırpılmış haliyle girer
+                out.append({**t, "text": summarizer.clip_tokens(t.get("text", ""), max_tokens)})
+            break
+        out.append(t)
+        used += cost
+    out.reverse()
+    return out
+
+
+def _window_start(turns: List[dict], offset: int) -> int:
+    """
+    turns: özetlenmemiş turlar (mutlak indeksi offset'ten başlar). Ham pencerenin ilk
+    turunun mutlak indeksi; bundan öncesi özete katılmalıdır. context ve fold aynı hesabı kullanır.
+    """
+    keep = used = 0
+    for t in reversed(turns[-RECENT_TURNS:]):
+        cost = summarizer.estimate_tokens(t.get("text", ""))
+        if keep and RECENT_MAX_TOKENS > 0 and used + cost > RECENT_MAX_TOKENS:
+            break
+        keep += 1
+        used += cost
+    return offset + len(turns) - keep
+
+
+def context(session_id: str, max_turns: int) -> Tuple[str, List[dict]]:
+    """
+    (koşan özet, prompt'a girecek ham turlar). Kapalıyken ("", son max_turns tur).
+    Açıkken ham turlar özetin kapsamadığı turların tamamıdır (pencere + henüz özete
+    katılmamış olanlar); pencere STM_RECENT_TURNS / STM_RECENT_MAX_TOKENS ile belirlenir.
+    max_turns (> 0) her iki durumda da ham tur üst sınırıdır: daha küçükse en yeni
+    max_turns tur kalır (özet yine eklenir); 0 → sınır yok.
+    """
+    if not STM_SUMMARY_ENABLED:
+        return "", stm_store.get_context(session_id, max_turns=max_turns)
+    summary, covered, _epoch = stm_store.get_summary(session_id)
+    turns = stm_store.get_range(session_id, covered)
+    start = _window_start(turns, covered) - covered
+    raw = turns[:start] + _fit_recent(turns[start:], RECENT_MAX_TOKENS)
+    if max_turns and max_turns > 0:
+        raw = raw[-max_turns:]
+    return summary, raw
+
+
+# ---------------------------
+# Artımlı özetleme
+# ---------------------------
+def _pending_turns(session_id: str) -> Tuple[int, int]:
+    """(özetlenmiş tur sayısı, özetlenmesi gereken son indeks = pencerenin başı)."""
+    _summary, covered, _epoch = stm_store.get_summary(session_id)
+    return covered, _window_start(stm_store.get_range(session_id, covered), covered)
+
+
+def fold(session_id: str) -> bool:
+    """
+    Ham pencerenin gerisinde kalan özetlenmemiş turları özete katar.
+    Dönüş: özet güncellendi mi. Eşzamanlı clear / daha yeni özet varsa sonuç atılır.
+    """
+    summary, covered, epoch = stm_store.get_summary(session_id)
+    end = _window_start(stm_store.get_range(session_id, covered), covered)
+    if end <= covered:
+        return False
+    turns = stm_store.get_range(session_id, covered, end)
+    t0 = time.perf_counter()
+    with _background():
+        new_summary = summarizer.summarize_turns(
+            summary, turns, max_tokens=SUMMARY_MAX_TOKENS, prefer_llm=USE_LLM
+        )
+    written = stm_store.set_summary(session_id, new_summary, covered + len(turns), epoch)
+    if METRICS is not None:
+        METRICS.observe("stm_summary_fold_ms", (time.perf_counter() - t0) * 1000.0, _FOLD_MS_BUCKETS)
+        METRICS.incr("stm_summary_folds" if written else "stm_summary_discarded")
+    return written
+
+
+def maybe_schedule(session_id: str) -> bool:
+    """Özetlenmeyi bekleyen tur sayısı BATCH_TURNS'e ulaştıysa session'ı kuyruğa alır."""
+    if not STM_SUMMARY_ENABLED or not session_id:
+        return False
+    covered, end = _pending_turns(session_id)
+    if end - covered < BATCH_TURNS:
+        return False
+    schedule(session_id)
+    return True
+
+
+# ---------------------------
+# Arka plan thread'i
+# ---------------------------
+_pending_lock = threading.Lock()
+_pending: Dict[str, bool] = {}
+_queue: "queue.Queue[str]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+
+
+def schedule(session_id: str) -> None:
+    global _worker
+    with _pending_lock:
+        if session_id in _pending:
+            return
+        _pending[session_id] = True
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="stm-summary", daemon=True)
+            _worker.start()
+    _queue.put(session_id)
+
+
+def _run() -> None:
+    while True:
+        session_id = _queue.get()
+        try:
+            fold(session_id)
+        except Exception:
+            log.exception("STM özeti güncellenemedi: %s", session_id)
+        finally:
+            with _pending_lock:
+                _pending.pop(session_id, None)
+
+
+def stats() -> Dict[str, Any]:
+    with _pending_lock:
+        pending = len(_pending)
+    return {
+        "enabled": STM_SUMMARY_ENABLED,
+        "recent_turns": RECENT_TURNS,
+        "recent_max_tokens": RECENT_MAX_TOKENS,
+        "summary_max_tokens": SUMMARY_MAX_TOKENS,
+        "batch_turns": BATCH_TURNS,
+        "use_llm": USE_LLM,
+        "pending": pending,
+    }
@@ -0,0 +1,276 @@
+# app/services/structured_reply.py
+from __future__ import annotations
+
+"""
+Tek çağrı (single-call) modu: ana üretim prompt'u hem yanıtı hem de 0-5 memory
+adayını tek bir JSON nesnesi olarak ister:
+
+    {"reply": "...", "memories": [{"scope": "...", "text": "...", "reason": "..."}]}
+
+Model çıktısı akış (stream) halinde gelirken `IncrementalReplyParser` "reply"
+alanının metnini parça parça çözer; böylece yanıt yine akıtılabilir. Akış bittiğinde
+"memories" listesi toleranslı biçimde ayrıştırılır (kod bloğu, eksik parantez,
+model formatı hiç uygulamamış olsa bile).
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_REPLY_KEY_RE = re.compile(r'"reply"\s*:\s*"')
+_MEMORIES_KEY_RE = re.compile(r'"memories"\s*:\s*\[')
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+def build_instructions() -> str:
+    """Ana prompt'un sonuna eklenen çıktı formatı talimatı."""
+    return """
+[OUTPUT FORMAT]
+Respond with ONE JSON object and nothing else:
+{"reply": "<your answer to the user>", "memories": [ ... ]}
+
+- "reply" MUST be the first key. Write it exactly as you would answer the user.
+- "memories": 0 to 5 items worth remembering for the FUTURE, each:
+  {"scope": "global" | "local", "text": "<short, self-contained, Turkish>", "reason": "<why>"}
+  * "global": user profile, preferences, long-term facts (name, job, hobbies, projects…)
+  * "local": this conversation's decisions, tasks, constraints, plans
+- If nothing is worth remembering, use "memories": []
+- DO NOT invent facts. Max memory text length: 200 chars.
+""".strip()
+
+
+def _strip_fences(text: str) -> str:
+    return _FENCE_RE.sub("", text or "").strip()
+
+
+def _close_json(fragment: str) -> str:
+    """
+    Yarım kalmış bir JSON parçasını açık string/parantezleri kapatarak onarır.
+    (Model çıktısı max_output_tokens'a takılıp kesildiğinde işe yarar.)
+    """
+    stack: List[str] = []
+    in_str = False
+    esc = False
+    for ch in fragment:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "[{":
+            stack.append("]" if ch == "[" else "}")
+        elif ch in "]}" and stack:
+            stack.pop()
+
+    out = fragment
+    if in_str:
+        out += '"'
+    out = re.sub(r"[,:\s]+$", "", out)
+    return out + "".join(reversed(stack))
+
+
+def _extract_memories(raw: str) -> List[Any]:
+    """'memories' dizisini toleranslı biçimde çıkarır; başarısızsa boş liste."""
+    m = _MEMORIES_KEY_RE.search(raw)
+    if not m:
+        return []
+    fragment = raw[m.end() - 1:]
+
+    # Dizinin kapandığı yeri bul; bulunamazsa onar
+    depth = 0
+    in_str = False
+    esc = False
+    end = None
+    for i, ch in enumerate(fragment):
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "[{":
+            depth += 1
+        elif ch in "]}":
+            depth -= 1
+            if depth == 0:
+                end = i + 1
+                break
+
+    candidate = fragment[:end] if end else _close_json(fragment)
+    try:
+        data = json.loads(candidate)
+    except Exception:
+        return []
+    return data if isinstance(data, list) else []
+
+
+def _hex4(digits: str) -> Optional[int]:
+    try:
+        return int(digits, 16) if len(digits) == 4 else None
+    except ValueError:
+        return None
+
+
+class IncrementalReplyParser:
+    """
+    Akan model çıktısından "reply" alanını artımlı çözer.
+
+    Kullanım:
+        p = IncrementalReplyParser()
+        for chunk in llm_client.stream(...):
+            delta = p.feed(chunk)   # kullanıcıya akıtılacak yeni yanıt metni
+        result = p.finish()         # {"reply": str, "memories": list, "structured": bool}
+    """
+
+    def __init__(self) -> None:
+        self._raw: List[str] = []
+        self._pending = ""       # henüz işlenmemiş ham karakterler
+        self._state = "seek"     # seek → reply → done | plain
+        self._reply: List[str] = []
+
+    # --- durum makinesi ---
+    def feed(self, chunk: str) -> str:
+        if not chunk:
+            return ""
+        self._raw.append(chunk)
+        self._pending += chunk
+        out: List[str] = []
+
+        if self._state == "seek":
+            head = self._pending.lstrip()
+            if head and not head.startswith(("{", "`")):
+                # Model formatı uygulamadı → düz metin olarak akıt
+                self._state = "plain"
+            else:
+                m = _REPLY_KEY_RE.search(self._pending)
+                if not m:
+                    return ""
+                self._pending = self._pending[m.end():]
+                self._state = "reply"
+
+        if self._state == "plain":
+            out.append(self._pending)
+            self._reply.append(self._pending)
+            self._pending = ""
+            return "".join(out)
+
+        if self._state == "reply":
+            out.append(self._decode_string())
+
+        return "".join(out)
+
+    def _decode_string(self) -> str:
+        """_pending içindeki JSON string gövdesini, kapanış tırnağına kadar çözer."""
+        buf = self._pending
+        out: List[str] = []
+        i = 0
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if ch == '"':
+                self._state = "done"
+                i += 1
+                break
+            if ch != "\\":
+                out.append(ch)
+                i += 1
+                continue
+            # Kaçış dizisi: parça sınırında yarım kalmışsa bir sonraki feed'i bekle
+            if i + 1 >= n:
+                break
+            nxt = buf[i + 1]
+            if nxt == "u":
+                if i + 6 > n:
+                    break
+                code = _hex4(buf[i + 2:i + 6])
+                if code is None:
+                    out.append(buf[i:i + 6])
+                    i += 6
+                    continue
+                if 0xD800 <= code <= 0xDBFF:
+                    # UTF-16 vekil çifti (😀 gibi): düşük yarı sonraki parçada olabilir
+                    rest = buf[i + 6:i + 12]
+                    if len(rest) < 6 and "\\u".startswith(rest[:2]):
+                        break
+                    low = _hex4(rest[2:6]) if rest.startswith("\\u") else None
+                    if low is not None and 0xDC00 <= low <= 0xDFFF:
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+                    out.append("\ufffd")
+                elif 0xDC00 <= code <= 0xDFFF:
+                    out.append("\ufffd")
+                else:
+                    out.append(chr(code))
+                i += 6
+                continue
+            out.append(_SIMPLE_ESCAPES.get(nxt, nxt))
+            i += 2
+
+        self._pending = buf[i:]
+        text = "".join(out)
+        self._reply.append(text)
+        return text
+
+    def finish(self) -> Dict[str, Any]:
+        raw = _strip_fences("".join(self._raw))
+
+        # 1) Tam ve geçerli JSON ise doğrudan kullan
+        try:
+            data = json.loads(raw)
+            if isinstance(data, dict) and isinstance(data.get("reply"), str):
+                memories = data.get("memories")
+                return {
+                    "reply": data["reply"].strip(),
+                    "memories": memories if isinstance(memories, list) else [],
+                    "structured": True,
+                }
+        except Exception:
+            pass
+
+        # 2) Düz metin: model formatı hiç uygulamadı
+        if self._state in ("seek", "plain"):
+            return {"reply": raw, "memories": [], "structured": False}
+
+        # 3) Artımlı çözülen yanıt + toleranslı memories
+        return {
+            "reply": "".join(self._reply).strip(),
+            "memories": _extract_memories(raw),
+            "structured": True,
+        }
+
+
+def iter_reply(chunks: Iterable[str], parser: Optional[IncrementalReplyParser] = None) -> Iterator[str]:
+    """Model parçalarını yanıt metni parçalarına dönüştüren üreteç (parser dışarıdan verilebilir)."""
+    p = parser or IncrementalReplyParser()
+    for chunk in chunks:
+        delta = p.feed(chunk)
+        if delta:
+            yield delta
+
+
+def parse(text: str) -> Dict[str, Any]:
+    """Akış gerektirmeyen durumlar için tek seferde ayrıştırma."""
+    p = IncrementalReplyParser()
+    p.feed(text or "")
+    return p.finish()
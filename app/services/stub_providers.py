@@ -0,0 +1,178 @@
+# app/services/stub_providers.py
+from __future__ import annotations
+
+"""
+Yerel stub sağlayıcılar: gerçek API'ye gitmeden ayarlanabilir gecikme dağılımı ve
+hata oranı ile LLM davranışını taklit eder. Dayanıklılık katmanını (deadline, retry,
+hedge, devre kesici), benchmark ve yük testlerini ağ/kota olmadan çalıştırmak içindir.
+
+LLM_PROVIDER=stub ile llm_client StubChatModel'i, EMB_BACKEND=stub ile embed_client
+StubEmbeddings'i kullanır.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+
+class StubProviderError(RuntimeError):
+    """Stub sağlayıcının enjekte ettiği yapay hata."""
+
+
+class _StubMessage:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+def sample_latency_s(
+    rng: random.Random,
+    *,
+    distribution: str,
+    median_ms: float,
+    spread: float,
+) -> float:
+    """
+    Gecikme örnekler (saniye).
+    - fixed       : her zaman median_ms
+    - uniform     : median_ms * [1-spread, 1+spread]
+    - exponential : ortalaması median_ms olan üstel dağılım
+    - lognormal   : medyanı median_ms, sigma=spread (uzun kuyruk)
+    """
+    base = max(0.0, float(median_ms)) / 1000.0
+    if base <= 0:
+        return 0.0
+    dist = (distribution or "lognormal").lower()
+    if dist == "fixed":
+        return base
+    if dist == "uniform":
+        return max(0.0, base * rng.uniform(1.0 - spread, 1.0 + spread))
+    if dist == "exponential":
+        return rng.expovariate(1.0 / base)
+    return base * math.exp(rng.gauss(0.0, max(0.0, spread)))
+
+
+class _StubLatency:
+    """Ortak gecikme / hata / askıda kalma enjeksiyonu (thread-safe RNG)."""
+
+    def __init__(
+        self,
+        *,
+        latency_ms: float,
+        latency_spread: float = 0.5,
+        distribution: str = "lognormal",
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_ms: float = 60_000.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.latency_ms = float(latency_ms)
+        self.latency_spread = float(latency_spread)
+        self.distribution = distribution
+        self.error_rate = float(error_rate)
+        self.hang_rate = float(hang_rate)
+        self.hang_ms = float(hang_ms)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _simulate(self) -> None:
+        with self._lock:
+            self.calls += 1
+            roll = self._rng.random()
+            delay = sample_latency_s(
+                self._rng,
+                distribution=self.distribution,
+                median_ms=self.latency_ms,
+                spread=self.latency_spread,
+            )
+        if roll < self.hang_rate:
+            time.sleep(self.hang_ms / 1000.0)
+            raise StubProviderError("stub: hung call finally gave up")
+        time.sleep(delay)
+        if roll < self.hang_rate + self.error_rate:
+            raise StubProviderError("stub: injected provider error")
+
+
+class StubChatModel(_StubLatency):
+    """
+    LangChain ChatModel arayüzünün (invoke / stream) kullanılan kısmını taklit eder.
+    Prompt türüne göre deterministik, biçime uygun yanıtlar üretir:
+    - memory extraction prompt'u → "[]"
+    - tek çağrı (OUTPUT FORMAT) prompt'u → {"reply": ..., "memories": []}
+    - diğerleri → "(stub) <mesajın başı>"
+    """
+
+    def __init__(self, *, latency_ms: float = 200.0, **kwargs: Any) -> None:
+        super().__init__(latency_ms=latency_ms, **kwargs)
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> "StubChatModel":
+        return cls(
+            latency_ms=float(getattr(settings, "LLM_STUB_LATENCY_MS", 200.0)),
+            latency_spread=float(getattr(settings, "LLM_STUB_LATENCY_SPREAD", 0.5)),
+            distribution=str(getattr(settings, "LLM_STUB_LATENCY_DIST", "lognormal")),
+            error_rate=float(getattr(settings, "LLM_STUB_ERROR_RATE", 0.0)),
+            hang_rate=float(getattr(settings, "LLM_STUB_HANG_RATE", 0.0)),
+        )
+
+    # --- davranış ---
+    @staticmethod
+    def _prompt_of(msgs: List[Any]) -> str:
+        if not msgs:
+            return ""
+        last = msgs[-1]
+        return str(getattr(last, "content", last) or "")
+
+    @staticmethod
+    def _reply_for(prompt: str) -> str:
+        if "memory extraction module" in prompt:
+            return "[]"
+        tail = prompt.rsplit("[USER MESSAGE]", 1)[-1].split("[OUTPUT FORMAT]", 1)[0]
+        text = " ".join(tail.split())[:200] or "ok"
+        if "[OUTPUT FORMAT]" in prompt:
+            return json.dumps({"reply": f"(stub) {text}", "memories": []}, ensure_ascii=False)
+        return f"(stub) {text}"
+
+    def invoke(self, msgs: List[Any]) -> _StubMessage:
+        self._simulate()
+        return _StubMessage(self._reply_for(self._prompt_of(msgs)))
+
+    def stream(self, msgs: List[Any]) -> Iterator[_StubMessage]:
+        self._simulate()
+        text = self._reply_for(self._prompt_of(msgs))
+        step = 16
+        for i in range(0, len(text), step):
+            yield _StubMessage(text[i:i + step])
+
+
+class StubEmbeddings(_StubLatency):
+    """
+    LangChain Embeddings arayüzünü (embed_documents / embed_query) taklit eder.
+    Vektörler deterministik yerel motordan (local_embedder) gelir; gecikme ve hata
+    enjeksiyonu çağrı (batch) başınadır. EMB_BACKEND=stub ile embed_client bunu kullanır;
+    batch / deadline / devre kesici yolu gerçek sağlayıcıdaki gibi çalışır.
+    """
+
+    def __init__(self, *, latency_ms: float = 20.0, **kwargs: Any) -> None:
+        super().__init__(latency_ms=latency_ms, **kwargs)
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> "StubEmbeddings":
+        return cls(
+            latency_ms=float(getattr(settings, "EMB_STUB_LATENCY_MS", 20.0)),
+            latency_spread=float(getattr(settings, "EMB_STUB_LATENCY_SPREAD", 0.5)),
+            distribution=str(getattr(settings, "EMB_STUB_LATENCY_DIST", "lognormal")),
+            error_rate=float(getattr(settings, "EMB_STUB_ERROR_RATE", 0.0)),
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        from app.services import local_embedder
+
+        self._simulate()
+        return local_embedder.embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
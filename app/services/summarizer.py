@@ -108,7 +108,7 @@ def distill(
             f"{draft}"
         )
         try:
-            out = llm_generate(prompt).get("text", "").strip()  # type: ignore
+            out = llm_generate(prompt, call_site="summarizer").get("text", "").strip()  # type: ignore
             if out:
                 return out
         except Exception:
@@ -116,3 +116,67 @@ def distill(
 
     # Fallback: taslak halini döndür
     return draft
+
+
+# Modül dışı kullanım (stm_summary token bütçeleri) için genel ad
+estimate_tokens = _estimate_tokens
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Metni yaklaşık max_tokens'a kırpar (kelime sınırında, '…' ile)."""
+    if not text or max_tokens <= 0 or _estimate_tokens(text) <= max_tokens:
+        return text
+    words = text.split()
+    keep = max(1, int(max_tokens / 1.3))
+    return " ".join(words[:keep]) + " …"
+
+
+def _turn_line(turn: Dict[str, Any], max_tokens: int) -> str:
+    text = re.sub(r"\s+", " ", str(turn.get("text") or "")).strip()
+    return f"{str(turn.get('role') or 'user').upper()}: {clip_tokens(text, max_tokens)}"
+
+
+def summarize_turns(
+    previous: str,
+    turns: List[Dict[str, Any]],
+    *,
+    max_tokens: int = 256,
+    prefer_llm: bool = True,
+) -> str:
+    """
+    Koşan (rolling) konuşma özeti: önceki özet + STM penceresinden düşen turlar → yeni özet.
+    Her çağrıda yalnızca yeni turlar işlenir (artımlı); sonuç max_tokens'a sığdırılır.
+    LLM yoksa / fallback dönerse kural tabanlı: her turun ilk cümlesi madde olarak eklenir,
+    bütçe aşılırsa en eski maddeler düşer.
+    """
+    previous = (previous or "").strip()
+    if not turns:
+        return previous
+
+    if prefer_llm and llm_generate is not None:
+        lines = "\n".join(_turn_line(t, 200) for t in turns)
+        prompt = (
+            "Aşağıda bir sohbetin şimdiye kadarki özeti ve ardından gelen yeni turlar var. "
+            "Özeti yeni turlarla güncelle: kullanıcının hedeflerini, verdiği bilgileri, alınan "
+            "kararları ve açık kalan soruları koru; selamlaşma ve tekrarları at. "
+            f"Kısa maddeler halinde yaz, en fazla {max_tokens} token. Yalnızca özeti döndür.\n\n"
+            f"[ÖNCEKİ ÖZET]\n{previous or '(yok)'}\n\n[YENİ TURLAR]\n{lines}"
+        )
+        try:
+            out = llm_generate(prompt, call_site="stm_summary")  # type: ignore
+            text = (out.get("text") or "").strip() if isinstance(out, dict) else ""
+            if text and not (isinstance(out, dict) and out.get("fallback")):
+                return clip_tokens(text, max_tokens)
+        except Exception:
+            pass
+
+    # Kural tabanlı: önceki maddeler + her yeni turun ilk cümlesi; baştan kırp
+    bullets = [b for b in previous.splitlines() if b.strip()]
+    for t in turns:
+        sents = _sent_split(str(t.get("text") or ""))
+        head = sents[0] if sents else ""
+        if head.strip():
+            bullets.append("- " + _turn_line({"role": t.get("role"), "text": head}, 40))
+    while len(bullets) > 1 and _estimate_tokens("\n".join(bullets)) > max_tokens:
+        bullets.pop(0)
+    return clip_tokens("\n".join(bullets), max_tokens)
@@ -0,0 +1,464 @@
+# app/services/vector_segments.py
+from __future__ import annotations
+
+"""
+Kullanıcı (global) / session (local) bazında segmentli vektör deposu.
+
+Sahip (owner) = (scope, user_id, session_id). Her sahibin vektörleri:
+- mühürlü (sealed) segmentler: vector_segments tablosunda değişmez blob'lar;
+  id'ler (int64) + önceden L2 normalize edilmiş vektörler (float32).
+- değişken kuyruk (tail): son mühürlü segmentin max_id'sinden büyük id'li
+  satırlar; doğrudan sıcak tablodan okunur.
+
+Arama tüm segmentlerde + kuyrukta vektörize skorlar, her parçadan argpartition
+ile top-k alır ve birleştirir; recency penceresi (candidate_limit) yoktur.
+Silinen kayıtlar segmentte kalabilir; hidrasyon (hydrate) sırasında elenir,
+arka plan birleştirmesinde (compaction) fiziksel olarak düşülür.
+
+Yalnızca sağlayıcı uzayındaki (SEGMENT_SPACE = embed_client.PROVIDER_SPACE)
+satırlar indekslenir; yerel yedek motorla üretilmiş vektörler aynı boyutta olsa
+da başka bir uzaydır ve karıştırılmaz (bkz. app/scripts/reindex.py --reembed).
+
+Bakım (mühürleme + küçük segmentlerin birleştirilmesi) tek bir arka plan
+thread'inde yapılır; arama yolu yalnızca ihtiyaç olduğunu bildirir.
+Segment dizileri bayt sınırlı bir LRU önbellekte tutulur.
+"""
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.db.repository import get_conn, path_for_user, pooled_conn
+from app.services import similarity
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        VECTOR_SEGMENTS_ENABLED = os.getenv("VECTOR_SEGMENTS_ENABLED", "true").lower() == "true"
+        SEGMENT_SEAL_ROWS = int(os.getenv("SEGMENT_SEAL_ROWS", "256"))
+        SEGMENT_TARGET_ROWS = int(os.getenv("SEGMENT_TARGET_ROWS", "4096"))
+        SEGMENT_MAX_SMALL = int(os.getenv("SEGMENT_MAX_SMALL", "4"))
+        SEGMENT_CACHE_MB = int(os.getenv("SEGMENT_CACHE_MB", "256"))
+
+    settings = _Fallback()  # type: ignore
+
+# Vektör uzayı (opsiyonel): yoksa uzay filtresi uygulanmaz
+try:
+    from app.services.embed_client import PROVIDER_SPACE as _PROVIDER_SPACE  # type: ignore
+except Exception:
+    _PROVIDER_SPACE = None  # type: ignore
+
+# Metrikler (opsiyonel)
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+log = logging.getLogger("vector_segments")
+
+SEGMENTS_ENABLED: bool = bool(getattr(settings, "VECTOR_SEGMENTS_ENABLED", True))
+SEAL_ROWS: int = max(1, int(getattr(settings, "SEGMENT_SEAL_ROWS", 256)))
+TARGET_ROWS: int = max(SEAL_ROWS, int(getattr(settings, "SEGMENT_TARGET_ROWS", 4096)))
+MAX_SMALL: int = max(1, int(getattr(settings, "SEGMENT_MAX_SMALL", 4)))
+CACHE_BYTES: int = max(1, int(getattr(settings, "SEGMENT_CACHE_MB", 256))) * 1024 * 1024
+SEGMENT_SPACE: Optional[Tuple[str, str]] = tuple(_PROVIDER_SPACE) if _PROVIDER_SPACE else None  # type: ignore
+
+_TABLES = {"global": "global_memories", "local": "local_memories"}
+
+Owner = Tuple[str, str, str]  # (scope, user_id, session_id | "")
+
+
+def _incr(name: str) -> None:
+    if METRICS is not None and hasattr(METRICS, "incr"):
+        METRICS.incr(name)
+
+
+def _owner(scope: str, user_id: str, session_id: Optional[str]) -> Owner:
+    return (scope, user_id, session_id or "")
+
+
+def _owner_where(owner: Owner) -> Tuple[str, Tuple[Any, ...]]:
+    scope, user_id, session_id = owner
+    if scope == "local":
+        return "user_id = ? AND session_id = ?", (user_id, session_id)
+    return "user_id = ?", (user_id,)
+
+
+def _space_where() -> Tuple[str, Tuple[Any, ...]]:
+    if SEGMENT_SPACE is None:
+        return "", ()
+    return " AND emb_version = ? AND model = ?", SEGMENT_SPACE
+
+
+def _normalize(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return (mat / np.where(norms > 0, norms, 1.0)).astype(np.float32, copy=False)
+
+
+def _topk(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    idx, top = similarity.topk(scores, k)
+    return ids[idx], top
+
+
+# ---------------------------
+# Segment önbelleği (LRU, bayt sınırlı)
+# ---------------------------
+class _SegmentCache:
+    def __init__(self, max_bytes: int) -> None:
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[int, Tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self.max_bytes = max_bytes
+
+    def get(self, seg_id: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        with self._lock:
+            item = self._data.get(seg_id)
+            if item is not None:
+                self._data.move_to_end(seg_id)
+            return item
+
+    def put(self, seg_id: int, ids: np.ndarray, mat: np.ndarray) -> None:
+        size = ids.nbytes + mat.nbytes
+        with self._lock:
+            old = self._data.pop(seg_id, None)
+            if old is not None:
+                self._bytes -= old[0].nbytes + old[1].nbytes
+            self._data[seg_id] = (ids, mat)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                _, (i, m) = self._data.popitem(last=False)
+                self._bytes -= i.nbytes + m.nbytes
+
+    def drop(self, seg_ids: Sequence[int]) -> None:
+        with self._lock:
+            for s in seg_ids:
+                old = self._data.pop(s, None)
+                if old is not None:
+                    self._bytes -= old[0].nbytes + old[1].nbytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"segments": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_CACHE = _SegmentCache(CACHE_BYTES)
+
+
+# ---------------------------
+# Segment okuma / yazma
+# ---------------------------
+def _segment_meta(con: sqlite3.Connection, owner: Owner) -> List[sqlite3.Row]:
+    return con.execute(
+        """
+        SELECT segment_id, min_id, max_id, count, dim FROM vector_segments
+        WHERE scope = ? AND user_id = ? AND session_id = ?
+        ORDER BY max_id
+        """,
+        owner,
+    ).fetchall()
+
+
+def _load_segments(con: sqlite3.Connection, seg_ids: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    out: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+    missing: List[int] = []
+    for s in seg_ids:
+        item = _CACHE.get(s)
+        if item is None:
+            missing.append(s)
+        else:
+            out[s] = item
+    if missing:
+        placeholders = ",".join("?" * len(missing))
+        for r in con.execute(
+            f"SELECT segment_id, dim, ids, vectors FROM vector_segments WHERE segment_id IN ({placeholders})",
+            missing,
+        ).fetchall():
+            ids = np.frombuffer(r["ids"], dtype=np.int64)
+            mat = np.frombuffer(r["vectors"], dtype=np.float32).reshape(len(ids), int(r["dim"]))
+            _CACHE.put(int(r["segment_id"]), ids, mat)
+            out[int(r["segment_id"])] = (ids, mat)
+    return out
+
+
+def _read_rows(con: sqlite3.Connection, owner: Owner, after_id: int,
+               limit: Optional[int] = None) -> Tuple[np.ndarray, List[np.ndarray]]:
+    where, params = _owner_where(owner)
+    space_sql, space_params = _space_where()
+    sql = f"SELECT id, embedding FROM {_TABLES[owner[0]]} WHERE {where}{space_sql} AND id > ? ORDER BY id"
+    p: List[Any] = [*params, *space_params, after_id]
+    if limit is not None:
+        sql += " LIMIT ?"
+        p.append(limit)
+    rows = con.execute(sql, p).fetchall()
+    ids = np.fromiter((int(r[0]) for r in rows), dtype=np.int64, count=len(rows))
+    return ids, [np.frombuffer(r[1], dtype=np.float32) for r in rows]
+
+
+def _write_segment(con: sqlite3.Connection, owner: Owner, ids: np.ndarray, mat: np.ndarray,
+                   min_id: int, max_id: int) -> None:
+    con.execute(
+        """
+        INSERT INTO vector_segments (scope, user_id, session_id, min_id, max_id, count, dim, ids, vectors, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (*owner, int(min_id), int(max_id), int(len(ids)), int(mat.shape[1]) if mat.ndim == 2 else 0,
+         ids.astype(np.int64).tobytes(), np.ascontiguousarray(mat, dtype=np.float32).tobytes(), int(time.time())),
+    )
+
+
+def _stack_same_dim(ids: np.ndarray, vecs: List[np.ndarray], dim: int) -> Tuple[np.ndarray, np.ndarray]:
+    keep = [i for i, v in enumerate(vecs) if v.shape[0] == dim]
+    if not keep:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, dim), dtype=np.float32)
+    return ids[keep], _normalize(np.stack([vecs[i] for i in keep]))
+
+
+# ---------------------------
+# Arama
+# ---------------------------
+def preload(user_id: str, *, db_path: Optional[str] = None) -> int:
+    """
+    Kullanıcının (global + tüm session'lar) mühürlü segmentlerini önbelleğe yükler;
+    açılış ısınması için. Yeni yüklenen segment sayısını döner.
+    """
+    db_path = db_path or path_for_user(user_id)
+    with pooled_conn(db_path) as con:
+        seg_ids = [
+            int(r["segment_id"])
+            for r in con.execute(
+                "SELECT segment_id FROM vector_segments WHERE user_id = ? ORDER BY max_id DESC", (user_id,)
+            ).fetchall()
+        ]
+        missing = [s for s in seg_ids if _CACHE.get(s) is None]
+        for i in range(0, len(missing), 256):
+            _load_segments(con, missing[i:i + 256])
+    return len(missing)
+
+
+def search(
+    scope: str,
+    user_id: str,
+    session_id: Optional[str],
+    query: Sequence[float],
+    k: int,
+    hydrate: Callable[[List[int]], Dict[int, Any]],
+    *,
+    db_path: Optional[str] = None,
+) -> List[Tuple[Any, float]]:
+    """
+    Sahibin SEGMENT_SPACE uzayındaki tüm vektörlerinde top-k kosinüs araması;
+    sorgu da aynı uzayda üretilmiş olmalıdır (çağıran kontrol eder).
+    hydrate(ids) → {id: satır}; silinmiş id'ler dönmez ve atlanır.
+    Dönüş: [(satır, skor)] skor azalan sırada, en fazla k adet.
+    """
+    if k <= 0:
+        return []
+    owner = _owner(scope, user_id, session_id)
+    q = np.asarray(query, dtype=np.float32).ravel()
+    qn = float(np.linalg.norm(q))
+    if qn == 0.0:
+        return []
+    q = q / qn
+    dim = q.shape[0]
+
+    all_ids: List[np.ndarray] = []
+    all_scores: List[np.ndarray] = []
+    # Silinmiş kayıtlar için pay bırakarak her parçadan biraz fazla aday alınır
+    fetch = k * 2 + 8
+    db_path = db_path or path_for_user(user_id)
+
+    with pooled_conn(db_path) as con:
+        # Tek okuma işlemi: segment listesi, blob'lar ve kuyruk aynı anlık görüntüden
+        con.execute("BEGIN")
+        metas = _segment_meta(con, owner)
+        last_sealed = max((int(m["max_id"]) for m in metas), default=0)
+        segs = _load_segments(con, [int(m["segment_id"]) for m in metas if int(m["dim"]) == dim])
+        tail_ids, tail_vecs = _read_rows(con, owner, last_sealed)
+
+    for ids, mat in segs.values():
+        if ids.shape[0]:
+            i, s = _topk(ids, mat @ q, fetch)
+            all_ids.append(i)
+            all_scores.append(s)
+
+    t_ids, t_mat = _stack_same_dim(tail_ids, tail_vecs, dim)
+    if t_ids.shape[0]:
+        i, s = _topk(t_ids, t_mat @ q, fetch)
+        all_ids.append(i)
+        all_scores.append(s)
+
+    if tail_ids.shape[0] >= SEAL_ROWS or len(metas) > MAX_SMALL:
+        schedule_maintenance(owner, db_path=db_path)
+
+    if not all_ids:
+        return []
+    cand_ids = np.concatenate(all_ids)
+    cand_scores = np.concatenate(all_scores)
+    order = np.argsort(-cand_scores, kind="stable")
+    cand_ids = cand_ids[order]
+    cand_scores = cand_scores[order]
+
+    # Hidrasyon: sıralı adaylardan, silinmişleri atlayarak k tane topla
+    out: List[Tuple[Any, float]] = []
+    pos = 0
+    while len(out) < k and pos < cand_ids.shape[0]:
+        chunk = cand_ids[pos:pos + fetch].tolist()
+        rows = hydrate(chunk)
+        for j, mid in enumerate(chunk):
+            row = rows.get(mid)
+            if row is not None:
+                out.append((row, float(cand_scores[pos + j])))
+                if len(out) >= k:
+                    break
+        pos += len(chunk)
+    return out
+
+
+# ---------------------------
+# Bakım: mühürleme + birleştirme
+# ---------------------------
+def seal(owner: Owner, *, db_path: Optional[str] = None) -> int:
+    """Kuyruktaki satırları SEAL_ROWS'luk segmentlere mühürler. Dönüş: yazılan segment sayısı."""
+    written = 0
+    with get_conn(db_path or path_for_user(owner[1])) as con:
+        metas = _segment_meta(con, owner)
+        last = max((int(m["max_id"]) for m in metas), default=0)
+        while True:
+            ids, vecs = _read_rows(con, owner, last, limit=SEAL_ROWS)
+            if ids.shape[0] < SEAL_ROWS:
+                break
+            dim = max(set(v.shape[0] for v in vecs), key=lambda d: sum(1 for v in vecs if v.shape[0] == d))
+            s_ids, mat = _stack_same_dim(ids, vecs, dim)
+            _write_segment(con, owner, s_ids, mat, int(ids[0]), int(ids[-1]))
+            last = int(ids[-1])
+            written += 1
+    if written:
+        _incr("vector_segments_sealed")
+    return written
+
+
+def compact(owner: Owner, *, db_path: Optional[str] = None) -> int:
+    """
+    Hedef boyuttan küçük komşu segmentleri birleştirir; silinmiş id'leri düşer.
+    Dönüş: birleştirilen (kaldırılan) segment sayısı.
+    """
+    removed = 0
+    with get_conn(db_path or path_for_user(owner[1])) as con:
+        metas = [m for m in _segment_meta(con, owner)]
+        small = [m for m in metas if int(m["count"]) < TARGET_ROWS]
+        if len(small) <= 1:
+            return 0
+
+        # Ardışık küçük segmentleri TARGET_ROWS'a kadar grupla
+        groups: List[List[sqlite3.Row]] = []
+        cur: List[sqlite3.Row] = []
+        size = 0
+        for m in small:
+            if cur and (size + int(m["count"]) > TARGET_ROWS or int(m["dim"]) != int(cur[0]["dim"])):
+                groups.append(cur)
+                cur, size = [], 0
+            cur.append(m)
+            size += int(m["count"])
+        if cur:
+            groups.append(cur)
+
+        table = _TABLES[owner[0]]
+        where, params = _owner_where(owner)
+        space_sql, space_params = _space_where()
+        for g in groups:
+            if len(g) < 2:
+                continue
+            seg_ids = [int(m["segment_id"]) for m in g]
+            loaded = _load_segments(con, seg_ids)
+            ids = np.concatenate([loaded[s][0] for s in seg_ids])
+            mat = np.concatenate([loaded[s][1] for s in seg_ids])
+            lo, hi = int(g[0]["min_id"]), int(g[-1]["max_id"])
+            alive = {
+                int(r[0])
+                for r in con.execute(
+                    f"SELECT id FROM {table} WHERE {where}{space_sql} AND id BETWEEN ? AND ?",
+                    (*params, *space_params, lo, hi),
+                ).fetchall()
+            }
+            mask = np.fromiter((int(i) in alive for i in ids), dtype=bool, count=ids.shape[0])
+            placeholders = ",".join("?" * len(seg_ids))
+            con.execute(f"DELETE FROM vector_segments WHERE segment_id IN ({placeholders})", seg_ids)
+            _write_segment(con, owner, ids[mask], mat[mask], lo, hi)
+            _CACHE.drop(seg_ids)
+            removed += len(seg_ids) - 1
+    if removed:
+        _incr("vector_segments_compacted")
+    return removed
+
+
+def invalidate(scope: str, user_id: str, session_id: Optional[str] = None, *, db_path: Optional[str] = None) -> None:
+    """
+    Sahibin segmentlerini siler (embedding değişikliği / yeniden embed / geri yükleme sonrası).
+    local'de session_id None ise kullanıcının tüm session'ları geçersizlenir.
+    Segmentler sonraki aramalarda kuyruktan yeniden mühürlenir.
+    """
+    sql = "SELECT segment_id FROM vector_segments WHERE scope = ? AND user_id = ?"
+    params: List[Any] = [scope, user_id]
+    if session_id is not None:
+        sql += " AND session_id = ?"
+        params.append(session_id)
+    with get_conn(db_path or path_for_user(user_id)) as con:
+        seg_ids = [int(r[0]) for r in con.execute(sql, params).fetchall()]
+        if seg_ids:
+            placeholders = ",".join("?" * len(seg_ids))
+            con.execute(f"DELETE FROM vector_segments WHERE segment_id IN ({placeholders})", seg_ids)
+    _CACHE.drop(seg_ids)
+
+
+# ---------------------------
+# Arka plan bakım thread'i
+# ---------------------------
+_pending_lock = threading.Lock()
+_pending: Dict[Tuple[Owner, Optional[str]], bool] = {}
+_queue: "queue.Queue[Tuple[Owner, Optional[str]]]" = queue.Queue()
+_worker: Optional[threading.Thread] = None
+
+
+def schedule_maintenance(owner: Owner, *, db_path: Optional[str] = None) -> None:
+    global _worker
+    key = (owner, db_path)
+    with _pending_lock:
+        if key in _pending:
+            return
+        _pending[key] = True
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name="vector-segments", daemon=True)
+            _worker.start()
+    _queue.put(key)
+
+
+def _run() -> None:
+    while True:
+        owner, db_path = _queue.get()
+        try:
+            seal(owner, db_path=db_path)
+            compact(owner, db_path=db_path)
+        except Exception:
+            log.exception("Segment bakımı başarısız: %s", owner)
+        finally:
+            with _pending_lock:
+                _pending.pop((owner, db_path), None)
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "enabled": SEGMENTS_ENABLED,
+        "seal_rows": SEAL_ROWS,
+        "target_rows": TARGET_ROWS,
+        "pending_maintenance": _queue.qsize(),
+        "cache": _CACHE.stats(),
+    }
@@ -0,0 +1,185 @@
+# app/services/warmup.py
+from __future__ import annotations
+
+"""
+Açılış ısınması (warm-up) ve açılış süreleri raporu.
+
+Sağlayıcı istemcileri ilk kullanımda tembel oluşturulur (llm_client.get_model,
+embed_client.get_embeddings); bu modül isteğe bağlı olarak worker hazır olduğunu
+bildirmeden önce pahalı ilk kullanımları önceden öder:
+
+    connections : her shard için havuzdan bir bağlantı (pragma'lar uygulanmış)
+    templates   : prompt şablonları (retriever önbelleği)
+    providers   : LLM / embedding istemcileri + ağır import'lar, yerel embedder
+    segments    : en son aktif WARMUP_HOT_USERS kullanıcının vektör segmentleri
+
+WARMUP_BLOCKING=true iken açılış kancası ısınma bitene kadar bekler (uvicorn bu sırada
+istek kabul etmez); false iken arka planda çalışır ve readiness "warm" kontrolü
+bitene kadar degraded (HEALTH_REQUIRE_WARM=true ise 503) döner.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+log = logging.getLogger("warmup")
+
+WARMUP_ENABLED: bool = bool(getattr(settings, "WARMUP_ENABLED", False))
+WARMUP_BLOCKING: bool = bool(getattr(settings, "WARMUP_BLOCKING", True))
+WARMUP_HOT_USERS: int = max(0, int(getattr(settings, "WARMUP_HOT_USERS", 50)))
+WARMUP_PROVIDERS: bool = bool(getattr(settings, "WARMUP_PROVIDERS", True))
+
+try:
+    from app.observability import health  # type: ignore
+except Exception:
+    health = None  # type: ignore
+
+try:
+    from app.observability.metrics import METRICS  # type: ignore
+except Exception:
+    METRICS = None  # type: ignore
+
+_WARMUP_MS_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+# Açılış raporu: import süresi (app.main) + son ısınma sonucu
+_lock = threading.Lock()
+_STARTUP: Dict[str, Any] = {"import_ms": None, "warmup": None}
+
+
+def record_import(ms: float) -> None:
+    with _lock:
+        _STARTUP["import_ms"] = round(float(ms), 3)
+    if METRICS is not None:
+        METRICS.observe("startup_import_ms", ms, _WARMUP_MS_BUCKETS)
+
+
+def startup_report() -> Dict[str, Any]:
+    with _lock:
+        return dict(_STARTUP)
+
+
+# ---------------------------
+# Adımlar
+# ---------------------------
+def _warm_connections() -> Dict[str, Any]:
+    from app.db.repository import all_paths, pooled_conn
+
+    paths = all_paths()
+    for p in paths:
+        with pooled_conn(p) as con:
+            con.execute("SELECT 1").fetchone()
+    return {"shards": len(paths)}
+
+
+def _warm_templates() -> Dict[str, Any]:
+    from app.services import retriever
+
+    return {"templates": retriever.load_templates()}
+
+
+def _warm_providers() -> Dict[str, Any]:
+    from app.services import embed_client, llm_client, local_embedder
+
+    local_embedder.get_embedder()
+    out: Dict[str, Any] = {}
+    t0 = time.perf_counter()
+    out["llm"] = type(llm_client.get_model()).__name__
+    out["llm_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    t0 = time.perf_counter()
+    out["embed"] = type(embed_client.get_embeddings()).__name__
+    out["embed_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    # LangChain mesaj sınıfları generate() içinde tembel import edilir
+    if out["llm"] != "NoneType":
+        llm_client._build_messages("", None)
+    return out
+
+
+def hot_users(limit: int) -> List[str]:
+    """Tüm shard'larda hafızası en son güncellenen kullanıcılar (azalan)."""
+    if limit <= 0:
+        return []
+    from app.db.repository import all_paths, pooled_conn
+
+    last: Dict[str, int] = {}
+    sql = """
+        SELECT user_id, MAX(ts) AS ts FROM (
+            SELECT user_id, COALESCE(updated_at, created_at) AS ts FROM global_memories
+            UNION ALL
+            SELECT user_id, COALESCE(updated_at, created_at) AS ts FROM local_memories
+        ) GROUP BY user_id ORDER BY ts DESC LIMIT ?
+    """
+    for p in all_paths():
+        with pooled_conn(p) as con:
+            for r in con.execute(sql, (int(limit),)).fetchall():
+                uid = str(r["user_id"])
+                last[uid] = max(last.get(uid, 0), int(r["ts"] or 0))
+    return [u for u, _ in sorted(last.items(), key=lambda kv: kv[1], reverse=True)[:limit]]
+
+
+def _warm_segments(users: Optional[List[str]] = None) -> Dict[str, Any]:
+    from app.services import vector_segments
+
+    users = hot_users(WARMUP_HOT_USERS) if users is None else users
+    loaded = 0
+    for uid in users:
+        loaded += vector_segments.preload(uid)
+    return {"users": len(users), "segments_loaded": loaded, "cache": vector_segments.stats().get("cache")}
+
+
+# ---------------------------
+# Çalıştırma
+# ---------------------------
+def run(*, users: Optional[List[str]] = None, providers: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Tüm ısınma adımlarını sırayla çalıştırır; bir adımın hatası diğerlerini durdurmaz.
+    Dönüş: {"total_ms", "steps": {ad: {"ms", ...} | {"ms", "error"}}}.
+    """
+    if health is not None:
+        health.mark_warming(phase="running")
+    steps: List[tuple] = [
+        ("connections", _warm_connections),
+        ("templates", _warm_templates),
+    ]
+    if WARMUP_PROVIDERS if providers is None else providers:
+        steps.append(("providers", _warm_providers))
+    steps.append(("segments", lambda: _warm_segments(users)))
+
+    report: Dict[str, Any] = {"steps": {}}
+    t_all = time.perf_counter()
+    for name, fn in steps:
+        report["steps"][name] = _timed(name, fn)
+    report["total_ms"] = round((time.perf_counter() - t_all) * 1000.0, 3)
+    report["finished_at"] = int(time.time())
+
+    with _lock:
+        _STARTUP["warmup"] = report
+    if METRICS is not None:
+        METRICS.observe("startup_warmup_ms", report["total_ms"], _WARMUP_MS_BUCKETS)
+    if health is not None:
+        health.mark_warm(total_ms=report["total_ms"])
+    log.info("Isınma tamamlandı: %.1f ms %s", report["total_ms"],
+             {k: v.get("ms") for k, v in report["steps"].items()})
+    return report
+
+
+def _timed(name: str, fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        out = dict(fn() or {})
+    except Exception as e:
+        log.warning("Isınma adımı başarısız (%s): %r", name, e)
+        out = {"error": repr(e)}
+    out["ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    return out
+
+
+def start_background() -> threading.Thread:
+    """Isınmayı arka planda başlatır (WARMUP_BLOCKING=false)."""
+    if health is not None:
+        health.mark_warming(phase="scheduled")
+    th = threading.Thread(target=run, name="warmup", daemon=True)
+    th.start()
+    return th
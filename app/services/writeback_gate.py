@@ -0,0 +1,225 @@
+# app/services/writeback_gate.py
+from __future__ import annotations
+
+import random
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.similarity import normalize_text
+
+# Config
+try:
+    from app.core.config import settings  # type: ignore
+except Exception:
+    class _Fallback:
+        WRITEBACK_GATE_ENABLED = True
+        WRITEBACK_GATE_THRESHOLD = 0.3
+        WRITEBACK_GATE_MIN_CHARS = 12
+        WRITEBACK_GATE_SAMPLE_RATE = 0.05
+        WRITEBACK_GATE_SCORER_WEIGHT = 0.5
+
+    settings = _Fallback()  # type: ignore
+
+GATE_ENABLED: bool = bool(getattr(settings, "WRITEBACK_GATE_ENABLED", True))
+GATE_THRESHOLD: float = float(getattr(settings, "WRITEBACK_GATE_THRESHOLD", 0.3))
+GATE_MIN_CHARS: int = int(getattr(settings, "WRITEBACK_GATE_MIN_CHARS", 12))
+GATE_SAMPLE_RATE: float = float(getattr(settings, "WRITEBACK_GATE_SAMPLE_RATE", 0.05))
+GATE_SCORER_WEIGHT: float = float(getattr(settings, "WRITEBACK_GATE_SCORER_WEIGHT", 0.5))
+
+# Skorlayıcı imzası: (user_message, assistant_reply) -> 0..1 arası olasılık
+Scorer = Callable[[str, str], float]
+
+
+# ---------------------------
+# Sezgisel desenler (TR + EN)
+# ---------------------------
+# Tek başına hatırlamaya değmeyecek onay / nezaket mesajları
+_TRIVIAL = {
+    "ok", "okay", "k", "yes", "no", "yep", "nope", "thanks", "thank you", "thx",
+    "cool", "nice", "great", "got it", "sure", "hmm", "hm", "lol",
+    "tamam", "tamamdır", "ok tamam", "evet", "hayır", "yok", "peki", "olur",
+    "anladım", "teşekkürler", "teşekkür ederim", "sağol", "sağ ol", "eyvallah",
+    "süper", "harika", "güzel", "devam", "devam et",
+}
+
+# Birinci tekil/çoğul şahıs işaretleri
+_FIRST_PERSON_RE = re.compile(
+    r"\b(?:i|i'm|im|i've|i'd|i'll|me|my|mine|myself|we|we're|our|ours|us"
+    r"|ben|benim|bana|beni|bende|biz|bizim|bize|bizi)\b"
+    # Türkçe fiil çekim ekleri: yaşıyorum, çalışacağım, taşındım ...
+    r"|\w{2,}(?:yorum|yoruz|acağım|eceğim|acağız|eceğiz|mışım|mişim|muşum|müşüm"
+    r"|dım|dim|dum|düm|tım|tim|tum|tüm)\b",
+    re.UNICODE,
+)
+
+# Tercih / kalıcı gerçek / karar desenleri
+_FACT_RE = re.compile(
+    r"\b(?:like|love|prefer|hate|dislike|favou?rite|always|never|usually"
+    r"|remember|call me|my name|name is|i work|i live|i am a|born|allergic"
+    r"|birthday|project|deadline|decided|decide|plan|goal|let's|we will"
+    r"|sev\w*|tercih\w*|favori\w*|nefret\w*|hatırla\w*|unutma\w*|benim ad[ıi]m|ismim"
+    r"|yaşıyorum|çalışıyorum|doğdum|doğum|alerji\w*|proje\w*|hedef\w*"
+    r"|karar\w*|plan\w*|görev\w*|toplantı\w*|her zaman|asla|genelde)\b",
+    re.UNICODE,
+)
+
+_QUESTION_RE = re.compile(
+    r"\?\s*$|^(?:what|why|how|when|where|who|which|can|could|is|are|do|does"
+    r"|ne|neden|nasıl|nerede|kim|hangi|niye)\b",
+    re.UNICODE,
+)
+
+
+def _heuristic_score(user_message: str, assistant_reply: str) -> Dict[str, Any]:
+    """
+    Kullanıcı mesajına bakarak 0..1 arası kaba bir "hatırlamaya değer" skoru üretir.
+    Asistan yanıtı yalnızca karar/plan desenleri için ikincil sinyal olarak kullanılır.
+    """
+    msg = normalize_text(user_message)
+    reasons: List[str] = []
+
+    if not msg:
+        return {"score": 0.0, "reasons": ["empty"]}
+
+    bare = msg.strip(" .!?,;:")
+    if bare in _TRIVIAL:
+        return {"score": 0.0, "reasons": ["trivial"]}
+
+    score = 0.0
+    first_person = bool(_FIRST_PERSON_RE.search(msg))
+    fact = bool(_FACT_RE.search(msg))
+
+    # Kısa ama kişisel / gerçek içeren mesajlar ("I am vegan", "Im allergic") elenmez
+    if len(msg) < GATE_MIN_CHARS and not first_person and not fact:
+        return {"score": 0.0, "reasons": ["too_short"]}
+
+    if first_person:
+        score += 0.35
+        reasons.append("first_person")
+    if fact:
+        score += 0.45
+        reasons.append("fact_pattern")
+    if len(msg) >= 40:
+        score += 0.2
+        reasons.append("long")
+
+    if not fact and _FACT_RE.search(normalize_text(assistant_reply)):
+        score += 0.1
+        reasons.append("reply_fact_pattern")
+
+    # Saf takip sorusu: soru kalıbı var, kişisel ifade / gerçek yok
+    if _QUESTION_RE.search(msg) and not first_person and not fact:
+        score -= 0.4
+        reasons.append("question_only")
+
+    return {"score": max(0.0, min(1.0, score)), "reasons": reasons}
+
+
+class _WritebackGate:
+    """
+    memory_policy için LLM öncesi ucuz karar kapısı.
+    - Sezgisel skor + (opsiyonel) hafif bir skorlayıcıyı harmanlar.
+    - Eşik altındaki turları atlar; bunların küçük bir oranını denetim için örnekler.
+    - Process içi istatistik tutar (atlanma oranı, örneklem sonucu vb.).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._scorer: Optional[Scorer] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.evaluated = 0
+        self.passed = 0
+        self.skipped = 0
+        self.sampled = 0
+        # Örneklenen (normalde atlanacak) turlardan LLM'in yine de memory çıkardıkları
+        self.sampled_with_memories = 0
+
+    def set_scorer(self, scorer: Optional[Scorer]) -> None:
+        """Opsiyonel skorlayıcıyı kaydeder (None → kaldırır)."""
+        with self._lock:
+            self._scorer = scorer
+
+    def decide(self, user_message: str, assistant_reply: str) -> Dict[str, Any]:
+        """
+        Dönüş: {"extract": bool, "score": float, "reasons": [...], "sampled": bool}
+        extract=False ise çağıran taraf LLM çağrısını atlamalıdır.
+        """
+        if not GATE_ENABLED:
+            return {"extract": True, "score": 1.0, "reasons": ["disabled"], "sampled": False}
+
+        h = _heuristic_score(user_message or "", assistant_reply or "")
+        score = float(h["score"])
+        reasons = list(h["reasons"])
+
+        scorer = self._scorer
+        if scorer is not None and "trivial" not in reasons and "empty" not in reasons:
+            try:
+                s = max(0.0, min(1.0, float(scorer(user_message or "", assistant_reply or ""))))
+                w = max(0.0, min(1.0, GATE_SCORER_WEIGHT))
+                score = (1.0 - w) * score + w * s
+                reasons.append("scorer")
+            except Exception:
+                # Skorlayıcı hatası kararı bozmasın
+                reasons.append("scorer_error")
+
+        extract = score >= GATE_THRESHOLD
+        sampled = False
+        if not extract and GATE_SAMPLE_RATE > 0 and random.random() < GATE_SAMPLE_RATE:
+            extract = True
+            sampled = True
+
+        with self._lock:
+            self.evaluated += 1
+            if sampled:
+                self.sampled += 1
+            elif extract:
+                self.passed += 1
+            else:
+                self.skipped += 1
+
+        return {"extract": extract, "score": score, "reasons": reasons, "sampled": sampled}
+
+    def record_sample_result(self, decision: Dict[str, Any], n_memories: int) -> None:
+        """Örneklenen bir turun LLM sonucunu denetim istatistiğine işler."""
+        if not decision or not decision.get("sampled"):
+            return
+        if n_memories > 0:
+            with self._lock:
+                self.sampled_with_memories += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            evaluated = self.evaluated
+            would_skip = self.skipped + self.sampled
+            return {
+                "enabled": GATE_ENABLED,
+                "threshold": GATE_THRESHOLD,
+                "sample_rate": GATE_SAMPLE_RATE,
+                "evaluated": evaluated,
+                "passed": self.passed,
+                "skipped": self.skipped,
+                "sampled": self.sampled,
+                "sampled_with_memories": self.sampled_with_memories,
+                "skip_rate": (self.skipped / evaluated) if evaluated else 0.0,
+                # Örneklem üzerinden tahmini kaçırma oranı (atlanan turlarda memory çıkma olasılığı)
+                "est_miss_rate": (self.sampled_with_memories / self.sampled) if self.sampled else 0.0,
+                "would_skip_rate": (would_skip / evaluated) if evaluated else 0.0,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+# Tekil (singleton) örnek
+_gate = _WritebackGate()
+
+# Modül düzeyi kısayollar
+decide = _gate.decide
+set_scorer = _gate.set_scorer
+record_sample_result = _gate.record_sample_result
+stats = _gate.stats
+reset_stats = _gate.reset_stats
@@ -0,0 +1,12 @@
+# benchmarks/__init__.py
+"""
+Hafıza retrieval sıcak yolu için benchmark paketi.
+
+    python -m benchmarks --users 20 --memories 500 --output bench.json
+    python -m benchmarks --save-baseline benchmarks/baseline.json
+    python -m benchmarks --fail-on-regression   # benchmarks/baseline.json ile karşılaştırır
+
+Deterministik sentetik korpus geçici bir SQLite DB'ye yazılır; LLM stub sağlayıcı
+(LLM_PROVIDER=stub), embedding yerel motor (EMB_BACKEND=local) ile çalışır.
+Ağ / API anahtarı gerekmez.
+"""
@@ -0,0 +1,343 @@
+# benchmarks/bench.py
+from __future__ import annotations
+
+"""
+Retrieval sıcak yolu benchmark koşucusu.
+
+Ölçülen işlemler:
+- ltm_local_store.search_embed / ltm_global_store.search_embed
+- similarity.knn / similarity.knn_batch / similarity.mmr
+- summarizer.distill (stub LLM)
+- retriever.retrieve_context (uçtan uca bağlam derleme)
+
+Her işlem için p50/p95/p99/ortalama (ms) ve tek iş parçacığı throughput'u (işlem/s)
+JSON olarak yazılır ve p50/p95 oranları baseline ile karşılaştırılır (varsayılan:
+depodaki benchmarks/baseline.json; varsayılan parametrelerle --save-baseline ile üretilir).
+Korpus / yineleme parametreleri baseline'ınkinden farklıysa karşılaştırma yapılmaz ve
+koşucu sıfır olmayan kodla çıkar (farklı iş yükünün süreleri kıyaslanamaz).
+
+Ayarlar modül import edilirken okunduğundan (app.core.config), ortam değişkenleri
+app modülleri import edilmeden ÖNCE ayarlanır; app importları bu yüzden fonksiyon içindedir.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.corpus import Corpus, CorpusSpec, generate, sources_for
+
+# Depoda tutulan referans rapor (varsayılan parametrelerle --save-baseline çıktısı)
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Süreleri doğrudan etkileyen meta alanları: baseline ile aynı olmalı
+_COMPARABLE_META = ("corpus", "iterations", "warmup", "segments", "llm_latency_ms")
+
+_OPERATIONS = ("local_search", "global_search", "knn", "knn_batch", "mmr", "distill", "retrieve_context")
+
+
+# ---------------------------
+# Ortam
+# ---------------------------
+def _configure_env(db_path: str, args: argparse.Namespace) -> None:
+    """Stub LLM + yerel embedding + geçici DB; arka plan işleri kapalı."""
+    env = {
+        "DB_PATH": db_path,
+        "SHARD_COUNT": "1",
+        "EMB_BACKEND": "local",
+        "EMB_DIM": str(args.dim),
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_STUB_ERROR_RATE": "0",
+        "LLM_STUB_HANG_RATE": "0",
+        # Yanıt önbelleği distill ölçümünü ilk çağrıdan sonra sıfıra indirirdi
+        "LLM_CACHE_ENABLED": "false",
+        # Tekrarlanan sorgular retrieve_context'i önbellekten döndürürdü; sıcak yol ölçülür
+        "RETRIEVAL_CACHE_ENABLED": "false",
+        "VECTOR_SEGMENTS_ENABLED": "false" if args.no_segments else "true",
+        "RETENTION_SWEEP_INTERVAL_S": "0",
+        "LOG_LEVEL": "WARNING",
+    }
+    os.environ.update(env)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ---------------------------
+# Ölçüm
+# ---------------------------
+def percentiles(samples_s: List[float]) -> Dict[str, Any]:
+    """Süre örnekleri (saniye) → n + p50/p95/p99/ortalama/maks (ms)."""
+    if not samples_s:
+        return {"n": 0}
+    arr = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "n": int(arr.shape[0]),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(np.mean(arr)), 4),
+        "max_ms": round(float(np.max(arr)), 4),
+    }
+
+
+def summarize(samples_s: List[float]) -> Dict[str, Any]:
+    """Süre örnekleri (saniye) → yüzdelikler (ms) + tek iş parçacığı throughput'u."""
+    total_s = float(np.sum(samples_s))
+    out = percentiles(samples_s)
+    out["throughput_ops_s"] = round(len(samples_s) / total_s, 2) if total_s > 0 else None
+    return out
+
+
+def measure(fn: Callable[[int], Any], *, iterations: int, warmup: int) -> Dict[str, Any]:
+    """fn(i) çağrılarını ısınma sonrası tek tek zamanlar."""
+    for i in range(warmup):
+        fn(i)
+    samples: List[float] = []
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn(warmup + i)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples)
+
+
+def meta_mismatch(meta: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Raporun iş yükü parametrelerini baseline meta'sıyla kıyaslar.
+    Dönüş: {alan: {"current", "baseline"}}; boşsa karşılaştırma anlamlıdır.
+    Baseline'da hiç meta yoksa tüm alanlar uyuşmaz sayılır.
+    """
+    ref = baseline.get("meta") or {}
+    out: Dict[str, Any] = {}
+    for key in _COMPARABLE_META:
+        if ref.get(key) != meta.get(key):
+            out[key] = {"current": meta.get(key), "baseline": ref.get(key)}
+    return out
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], *, tolerance: float) -> Dict[str, Any]:
+    """
+    Sonuçları baseline ile karşılaştırır. p95 oranı 1 + tolerance üstündeyse
+    "regression", 1 - tolerance altındaysa "improvement", arada ise "ok".
+    """
+    base = baseline.get("results", baseline)
+    out: Dict[str, Any] = {}
+    for name, cur in results.items():
+        ref = base.get(name)
+        if not ref:
+            out[name] = {"status": "new"}
+            continue
+        r50 = cur["p50_ms"] / ref["p50_ms"] if ref.get("p50_ms") else None
+        r95 = cur["p95_ms"] / ref["p95_ms"] if ref.get("p95_ms") else None
+        status = "ok"
+        if r95 is not None and r95 > 1.0 + tolerance:
+            status = "regression"
+        elif r95 is not None and r95 < 1.0 - tolerance:
+            status = "improvement"
+        out[name] = {
+            "status": status,
+            "p50_ratio": round(r50, 3) if r50 is not None else None,
+            "p95_ratio": round(r95, 3) if r95 is not None else None,
+            "baseline_p95_ms": ref.get("p95_ms"),
+        }
+    return out
+
+
+# ---------------------------
+# Senaryolar
+# ---------------------------
+def _prepare(corpus: Corpus) -> None:
+    """Segmentleri önceden mühürler ve STM'yi doldurur: ölçüm kararlı durumda yapılır."""
+    from app.services import stm_store, vector_segments
+
+    if vector_segments.SEGMENTS_ENABLED:
+        for user in corpus.users:
+            vector_segments.seal(("global", user, ""))
+            vector_segments.compact(("global", user, ""))
+            for session in corpus.sessions[user]:
+                vector_segments.seal(("local", user, session))
+                vector_segments.compact(("local", user, session))
+
+    rng = random.Random(corpus.spec.seed + 1)
+    for user in corpus.users:
+        for session in corpus.sessions[user]:
+            for t in range(8):
+                role = "user" if t % 2 == 0 else "assistant"
+                stm_store.append_turn(session, role, rng.choice(corpus.sample_texts or corpus.queries))
+
+
+def run_all(corpus: Corpus, args: argparse.Namespace) -> Dict[str, Any]:
+    from app.services import embed_client, ltm_global_store, ltm_local_store, retriever, similarity, summarizer
+
+    only = set(args.only or _OPERATIONS)
+    rng = random.Random(corpus.spec.seed + 2)
+    plan = [corpus.targets(rng) for _ in range(args.iterations + args.warmup)]
+    results: Dict[str, Any] = {}
+
+    def _run(name: str, fn: Callable[[int], Any]) -> None:
+        if name in only:
+            results[name] = measure(fn, iterations=args.iterations, warmup=args.warmup)
+
+    _run("local_search", lambda i: ltm_local_store.search_embed(plan[i][0], plan[i][1], plan[i][2], topk=args.topk))
+    _run("global_search", lambda i: ltm_global_store.search_embed(plan[i][0], plan[i][2], topk=args.topk))
+
+    matrix = corpus.sample_matrix
+    queries = np.asarray(embed_client.encode(corpus.queries), dtype=np.float32)
+    _run("knn", lambda i: similarity.knn(queries[i % len(queries)], matrix, args.topk))
+    # Çok sorgulu blok: her çağrı knn_queries sorguyu tek seferde skorlar
+    q_block = np.resize(queries, (max(1, args.knn_queries), queries.shape[1]))
+    _run("knn_batch", lambda i: similarity.knn_batch(np.roll(q_block, i, axis=0), matrix, args.topk))
+
+    candidates = corpus.sample_texts[: args.mmr_candidates]
+    _run("mmr", lambda i: similarity.mmr(candidates, plan[i][2], embed_client.encode, args.topk))
+
+    # distill girdisi: gerçek arama sonuçları (benzerlik skorlarıyla)
+    sources = [
+        sources_for(ltm_global_store.search_embed(u, q, topk=args.topk)[0])
+        for u, _s, q in plan[: min(len(plan), 32)]
+    ]
+    _run("distill", lambda i: summarizer.distill(sources[i % len(sources)]))
+
+    _run(
+        "retrieve_context",
+        lambda i: retriever.retrieve_context(plan[i][0], plan[i][1], plan[i][2], distill_with_llm=args.distill_llm),
+    )
+    return results
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Benchmark the memory retrieval hot path on a synthetic corpus.")
+    p.add_argument("--users", type=int, default=20, help="Number of synthetic users")
+    p.add_argument("--sessions", type=int, default=5, help="Sessions per user")
+    p.add_argument("--memories", type=int, default=500, help="Memories per user (global + local)")
+    p.add_argument("--dim", type=int, default=768, help="Embedding dimension")
+    p.add_argument("--global-ratio", type=float, default=0.5, help="Share of memories written to global LTM")
+    p.add_argument("--seed", type=int, default=1234, help="Corpus / workload seed")
+    p.add_argument("--iterations", type=int, default=200, help="Timed calls per operation")
+    p.add_argument("--warmup", type=int, default=20, help="Untimed warm-up calls per operation")
+    p.add_argument("--topk", type=int, default=8, help="k for searches / knn / mmr")
+    p.add_argument("--knn-queries", type=int, default=32, help="Queries per knn_batch call")
+    p.add_argument("--mmr-candidates", type=int, default=50, help="Candidate count for mmr")
+    p.add_argument("--llm-latency-ms", type=float, default=0.0, help="Stub LLM median latency")
+    p.add_argument("--distill-llm", action="store_true", help="retrieve_context distills with the (stub) LLM")
+    p.add_argument("--no-segments", action="store_true", help="Disable segmented vector storage")
+    p.add_argument("--only", nargs="+", choices=_OPERATIONS, default=None, help="Run only these operations")
+    p.add_argument("--db", default=None, help="Write the corpus here instead of a temporary file")
+    p.add_argument("--output", default=None, help="Write the JSON report to this file (default: stdout)")
+    p.add_argument(
+        "--baseline",
+        default=str(DEFAULT_BASELINE),
+        help="Compare against this baseline report (default: benchmarks/baseline.json; '' to skip)",
+    )
+    p.add_argument("--save-baseline", default=None, help="Also write the report as a baseline file")
+    p.add_argument("--tolerance", type=float, default=0.15, help="Allowed p95 slowdown vs. baseline (0.15 = 15%%)")
+    p.add_argument("--fail-on-regression", action="store_true", help="Exit 1 if any operation regressed")
+    return p
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    spec = CorpusSpec(
+        users=args.users,
+        sessions=args.sessions,
+        memories_per_user=args.memories,
+        dim=args.dim,
+        global_ratio=args.global_ratio,
+        seed=args.seed,
+    )
+
+    with tempfile.TemporaryDirectory(prefix="memory-bench-") as tmp:
+        db_path = args.db or str(Path(tmp) / "bench.db")
+        _configure_env(db_path, args)
+
+        from app.db.repository import ensure_schema, get_conn
+        from app.services.local_embedder import LocalEmbedder
+        from app.services import embed_client
+
+        # Korunma: .env vb. yüzünden yanlışlıkla ağa çıkılmasın
+        if embed_client.EMB_BACKEND != "local":
+            print(f"[bench] embedding backend is {embed_client.EMB_BACKEND!r}, expected 'local'; aborting", file=sys.stderr)
+            return 2
+
+        ensure_schema()
+        t0 = time.perf_counter()
+        embedder = LocalEmbedder(spec.dim)
+        with get_conn(db_path) as con:
+            corpus = generate(con, spec, embedder.embed)
+        setup_ms = (time.perf_counter() - t0) * 1000.0
+        _prepare(corpus)
+
+        results = run_all(corpus, args)
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "corpus": spec.as_dict(),
+            "rows": {"global": corpus.global_rows, "local": corpus.local_rows},
+            "setup_ms": round(setup_ms, 1),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "segments": not args.no_segments,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "results": results,
+    }
+
+    regressed = mismatched = False
+    if args.baseline:
+        try:
+            baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            print(f"[bench] baseline not found: {args.baseline}", file=sys.stderr)
+        else:
+            mismatch = meta_mismatch(report["meta"], baseline)
+            if mismatch:
+                mismatched = True
+                report["baseline_mismatch"] = mismatch
+                print(
+                    f"[bench] !!! WORKLOAD DOES NOT MATCH BASELINE {args.baseline} — comparison skipped !!!",
+                    file=sys.stderr,
+                )
+                for key, diff in mismatch.items():
+                    print(f"[bench]   {key}: current={diff['current']!r} baseline={diff['baseline']!r}", file=sys.stderr)
+                print("[bench]   rerun with the baseline's parameters, or pass --baseline '' to skip", file=sys.stderr)
+            else:
+                report["comparison"] = compare(results, baseline, tolerance=args.tolerance)
+                regressed = any(v.get("status") == "regression" for v in report["comparison"].values())
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(text + "\n", encoding="utf-8")
+
+    if mismatched:
+        return 3
+    return 1 if (regressed and args.fail_on_regression) else 0
@@ -0,0 +1,167 @@
+# benchmarks/corpus.py
+from __future__ import annotations
+
+"""
+Deterministik sentetik hafıza korpusu.
+
+Aynı tohum (seed) ve boyutlar her çalıştırmada aynı metinleri, aynı embedding'leri
+ve aynı sorguları üretir; böylece farklı commit'lerin sonuçları karşılaştırılabilir.
+Satırlar mağaza API'si yerine doğrudan SQLite'a toplu yazılır (yakın-kopya
+birleştirmesi ve tekil embed çağrıları korpus kurulumunu yavaşlatmasın diye).
+"""
+
+import json
+import random
+import sqlite3
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_SUBJECTS = (
+    "kahve", "çay", "python", "rust", "futbol", "satranç", "kitap", "film", "müzik", "yoga",
+    "koşu", "bisiklet", "fotoğraf", "resim", "gitar", "piyano", "yemek", "seyahat", "kamp", "dağ",
+    "deniz", "kedi", "köpek", "bahçe", "bulut", "veritabanı", "mimari", "test", "tasarım", "proje",
+)
+_CITIES = ("Ankara", "İstanbul", "İzmir", "Bursa", "Antalya", "Berlin", "Londra", "Paris", "Tokyo", "Roma")
+_TEMPLATES = (
+    "Kullanıcı {a} konusunu çok seviyor ve haftada {n} kez ilgileniyor.",
+    "{city} şehrinde yaşıyor; {a} ile ilgili bir topluluğa üye.",
+    "{a} yerine {b} tercih ediyor, özellikle akşamları.",
+    "Projesinde {a} ve {b} kullanıyor; son sürüm {n}.{m} olarak planlandı.",
+    "{n} yıldır {a} ile uğraşıyor, {city} seyahatinde {b} denemek istiyor.",
+    "Toplantı notu: {a} entegrasyonu {n} gün içinde bitecek, {b} ekibi destek verecek.",
+    "{b} hakkında yazdığı yazı {n} kişi tarafından okundu.",
+    "Sabahları {a}, hafta sonları {b} yapmayı seviyor.",
+)
+_QUESTIONS = (
+    "{a} hakkında ne biliyorsun?",
+    "Hangi şehirde yaşıyorum ve {a} ile ilgili ne yapıyorum?",
+    "{a} mı {b} mi daha çok hoşuma gidiyor?",
+    "Projemde {a} kullanıyor muydum?",
+)
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    a, b = rng.sample(_SUBJECTS, 2)
+    return template.format(
+        a=a, b=b, city=rng.choice(_CITIES), n=rng.randint(1, 20), m=rng.randint(0, 9)
+    )
+
+
+class CorpusSpec:
+    """Korpus boyutları. memories_per_user, global ve session'lara dağıtılan local kayıtların toplamıdır."""
+
+    def __init__(
+        self,
+        *,
+        users: int = 20,
+        sessions: int = 5,
+        memories_per_user: int = 500,
+        dim: int = 768,
+        global_ratio: float = 0.5,
+        queries: int = 64,
+        seed: int = 1234,
+    ) -> None:
+        self.users = max(1, int(users))
+        self.sessions = max(1, int(sessions))
+        self.memories_per_user = max(1, int(memories_per_user))
+        self.dim = max(8, int(dim))
+        self.global_ratio = min(1.0, max(0.0, float(global_ratio)))
+        self.queries = max(1, int(queries))
+        self.seed = int(seed)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class Corpus:
+    """Üretilen korpusun benchmark tarafından kullanılan özeti."""
+
+    def __init__(self, spec: CorpusSpec) -> None:
+        self.spec = spec
+        self.users: List[str] = []
+        self.sessions: Dict[str, List[str]] = {}
+        self.queries: List[str] = []
+        self.global_rows = 0
+        self.local_rows = 0
+        # KNN / MMR için örnek embedding matrisi ve metinler (ilk kullanıcının global kayıtları)
+        self.sample_texts: List[str] = []
+        self.sample_matrix: np.ndarray = np.zeros((0, spec.dim), dtype=np.float32)
+
+    def targets(self, rng: random.Random) -> Tuple[str, str, str]:
+        """Rastgele (user, session, sorgu) üçlüsü."""
+        user = rng.choice(self.users)
+        return user, rng.choice(self.sessions[user]), rng.choice(self.queries)
+
+
+def generate(con: sqlite3.Connection, spec: CorpusSpec, embed_fn) -> Corpus:
+    """
+    Korpusu con'a yazar. embed_fn(texts) → (N, dim) dizi (ör. LocalEmbedder.embed).
+    Şemanın önceden uygulanmış olması gerekir.
+    """
+    rng = random.Random(spec.seed)
+    corpus = Corpus(spec)
+    now = int(time.time())
+    n_global = int(round(spec.memories_per_user * spec.global_ratio))
+    n_local = spec.memories_per_user - n_global
+
+    for u in range(spec.users):
+        user_id = f"bench-u{u:04d}"
+        sessions = [f"{user_id}-s{s:02d}" for s in range(spec.sessions)]
+        corpus.users.append(user_id)
+        corpus.sessions[user_id] = sessions
+        con.execute("INSERT OR IGNORE INTO users (user_id, created_at) VALUES (?, ?)", (user_id, now))
+        con.executemany(
+            "INSERT OR IGNORE INTO sessions (session_id, user_id, title, created_at) VALUES (?, ?, ?, ?)",
+            [(s, user_id, s, now) for s in sessions],
+        )
+
+        # uq_global_user_text: kullanıcı içinde global metinler benzersiz olmalı
+        g_texts: List[str] = []
+        seen = set()
+        while len(g_texts) < n_global:
+            t = _fill(rng, rng.choice(_TEMPLATES))
+            if t in seen:
+                t = f"{t} (#{len(g_texts)})"
+            seen.add(t)
+            g_texts.append(t)
+        l_texts = [_fill(rng, rng.choice(_TEMPLATES)) for _ in range(n_local)]
+
+        g_emb = np.asarray(embed_fn(g_texts), dtype=np.float32) if g_texts else np.zeros((0, spec.dim), np.float32)
+        l_emb = np.asarray(embed_fn(l_texts), dtype=np.float32) if l_texts else np.zeros((0, spec.dim), np.float32)
+
+        con.executemany(
+            """
+            INSERT INTO global_memories (user_id, text, embedding, meta, dim, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (user_id, t, g_emb[i].tobytes(), json.dumps({"confidence": 0.8}), spec.dim, now - i)
+                for i, t in enumerate(g_texts)
+            ],
+        )
+        con.executemany(
+            """
+            INSERT INTO local_memories (session_id, user_id, text, embedding, meta, dim, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """,
+            [
+                (sessions[i % spec.sessions], user_id, t, l_emb[i].tobytes(), "{}", spec.dim, now - i)
+                for i, t in enumerate(l_texts)
+            ],
+        )
+        corpus.global_rows += len(g_texts)
+        corpus.local_rows += len(l_texts)
+        if u == 0:
+            corpus.sample_texts = g_texts or l_texts
+            corpus.sample_matrix = g_emb if g_texts else l_emb
+
+    corpus.queries = [_fill(rng, rng.choice(_QUESTIONS)) for _ in range(spec.queries)]
+    con.commit()
+    return corpus
+
+
+def sources_for(rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Arama sonuçlarını summarizer.distill'in beklediği kaynak biçimine çevirir."""
+    return [{"text": r.get("text", ""), "meta": r.get("meta") or {}} for r in rows]
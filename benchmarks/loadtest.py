@@ -0,0 +1,405 @@
+# benchmarks/loadtest.py
+from __future__ import annotations
+
+"""
+Uçtan uca yük testi: gerçek FastAPI uygulaması uvicorn altında, stub sağlayıcılarla.
+
+    python -m benchmarks.loadtest --concurrency 1 2 4 8 16 32 --duration 10
+    python -m benchmarks.loadtest --workers 2 --mix chat=0.6,search=0.4
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --api-key ...   # çalışan sunucu
+
+Her eşzamanlılık seviyesinde kapalı döngü (closed-loop) sanal istemciler, karışıma
+(--mix) göre chat / hafıza yazma / listeleme / arama istekleri gönderir. Çıktı:
+eşzamanlılık → throughput eğrisi, uç bazında gecikme yüzdelikleri ve hata sayıları,
+ve throughput artışının durduğu doyum (saturation) noktası tahmini.
+
+Sonuçlar üç kovaya ayrılır: başarılı (2xx/3xx), istemci hatası (4xx; 429 rate limit
+dahil) ve hata (5xx, zaman aşımı, bağlantı hatası). Throughput ve gecikme yüzdelikleri
+yalnızca başarılı isteklerden hesaplanır: hızlı dönen 4xx'ler eğriyi şişirmez.
+
+Sunucu bu betik tarafından başlatılırsa LLM_PROVIDER=stub ve EMB_BACKEND=stub
+kullanılır; gecikme dağılımı ve hata oranları --llm-* / --emb-* ile ayarlanır.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.bench import percentiles
+
+_ENDPOINTS = ("chat", "write", "list", "search")
+_DEFAULT_MIX = "chat=0.4,write=0.2,list=0.2,search=0.2"
+
+_FACTS = (
+    "kahveyi şekersiz içiyorum", "Ankara'da yaşıyorum", "python ile backend geliştiriyorum",
+    "hafta sonları bisiklete biniyorum", "kedimin adı Pamuk", "caz dinlemeyi seviyorum",
+    "projem bir hafıza asistanı", "sabahları koşuya çıkıyorum", "en sevdiğim yemek mantı",
+    "rust öğrenmek istiyorum", "yazın Bodrum'a gideceğim", "SQLite performansı üzerinde çalışıyorum",
+)
+_QUESTIONS = (
+    "Ne içmeyi severim?", "Nerede yaşıyorum?", "Projem neydi?", "Hafta sonu ne yapıyorum?",
+    "Kedimin adı ne?", "Hangi dili öğrenmek istiyorum?", "Yaz planım ne?",
+)
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """'chat=0.4,search=0.6' → normalize edilmiş ağırlıklar."""
+    mix: Dict[str, float] = {}
+    for part in (spec or "").split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in _ENDPOINTS:
+            raise ValueError(f"unknown endpoint in mix: {name!r} (expected one of {', '.join(_ENDPOINTS)})")
+        mix[name] = float(weight or 1.0)
+    total = sum(w for w in mix.values() if w > 0)
+    if total <= 0:
+        raise ValueError("mix must contain at least one positive weight")
+    return {k: v / total for k, v in mix.items() if v > 0}
+
+
+class Workload:
+    """Sanal kullanıcılar / session'lar üzerinde karışıma göre istek üretir."""
+
+    def __init__(self, *, users: int, sessions: int, mix: Dict[str, float], prefix: str) -> None:
+        self.users = [f"{prefix}-u{u:04d}" for u in range(max(1, users))]
+        self.sessions = max(1, sessions)
+        self.names = list(mix.keys())
+        self.weights = [mix[n] for n in self.names]
+
+    def next(self, rng: random.Random) -> Tuple[str, str, str, Dict[str, Any]]:
+        """(uç adı, method, path, httpx kwargs)"""
+        name = rng.choices(self.names, self.weights)[0]
+        user = rng.choice(self.users)
+        session = f"{user}-s{rng.randrange(self.sessions):02d}"
+        if name == "chat":
+            msg = rng.choice(_QUESTIONS) if rng.random() < 0.6 else f"Bilgin olsun: {rng.choice(_FACTS)}."
+            return name, "POST", "/api/chat", {"json": {"user_id": user, "session_id": session, "message": msg}}
+        if name == "write":
+            scope = "local" if rng.random() < 0.5 else "global"
+            body: Dict[str, Any] = {
+                "scope": scope,
+                "user_id": user,
+                "text": f"{rng.choice(_FACTS)} ({rng.randrange(10_000)})",
+            }
+            if scope == "local":
+                body["session_id"] = session
+            return name, "POST", f"/api/memory/{scope}", {"json": body}
+        if name == "list":
+            if rng.random() < 0.5:
+                return name, "GET", "/api/memory/local", {"params": {"user_id": user, "session_id": session}}
+            return name, "GET", "/api/memory/global", {"params": {"user_id": user}}
+        return name, "POST", "/api/memory/search", {
+            "json": {"user_id": user, "session_id": session, "q": rng.choice(_QUESTIONS), "topk": 5}
+        }
+
+
+# ---------------------------
+# Ölçüm
+# ---------------------------
+OK = "ok"
+CLIENT_ERROR = "client_error"
+ERROR = "error"
+
+
+def classify(outcome: str) -> str:
+    """HTTP durum kodu / istisna adı → ok | client_error (4xx) | error (5xx, zaman aşımı, ağ)."""
+    if not outcome.isdigit():
+        return ERROR
+    code = int(outcome)
+    if code >= 500:
+        return ERROR
+    if code >= 400:
+        return CLIENT_ERROR
+    return OK
+
+
+def _tally(rows: List[Tuple[float, str]]) -> Dict[str, Any]:
+    ok = [lat for lat, o in rows if classify(o) == OK]
+    outcomes: Dict[str, int] = defaultdict(int)
+    for _lat, o in rows:
+        outcomes[o] += 1
+    return {
+        "ok_latencies": ok,
+        "client_errors": sum(1 for _lat, o in rows if classify(o) == CLIENT_ERROR),
+        "errors": sum(1 for _lat, o in rows if classify(o) == ERROR),
+        "outcomes": dict(outcomes),
+    }
+
+
+async def _client_loop(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    rng: random.Random,
+    deadline: float,
+    record: Optional[List[Tuple[str, float, str]]],
+) -> None:
+    while time.perf_counter() < deadline:
+        name, method, path, kwargs = workload.next(rng)
+        t0 = time.perf_counter()
+        try:
+            resp = await client.request(method, path, **kwargs)
+            outcome = str(resp.status_code)
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        if record is not None:
+            record.append((name, time.perf_counter() - t0, outcome))
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    *,
+    concurrency: int,
+    duration_s: float,
+    warmup_s: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """Tek eşzamanlılık seviyesi: ısınma (kaydedilmez) + ölçüm penceresi."""
+    if warmup_s > 0:
+        end = time.perf_counter() + warmup_s
+        await asyncio.gather(*(
+            _client_loop(client, workload, random.Random(seed * 7919 + i), end, None) for i in range(concurrency)
+        ))
+
+    samples: List[Tuple[str, float, str]] = []
+    t0 = time.perf_counter()
+    end = t0 + duration_s
+    await asyncio.gather(*(
+        _client_loop(client, workload, random.Random(seed * 104729 + i), end, samples) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - t0
+
+    by_endpoint: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+    for name, lat, outcome in samples:
+        by_endpoint[name].append((lat, outcome))
+
+    endpoints: Dict[str, Any] = {}
+    for name, rows in sorted(by_endpoint.items()):
+        t = _tally(rows)
+        endpoints[name] = {
+            **percentiles(t["ok_latencies"]),
+            "requests": len(rows),
+            "client_errors": t["client_errors"],
+            "errors": t["errors"],
+            "outcomes": t["outcomes"],
+        }
+
+    total = _tally([(lat, o) for _n, lat, o in samples])
+    ok_count = len(total["ok_latencies"])
+    return {
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "requests": len(samples),
+        "ok": ok_count,
+        "throughput_rps": round(ok_count / elapsed, 2) if elapsed > 0 else None,
+        "client_errors": total["client_errors"],
+        "client_error_rate": round(total["client_errors"] / len(samples), 4) if samples else 0.0,
+        "errors": total["errors"],
+        "error_rate": round(total["errors"] / len(samples), 4) if samples else 0.0,
+        "latency": percentiles(total["ok_latencies"]),
+        "endpoints": endpoints,
+    }
+
+
+def saturation(curve: List[Dict[str, Any]], *, min_gain: float = 0.10) -> Optional[Dict[str, Any]]:
+    """
+    Doyum noktası: eşzamanlılık arttığında başarılı throughput'un en az min_gain oranında
+    artmadığı ilk seviyeden önceki seviye. Eğri hiç düzleşmezse None.
+    """
+    for prev, cur in zip(curve, curve[1:]):
+        p, c = prev.get("throughput_rps") or 0.0, cur.get("throughput_rps") or 0.0
+        if p > 0 and c < p * (1.0 + min_gain):
+            return {
+                "concurrency": prev["concurrency"],
+                "throughput_rps": p,
+                "p95_ms": prev["latency"].get("p95_ms"),
+                "next_concurrency": cur["concurrency"],
+                "next_throughput_rps": c,
+                "next_p95_ms": cur["latency"].get("p95_ms"),
+            }
+    return None
+
+
+# ---------------------------
+# Sunucu
+# ---------------------------
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def _server_env(args: argparse.Namespace, db_path: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DB_PATH": db_path,
+        "API_KEY": "",
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_STUB_LATENCY_SPREAD": str(args.llm_latency_spread),
+        "LLM_STUB_LATENCY_DIST": args.llm_latency_dist,
+        "LLM_STUB_ERROR_RATE": str(args.llm_error_rate),
+        "EMB_BACKEND": "stub",
+        "EMB_STUB_LATENCY_MS": str(args.emb_latency_ms),
+        "EMB_STUB_LATENCY_SPREAD": str(args.emb_latency_spread),
+        "EMB_STUB_LATENCY_DIST": args.emb_latency_dist,
+        "EMB_STUB_ERROR_RATE": str(args.emb_error_rate),
+        # Aynı sorular tekrarlandığından önbellek LLM yükünü gizlerdi
+        "LLM_CACHE_ENABLED": "true" if args.llm_cache else "false",
+        "RETENTION_SWEEP_INTERVAL_S": "0",
+        # Yük üreteci tek anahtardan yüksek hızda istek atar; 429'lar ölçümü bozardı
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def _start_server(args: argparse.Namespace, db_path: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    proc = subprocess.Popen(cmd, env=_server_env(args, db_path))
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/api/health", timeout=1.0).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+
+def _stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _print_table(curve: List[Dict[str, Any]]) -> None:
+    print(
+        f"{'conc':>6} {'rps':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'4xx':>8} {'errors':>8}",
+        file=sys.stderr,
+    )
+    for lv in curve:
+        lat = lv["latency"]
+        print(
+            f"{lv['concurrency']:>6} {lv['throughput_rps'] or 0:>10.1f} {lat.get('p50_ms', 0):>10.1f} "
+            f"{lat.get('p95_ms', 0):>10.1f} {lat.get('p99_ms', 0):>10.1f} {lv['client_errors']:>8} {lv['errors']:>8}",
+            file=sys.stderr,
+        )
+
+
+async def _drive(base_url: str, args: argparse.Namespace, workload: Workload) -> List[Dict[str, Any]]:
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    curve: List[Dict[str, Any]] = []
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        for level in args.concurrency:
+            curve.append(await run_level(
+                client, workload,
+                concurrency=level, duration_s=args.duration, warmup_s=args.warmup, seed=args.seed + level,
+            ))
+    return curve
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Load-test /api/chat and /api/memory with stub providers.")
+    p.add_argument("--url", default=None, help="Target an already running server instead of starting uvicorn")
+    p.add_argument("--api-key", default=None, help="X-API-Key for --url targets")
+    p.add_argument("--workers", type=int, default=1, help="uvicorn worker processes (spawned server only)")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Concurrency levels")
+    p.add_argument("--duration", type=float, default=10.0, help="Measured seconds per level")
+    p.add_argument("--warmup", type=float, default=2.0, help="Unmeasured warm-up seconds per level")
+    p.add_argument("--timeout", type=float, default=30.0, help="Per-request client timeout (s)")
+    p.add_argument("--mix", default=_DEFAULT_MIX, help="Request mix, e.g. chat=0.4,write=0.2,list=0.2,search=0.2")
+    p.add_argument("--users", type=int, default=200, help="Simulated users")
+    p.add_argument("--sessions", type=int, default=3, help="Sessions per user")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--llm-latency-ms", type=float, default=200.0)
+    p.add_argument("--llm-latency-spread", type=float, default=0.5)
+    p.add_argument("--llm-latency-dist", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    p.add_argument("--llm-error-rate", type=float, default=0.0)
+    p.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    p.add_argument("--emb-latency-ms", type=float, default=20.0)
+    p.add_argument("--emb-latency-spread", type=float, default=0.5)
+    p.add_argument("--emb-latency-dist", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    p.add_argument("--emb-error-rate", type=float, default=0.0)
+    p.add_argument("--min-gain", type=float, default=0.10, help="Throughput gain below which a level counts as saturated")
+    p.add_argument("--startup-timeout", type=float, default=60.0)
+    p.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    args = p.parse_args(argv)
+
+    args.concurrency = sorted(set(max(1, c) for c in args.concurrency))
+    workload = Workload(
+        users=args.users, sessions=args.sessions, mix=parse_mix(args.mix), prefix=f"load{args.seed}"
+    )
+
+    proc: Optional[subprocess.Popen] = None
+    with tempfile.TemporaryDirectory(prefix="memory-load-") as tmp:
+        try:
+            if args.url:
+                base_url = args.url.rstrip("/")
+            else:
+                proc, base_url = _start_server(args, str(Path(tmp) / "load.db"))
+            curve = asyncio.run(_drive(base_url, args, workload))
+        finally:
+            if proc is not None:
+                _stop_server(proc)
+
+    report = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "target": args.url or "spawned",
+            "workers": None if args.url else args.workers,
+            "duration_s": args.duration,
+            "mix": parse_mix(args.mix),
+            "users": args.users,
+            "sessions": args.sessions,
+            "providers": None if args.url else {
+                "llm": {"latency_ms": args.llm_latency_ms, "dist": args.llm_latency_dist, "error_rate": args.llm_error_rate},
+                "emb": {"latency_ms": args.emb_latency_ms, "dist": args.emb_latency_dist, "error_rate": args.emb_error_rate},
+            },
+        },
+        "curve": curve,
+        "saturation": saturation(curve, min_gain=args.min_gain),
+    }
+    _print_table(curve)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
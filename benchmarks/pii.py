@@ -0,0 +1,197 @@
+# benchmarks/pii.py
+from __future__ import annotations
+
+"""
+pii_guard.scrub_text için kötü niyetli girdi (adversarial) benchmark'ı.
+
+    python -m benchmarks.pii
+    python -m benchmarks.pii --sizes 1000 4000 16000 64000 --legacy
+    python -m benchmarks.pii --fail-on-superlinear
+
+Her girdi ailesi (uzun rakam/ayırıcı koşuları, '@' içermeyen uzun kelimeler, bitmeyen
+alan adları…) artan uzunluklarda üretilir; her uzunlukta medyan süre ve bir önceki
+uzunluğa göre büyüme oranı raporlanır. Doğrusal zamanda oran ≈ uzunluk oranıdır (2x → ~2);
+ikinci dereceden davranış ~4 verir. --max-growth aşılırsa aile "superlinear" işaretlenir.
+
+--legacy, eski beş geçişli düzenli ifade zincirini (referans kopya) aynı girdilerle
+ölçer; çağrı süresi --legacy-budget-ms'i aşınca o ailenin büyük boyutları atlanır.
+Ayrıca gerçekçi kısa metinlerde scrub_text (tek tek) ile scrub_texts (toplu) karşılaştırılır.
+"""
+
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Kötü niyetli girdi aileleri: n → metin (yaklaşık n karakter)
+FAMILIES: Dict[str, Callable[[int], str]] = {
+    "digit_space": lambda n: "1 " * (n // 2) + "x",
+    "digit_dash": lambda n: "1-" * (n // 2) + "x",
+    "digits_then_alpha": lambda n: "1" * n + "a",
+    "word_without_at": lambda n: "a" * n,
+    "at_then_dashes": lambda n: "a@" + "-" * n,
+    "at_unfinished_domain": lambda n: "a@b" + ".c" * (n // 2),
+    "many_at": lambda n: "a@" * (n // 2),
+    "paren_groups": lambda n: "(12) " * (n // 5) + "x",
+    "iban_prefix_run": lambda n: "TR12" + "A" * n,
+}
+
+_REALISTIC = [
+    "Benim adım {name}, e-postam {name}.{n}@example.com.",
+    "Telefonum +90 5{n:02d} 123 45 67, akşamları ararsan açarım.",
+    "Kartımın son kullanma tarihi 12/26, numarası 4111 1111 1111 1111.",
+    "TR33 0006 1005 1978 6457 8413 26 hesabına gönder.",
+    "Kahveyi şekersiz içerim ve {n} yıldır İstanbul'da yaşıyorum.",
+    "Projede FastAPI + SQLite kullanıyoruz, teslim tarihi 2025-0{d}-15.",
+]
+_NAMES = ["ayse", "mehmet", "zeynep", "can", "elif", "burak"]
+
+
+# ---------------------------
+# Eski uygulama (referans kopya, yalnızca karşılaştırma için)
+# ---------------------------
+_L_EMAIL_RE = re.compile(r"([A-Za-z0-9._%+-]+)@([A-Za-z0-9.-]+\.[A-Za-z]{2,})", re.UNICODE)
+_L_PHONE_RE = re.compile(r"(?:(?:\+?\d{1,3}\s?)?(?:\(?\d{2,4}\)?\s?)?[\d\s\-]{7,})")
+_L_NATIONAL_ID_RE = re.compile(r"\b\d{11}\b")
+_L_IBAN_RE = re.compile(r"\b[A-Z]{2}\d{2}[A-Z0-9]{10,30}\b", re.IGNORECASE)
+_L_CREDIT_CARD_RE = re.compile(r"\b(?:\d[ -]*?){13,19}\b")
+
+
+def legacy_scrub_text(text: str) -> str:
+    if not text:
+        return text
+    out = _L_EMAIL_RE.sub(lambda m: f"{m.group(1)[:2]}***@{m.group(2)}", str(text))
+    out = _L_PHONE_RE.sub(lambda m: "***" if len(re.sub(r"\D", "", m.group(0))) >= 7 else m.group(0), out)
+    out = _L_NATIONAL_ID_RE.sub(lambda m: "***", out)
+    out = _L_IBAN_RE.sub(lambda m: f"{m.group(0)[:6]}***{m.group(0)[-4:]}", out)
+    out = _L_CREDIT_CARD_RE.sub(lambda m: f"{m.group(0)[:4]} **** **** {m.group(0)[-4:]}", out)
+    return out
+
+
+# ---------------------------
+# Ölçüm
+# ---------------------------
+def _median_s(fn: Callable[[], Any], repeats: int) -> float:
+    samples = []
+    for _ in range(max(1, repeats)):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples)
+
+
+def scaling(
+    scrub: Callable[[str], str],
+    sizes: List[int],
+    *,
+    repeats: int,
+    max_growth: float,
+    budget_ms: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Her aile için boyut → medyan ms ve ardışık boyutlar arası büyüme oranı."""
+    out: Dict[str, Any] = {}
+    for name, gen in FAMILIES.items():
+        rows: List[Dict[str, Any]] = []
+        prev: Optional[Dict[str, Any]] = None
+        worst = 0.0
+        for n in sizes:
+            text = gen(n)
+            ms = _median_s(lambda: scrub(text), repeats) * 1000.0
+            row: Dict[str, Any] = {"chars": len(text), "median_ms": round(ms, 4)}
+            if prev is not None and prev["median_ms"] > 0:
+                size_ratio = len(text) / prev["chars"]
+                # Zaman oranı / uzunluk oranı: doğrusalda ~1, karesel davranışta ~uzunluk oranı
+                growth = (ms / prev["median_ms"]) / size_ratio * 2.0
+                row["growth_per_2x"] = round(growth, 2)
+                worst = max(worst, growth)
+            rows.append(row)
+            prev = row
+            if budget_ms is not None and ms > budget_ms:
+                rows.append({"skipped_from_chars": len(text) * 2, "reason": f"call > {budget_ms} ms"})
+                break
+        out[name] = {
+            "rows": rows,
+            "worst_growth_per_2x": round(worst, 2),
+            "superlinear": worst > max_growth,
+        }
+    return out
+
+
+def realistic(count: int, *, repeats: int, seed: int) -> Dict[str, Any]:
+    """Kısa, gerçekçi metinlerde tek tek ve toplu maskeleme süresi (toplam ms)."""
+    from app.services.pii_guard import scrub_text, scrub_texts
+
+    rng = random.Random(seed)
+    texts = [
+        rng.choice(_REALISTIC).format(name=rng.choice(_NAMES), n=rng.randint(1, 99), d=rng.randint(1, 9))
+        for _ in range(count)
+    ]
+    single = _median_s(lambda: [scrub_text(t) for t in texts], repeats) * 1000.0
+    batch = _median_s(lambda: scrub_texts(texts), repeats) * 1000.0
+    legacy = _median_s(lambda: [legacy_scrub_text(t) for t in texts], repeats) * 1000.0
+    assert scrub_texts(texts) == [scrub_text(t) for t in texts]
+    return {
+        "texts": count,
+        "avg_chars": round(sum(map(len, texts)) / max(1, count), 1),
+        "scrub_text_ms": round(single, 3),
+        "scrub_texts_ms": round(batch, 3),
+        "legacy_ms": round(legacy, 3),
+        "batch_speedup": round(single / batch, 2) if batch > 0 else None,
+    }
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def main(argv: Optional[list[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Adversarial-input benchmark for pii_guard.scrub_text.")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 4000, 8000, 16000, 32000])
+    p.add_argument("--repeats", type=int, default=5, help="Timed calls per size (median is reported)")
+    p.add_argument("--max-growth", type=float, default=3.0, help="Growth per 2x input above which a family is superlinear")
+    p.add_argument("--legacy", action="store_true", help="Also measure the previous five-pass implementation")
+    p.add_argument("--legacy-budget-ms", type=float, default=2000.0, help="Stop growing a legacy family past this call time")
+    p.add_argument("--realistic", type=int, default=2000, help="Short realistic texts for the batch comparison (0 = skip)")
+    p.add_argument("--seed", type=int, default=7)
+    p.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    p.add_argument("--fail-on-superlinear", action="store_true", help="Exit 1 if any family grows superlinearly")
+    args = p.parse_args(argv)
+
+    from app.services.pii_guard import scrub_text
+
+    sizes = sorted(set(max(1, s) for s in args.sizes))
+    report: Dict[str, Any] = {
+        "meta": {"timestamp": int(time.time()), "python": platform.python_version(), "sizes": sizes},
+        "scrub_text": scaling(scrub_text, sizes, repeats=args.repeats, max_growth=args.max_growth),
+    }
+    if args.legacy:
+        report["legacy"] = scaling(
+            legacy_scrub_text,
+            sizes,
+            repeats=1,
+            max_growth=args.max_growth,
+            budget_ms=args.legacy_budget_ms,
+        )
+    if args.realistic > 0:
+        report["realistic"] = realistic(args.realistic, repeats=args.repeats, seed=args.seed)
+
+    superlinear = sorted(k for k, v in report["scrub_text"].items() if v["superlinear"])
+    report["superlinear"] = superlinear
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if superlinear:
+        print(f"[pii] superlinear families: {', '.join(superlinear)}", file=sys.stderr)
+    return 1 if (superlinear and args.fail_on_superlinear) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
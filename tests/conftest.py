@@ -0,0 +1,48 @@
+# tests/conftest.py
+"""
+Ortak test ortamı.
+
+Ayarlar app modülleri import edilirken okunduğundan (app.core.config), ortam değişkenleri
+burada, test modülleri toplanmadan ÖNCE ayarlanır: geçici SQLite DB, ağ gerektirmeyen
+yerel embedding ve stub LLM; arka plan işleri ve dış çıktılar kapalı.
+"""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="memory-tests-")
+
+os.environ.update(
+    {
+        "DB_PATH": os.path.join(_TMP, "memory.db"),
+        "SHARD_COUNT": "1",
+        "RATE_LIMIT_DB_PATH": os.path.join(_TMP, "ratelimit.db"),
+        "EMB_BACKEND": "local",
+        "LLM_PROVIDER": "stub",
+        "LLM_STUB_LATENCY_MS": "1",
+        "LLM_STUB_LATENCY_DIST": "fixed",
+        "LLM_STUB_ERROR_RATE": "0",
+        "LLM_STUB_HANG_RATE": "0",
+        "LLM_CACHE_ENABLED": "false",
+        "RETENTION_SWEEP_INTERVAL_S": "0",
+        "WARMUP_ENABLED": "false",
+        "TRACING_EXPORT_PATH": "",
+        "LOG_LEVEL": "WARNING",
+    }
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _schema():
+    from app.db.repository import ensure_schema
+
+    ensure_schema()
+
+
+@pytest.fixture
+def user_id() -> str:
+    """Testler aynı DB'yi paylaşır; her test kendi kullanıcısıyla yalıtılır."""
+    return f"u-{uuid.uuid4().hex[:12]}"
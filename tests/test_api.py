@@ -0,0 +1,72 @@
+# tests/test_api.py
+"""
+HTTP katmanı testleri (FastAPI TestClient).
+"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import rate_limit
+from app.core.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def tight_limiter(monkeypatch):
+    """GET /api/memory/* (maliyet 0.5) için 4 isteklik, pratikte dolmayan bellek içi kova."""
+    limiter = rate_limit.TokenBucketLimiter(capacity=2.0, rate=0.0001, backend="memory")
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(rate_limit, "limiter", limiter)
+    return limiter
+
+
+def _list_global(client, user_id, api_key=None):
+    headers = {"X-API-Key": api_key} if api_key else {}
+    return client.get("/api/memory/global", params={"user_id": user_id}, headers=headers).status_code
+
+
+def test_rate_limit_ignores_unverified_keys_in_open_mode(client, tight_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "API_KEY", None)
+    # Her istekte yeni anahtar + yeni user_id: hepsi aynı IP kovasından düşülür
+    codes = [_list_global(client, f"u{i}", api_key=uuid.uuid4().hex) for i in range(6)]
+    assert codes == [200, 200, 200, 200, 429, 429]
+
+
+def test_rate_limit_uses_key_bucket_only_for_configured_key(client, tight_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "API_KEY", "secret")
+    # Doğrulanmış anahtar: user_id başına ayrı kova
+    assert [_list_global(client, "alice", "secret") for _ in range(5)] == [200, 200, 200, 200, 429]
+    assert _list_global(client, "bob", "secret") == 200
+    # Yanlış anahtar: kimlik doğrulaması reddeder, kova seçmez
+    assert _list_global(client, "mallory", "wrong") == 401
+
+
+def test_chat_extraction_runs_after_response_at_background_priority(client, user_id, monkeypatch):
+    from app.api import routes_chat
+    from app.services import ltm_global_store, provider_scheduler
+
+    seen = {}
+
+    def fake_extract(**kwargs):
+        seen["priority"] = provider_scheduler.current_priority("chat")
+        seen["queue_timeout"] = provider_scheduler.queue_timeout(provider_scheduler.BACKGROUND)
+        return [{"scope": "global", "text": "User keeps bees in Rize"}]
+
+    monkeypatch.setattr(routes_chat.memory_policy, "extract_writebacks", fake_extract)
+    r = client.post("/api/chat", json={"user_id": user_id, "session_id": "s1", "message": "I keep bees in Rize"})
+    assert r.status_code == 200
+    # Yanıt yolunun dışında: background önceliği ve uzun arka plan kuyruk süresi
+    assert seen == {
+        "priority": provider_scheduler.BACKGROUND,
+        "queue_timeout": provider_scheduler.PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S,
+    }
+    items, _ = ltm_global_store.list(user_id, limit=10)
+    assert [it["text"] for it in items] == ["User keeps bees in Rize"]
@@ -0,0 +1,88 @@
+# tests/test_embeddings.py
+"""
+Vektör uzayı (emb_version, model) ayrımı: yerel yedek ve sağlayıcı vektörleri aynı
+boyutta olsa da arama, kopya tespiti ve birleştirmede karıştırılmaz; reindex
+--reembed farklı uzaydaki kayıtları yapılandırılmış uzaya taşır.
+"""
+
+from app.db.repository import get_conn, path_for_user
+from app.scripts import reindex
+from app.services import consolidator, embed_client, ltm_global_store, ltm_local_store, memory_dedupe
+from app.services import memory_versions
+
+# Testlerde EMB_BACKEND=local: yapılandırılmış uzay yerel uzaydır; "yabancı" uzay,
+# örneğin sağlayıcı modeliyle yazılmış eski kayıtları temsil eder.
+FOREIGN = ("text-embedding-004", "text-embedding-004")
+
+
+def _restamp(user_id: str, table: str, memory_id: int, space=FOREIGN) -> None:
+    with get_conn(path_for_user(user_id)) as con:
+        con.execute(
+            f"UPDATE {table} SET emb_version = ?, model = ? WHERE id = ?", (*space, memory_id)
+        )
+
+
+def _spaces(user_id: str, table: str):
+    with get_conn(path_for_user(user_id)) as con:
+        return {
+            int(r[0]): (r[1], r[2])
+            for r in con.execute(f"SELECT id, emb_version, model FROM {table} WHERE user_id = ?", (user_id,))
+        }
+
+
+def test_backend_space_is_local():
+    assert embed_client.PROVIDER_SPACE == embed_client.LOCAL_SPACE
+
+
+def test_search_skips_rows_from_another_space(user_id):
+    kept = ltm_global_store.add(user_id, "User plays the violin every evening")
+    other = ltm_global_store.add(user_id, "User plays the cello every evening")
+    _restamp(user_id, "global_memories", other["id"])
+
+    items, _ = ltm_global_store.search_embed(user_id, "User plays the cello every evening", topk=5)
+    assert [it["id"] for it in items] == [kept["id"]]
+
+    local = ltm_local_store.add("s1", user_id, "User prefers green tea")
+    _restamp(user_id, "local_memories", local["id"])
+    items, _ = ltm_local_store.search_embed(user_id, "s1", "User prefers green tea", topk=5)
+    assert items == []
+
+
+def test_find_duplicate_filters_by_space(user_id):
+    row = ltm_global_store.add(user_id, "User lives in Izmir near the sea")
+    _restamp(user_id, "global_memories", row["id"])
+    vec = embed_client.encode(["User lives in Izmir near the sea."])[0]
+    with get_conn(path_for_user(user_id)) as con:
+        assert memory_dedupe.find_duplicate(con, "global", user_id, None, vec) is not None
+        assert (
+            memory_dedupe.find_duplicate(con, "global", user_id, None, vec, space=embed_client.LOCAL_SPACE)
+            is None
+        )
+        assert memory_dedupe.find_duplicate(con, "global", user_id, None, vec, space=FOREIGN)[0] == row["id"]
+
+
+def test_consolidation_does_not_cluster_across_spaces(user_id):
+    # Benzerlik ~0.81: kopya eşiğinin (0.92) altında, birleştirme eşiğinin (0.8) üstünde
+    a = ltm_global_store.add(user_id, "User has two cats named Tarcin and Pamuk")
+    ltm_global_store.add(user_id, "User owns two cats, Tarcin and Pamuk")
+    report = consolidator.consolidate_user(user_id, scopes=("global",), threshold=0.8, use_llm=False, dry_run=True)
+    assert report["global"]["clusters"] == 1
+
+    _restamp(user_id, "global_memories", a["id"])
+    report = consolidator.consolidate_user(user_id, scopes=("global",), threshold=0.8, use_llm=False, dry_run=True)
+    assert report["global"]["clusters"] == 0
+
+
+def test_reembed_moves_rows_into_configured_space(user_id):
+    row = ltm_global_store.add(user_id, "User's favourite city is Trabzon")
+    _restamp(user_id, "global_memories", row["id"])
+    before = memory_versions.current(user_id)
+
+    with get_conn(path_for_user(user_id)) as con:
+        done, left = reindex.reembed(con, "global", user_id=user_id, db_path=path_for_user(user_id))
+    assert (done, left) == (1, 0)
+    assert _spaces(user_id, "global_memories") == {row["id"]: embed_client.PROVIDER_SPACE}
+    assert memory_versions.current(user_id) != before
+
+    items, _ = ltm_global_store.search_embed(user_id, "User's favourite city is Trabzon", topk=5)
+    assert [it["id"] for it in items] == [row["id"]]
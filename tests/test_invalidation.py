@@ -0,0 +1,142 @@
+# tests/test_invalidation.py
+"""
+LTM değiştiğinde türetilmiş yapıların bayatlaması: retrieval_cache girdisi her yazma
+yolundan (add / delete / clear, retention, birleştirme) sonra kullanılmaz; segmentli
+depoda birleştirme silinmiş id'leri düşer, arşivden geri alınan kayıt ise segmentler
+geçersizlendiği için aramada yeniden bulunur.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from app.db.repository import get_conn, path_for_user
+from app.services import consolidator, ltm_global_store, ltm_local_store, retention, retrieval_cache
+from app.services import vector_segments
+
+SESSION = "s1"
+
+
+def _age(user_id: str, table: str, memory_id: int, days: float = 400) -> None:
+    ts = int(time.time() - days * 86400)
+    with get_conn(path_for_user(user_id)) as con:
+        con.execute(f"UPDATE {table} SET created_at = ?, updated_at = ? WHERE id = ?", (ts, ts, memory_id))
+
+
+@pytest.fixture
+def max_age_policy(monkeypatch):
+    """Yalnızca 30 günden eski local kayıtları arşivleyen politika (diğer testlere dokunmaz)."""
+    monkeypatch.setattr(retention.settings, "RETENTION_MODE", "archive", raising=False)
+    monkeypatch.setattr(retention.settings, "LOCAL_RETENTION_MAX_AGE_DAYS", 30, raising=False)
+
+
+def _global_add(user_id, seed):
+    ltm_global_store.add(user_id, "User works as a marine biologist")
+
+
+def _global_delete(user_id, seed):
+    ltm_global_store.delete(seed["global_id"], user_id)
+
+
+def _global_clear(user_id, seed):
+    ltm_global_store.clear(user_id)
+
+
+def _local_add(user_id, seed):
+    ltm_local_store.add(SESSION, user_id, "User is planning a trip to Kars")
+
+
+def _local_delete(user_id, seed):
+    ltm_local_store.delete(seed["local_id"], user_id)
+
+
+def _local_clear(user_id, seed):
+    ltm_local_store.clear(user_id, SESSION)
+
+
+def _retention(user_id, seed):
+    _age(user_id, "local_memories", seed["local_id"])
+    report = retention.sweep(db_path=path_for_user(user_id))
+    assert report["local"] == {"max_age": 1}
+
+
+def _consolidation(user_id, seed):
+    # Benzerlik ~0.81: kopya eşiğinin altında, birleştirme eşiğinin üstünde
+    ltm_global_store.add(user_id, "User owns two cats, Tarcin and Pamuk")
+    report = consolidator.consolidate_user(user_id, scopes=("global",), threshold=0.8, use_llm=False)
+    assert report["global"]["clusters"] == 1
+
+
+@pytest.mark.parametrize(
+    "mutate",
+    [_global_add, _global_delete, _global_clear, _local_add, _local_delete, _local_clear, _retention, _consolidation],
+)
+def test_cache_entry_goes_stale_after_ltm_write(user_id, mutate, max_age_policy):
+    seed = {
+        "global_id": ltm_global_store.add(user_id, "User has two cats named Tarcin and Pamuk")["id"],
+        "local_id": ltm_local_store.add(SESSION, user_id, "User prefers window seats on trains")["id"],
+    }
+
+    key = retrieval_cache.key(user_id, SESSION, "cats", 5, 5, False)
+    versions = retrieval_cache.versions(user_id, SESSION)
+    retrieval_cache.put(key, versions, {"local": [], "global": [], "sources": [], "complete": True})
+    assert retrieval_cache.get(key, retrieval_cache.versions(user_id, SESSION)) is not None
+
+    mutate(user_id, seed)
+
+    assert retrieval_cache.versions(user_id, SESSION) != versions
+    assert retrieval_cache.get(key, retrieval_cache.versions(user_id, SESSION)) is None
+
+
+def _segment_ids(owner):
+    with get_conn(path_for_user(owner[1])) as con:
+        rows = con.execute(
+            "SELECT ids FROM vector_segments WHERE scope = ? AND user_id = ? AND session_id = ? ORDER BY max_id",
+            owner,
+        ).fetchall()
+    return [np.frombuffer(r[0], dtype=np.int64).tolist() for r in rows]
+
+
+_TEXTS = [
+    "User plays the violin every evening",
+    "User's sister lives in Berlin",
+    "User is allergic to penicillin",
+    "User drives an old green bicycle to work",
+]
+
+
+def test_compaction_drops_deleted_ids(user_id, monkeypatch):
+    monkeypatch.setattr(vector_segments, "SEAL_ROWS", 2)
+    ids = [ltm_global_store.add(user_id, t)["id"] for t in _TEXTS]
+    owner = ("global", user_id, "")
+
+    assert vector_segments.seal(owner) == 2
+    assert _segment_ids(owner) == [ids[:2], ids[2:]]
+
+    ltm_global_store.delete(ids[1], user_id)
+    assert vector_segments.compact(owner) == 1
+    assert _segment_ids(owner) == [[ids[0], *ids[2:]]]
+
+    items, _ = ltm_global_store.search_embed(user_id, _TEXTS[1], topk=5)
+    assert ids[1] not in [it["id"] for it in items]
+
+
+def test_restored_archive_row_is_found_after_invalidate(user_id, monkeypatch, max_age_policy):
+    monkeypatch.setattr(vector_segments, "SEAL_ROWS", 2)
+    ids = [ltm_local_store.add(SESSION, user_id, t)["id"] for t in _TEXTS]
+    owner = ("local", user_id, SESSION)
+    assert vector_segments.seal(owner) == 2
+
+    # Arşivlenen kayıt birleştirmede segmentten düşer; geri geldiğinde id'si mühürlü
+    # aralıkta kalır (kuyrukta değil) → yalnızca segment geçersizlemesi onu bulunur kılar
+    _age(user_id, "local_memories", ids[0])
+    assert retention.sweep(db_path=path_for_user(user_id))["local"] == {"max_age": 1}
+    assert vector_segments.compact(owner) == 1
+    assert ids[0] not in sum(_segment_ids(owner), [])
+
+    assert retention.restore_session(user_id, SESSION) == 1
+    assert _segment_ids(owner) == []
+
+    items, _ = ltm_local_store.search_embed(user_id, SESSION, _TEXTS[0], topk=1)
+    assert [it["id"] for it in items] == [ids[0]]
@@ -0,0 +1,46 @@
+# tests/test_loadtest.py
+"""
+Yük testi ölçümü (benchmarks.loadtest) testleri: 4xx / 429 yanıtları ayrı kovada
+sayılır, throughput ve gecikme yüzdeliklerine girmez.
+"""
+
+import asyncio
+import random
+
+import httpx
+
+from benchmarks import loadtest
+
+
+def test_classify_outcomes():
+    assert [loadtest.classify(o) for o in ("200", "201", "304")] == ["ok"] * 3
+    assert [loadtest.classify(o) for o in ("400", "401", "422", "429")] == ["client_error"] * 4
+    assert [loadtest.classify(o) for o in ("500", "503", "timeout", "ConnectError")] == ["error"] * 4
+
+
+def test_client_errors_excluded_from_throughput_and_latency():
+    # chat → 429 (hızlı), list → 200 (yavaş), search → 503
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/chat":
+            return httpx.Response(429)
+        if request.url.path == "/api/memory/search":
+            return httpx.Response(503)
+        return httpx.Response(200, json={})
+
+    async def run():
+        workload = loadtest.Workload(
+            users=2, sessions=1, mix=loadtest.parse_mix("chat=1,list=1,search=1"), prefix="t"
+        )
+        async with httpx.AsyncClient(base_url="http://test", transport=httpx.MockTransport(handler)) as client:
+            return await loadtest.run_level(client, workload, concurrency=2, duration_s=0.2, warmup_s=0, seed=1)
+
+    level = asyncio.run(run())
+    eps = level["endpoints"]
+    assert eps["chat"]["client_errors"] == eps["chat"]["requests"] > 0
+    assert eps["chat"]["errors"] == 0 and eps["chat"]["n"] == 0
+    assert eps["search"]["errors"] == eps["search"]["requests"]
+    assert level["latency"]["n"] == level["ok"] == eps["list"]["requests"]
+    assert level["client_errors"] + level["errors"] + level["ok"] == level["requests"]
+    # Throughput yalnızca başarılı istekler (elapsed_s yuvarlanmış)
+    assert abs(level["throughput_rps"] * level["elapsed_s"] - level["ok"]) < 0.01 * level["ok"] + 1
+    assert level["throughput_rps"] < level["requests"] / level["elapsed_s"]
@@ -0,0 +1,35 @@
+# tests/test_memory_policy.py
+"""
+Write-back ön filtresi (writeback_gate) testleri: kısa ama kişisel / kalıcı gerçek
+içeren mesajlar LLM çıkarımına gider; boş onaylar ve kısa sorular gitmez.
+"""
+
+import pytest
+
+from app.services import writeback_gate
+
+
+@pytest.fixture(autouse=True)
+def _no_sampling(monkeypatch):
+    monkeypatch.setattr(writeback_gate, "GATE_SAMPLE_RATE", 0.0)
+    monkeypatch.setattr(writeback_gate, "GATE_ENABLED", True)
+
+
+@pytest.mark.parametrize("message", ["I am vegan", "Im allergic", "I'm 34", "Çay severim", "Ben Elif"])
+def test_short_personal_statements_pass(message):
+    assert len(message) < writeback_gate.GATE_MIN_CHARS
+    decision = writeback_gate.decide(message, "")
+    assert decision["extract"], decision
+    assert "too_short" not in decision["reasons"]
+
+
+@pytest.mark.parametrize("message", ["sounds fun", "why not", "what time?", "hmm, maybe"])
+def test_short_impersonal_messages_are_skipped(message):
+    decision = writeback_gate.decide(message, "")
+    assert not decision["extract"], decision
+    assert decision["reasons"] == ["too_short"]
+
+
+def test_trivial_acknowledgement_is_skipped():
+    for message in ("thanks!", "Tamam.", "ok"):
+        assert writeback_gate.decide(message, "")["reasons"] == ["trivial"]
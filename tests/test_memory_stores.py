@@ -0,0 +1,102 @@
+# tests/test_memory_stores.py
+"""
+LTM depoları (ltm_global_store / ltm_local_store) testleri: yakın-kopya birleştirme,
+çelişen ifadelerde en son söylenenin geçerli olması ve çevrim dışı birleştirmenin
+(consolidator) zincirleme benzerlikte uzak kayıtları silmemesi.
+"""
+
+import json
+
+import numpy as np
+
+from app.services import consolidator, ltm_global_store, ltm_local_store, memory_dedupe
+
+
+def _texts(user_id: str):
+    items, _total = ltm_global_store.list(user_id, limit=100)
+    return [it["text"] for it in items]
+
+
+def test_paraphrase_merges_into_existing_memory(user_id):
+    first = ltm_global_store.add(user_id, "User lives in Istanbul with two cats")
+    again = ltm_global_store.add(user_id, "User lives in Istanbul with two cats.")
+    assert again["id"] == first["id"]
+    assert _texts(user_id) == ["User lives in Istanbul with two cats"]
+    assert again["meta"]["dup_count"] == 1
+
+
+def test_negated_statement_supersedes_instead_of_merging(user_id):
+    old = ltm_global_store.add(user_id, "User is allergic to peanuts")
+    new = ltm_global_store.add(user_id, "User is not allergic to peanuts")
+    assert new["id"] != old["id"]
+    assert _texts(user_id) == ["User is not allergic to peanuts"]
+    assert new["meta"]["superseded_texts"] == ["User is allergic to peanuts"]
+
+
+def test_changed_number_supersedes_instead_of_merging(user_id):
+    base = "User's daughter Elif was born in {} and studies at Ankara Science High School"
+    ltm_global_store.add(user_id, base.format(2015))
+    new = ltm_global_store.add(user_id, base.format(2016))
+    assert _texts(user_id) == [base.format(2016)]
+    assert new["meta"]["supersedes"]
+
+
+def test_local_store_supersedes_within_session(user_id):
+    ltm_local_store.add("s1", user_id, "User is allergic to peanuts")
+    ltm_local_store.add("s1", user_id, "User is not allergic to peanuts")
+    items, total = ltm_local_store.list(user_id, "s1")
+    assert total == 1
+    assert items[0]["text"] == "User is not allergic to peanuts"
+
+
+def test_conflicts_detects_negation_and_numbers():
+    assert memory_dedupe.conflicts("User is allergic to peanuts", "User isn't allergic to peanuts")
+    assert memory_dedupe.conflicts("Kullanıcı kahve seviyor", "Kullanıcı kahve sevmiyor")
+    assert memory_dedupe.conflicts("User is 30 years old", "User is 31 years old")
+    assert not memory_dedupe.conflicts("User likes coffee", "user likes coffee a lot")
+    # Çift olumsuzluk olumlu sayılır
+    assert not memory_dedupe.conflicts("User never says no to tea", "User likes tea")
+
+
+def _chain(degrees):
+    """Birim çember üzerinde verilen açılarda vektörler: komşular benzer, uçlar değil."""
+    rad = np.radians(np.asarray(degrees, dtype=np.float64))
+    return np.stack([np.cos(rad), np.sin(rad)], axis=1).astype(np.float32)
+
+
+def test_single_linkage_chain_is_split_around_medoid():
+    # 0°~30°~60°~90°: komşu benzerliği 0.87, 0° ile 90° arası 0
+    emb = _chain([0, 30, 60, 90])
+    thr = 0.85
+    assert consolidator.cluster(emb, thr) == [[0, 1, 2, 3]]
+
+    groups = consolidator._tight_groups(emb, [0, 1, 2, 3], thr)
+    assert groups == [(1, [0, 1, 2])]
+    for medoid, members in groups:
+        assert all(float(emb[i] @ emb[medoid]) >= thr for i in members)
+
+
+def test_chain_remainder_is_reclustered_not_dropped():
+    # 10° adımlı zincir; eşik ~12°: yalnızca komşular benzer
+    emb = _chain([0, 10, 20, 30, 40, 50])
+    thr = float(np.cos(np.radians(12)))
+    assert consolidator.cluster(emb, thr) == [[0, 1, 2, 3, 4, 5]]
+
+    groups = consolidator._tight_groups(emb, range(6), thr)
+    # Medoid (20°) çevresi birleşir; kalan 40°~50° çifti ayrıca birleşir, 0° korunur
+    assert sorted((m, sorted(g)) for m, g in groups) == [(2, [1, 2, 3]), (4, [4, 5])]
+
+
+def test_plan_group_never_drops_rows_dissimilar_to_kept_row():
+    emb = _chain([0, 30, 60, 90])
+    rows = [
+        {"id": i + 1, "text": f"fact {i}", "meta": json.dumps({}), "embedding": v.tobytes(), "user_id": "u"}
+        for i, v in enumerate(emb)
+    ]
+    plans = consolidator._plan_group("global", rows, threshold=0.85, use_llm=False, dry_run=True)
+    assert len(plans) == 1
+    keep = plans[0]["keep"]
+    assert keep["id"] == 2
+    assert sorted(plans[0]["drop_ids"]) == [1, 3]
+    # 90° kaydı 30° medoidine benzemez → korunur
+    assert 4 not in plans[0]["drop_ids"]
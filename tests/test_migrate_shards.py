@@ -0,0 +1,117 @@
+# tests/test_migrate_shards.py
+"""
+Tek dosyadan shard'lara çevrimiçi geçiş (app.scripts.migrate_shards): yarıda kesilen
+kopya kaldığı yerden devam eder ve satırları tekrar yazmaz; son eşitleme (--final)
+kaynakta daha yeni updated_at'e sahip kayıtları günceller, shard'da daha yeni olanlara
+dokunmaz ve kaynakta silinmiş kayıtları düşer.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from app.db.repository import ensure_schema, get_conn, seed_sequences
+from app.scripts import migrate_shards
+
+USERS = [f"m-user-{i}" for i in range(6)]
+
+
+def _vec(i: int) -> bytes:
+    v = np.zeros(8, dtype=np.float32)
+    v[i % 8] = 1.0
+    return v.tobytes()
+
+
+@pytest.fixture
+def env(tmp_path):
+    source = str(tmp_path / "memory.db")
+    ensure_schema(path=source)
+    now = int(time.time()) - 100
+    with get_conn(source) as con:
+        for i, user in enumerate(USERS):
+            con.execute("INSERT INTO users (user_id, created_at) VALUES (?, ?)", (user, now))
+            con.execute(
+                "INSERT INTO global_memories (user_id, text, embedding, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (user, f"fact {i}", _vec(i), now, now),
+            )
+    targets = migrate_shards._Targets(2, tmp_path, 64)
+    for i, path in enumerate(targets.paths):
+        ensure_schema(path=path)
+        with get_conn(path) as con:
+            seed_sequences(con, i)
+    return source, targets
+
+
+def _shard_rows(targets):
+    out = {}
+    for path in targets.paths:
+        with get_conn(path) as con:
+            for r in con.execute("SELECT id, user_id, text FROM global_memories"):
+                out[int(r[0])] = (r[1], r[2])
+    return out
+
+
+def test_interrupted_copy_resumes_without_duplicates(env, monkeypatch):
+    source, targets = env
+    real_write = migrate_shards._write
+    calls = {"n": 0}
+
+    def crashing_write(*args, **kwargs):
+        if args[1] == "global_memories":
+            calls["n"] += 1
+            if calls["n"] == 3:
+                raise RuntimeError("crash")
+        return real_write(*args, **kwargs)
+
+    monkeypatch.setattr(migrate_shards, "_write", crashing_write)
+    with pytest.raises(RuntimeError):
+        migrate_shards.copy(source, targets, batch_size=2)
+    assert len(_shard_rows(targets)) == 4
+    with get_conn(source) as con:
+        assert migrate_shards._state(con)["global_memories"][0] == 4
+
+    monkeypatch.setattr(migrate_shards, "_write", real_write)
+    report = migrate_shards.copy(source, targets, batch_size=2)
+    assert report["global_memories"]["copied"] == 2
+
+    rows = _shard_rows(targets)
+    assert sorted(u for u, _t in rows.values()) == USERS
+    for i, path in enumerate(targets.paths):
+        with get_conn(path) as con:
+            for (user,) in con.execute("SELECT user_id FROM global_memories"):
+                assert targets.for_user(user) == i
+    assert migrate_shards.verify(source, targets)["ok"]
+
+    # Yeni satır: yalnızca o kopyalanır
+    with get_conn(source) as con:
+        con.execute(
+            "INSERT INTO global_memories (user_id, text, embedding, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (USERS[0], "fact new", _vec(9), int(time.time()), int(time.time())),
+        )
+    assert migrate_shards.copy(source, targets, batch_size=2)["global_memories"]["copied"] == 1
+
+
+def test_final_sync_upserts_by_updated_at(env):
+    source, targets = env
+    migrate_shards.copy(source, targets, batch_size=100)
+    ids = sorted(_shard_rows(targets))
+    newer = int(time.time()) + 10
+
+    with get_conn(source) as con:
+        # Kaynakta güncellendi → shard'a taşınmalı
+        con.execute("UPDATE global_memories SET text = 'fact 0 (edited)', updated_at = ? WHERE id = ?", (newer, ids[0]))
+        # Kaynakta eski bir düzenleme; shard'daki kopya daha yeni → korunmalı
+        con.execute("UPDATE global_memories SET text = 'fact 1 (stale)', updated_at = ? WHERE id = ?", (newer, ids[1]))
+        con.execute("DELETE FROM global_memories WHERE id = ?", (ids[2],))
+    user1 = _shard_rows(targets)[ids[1]][0]
+    with get_conn(targets.paths[targets.for_user(user1)]) as con:
+        con.execute("UPDATE global_memories SET text = 'fact 1 (shard)', updated_at = ? WHERE id = ?", (newer + 10, ids[1]))
+
+    report = migrate_shards.finalize(source, targets, batch_size=100)
+    assert report["global_memories"] == {"resynced": 1, "dropped": 1}
+
+    rows = _shard_rows(targets)
+    assert rows[ids[0]][1] == "fact 0 (edited)"
+    assert rows[ids[1]][1] == "fact 1 (shard)"
+    assert ids[2] not in rows
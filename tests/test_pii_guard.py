@@ -0,0 +1,85 @@
+# tests/test_pii_guard.py
+"""
+PII maskeleme (pii_guard) testleri: tür başına scan() span'ları ve maskeli çıktı,
+toplu (scrub_texts) ayraç sınırları ve kötü niyetli girdilerde doğrusal süre.
+"""
+
+import time
+
+import pytest
+
+from app.services.pii_guard import scan, scrub_text, scrub_texts
+
+CASES = [
+    # (metin, beklenen span türleri, beklenen maskeli çıktı)
+    ("mail ali.veli@example.com.", ["email"], "mail al***@example.com."),
+    ("kart 4111 1111 1111 1111 ok", ["card"], "kart *** ok"),
+    ("kart 4111-1111-1111-1111", ["card"], "kart ***"),
+    ("kart 4111111111111111", ["card"], "kart ***"),
+    ("iban TR330006100519786457841326 x", ["iban"], "iban TR*** x"),
+    ("iban TR33 0006 1005 1978 6457 8413 26 x", ["iban"], "iban TR*** x"),
+    ("DE89370400440532013000", ["iban"], "DE***"),
+    ("tc 12345678901", ["national_id"], "tc ***"),
+    ("tel +90 (532) 123 45 67.", ["phone"], "tel ***."),
+    ("ara (555 123 4567)", ["phone"], "ara ***"),
+    # Luhn'u geçmeyen 16 hane kart değildir, telefon kovasına düşer
+    ("no 1234 5678 9012 3456", ["phone"], "no ***"),
+    ("sayı 2024 yılı 12 kişi, 123-45", [], "sayı 2024 yılı 12 kişi, 123-45"),
+]
+
+
+@pytest.mark.parametrize("text,kinds,masked", CASES)
+def test_scan_and_scrub_each_type(text, kinds, masked):
+    assert [k for _s, _e, k in scan(text)] == kinds
+    assert scrub_text(text) == masked
+
+
+def test_scan_spans_are_exact():
+    text = "a@b.co 4111 1111 1111 1111 "
+    assert scan(text) == [(0, 6, "email"), (7, 26, "card")]
+
+
+def test_masks_reveal_no_card_or_account_digits():
+    for text in ("4111 1111 1111 1111", "TR330006100519786457841326"):
+        assert not any(c.isdigit() for c in scrub_text(text))
+
+
+def test_scrub_texts_matches_single_scrub_and_keeps_boundaries():
+    # Her parça tek başına 7 haneden kısa; birleşseler telefon sayılırdı
+    texts = ["tel 053", "21 23", None, "", "ali@example.com", "4111 11", "11 1111"]
+    out = scrub_texts(texts)
+    # Komşu metinlerdeki rakamlar ayraçtan öteye birleşip tek span oluşturmaz
+    assert out == [scrub_text(t) if t else t for t in texts]
+    assert out == ["tel 053", "21 23", None, "", "al***@example.com", "4111 11", "11 1111"]
+
+
+def test_scrub_texts_with_separator_in_input_falls_back():
+    texts = ["a\x00b 4111 1111 1111 1111", "tc 12345678901"]
+    assert scrub_texts(texts) == ["a\x00b ***", "tc ***"]
+
+
+@pytest.mark.parametrize(
+    "make",
+    [
+        lambda n: "1 " * (n // 2) + "x",
+        lambda n: "a" * n,
+        lambda n: "a@" + "-" * n,
+        lambda n: "a@b" + ".c" * (n // 2),
+        lambda n: "(12) " * (n // 5) + "x",
+        lambda n: "TR12" + "A" * n,
+    ],
+)
+def test_adversarial_inputs_scale_linearly(make):
+    def best_of(text, repeats=3):
+        times = []
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            scrub_text(text)
+            times.append(time.perf_counter() - t0)
+        return min(times)
+
+    small, large = make(20_000), make(80_000)
+    t_small, t_large = best_of(small), best_of(large)
+    # 4x uzunluk: doğrusalda ~4x; karesel davranış ~16x olurdu
+    assert t_large < max(t_small, 1e-4) * 10
+    assert t_large < 1.0
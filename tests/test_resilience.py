@@ -0,0 +1,142 @@
+# tests/test_resilience.py
+"""
+Dayanıklılık katmanı (deadline / retry / hedge / devre kesici / sağlayıcı kuyruğu) testleri.
+Sağlayıcı davranışı stub_providers ile enjekte edilir (gecikme, hata, askıda kalma).
+"""
+
+import time
+
+import pytest
+
+from app.core.errors import CircuitOpenError, DeadlineExceededError
+from app.services import provider_scheduler
+from app.services.resilience import CircuitBreaker, LatencyTracker, call_with_deadline
+from app.services.stub_providers import StubChatModel, StubProviderError
+
+FAST_BACKOFF = {"backoff_base_s": 0.001, "backoff_max_s": 0.002}
+
+
+def _stub(**kwargs) -> StubChatModel:
+    kwargs.setdefault("latency_ms", 5.0)
+    return StubChatModel(distribution="fixed", seed=1, **kwargs)
+
+
+def _call(model: StubChatModel):
+    return lambda: model.invoke(["merhaba"]).content
+
+
+def test_returns_result_within_deadline():
+    model = _stub()
+    assert call_with_deadline(_call(model), deadline_s=1.0) == "(stub) merhaba"
+    assert model.calls == 1
+
+
+def test_hung_call_raises_deadline_exceeded():
+    model = _stub(hang_rate=1.0, hang_ms=2000.0)
+    t0 = time.monotonic()
+    with pytest.raises(DeadlineExceededError):
+        call_with_deadline(_call(model), deadline_s=0.2, retries=2, **FAST_BACKOFF)
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_retries_until_success():
+    model = _stub(error_rate=1.0)
+
+    def flaky():
+        try:
+            return model.invoke(["merhaba"]).content
+        finally:
+            if model.calls >= 2:
+                model.error_rate = 0.0
+
+    assert call_with_deadline(flaky, deadline_s=2.0, retries=2, **FAST_BACKOFF) == "(stub) merhaba"
+    assert model.calls == 3
+
+
+def test_gives_up_after_retries_with_last_error():
+    model = _stub(error_rate=1.0)
+    with pytest.raises(StubProviderError):
+        call_with_deadline(_call(model), deadline_s=2.0, retries=2, **FAST_BACKOFF)
+    assert model.calls == 3
+
+
+def test_provider_timeout_error_is_retried_not_treated_as_deadline():
+    model = _stub()
+    calls = {"n": 0}
+
+    def read_timeout_once():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise TimeoutError("socket read timed out")
+        return model.invoke(["merhaba"]).content
+
+    assert call_with_deadline(read_timeout_once, deadline_s=2.0, retries=1, **FAST_BACKOFF) == "(stub) merhaba"
+    assert calls["n"] == 2
+
+
+def test_hedge_races_slow_attempt():
+    slow, fast = _stub(latency_ms=1500.0), _stub(latency_ms=5.0)
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.record(0.02)
+    calls = {"n": 0}
+    hedges = []
+
+    def first_slow():
+        calls["n"] += 1
+        model = slow if calls["n"] == 1 else fast
+        return model.invoke(["merhaba"]).content
+
+    t0 = time.monotonic()
+    out = call_with_deadline(
+        first_slow,
+        deadline_s=3.0,
+        tracker=tracker,
+        hedge=True,
+        on_hedge=lambda: hedges.append(1),
+    )
+    assert out == "(stub) merhaba"
+    assert hedges == [1]
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_breaker_opens_fails_fast_and_recovers():
+    breaker = CircuitBreaker("test", error_rate=0.5, min_calls=4, window_s=30.0, open_s=0.2)
+    model = _stub(error_rate=1.0)
+    for _ in range(4):
+        with pytest.raises(StubProviderError):
+            call_with_deadline(_call(model), deadline_s=1.0, retries=0, breaker=breaker)
+    assert breaker.state == "open"
+
+    # Açıkken sağlayıcı çağrılmaz
+    with pytest.raises(CircuitOpenError):
+        call_with_deadline(_call(model), deadline_s=1.0, retries=0, breaker=breaker)
+    assert model.calls == 4
+
+    time.sleep(0.25)
+    assert breaker.state == "half_open"
+    model.error_rate = 0.0
+    assert call_with_deadline(_call(model), deadline_s=1.0, retries=0, breaker=breaker) == "(stub) merhaba"
+    assert breaker.state == "closed"
+
+
+def test_failed_half_open_probe_reopens():
+    breaker = CircuitBreaker("test", error_rate=0.5, min_calls=2, window_s=30.0, open_s=0.1)
+    model = _stub(error_rate=1.0)
+    for _ in range(2):
+        with pytest.raises(StubProviderError):
+            call_with_deadline(_call(model), deadline_s=1.0, retries=0, breaker=breaker)
+    time.sleep(0.15)
+    with pytest.raises(StubProviderError):
+        call_with_deadline(_call(model), deadline_s=1.0, retries=0, breaker=breaker)
+    assert breaker.state == "open"
+
+
+def test_inline_background_calls_use_interactive_queue_timeout():
+    bg = provider_scheduler.BACKGROUND
+    assert provider_scheduler.queue_timeout(bg) == provider_scheduler.PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S
+    with provider_scheduler.inline():
+        # İstek yolundaki background sitesi (ör. distill) yanıtı uzun süre bekletmez
+        assert provider_scheduler.current_priority("summarizer") == bg
+        assert provider_scheduler.queue_timeout(bg) == provider_scheduler.PROVIDER_QUEUE_TIMEOUT_S
+    assert provider_scheduler.queue_timeout(bg) == provider_scheduler.PROVIDER_BACKGROUND_QUEUE_TIMEOUT_S
@@ -0,0 +1,67 @@
+# tests/test_retriever.py
+"""
+retriever.retrieve_context testleri: semantik LLM önbelleği sınırı (context_key) yalnızca
+sorgu dışı bağlam (STM, özet, getirilen hafızalar) aynıyken eşleşir; STM özeti açıkken
+de istekteki stm_max_turns ham tur sınırıdır.
+"""
+
+import uuid
+
+from app.services import ltm_global_store, retriever, stm_store, stm_summary
+
+
+def _ask(user_id: str, session_id: str, message: str) -> str:
+    # /chat gibi: kullanıcı turu STM'e yazılır, sonra bağlam derlenir
+    stm_store.append_turn(session_id, role="user", text=message)
+    return retriever.retrieve_context(user_id=user_id, session_id=session_id, query_text=message)["context_key"]
+
+
+def test_context_key_ignores_the_query_itself(user_id):
+    a = _ask(user_id, f"s-{uuid.uuid4().hex[:8]}", "What is my name?")
+    b = _ask(user_id, f"s-{uuid.uuid4().hex[:8]}", "What's my name?")
+    assert a == b
+
+
+def test_context_key_changes_with_stm(user_id):
+    session = f"s-{uuid.uuid4().hex[:8]}"
+    first = _ask(user_id, session, "What is my name?")
+    stm_store.append_turn(session, role="assistant", text="I don't know your name yet.")
+    stm_store.append_turn(session, role="user", text="My name is Deniz.")
+    stm_store.append_turn(session, role="assistant", text="Nice to meet you, Deniz.")
+    assert _ask(user_id, session, "What is my name?") != first
+
+
+def test_context_key_changes_with_retrieved_memories(user_id):
+    before = _ask(user_id, f"s-{uuid.uuid4().hex[:8]}", "Where does the user live?")
+    ltm_global_store.add(user_id, "User lives in Eskisehir")
+    after = _ask(user_id, f"s-{uuid.uuid4().hex[:8]}", "Where does the user live?")
+    assert after != before
+
+
+def _session_with_turns(n: int) -> str:
+    session = f"s-{uuid.uuid4().hex[:8]}"
+    for i in range(n):
+        stm_store.append_turn(session, role="user" if i % 2 == 0 else "assistant", text=f"turn {i}")
+    return session
+
+
+def test_stm_summary_is_rule_based_by_default():
+    assert stm_summary.STM_SUMMARY_ENABLED
+    assert stm_summary.USE_LLM is False
+
+
+def test_stm_max_turns_caps_raw_turns_with_summary_enabled():
+    session = _session_with_turns(10)
+    _summary, turns = stm_summary.context(session, 2)
+    assert [t["text"] for t in turns] == ["turn 8", "turn 9"]
+
+    # 0 → sınır yok: özetlenmemiş turların tamamı (pencere + özeti bekleyenler)
+    _summary, turns = stm_summary.context(session, 0)
+    assert [t["text"] for t in turns] == [f"turn {i}" for i in range(10)]
+
+
+def test_stm_max_turns_reaches_the_prompt(user_id):
+    session = _session_with_turns(10)
+    ctx = retriever.retrieve_context(user_id=user_id, session_id=session, query_text="turn 9", stm_max_turns=1)
+    assert ctx["used_stm_turns"] == 1
+    assert "ASSISTANT: turn 9" in ctx["prompt"] and "turn 8" not in ctx["prompt"]
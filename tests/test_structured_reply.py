@@ -0,0 +1,45 @@
+# tests/test_structured_reply.py
+"""
+Tek çağrı modu ayrıştırıcısı (structured_reply) testleri: akış parçalarının sınırı
+kaçış dizilerini ve UTF-16 vekil çiftlerini bölse de yanıt metni bozulmaz.
+"""
+
+import json
+
+import pytest
+
+from app.services.structured_reply import IncrementalReplyParser
+
+REPLY = "Merhaba 😀 \"Ankara\"\nçay? é"
+RAW = json.dumps({"reply": REPLY, "memories": []})  # ensure_ascii: 😀 → 😀
+
+
+def _stream(chunks):
+    p = IncrementalReplyParser()
+    deltas = [p.feed(c) for c in chunks]
+    return "".join(deltas), p.finish()
+
+
+@pytest.mark.parametrize("cut", range(1, len(RAW)))
+def test_split_at_any_position_decodes_reply(cut):
+    streamed, result = _stream([RAW[:cut], RAW[cut:]])
+    assert streamed == REPLY
+    assert "�" not in streamed
+    assert result == {"reply": REPLY, "memories": [], "structured": True}
+
+
+def test_char_by_char_stream_keeps_emoji():
+    assert "\\ud83d\\ude00" in RAW
+    streamed, _ = _stream(list(RAW))
+    assert streamed == REPLY
+
+
+def test_surrogate_pair_split_between_escapes():
+    i = RAW.index("\\ude00")
+    streamed, _ = _stream([RAW[:i], RAW[i:]])
+    assert streamed == REPLY
+
+
+def test_unpaired_surrogates_become_replacement_char():
+    streamed, _ = _stream(['{"reply": "a\\ud83d', 'b \\ude00c"}'])
+    assert streamed == "a�b �c"